@@ -22,5 +22,8 @@
 
 
 from horton.gbasis.cext import *
+from horton.gbasis.direct import *
+from horton.gbasis.gridstream import *
+from horton.gbasis.intcache import *
 from horton.gbasis.gobasis import *
 from horton.gbasis.iobas import *
@@ -0,0 +1,51 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Function pointer types for the BLAS routines used in the C++ code
+
+/**
+    @file blas.h
+    @brief Function pointer types for BLAS routines.
+
+    HORTON does not link to a BLAS library directly. Instead, the BLAS routines
+    from scipy.linalg.cython_blas are passed to the C++ code as function
+    pointers, using the Fortran calling convention (all arguments by
+    reference, column-major matrices).
+*/
+
+#ifndef HORTON_GBASIS_BLAS_H
+#define HORTON_GBASIS_BLAS_H
+
+
+/** @brief
+        Function pointer type for the Fortran BLAS routine dgemm.
+  */
+typedef void (*dgemm_t)(char* transa, char* transb, int* m, int* n, int* k,
+    double* alpha, double* a, int* lda, double* b, int* ldb, double* beta,
+    double* c, int* ldc);
+
+/** @brief
+        Function pointer type for the Fortran BLAS routine dgemv.
+  */
+typedef void (*dgemv_t)(char* trans, int* m, int* n, double* alpha, double* a,
+    int* lda, double* x, int* incx, double* beta, double* y, int* incy);
+
+
+#endif  // HORTON_GBASIS_BLAS_H
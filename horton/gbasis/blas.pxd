@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+#cython: language_level=3
+
+cdef extern from "horton/gbasis/blas.h":
+    ctypedef void (*dgemm_t)(char* transa, char* transb, int* m, int* n, int* k,
+        double* alpha, double* a, int* lda, double* b, int* ldb, double* beta,
+        double* c, int* ldc) noexcept nogil
+    ctypedef void (*dgemv_t)(char* trans, int* m, int* n, double* alpha, double* a,
+        int* lda, double* x, int* incx, double* beta, double* y, int* incy) noexcept nogil
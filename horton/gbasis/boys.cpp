@@ -115,3 +115,50 @@ void boys_function_array(long mmax, double t, double *output) {
         }
     }
 }
+
+
+void boys_function_batch(long mmax, long npoint, const double* t, double* output) {
+    if (mmax < 0 || mmax > BOYS_MAX_M) {
+        throw std::domain_error("Arguments to Boys function are outside the valid domain.");
+    }
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+        if (t[ipoint] < 0) {
+            throw std::domain_error("Arguments to Boys function are outside the valid domain.");
+        }
+    }
+    // The table of the highest order is the largest. The comparison is done in
+    // floating point, to avoid an overflow of the index for very large arguments.
+    const double tmax = (boys_sizes[mmax] - 1.5)/BOYS_RESOLUTION;
+    double* output_mmax = output + mmax*npoint;
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+        const double tp = t[ipoint];
+        if (tp < tmax) {
+            const int i = static_cast<int>(round(tp*BOYS_RESOLUTION));
+            const double t_delta = (i - tp*BOYS_RESOLUTION)/BOYS_RESOLUTION;
+            output_mmax[ipoint] = boys_fn_data[mmax+6][i];
+            for (long k=5; k >= 0; k--) {
+                output_mmax[ipoint] = boys_fn_data[mmax+k][i] +
+                                      output_mmax[ipoint]*t_delta/(k+1);
+            }
+        } else {
+            // Upward recursion, which is stable for large arguments, starting from
+            // the asymptotic form of the zeroth order.
+            const double e = exp(-tp);
+            double tail = SQRT_PI_D2/sqrt(tp);
+            for (long m=1; m <= mmax; m++) tail = 0.5*((2*m-1)*tail - e)/tp;
+            output_mmax[ipoint] = tail;
+        }
+    }
+    if (mmax == 0) return;
+    // The first row of the output is used to store exp(-t) until it gets
+    // overwritten by the Boys function of order zero in the last iteration.
+    for (long ipoint=0; ipoint < npoint; ipoint++) output[ipoint] = exp(-t[ipoint]);
+    for (long m=mmax-1; m >= 0; m--) {
+        const double factor = 1.0/(2*m+1);
+        const double* output_above = output + (m+1)*npoint;
+        double* output_m = output + m*npoint;
+        for (long ipoint=0; ipoint < npoint; ipoint++) {
+            output_m[ipoint] = (2*t[ipoint]*output_above[ipoint] + output[ipoint])*factor;
+        }
+    }
+}
@@ -53,4 +53,30 @@ double boys_function(long m, double t);
  */
 void boys_function_array(long mmax, double t, double *output);
 
+/** @brief
+        Compute the boys function for a range of orders and many arguments in one go.
+
+    The Boys function of the highest order is interpolated with the tabulated Taylor
+    series (or the asymptotic form for large t). The lower orders are obtained with
+    the downward recursion F_m(t) = (2 t F_{m+1}(t) + exp(-t))/(2 m + 1), which is
+    numerically stable. All loops run over the arguments for a fixed order.
+
+    @param mmax
+        The highest value of the order, for which the Boys function is to be computed.
+        All orders for zero up ot this value (inclusive) are considered.
+
+    @param npoint
+        The number of arguments.
+
+    @param t
+        The rescaled distances between the two centers. This array must not
+        overlap with the output array. (size=npoint)
+
+    @param output
+        The output array, with the orders running slowest, i.e.
+        output[m*npoint + ipoint] is the Boys function of order m for argument
+        t[ipoint]. (size=(mmax+1)*npoint)
+ */
+void boys_function_batch(long mmax, long npoint, const double* t, double* output);
+
 #endif  // HORTON_GBASIS_BOYS_H_
@@ -24,3 +24,4 @@
 cdef extern from "horton/gbasis/boys.h":
     double boys_function(long m, double t) except +
     void boys_function_array(long mmax, double t, double *output) except +
+    void boys_function_batch(long mmax, long npoint, const double* t, double* output) except +
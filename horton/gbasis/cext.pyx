@@ -27,8 +27,10 @@ cimport numpy as np
 np.import_array()
 
 cimport libc.string
-from libcpp.vector cimport vector
-from cython.operator cimport dereference as deref
+cimport libcpp
+from libc.stdlib cimport free
+from cpython.pycapsule cimport PyCapsule_New, PyCapsule_GetPointer
+from scipy.linalg.cython_blas cimport dgemm, dgemv
 
 cimport horton.gbasis.boys as boys
 cimport horton.gbasis.cartpure as cartpure
@@ -40,16 +42,23 @@ cimport horton.gbasis.iter_gb as iter_gb
 cimport horton.gbasis.iter_pow as iter_pow
 cimport horton.gbasis.cholesky as cholesky
 cimport horton.gbasis.gbw as gbw
+cimport horton.gbasis.gridcache as gridcache
+cimport horton.gbasis.packed as packed
 
 import atexit
+import os
+import tempfile
+
+import h5py as h5
 
 from horton.log import log, biblio
 from horton.cext import compute_grid_nucpot
+from horton.moments import get_cartesian_to_pure, get_ncart_cumul, get_npure_cumul
 
 
 __all__ = [
     # boys
-    'boys_function', 'boys_function_array',
+    'boys_function', 'boys_function_array', 'boys_function_batch',
     # cartpure
     'cart_to_pure_low',
     # common
@@ -69,6 +78,8 @@ __all__ = [
     'GB4ElectronRepulsionIntegralLibInt',
     'GB4ErfIntegralLibInt', 'GB4GaussIntegralLibInt',
     'GB4RAlphaIntegralLibInt',
+    # gridcache
+    'GB1GridCache',
     # fns
     'GB1DMGridDensityFn', 'GB1DMGridGradientFn', 'GB1DMGridGGAFn',
     'GB1DMGridKineticFn', 'GB1DMGridHessianFn', 'GB1DMGridMGGAFn',
@@ -76,6 +87,9 @@ __all__ = [
     'IterGB1', 'IterGB2', 'IterGB4',
     # iter_pow
     'iter_pow1_inc', 'IterPow1', 'IterPow2',
+    # packed
+    'get_packed_size', 'pack_four_index', 'unpack_four_index',
+    'contract_direct_packed', 'contract_exchange_packed',
 ]
 
 
@@ -137,6 +151,68 @@ cdef prepare_array(array, shape, name):
     return array
 
 
+cdef void _free_capsule(object capsule) noexcept:
+    """Release a buffer allocated with malloc in the C++ code, wrapped in a capsule."""
+    free(PyCapsule_GetPointer(capsule, NULL))
+
+
+cdef class _CholeskyStorage(object):
+    """Resizable HDF5 dataset to which the Cholesky code appends its vectors."""
+    cdef object group
+    cdef object name
+    cdef object dataset
+    cdef object error
+
+    def __cinit__(self, group, name):
+        self.group = group
+        self.name = name
+        self.dataset = None
+        self.error = None
+
+    def get_dataset(self, long npair):
+        """Return the dataset, which is created when no vectors were stored."""
+        if self.dataset is None:
+            self.dataset = self.group.create_dataset(
+                self.name, (0, npair), float, maxshape=(None, npair),
+                chunks=(1, max(npair, 1)))
+        return self.dataset
+
+
+cdef libcpp.bool _cholesky_store(void* context, const double* vectors, long nvec,
+                                 long npair) noexcept:
+    """Append Cholesky vectors to a _CholeskyStorage, called from the C++ code."""
+    cdef _CholeskyStorage storage = <_CholeskyStorage> context
+    cdef np.npy_intp dims[2]
+    dims[0] = <np.npy_intp> nvec
+    dims[1] = <np.npy_intp> npair
+    try:
+        block = np.PyArray_SimpleNewFromData(2, dims, np.NPY_DOUBLE, <double*> vectors)
+        dataset = storage.get_dataset(npair)
+        begin = dataset.shape[0]
+        dataset.resize(begin + nvec, axis=0)
+        dataset[begin:] = block
+        return True
+    except BaseException as e:
+        storage.error = e
+        return False
+
+
+cdef libcpp.bool _cholesky_load(void* context, double* vectors, long begin, long end,
+                                long npair) noexcept:
+    """Read Cholesky vectors back from a _CholeskyStorage, called from the C++ code."""
+    cdef _CholeskyStorage storage = <_CholeskyStorage> context
+    cdef np.npy_intp dims[2]
+    dims[0] = <np.npy_intp> (end - begin)
+    dims[1] = <np.npy_intp> npair
+    try:
+        block = np.PyArray_SimpleNewFromData(2, dims, np.NPY_DOUBLE, vectors)
+        block[:] = storage.dataset[begin:end]
+        return True
+    except BaseException as e:
+        storage.error = e
+        return False
+
+
 #
 # boys wrappers (for testing only)
 #
@@ -152,6 +228,13 @@ def boys_function_array(long mmax, double t):
     return output
 
 
+def boys_function_batch(long mmax, np.ndarray[double, ndim=1] t not None):
+    assert t.flags['C_CONTIGUOUS']
+    cdef np.ndarray[double, ndim=2] output = np.zeros((max(mmax, 0)+1, t.shape[0]))
+    boys.boys_function_batch(mmax, t.shape[0], <double*>t.data, <double*>output.data)
+    return output
+
+
 #
 # cartpure wrappers (for testing only)
 #
@@ -328,8 +411,13 @@ cdef class GBasis:
     cdef np.ndarray _shell_types
     cdef np.ndarray _alphas
     cdef np.ndarray _con_coeffs
+    # Schwarz bounds for different interaction potentials
+    cdef dict _schwarz_bounds
+    # Persistent cache for integrals, or None
+    cdef object _integral_cache
 
     def __cinit__(self, centers, shell_map, nprims, shell_types, alphas, con_coeffs):
+        self._schwarz_bounds = {}
         # Make private copies of the input arrays.
         self._centers = np.array(centers, dtype=float)
         self._shell_map = np.array(shell_map, dtype=int)
@@ -509,6 +597,86 @@ cdef class GBasis:
         def __get__(self):
             return self._this.get_max_shell_type()
 
+    property nthread:
+        '''The number of threads used to compute integrals and grid properties
+
+           The symmetry-unique shell pairs or quartets are distributed over a
+           pool of threads, each with its own integral object. The results do
+           not depend on the number of threads. Grid points are distributed
+           over the threads in blocks. Each thread has its own work arrays and,
+           for Fock matrices, its own output, which are summed at the end. The
+           GIL is released during the evaluation on grids. The default is one
+           thread.
+        '''
+        def __get__(self):
+            return self._this.get_nthread()
+
+        def __set__(self, long nthread):
+            self._this.set_nthread(nthread)
+
+    property grid_tolerance:
+        '''Basis functions smaller than this value are neglected on grids
+
+           Each shell gets a cutoff radius, beyond which all its primitives are
+           smaller than the tolerance. Shells whose cutoff sphere does not
+           overlap with a block of grid points are not evaluated on that
+           block. A zero tolerance disables this screening. The default is
+           1e-20.
+        '''
+        def __get__(self):
+            return self._this.get_grid_tolerance()
+
+        def __set__(self, double grid_tolerance):
+            self._this.set_grid_tolerance(grid_tolerance)
+
+    property shell_radii:
+        '''The cutoff radius of each shell, see ``grid_tolerance``'''
+        def __get__(self):
+            cdef np.npy_intp* shape = [self.nshell]
+            tmp = np.PyArray_SimpleNewFromData(1, shape, np.NPY_DOUBLE,
+                        <void*> self._this.get_shell_radii())
+            return tmp.copy()
+
+    property pair_threshold:
+        '''Products of primitives with a smaller overlap are neglected in integrals
+
+           The products of all pairs of primitives (exponent sums, Gaussian
+           product centers and prefactors) are computed once and reused by the
+           two- and four-center integrals, the Cholesky decomposition and the
+           electrostatic potential on grids. The overlap of two s-type
+           primitives with the same exponents, contraction coefficients and
+           normalization is used to discard negligible products. A zero
+           threshold keeps all products. The default is 1e-20.
+        '''
+        def __get__(self):
+            return self._this.get_pair_threshold()
+
+        def __set__(self, double pair_threshold):
+            self._this.set_pair_threshold(pair_threshold)
+
+    property integral_cache:
+        '''An IntegralCache in which integrals are looked up before they are computed
+
+           When set, the one-electron integrals, the four-center integrals and
+           their Cholesky decompositions are loaded from the cache when they
+           were computed before, in this or in an earlier run, for the same
+           basis set and parameters. New results are added to the cache. The
+           default is None, i.e. no caching.
+        '''
+        def __get__(self):
+            return self._integral_cache
+
+        def __set__(self, integral_cache):
+            self._integral_cache = integral_cache
+
+    property nprim_pair:
+        '''The number of non-negligible products of primitives, see ``pair_threshold``
+
+           Both orders of a pair of primitives are counted.
+        '''
+        def __get__(self):
+            return self._this.get_shell_pairs().get_npair_total()
+
     def _log_init(self):
         '''Write a summary of the basis to the screen logger'''
         if log.do_medium:
@@ -547,7 +715,7 @@ cdef class GBasis:
                             np.ndarray[double, ndim=1] point not None,
                             GB1DMGridFn grid_fn not None):
         assert output.flags['C_CONTIGUOUS']
-        assert output.shape[0] == self.nbasis
+        assert output.shape[0] == self.nbasis*grid_fn.dim_work
         assert point.flags['C_CONTIGUOUS']
         assert point.shape[0] == 3
         self._this.compute_grid_point1(&output[0], &point[0], grid_fn._this)
@@ -666,6 +834,35 @@ cdef class GOBasis(GBasis):
             raise TypeError('coeffs.shape[1] should not be below the number of occupation '
                             'numbers. Got {}. Expected at least {}.'.format(coeffs.shape[1], nocc))
 
+    def _load_cached(self, key, output):
+        """Copy integrals from the integral cache into output.
+
+        Parameters
+        ----------
+        key : tuple
+            The type of integrals and all its parameters.
+        output
+            The output array.
+
+        Returns
+        -------
+        found : bool
+            True when the integrals were present in the cache.
+        """
+        if self._integral_cache is None:
+            return False
+        output = np.asarray(output)
+        cached = self._integral_cache.load(self, key)
+        if cached is None or cached.shape != output.shape:
+            return False
+        output[:] = cached
+        return True
+
+    def _store_cached(self, key, output):
+        """Add integrals to the integral cache, if any. See ``_load_cached``."""
+        if self._integral_cache is not None:
+            self._integral_cache.store(self, key, np.asarray(output))
+
     def compute_overlap(self, double[:, ::1] output=None):
         """Compute the overlap integrals in a Gaussian orbital basis.
 
@@ -679,7 +876,10 @@ cdef class GOBasis(GBasis):
         output
         """
         output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        if self._load_cached(('olp',), output):
+            return np.asarray(output)
         (<gbasis.GOBasis*>self._this).compute_overlap(&output[0, 0])
+        self._store_cached(('olp',), output)
         return np.asarray(output)
 
     def compute_kinetic(self, double[:, ::1] output=None):
@@ -695,7 +895,10 @@ cdef class GOBasis(GBasis):
         output
         """
         output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        if self._load_cached(('kin',), output):
+            return np.asarray(output)
         (<gbasis.GOBasis*>self._this).compute_kinetic(&output[0, 0])
+        self._store_cached(('kin',), output)
         return np.asarray(output)
 
     def compute_nuclear_attraction(self, double[:, ::1] coordinates not None,
@@ -722,9 +925,13 @@ cdef class GOBasis(GBasis):
         natom = coordinates.shape[0]
         check_shape(charges, (natom,), 'charges')
         output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        key = ('na', np.asarray(coordinates), np.asarray(charges))
+        if self._load_cached(key, output):
+            return np.asarray(output)
         # actual job
         (<gbasis.GOBasis*>self._this).compute_nuclear_attraction(
             &charges[0], &coordinates[0, 0], natom, &output[0, 0])
+        self._store_cached(key, output)
         return np.asarray(output)
 
     def compute_erf_attraction(self, double[:, ::1] coordinates not None,
@@ -761,9 +968,13 @@ cdef class GOBasis(GBasis):
         natom = coordinates.shape[0]
         check_shape(charges, (natom,), 'charges')
         output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        key = ('erfna', np.asarray(coordinates), np.asarray(charges), mu)
+        if self._load_cached(key, output):
+            return np.asarray(output)
         # actual job
         (<gbasis.GOBasis*>self._this).compute_erf_attraction(
             &charges[0], &coordinates[0, 0], natom, &output[0, 0], mu)
+        self._store_cached(key, output)
         return np.asarray(output)
 
     def compute_gauss_attraction(self, double[:, ::1] coordinates not None,
@@ -802,9 +1013,13 @@ cdef class GOBasis(GBasis):
         natom = coordinates.shape[0]
         check_shape(charges, (natom,), 'charges')
         output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        key = ('gaussna', np.asarray(coordinates), np.asarray(charges), c, alpha)
+        if self._load_cached(key, output):
+            return np.asarray(output)
         # actual job
         (<gbasis.GOBasis*>self._this).compute_gauss_attraction(
             &charges[0], &coordinates[0, 0], natom, &output[0, 0], c, alpha)
+        self._store_cached(key, output)
         return np.asarray(output)
 
     def compute_multipole_moment(self, long[::1] xyz, double[::1] center not None,
@@ -840,7 +1055,198 @@ cdef class GOBasis(GBasis):
             &xyz[0], &center[0], &output[0, 0])
         return np.asarray(output)
 
-    def compute_electron_repulsion(self, double[:, :, :, ::1] output=None):
+    def compute_multipole_moments(self, double[::1] center not None, long lmax,
+                                  long mtype=1, output=None):
+        """Compute all multipole moment integrals up to a given order at once.
+
+        All components are computed in a single pass over all pairs of shells,
+        which is much faster than calling ``compute_multipole_moment`` for each
+        Cartesian component separately.
+
+        Parameters
+        ----------
+        center : np.ndarray, shape = (3,)
+            A numpy array of shape (3,) with the center [C_x, C_y, C_z] around which the
+            moment integrals are computed.
+        lmax : int
+            The highest order of the multipole moments.
+        mtype : int
+            The type of multipole moments: 1=``cartesian`` or 2=``pure``, with the
+            same conventions as in :mod:`horton.moments`.
+        output : np.ndarray, shape = (ncomponent, nbasis, nbasis)
+            Output array, optional. The first component is the overlap matrix. The
+            Cartesian components are ordered as in ``get_cartesian_powers``.
+
+        Returns
+        -------
+        output
+        """
+        # type checking
+        check_shape(center, (3,), 'center')
+        if lmax < 0:
+            raise ValueError('lmax can not be negative.')
+        if mtype == 1:
+            ncomponent = get_ncart_cumul(lmax)
+        elif mtype == 2:
+            ncomponent = get_npure_cumul(lmax)
+        else:
+            raise ValueError('Unsupported mtype.')
+        output = prepare_array(output, (ncomponent, self.nbasis, self.nbasis), 'output')
+        # actual job
+        cdef double[:, :, ::1] cartesian
+        if mtype == 1:
+            cartesian = output
+        else:
+            cartesian = np.zeros((get_ncart_cumul(lmax), self.nbasis, self.nbasis))
+        (<gbasis.GOBasis*>self._this).compute_multipole_moments(
+            &center[0], lmax, &cartesian[0, 0, 0])
+        if mtype == 2:
+            output[:] = np.tensordot(get_cartesian_to_pure(lmax), cartesian, axes=1)
+        return np.asarray(output)
+
+    def _get_schwarz_bounds(self, GB4Integral gb4int not None, key):
+        """Return the Schwarz bounds for all pairs of shells.
+
+        The bounds are computed only once for every type of four-center
+        integral and are recomputed when the centers have changed.
+
+        Parameters
+        ----------
+        gb4int
+            The object that can carry out four-center integrals.
+        key
+            A hashable object that identifies the interaction potential,
+            including its parameters.
+
+        Returns
+        -------
+        bounds : np.ndarray, shape=(nshell, nshell), dtype=float
+            The square root of the largest (ab|ab) integral for every pair of
+            shells a and b.
+        """
+        cdef double[:, ::1] bounds
+        centers, result = self._schwarz_bounds.get(key, (None, None))
+        if centers is None or not (centers == self._centers).all():
+            bounds = np.zeros((self.nshell, self.nshell))
+            self._this.compute_schwarz_bounds(&bounds[0, 0], gb4int._this)
+            result = np.asarray(bounds)
+            self._schwarz_bounds[key] = (self._centers.copy(), result)
+        return result
+
+    def _compute_four_index(self, GB4Integral gb4int not None, key, output=None,
+                            double schwarz_threshold=0.0, bint packed=False):
+        """Compute a given type of four-center integrals, with optional screening.
+
+        Parameters
+        ----------
+        gb4int
+            The object that can carry out four-center integrals.
+        key
+            A hashable object that identifies the interaction potential,
+            including its parameters. It is used to cache the Schwarz bounds
+            and, together with the other arguments, to look up the integrals
+            in the ``integral_cache``.
+        output
+            A Four-index object, optional.
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound is
+            below this threshold are skipped and the corresponding integrals
+            are set to zero.
+        packed
+            When True, only the symmetry-unique integrals are stored in a
+            one-dimensional array. See ``get_packed_size``.
+
+        Returns
+        -------
+        output
+        """
+        cdef double[:, ::1] bounds
+        cdef double[::1] output_view
+        cdef long nskip
+        if packed:
+            shape = (get_packed_size(self.nbasis),)
+        else:
+            shape = (self.nbasis, self.nbasis, self.nbasis, self.nbasis)
+        output = prepare_array(output, shape, 'output')
+        if not output.flags['C_CONTIGUOUS']:
+            raise TypeError('output must be C contiguous.')
+        cache_key = ('four_index',) + key + (schwarz_threshold, packed)
+        if self._load_cached(cache_key, output):
+            return output
+        output_view = output.reshape(-1)
+        if schwarz_threshold > 0:
+            bounds = self._get_schwarz_bounds(gb4int, key)
+            nskip = self._this.compute_four_index(
+                &output_view[0], gb4int._this, &bounds[0, 0], schwarz_threshold, packed)
+            if log.do_medium:
+                nquartet = self.nshell*(self.nshell + 1)*(self.nshell**2 + self.nshell + 2)//8
+                log('Schwarz screening skipped %i out of %i shell quartets.' % (nskip, nquartet))
+        else:
+            self._this.compute_four_index(&output_view[0], gb4int._this, NULL, 0.0, packed)
+        self._store_cached(cache_key, output)
+        return output
+
+    def _compute_four_index_jk(self, GB4Integral gb4int not None, key,
+                               double[:, :, ::1] dms not None,
+                               double[:, :, ::1] directs=None,
+                               double[:, :, ::1] exchanges=None,
+                               double schwarz_threshold=0.0):
+        """Contract four-center integrals with density matrices, without storing them.
+
+        Parameters
+        ----------
+        gb4int
+            The object that can carry out four-center integrals.
+        key
+            A hashable object that identifies the interaction potential,
+            including its parameters. It is used to cache the Schwarz bounds.
+        dms
+            The density matrices, shape=(ndm, nbasis, nbasis).
+        directs
+            When given, the direct contractions, ``einsum('abcd,bd->ac')``,
+            are added to this array with shape (ndm, nbasis, nbasis).
+        exchanges
+            When given, the exchange contractions, ``einsum('abcd,cb->ad')``,
+            are added to this array with shape (ndm, nbasis, nbasis).
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound,
+            multiplied by the largest relevant density matrix element, is
+            below this threshold are skipped.
+
+        Returns
+        -------
+        nskip
+            The number of symmetry-unique shell quartets that were skipped.
+        """
+        cdef double[:, ::1] bounds
+        cdef double* bounds_ptr = NULL
+        cdef double* directs_ptr = NULL
+        cdef double* exchanges_ptr = NULL
+        cdef long ndm = dms.shape[0]
+        cdef long nskip
+        if dms.shape[1] != self.nbasis or dms.shape[2] != self.nbasis:
+            raise TypeError('dms does not have the right shape.')
+        if ndm == 0:
+            return 0
+        if directs is not None:
+            prepare_array(directs, (ndm, self.nbasis, self.nbasis), 'directs')
+            directs_ptr = &directs[0, 0, 0]
+        if exchanges is not None:
+            prepare_array(exchanges, (ndm, self.nbasis, self.nbasis), 'exchanges')
+            exchanges_ptr = &exchanges[0, 0, 0]
+        if schwarz_threshold > 0:
+            bounds = self._get_schwarz_bounds(gb4int, key)
+            bounds_ptr = &bounds[0, 0]
+        nskip = self._this.compute_four_index_jk(
+            gb4int._this, ndm, &dms[0, 0, 0], directs_ptr, exchanges_ptr,
+            bounds_ptr, schwarz_threshold)
+        if schwarz_threshold > 0 and log.do_high:
+            nquartet = self.nshell*(self.nshell + 1)*(self.nshell**2 + self.nshell + 2)//8
+            log('Schwarz screening skipped %i out of %i shell quartets.' % (nskip, nquartet))
+        return nskip
+
+    def compute_electron_repulsion(self, output=None,
+                                   double schwarz_threshold=0.0, bint packed=False):
         r'''Compute electron-electron repulsion integrals.
 
         The potential has the following form:
@@ -851,7 +1257,15 @@ cdef class GOBasis(GBasis):
         Parameters
         ----------
         output
-            A Four-index object, optional.
+            A Four-index object, optional. When packed is True, a
+            one-dimensional array with length ``get_packed_size(nbasis)``.
+            An np.memmap can be used to store the integrals on disk.
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound is
+            below this threshold are skipped and set to zero.
+        packed
+            When True, only the symmetry-unique integrals are stored, which
+            reduces the memory usage eightfold. See ``get_packed_size``.
 
         Returns
         -------
@@ -861,11 +1275,12 @@ cdef class GOBasis(GBasis):
         '''
         biblio.cite('valeev2014',
                     'the efficient implementation of four-center electron repulsion integrals')
-        output = prepare_array(output, (self.nbasis, self.nbasis, self.nbasis, self.nbasis), 'output')
-        (<gbasis.GOBasis*>self._this).compute_electron_repulsion(&output[0, 0, 0, 0])
-        return np.asarray(output)
+        return self._compute_four_index(
+            GB4ElectronRepulsionIntegralLibInt(self.max_shell_type), ('er',),
+            output, schwarz_threshold, packed)
 
-    def compute_erf_repulsion(self, double mu=0.0, double[:, :, :, ::1] output=None):
+    def compute_erf_repulsion(self, double mu=0.0, output=None,
+                              double schwarz_threshold=0.0, bint packed=False):
         r"""Compute short-range electron repulsion integrals.
 
         The potential has the following form:
@@ -878,7 +1293,15 @@ cdef class GOBasis(GBasis):
         mu : float
             Parameter for the erf(mu r)/r potential. Default is zero.
         output
-            A Four-index object, optional.
+            A Four-index object, optional. When packed is True, a
+            one-dimensional array with length ``get_packed_size(nbasis)``.
+            An np.memmap can be used to store the integrals on disk.
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound is
+            below this threshold are skipped and set to zero.
+        packed
+            When True, only the symmetry-unique integrals are stored, which
+            reduces the memory usage eightfold. See ``get_packed_size``.
 
         Returns
         -------
@@ -890,12 +1313,13 @@ cdef class GOBasis(GBasis):
                  'the efficient implementation of four-center electron repulsion integrals')
         biblio.cite('ahlrichs2006',
                  'the methodology to implement various types of four-center integrals.')
-        output = prepare_array(output, (self.nbasis, self.nbasis, self.nbasis, self.nbasis), 'output')
-        (<gbasis.GOBasis*>self._this).compute_erf_repulsion(&output[0, 0, 0, 0], mu)
-        return np.asarray(output)
+        return self._compute_four_index(
+            GB4ErfIntegralLibInt(self.max_shell_type, mu), ('erf', mu),
+            output, schwarz_threshold, packed)
 
     def compute_gauss_repulsion(self, double c=1.0, double alpha=1.0,
-                                double[:, :, :, ::1] output=None):
+                                output=None,
+                                double schwarz_threshold=0.0, bint packed=False):
         r"""Compute gaussian repulsion four-center integrals.
 
         The potential has the following form:
@@ -910,7 +1334,15 @@ cdef class GOBasis(GBasis):
         alpha : float
             Exponential parameter of the gaussian.
         output
-            A Four-index object, optional.
+            A Four-index object, optional. When packed is True, a
+            one-dimensional array with length ``get_packed_size(nbasis)``.
+            An np.memmap can be used to store the integrals on disk.
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound is
+            below this threshold are skipped and set to zero.
+        packed
+            When True, only the symmetry-unique integrals are stored, which
+            reduces the memory usage eightfold. See ``get_packed_size``.
 
         Returns
         -------
@@ -926,11 +1358,12 @@ cdef class GOBasis(GBasis):
                  'four-center integrals with a Gaussian interaction potential.')
         biblio.cite('toulouse2004',
                  'four-center integrals with a Gaussian interaction potential.')
-        output = prepare_array(output, (self.nbasis, self.nbasis, self.nbasis, self.nbasis), 'output')
-        (<gbasis.GOBasis*>self._this).compute_gauss_repulsion(&output[0, 0, 0, 0], c, alpha)
-        return np.asarray(output)
+        return self._compute_four_index(
+            GB4GaussIntegralLibInt(self.max_shell_type, c, alpha), ('gauss', c, alpha),
+            output, schwarz_threshold, packed)
 
-    def compute_ralpha_repulsion(self, double alpha=-1.0, double[:, :, :, ::1] output=None):
+    def compute_ralpha_repulsion(self, double alpha=-1.0, output=None,
+                                 double schwarz_threshold=0.0, bint packed=False):
         r"""Compute r^alpha repulsion four-center integrals.
 
         The potential has the following form:
@@ -945,7 +1378,17 @@ cdef class GOBasis(GBasis):
         alpha : float
             The power of r in the interaction potential.
         output
-            A Four-index object, optional.
+            A Four-index object, optional. When packed is True, a
+            one-dimensional array with length ``get_packed_size(nbasis)``.
+            An np.memmap can be used to store the integrals on disk.
+        schwarz_threshold
+            When positive, shell quartets whose Cauchy-Schwarz upper bound is
+            below this threshold are skipped and set to zero. This is only
+            supported for negative alpha, for which the potential is positive
+            definite.
+        packed
+            When True, only the symmetry-unique integrals are stored, which
+            reduces the memory usage eightfold. See ``get_packed_size``.
 
         Returns
         -------
@@ -953,15 +1396,18 @@ cdef class GOBasis(GBasis):
 
         Keywords: :index:`ERI`, :index:`four-center integrals`
         """
+        if schwarz_threshold > 0 and alpha >= 0:
+            raise ValueError('Schwarz screening requires a negative alpha.')
         biblio.cite('valeev2014',
                  'the efficient implementation of four-center electron repulsion integrals')
         biblio.cite('ahlrichs2006',
                  'the methodology to implement various types of four-center integrals.')
-        output = prepare_array(output, (self.nbasis, self.nbasis, self.nbasis, self.nbasis), 'output')
-        (<gbasis.GOBasis*>self._this).compute_ralpha_repulsion(&output[0, 0, 0, 0], alpha)
-        return np.asarray(output)
+        return self._compute_four_index(
+            GB4RAlphaIntegralLibInt(self.max_shell_type, alpha), ('ralpha', alpha),
+            output, schwarz_threshold, packed)
 
-    def _compute_cholesky(self, GB4Integral gb4int, double threshold=1e-8):
+    def _compute_cholesky(self, GB4Integral gb4int, double threshold=1e-8, output=None,
+                          bint reduced=False, key=None, double memory=1e9):
         """Apply the Cholesky code to a given type of four-center integrals.
 
         Parameters
@@ -969,55 +1415,201 @@ cdef class GOBasis(GBasis):
         gb4int
             The object that can carry out four-center integrals.
         threshold
-            The cutoff for the Cholesky decomposition.
+            The cutoff for the Cholesky decomposition. Pairs of shells for which
+            all integrals are below this cutoff, according to the Cauchy-Schwarz
+            inequality, are discarded before the decomposition starts.
+        output : h5py.Group
+            When given, the vectors are written to a new dataset ``cholesky`` in this
+            group, chunked per vector, instead of being returned as an array. When
+            reduced is True, the pair indexes are written to ``cholesky_pairs``. The
+            vectors are appended to the dataset while they are computed, such that
+            they never need to fit in memory all at once. When reduced is False,
+            the vectors in the reduced space are first written to a temporary file
+            in the same directory as the output.
+        reduced : bool
+            When True, the vectors are returned in the reduced space of basis
+            pairs that survived the screening, together with the indexes of these
+            pairs.
+        key
+            A hashable object that identifies the interaction potential,
+            including its parameters. When given, the full vectors, i.e. when
+            output is None and reduced is False, are looked up in the
+            ``integral_cache`` before they are computed.
+        memory : float
+            Only used when output is given. The approximate amount of memory, in
+            bytes, used to hold Cholesky vectors. Half of it is used to buffer new
+            vectors before they are written to output, the other half to read back
+            previous vectors.
 
         Returns
         -------
         array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
-            The Cholesky-decomposed four-center integrals
+            The Cholesky-decomposed four-center integrals. When output is given, the
+            h5py.Dataset with the vectors is returned instead.
+
+        When reduced is True, a tuple with two arrays is returned instead:
+
+        vectors : np.ndarray, shape=(nvec, npair), dtype=float
+            The Cholesky vectors for the basis pairs that are not discarded.
+        pairs : np.ndarray, shape=(npair,), dtype=int
+            The index ``a*nbasis + c`` of each basis pair (a, c). The full vectors
+            are obtained as ``full.reshape(nvec, -1)[:, pairs] = vectors``.
         """
         cdef gbw.GB4IntegralWrapper* gb4w = NULL
-        cdef vector[double]* vectors = NULL
-        cdef np.npy_intp dims[3]
-        cdef np.ndarray result
-
-        cdef extern from "numpy/arrayobject.h":
-            void PyArray_ENABLEFLAGS(np.ndarray arr, int flags)
+        cdef double* vectors = NULL
+        cdef long* pairs = NULL
+        cdef long npair = 0
+        cdef np.npy_intp dims[2]
+        cdef np.ndarray vectors_array
+        cdef np.ndarray pairs_array
+        cdef _CholeskyStorage storage = None
+        cdef cholesky.cholesky_store_t store = NULL
+        cdef cholesky.cholesky_load_t load = NULL
+
+        use_cache = (self._integral_cache is not None and key is not None and
+                     output is None and not reduced)
+        if use_cache:
+            cache_key = ('cholesky',) + key + (threshold,)
+            result = self._integral_cache.load(self, cache_key)
+            if result is not None:
+                return result
+
+        tmp_fn = None
+        tmp_file = None
+        if output is not None:
+            # The vectors in the reduced space are written while they are computed.
+            # When the full vectors are requested, they are derived afterwards from
+            # the reduced ones in a temporary file, next to the output. (Removing
+            # a dataset from the output would not make the file smaller.)
+            if reduced:
+                storage = _CholeskyStorage(output, 'cholesky')
+            else:
+                tmp_dir = os.path.dirname(os.path.abspath(output.file.filename))
+                fd, tmp_fn = tempfile.mkstemp(
+                    '.h5', 'horton_cholesky_', tmp_dir if os.path.isdir(tmp_dir) else None)
+                os.close(fd)
+                tmp_file = h5.File(tmp_fn, 'w')
+                storage = _CholeskyStorage(tmp_file, 'cholesky')
+            store = _cholesky_store
+            load = _cholesky_load
 
         try:
-            gb4w = new gbw.GB4IntegralWrapper(<gbasis.GOBasis*> self._this,
-                                              <ints.GB4Integral*> gb4int._this)
-            vectors = new vector[double]()
-            nvec = cholesky.cholesky(gb4w, vectors, threshold)
+            try:
+                gb4w = new gbw.GB4IntegralWrapper(<gbasis.GOBasis*> self._this,
+                                                  <ints.GB4Integral*> gb4int._this)
+                nvec = cholesky.cholesky(gb4w, &vectors, &pairs, &npair, threshold,
+                                         dgemm, dgemv, memory, store, load, <void*> storage)
+            except RuntimeError:
+                # Report the original problem when the output could not be accessed.
+                if storage is not None and storage.error is not None:
+                    raise storage.error
+                raise
+            finally:
+                if gb4w is not NULL:
+                    del gb4w
+
+            # The buffers are handed over to NumPy without a copy. They are released
+            # by the capsules when the arrays are garbage collected.
             dims[0] = <np.npy_intp> nvec
-            dims[1] = <np.npy_intp> self.nbasis
-            dims[2] = <np.npy_intp> self.nbasis
-            result = np.PyArray_SimpleNewFromData(3, dims, np.NPY_DOUBLE, &(deref(vectors)[0]))
-            PyArray_ENABLEFLAGS(result, np.NPY_OWNDATA)
+            dims[1] = <np.npy_intp> npair
+            pairs_array = np.PyArray_SimpleNewFromData(1, &dims[1], np.NPY_LONG, pairs)
+            np.set_array_base(pairs_array, PyCapsule_New(pairs, NULL, _free_capsule))
+            if output is not None:
+                return self._expand_cholesky_output(output, storage.get_dataset(npair),
+                                                    pairs_array, reduced, memory)
         finally:
-            if gb4w is not NULL:
-                del gb4w
+            if tmp_file is not None:
+                tmp_file.close()
+            if tmp_fn is not None:
+                os.remove(tmp_fn)
+
+        vectors_array = np.PyArray_SimpleNewFromData(2, dims, np.NPY_DOUBLE, vectors)
+        np.set_array_base(vectors_array, PyCapsule_New(vectors, NULL, _free_capsule))
+
+        if reduced:
+            return vectors_array, pairs_array
 
+        if npair == self.nbasis*self.nbasis:
+            # Nothing is discarded, so the vectors are already in the right layout.
+            result = vectors_array.reshape(nvec, self.nbasis, self.nbasis)
+        else:
+            result = np.zeros((nvec, self.nbasis*self.nbasis))
+            result[:, pairs_array] = vectors_array
+            result.shape = (nvec, self.nbasis, self.nbasis)
+
+        if use_cache:
+            self._integral_cache.store(self, cache_key, result)
         return result
 
-    def compute_electron_repulsion_cholesky(self, double threshold=1e-8):
+    def _expand_cholesky_output(self, output, dataset, pairs, bint reduced, double memory):
+        """Finish the Cholesky vectors that were written to an h5py.Group.
+
+        Parameters
+        ----------
+        output : h5py.Group
+            The group given to ``_compute_cholesky``.
+        dataset : h5py.Dataset
+            The Cholesky vectors in the reduced space, shape (nvec, npair). When
+            reduced is False, this dataset is in a temporary file.
+        pairs : np.ndarray, shape=(npair,), dtype=int
+            The index ``a*nbasis + c`` of each basis pair (a, c).
+        reduced : bool
+            When True, only the pairs are written. Otherwise, the full vectors are
+            written to the dataset ``cholesky``, in blocks that fit in memory.
+        memory : float
+            The approximate amount of memory, in bytes, for one block of vectors.
+
+        Returns
+        -------
+        The same as ``_compute_cholesky``, but with h5py.Dataset objects.
+        """
+        if reduced:
+            return dataset, output.create_dataset('cholesky_pairs', data=pairs)
+        nvec, npair = dataset.shape
+        nbasis = self.nbasis
+        result = output.create_dataset('cholesky', (nvec, nbasis, nbasis), float,
+                                       chunks=(1, nbasis, nbasis))
+        nblock = max(1, int(memory/(8*(nbasis*nbasis + npair))))
+        for begin in range(0, nvec, nblock):
+            end = min(begin + nblock, nvec)
+            block = np.zeros((end - begin, nbasis*nbasis))
+            block[:, pairs] = dataset[begin:end]
+            result[begin:end] = block.reshape(end - begin, nbasis, nbasis)
+        return result
+
+    def compute_electron_repulsion_cholesky(self, double threshold=1e-8, output=None,
+                                            bint reduced=False, double memory=1e9):
         r"""Compute Cholesky decomposition of electron repulsion four-center integrals.
 
         Parameters
         ----------
         threshold
             The cutoff for the Cholesky decomposition.
+        output : h5py.Group
+            When given, the vectors are written to a new dataset ``cholesky`` in
+            this group, which can be used with OutOfCoreFourIndex.
+        reduced : bool
+            When True, return the vectors only for the basis pairs that survive
+            the screening, together with the indexes of these pairs. See
+            ``_compute_cholesky`` for details.
+        memory : float
+            Only used when output is given. The approximate amount of memory, in
+            bytes, used to hold Cholesky vectors while they are written to output.
 
         Returns
         -------
         array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
-            The Cholesky-decomposed four-center integrals
+            The Cholesky-decomposed four-center integrals. When output is given,
+            the h5py.Dataset with the vectors is returned instead.
 
         Keywords: :index:`ERI`, :index:`four-center integrals`
         """
-        return self._compute_cholesky(GB4ElectronRepulsionIntegralLibInt(self.max_shell_type))
+        return self._compute_cholesky(GB4ElectronRepulsionIntegralLibInt(self.max_shell_type),
+                                      threshold, output, reduced, ('er',), memory)
 
-    def compute_erf_repulsion_cholesky(self, double mu=0.0, double threshold=1e-8):
+    def compute_erf_repulsion_cholesky(self, double mu=0.0, double threshold=1e-8,
+                                       output=None, bint reduced=False,
+                                       double memory=1e9):
         r"""Compute Cholesky decomposition of Erf repulsion four-center integrals.
 
         The potential has the following form:
@@ -1031,18 +1623,31 @@ cdef class GOBasis(GBasis):
             Parameter for the erf(mu r)/r potential. Default is zero.
         threshold
             The cutoff for the Cholesky decomposition.
+        output : h5py.Group
+            When given, the vectors are written to a new dataset ``cholesky`` in
+            this group, which can be used with OutOfCoreFourIndex.
+        reduced : bool
+            When True, return the vectors only for the basis pairs that survive
+            the screening, together with the indexes of these pairs. See
+            ``_compute_cholesky`` for details.
+        memory : float
+            Only used when output is given. The approximate amount of memory, in
+            bytes, used to hold Cholesky vectors while they are written to output.
 
         Returns
         -------
         array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
-            The Cholesky-decomposed four-center integrals
+            The Cholesky-decomposed four-center integrals. When output is given,
+            the h5py.Dataset with the vectors is returned instead.
 
         Keywords: :index:`ERI`, :index:`four-center integrals`
         """
-        return self._compute_cholesky(GB4ErfIntegralLibInt(self.max_shell_type, mu))
+        return self._compute_cholesky(GB4ErfIntegralLibInt(self.max_shell_type, mu),
+                                      threshold, output, reduced, ('erf', mu), memory)
 
     def compute_gauss_repulsion_cholesky(self, double c=1.0, double alpha=1.0,
-                                         double threshold=1e-8):
+                                         double threshold=1e-8, output=None,
+                                         bint reduced=False, double memory=1e9):
         r"""Compute Cholesky decomposition of Gauss repulsion four-center integrals.
 
         The potential has the following form:
@@ -1058,17 +1663,31 @@ cdef class GOBasis(GBasis):
             Exponential parameter of the gaussian.
         threshold
             The cutoff for the Cholesky decomposition.
+        output : h5py.Group
+            When given, the vectors are written to a new dataset ``cholesky`` in
+            this group, which can be used with OutOfCoreFourIndex.
+        reduced : bool
+            When True, return the vectors only for the basis pairs that survive
+            the screening, together with the indexes of these pairs. See
+            ``_compute_cholesky`` for details.
+        memory : float
+            Only used when output is given. The approximate amount of memory, in
+            bytes, used to hold Cholesky vectors while they are written to output.
 
         Returns
         -------
         array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
-            The Cholesky-decomposed four-center integrals
+            The Cholesky-decomposed four-center integrals. When output is given,
+            the h5py.Dataset with the vectors is returned instead.
 
         Keywords: :index:`ERI`, :index:`four-center integrals`
         """
-        return self._compute_cholesky(GB4GaussIntegralLibInt(self.max_shell_type, c, alpha))
+        return self._compute_cholesky(GB4GaussIntegralLibInt(self.max_shell_type, c, alpha),
+                                      threshold, output, reduced, ('gauss', c, alpha), memory)
 
-    def compute_ralpha_repulsion_cholesky(self, double alpha=-1.0, double threshold=1e-8):
+    def compute_ralpha_repulsion_cholesky(self, double alpha=-1.0, double threshold=1e-8,
+                                          output=None, bint reduced=False,
+                                          double memory=1e9):
         r"""Compute Cholesky decomposition of ralpha repulsion four-center integrals.
 
         The potential has the following form:
@@ -1083,15 +1702,158 @@ cdef class GOBasis(GBasis):
             The power of r in the interaction potential.
         threshold
             The cutoff for the Cholesky decomposition.
+        output : h5py.Group
+            When given, the vectors are written to a new dataset ``cholesky`` in
+            this group, which can be used with OutOfCoreFourIndex.
+        reduced : bool
+            When True, return the vectors only for the basis pairs that survive
+            the screening, together with the indexes of these pairs. See
+            ``_compute_cholesky`` for details.
+        memory : float
+            Only used when output is given. The approximate amount of memory, in
+            bytes, used to hold Cholesky vectors while they are written to output.
 
         Returns
         -------
         array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
-            The Cholesky-decomposed four-center integrals
+            The Cholesky-decomposed four-center integrals. When output is given,
+            the h5py.Dataset with the vectors is returned instead.
 
         Keywords: :index:`ERI`, :index:`four-center integrals`
         """
-        return self._compute_cholesky(GB4RAlphaIntegralLibInt(self.max_shell_type, alpha))
+        return self._compute_cholesky(GB4RAlphaIntegralLibInt(self.max_shell_type, alpha),
+                                      threshold, output, reduced, ('ralpha', alpha), memory)
+
+    def _compute_two_center(self, GB4Integral gb4int not None, output=None):
+        """Compute two-center integrals (P|Q) of a given type of four-center integrals.
+
+        Parameters
+        ----------
+        gb4int
+            The object that can carry out four-center integrals.
+        output
+            A two-index object, optional.
+
+        Returns
+        -------
+        output : np.ndarray, shape=(nbasis, nbasis), dtype=float
+        """
+        cdef double[:, ::1] output_view
+        output = prepare_array(output, (self.nbasis, self.nbasis), 'output')
+        output_view = output
+        self._this.compute_two_center(&output_view[0, 0], gb4int._this)
+        return output
+
+    def _compute_three_center(self, GBasis auxbasis not None, GB4Integral gb4int not None,
+                              output=None):
+        """Compute three-center integrals (P|ab) of a given type of four-center integrals.
+
+        Parameters
+        ----------
+        auxbasis
+            The auxiliary basis set, to which P belongs.
+        gb4int
+            The object that can carry out four-center integrals. It must support
+            the maximum shell type of both basis sets.
+        output
+            A three-index object, optional.
+
+        Returns
+        -------
+        output : np.ndarray, shape=(auxbasis.nbasis, nbasis, nbasis), dtype=float
+        """
+        cdef double[:, :, ::1] output_view
+        output = prepare_array(output, (auxbasis.nbasis, self.nbasis, self.nbasis), 'output')
+        output_view = output
+        self._this.compute_three_center(&output_view[0, 0, 0], auxbasis._this, gb4int._this)
+        return output
+
+    def compute_electron_repulsion_two_center(self, output=None):
+        r"""Compute the two-center electron repulsion integrals (P|Q).
+
+        This is typically used for an auxiliary basis in density fitting.
+
+        Parameters
+        ----------
+        output
+            A two-index object, optional.
+
+        Returns
+        -------
+        output : np.ndarray, shape=(nbasis, nbasis), dtype=float
+
+        Keywords: :index:`ERI`, :index:`two-center integrals`
+        """
+        biblio.cite('valeev2014',
+                    'the efficient implementation of four-center electron repulsion integrals')
+        return self._compute_two_center(
+            GB4ElectronRepulsionIntegralLibInt(self.max_shell_type), output)
+
+    def compute_electron_repulsion_three_center(self, GBasis auxbasis not None, output=None):
+        r"""Compute the three-center electron repulsion integrals (P|ab).
+
+        Parameters
+        ----------
+        auxbasis
+            The auxiliary basis set, to which P belongs.
+        output
+            A three-index object, optional.
+
+        Returns
+        -------
+        output : np.ndarray, shape=(auxbasis.nbasis, nbasis, nbasis), dtype=float
+
+        Keywords: :index:`ERI`, :index:`three-center integrals`
+        """
+        biblio.cite('valeev2014',
+                    'the efficient implementation of four-center electron repulsion integrals')
+        max_shell_type = max(self.max_shell_type, auxbasis.max_shell_type)
+        return self._compute_three_center(
+            auxbasis, GB4ElectronRepulsionIntegralLibInt(max_shell_type), output)
+
+    def compute_electron_repulsion_density_fitting(self, GBasis auxbasis not None,
+                                                   double threshold=1e-10):
+        r"""Compute density-fitted electron repulsion integrals.
+
+        The four-center integrals are approximated as
+
+        .. math::
+            (ac|bd) \approx \sum_{PQ} (ac|P) [J^{-1}]_{PQ} (Q|bd)
+
+        where :math:`J_{PQ}=(P|Q)` is the Coulomb metric of the auxiliary basis.
+        The result has the same layout as the Cholesky vectors, i.e.
+        ``<ab|cd> = einsum('kac,kbd->abcd', vecs, vecs)``, and can be used
+        wherever Cholesky-decomposed integrals are accepted.
+
+        Parameters
+        ----------
+        auxbasis
+            The auxiliary basis set for the fitting.
+        threshold
+            Eigenvalues of the Coulomb metric below this threshold are discarded,
+            to cope with linear dependencies in the auxiliary basis.
+
+        Returns
+        -------
+        array : np.ndarray, shape(nvec, nbasis, nbasis), dtype=float
+            The fitted three-index tensor, where nvec is the number of auxiliary
+            basis functions minus the number of discarded eigenvalues.
+
+        Keywords: :index:`ERI`, :index:`density fitting`, :index:`RI`
+        """
+        biblio.cite('vahtras1993', 'the density fitting of electron repulsion integrals')
+        metric = auxbasis.compute_electron_repulsion_two_center()
+        evals, evecs = np.linalg.eigh(metric)
+        mask = evals > threshold
+        # Inverse square root of the metric, in the basis of its eigenvectors.
+        transform = evecs[:, mask]/np.sqrt(evals[mask])
+        if log.do_medium:
+            log('Density fitting with %i out of %i auxiliary functions.' % (
+                mask.sum(), auxbasis.nbasis))
+        three_center = self.compute_electron_repulsion_three_center(auxbasis)
+        result = np.dot(transform.T, three_center.reshape(auxbasis.nbasis, -1))
+        result.shape = (-1, self.nbasis, self.nbasis)
+        return result
 
     def compute_grid_orbitals_exp(self, orb, double[:, ::1] points not None,
                                   long[::1] iorbs not None, double[:, ::1] output=None):
@@ -1120,15 +1882,16 @@ cdef class GOBasis(GBasis):
         # Do some type checking
         cdef double[:, :] coeffs = orb.coeffs
         self.check_coeffs(coeffs)
-        nfn = coeffs.shape[1]
+        cdef long nfn = coeffs.shape[1]
         check_shape(points, (-1, 3), 'points')
-        npoint = points.shape[0]
-        norb = iorbs.shape[0]
+        cdef long npoint = points.shape[0]
+        cdef long norb = iorbs.shape[0]
         output = prepare_array(output, (npoint, norb), 'output')
         # compute
-        (<gbasis.GOBasis*>self._this).compute_grid1_exp(
-            nfn, &coeffs[0, 0], npoint, &points[0, 0],
-            norb, &iorbs[0], &output[0, 0])
+        with nogil:
+            (<gbasis.GOBasis*>self._this).compute_grid1_exp(
+                nfn, &coeffs[0, 0], npoint, &points[0, 0],
+                norb, &iorbs[0], &output[0, 0], dgemm)
         return np.asarray(output)
 
     def compute_grid_orb_gradient_exp(self, orb, double[:, ::1] points not None,
@@ -1157,20 +1920,36 @@ cdef class GOBasis(GBasis):
         # Do some type checking
         cdef double[:, :] coeffs = orb.coeffs
         self.check_coeffs(coeffs)
-        nfn = coeffs.shape[1]
+        cdef long nfn = coeffs.shape[1]
         check_shape(points, (-1, 3), 'points')
-        npoint = points.shape[0]
-        norb = iorbs.shape[0]
+        cdef long npoint = points.shape[0]
+        cdef long norb = iorbs.shape[0]
         output = prepare_array(output, (npoint, norb, 3), 'output')
         # compute
-        (<gbasis.GOBasis*>self._this).compute_grid1_grad_exp(
-            nfn, &coeffs[0, 0], npoint, &points[0, 0],
-            norb, &iorbs[0], &output[0, 0, 0])
+        with nogil:
+            (<gbasis.GOBasis*>self._this).compute_grid1_grad_exp(
+                nfn, &coeffs[0, 0], npoint, &points[0, 0],
+                norb, &iorbs[0], &output[0, 0, 0], dgemm)
         return np.asarray(output)
 
+    cdef gridcache.GB1GridCache* _get_grid_cache(self, GB1GridCache cache, double[:, ::1] points) except *:
+        """Return the C++ cache object after checking that it can be used, or NULL."""
+        if cache is None:
+            return NULL
+        if cache._obasis is not self:
+            raise ValueError('The grid cache belongs to another basis set.')
+        if (cache._points.shape[0] != points.shape[0] or
+                (points.shape[0] > 0 and &cache._points[0, 0] != &points[0, 0])):
+            raise ValueError('The grid cache belongs to other grid points.')
+        if cache._grid_tolerance != self.grid_tolerance:
+            # The selection of the shells depends on the grid tolerance.
+            cache.clear()
+            cache._grid_tolerance = self.grid_tolerance
+        return cache._this
+
     def _compute_grid1_dm(self, double[:, ::1] dm not None, double[:, ::1] points not None,
                           GB1DMGridFn grid_fn not None, double[:, ::1] output not None,
-                          double epsilon=0):
+                          double epsilon=0, GB1GridCache cache=None):
         """Compute some density function on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1188,23 +1967,29 @@ cdef class GOBasis(GBasis):
             Output array. The second dimension depends on grid_fn.
         epsilon : float
             Allow errors on the density of this magnitude for the sake of
-            efficiency. Some grid_fn implementations may ignore this.
+            efficiency. Some grid_fn implementations may ignore this. When
+            zero, the grid points are processed in blocks with BLAS.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given. It is only used when epsilon is zero.
         """
         # Check the array shapes
         check_shape(dm, (self.nbasis, self.nbasis,), 'dm')
         check_shape(points, (-1, 3), 'points')
-        npoint = points.shape[0]
+        cdef long npoint = points.shape[0]
         check_shape(output, (npoint, grid_fn.dim_output), 'output')
         # Get the maximum of the absolute value over the rows
         cdef double[:] dmmaxrow = np.abs(dm).max(axis=0)
+        cdef gridcache.GB1GridCache* cache_ptr = self._get_grid_cache(cache, points)
         # Go!
-        (<gbasis.GOBasis*>self._this).compute_grid1_dm(
-            &dm[0, 0], npoint, &points[0, 0], grid_fn._this, &output[0, 0], epsilon,
-            &dmmaxrow[0])
+        with nogil:
+            (<gbasis.GOBasis*>self._this).compute_grid1_dm(
+                &dm[0, 0], npoint, &points[0, 0], grid_fn._this, &output[0, 0], epsilon,
+                &dmmaxrow[0], dgemm, cache_ptr)
 
     def compute_grid_density_dm(self, double[:, ::1] dm not None,
                                 double[:, ::1] points not None, double[::1] output=None,
-                                double epsilon=0):
+                                double epsilon=0, GB1GridCache cache=None):
         """Compute the electron density on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1221,6 +2006,9 @@ cdef class GOBasis(GBasis):
         epsilon : float
             Allow errors on the density of this magnitude for the sake of
             efficiency. Some grid_fn implementations may ignore this.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1230,11 +2018,12 @@ cdef class GOBasis(GBasis):
         if output is None:
             output = np.zeros(points.shape[0])
         self._compute_grid1_dm(dm, points, GB1DMGridDensityFn(self.max_shell_type),
-                               output[:, None], epsilon)
+                               output[:, None], epsilon, cache=cache)
         return np.asarray(output)
 
     def compute_grid_gradient_dm(self, double[:, ::1] dm not None,
-                                 double[:, ::1] points not None, double[:, ::1] output=None):
+                                 double[:, ::1] points not None, double[:, ::1] output=None,
+                                 GB1GridCache cache=None):
         """Compute the electron density gradient on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1248,6 +2037,9 @@ cdef class GOBasis(GBasis):
             Cartesian grid points.
         output : np.ndarray, shape=(npoint, 3), dtype=float
             Output array. When not given, it is allocated and returned.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1256,11 +2048,13 @@ cdef class GOBasis(GBasis):
         """
         if output is None:
             output = np.zeros((points.shape[0], 3), float)
-        self._compute_grid1_dm(dm, points, GB1DMGridGradientFn(self.max_shell_type), output)
+        self._compute_grid1_dm(dm, points, GB1DMGridGradientFn(self.max_shell_type), output,
+                               cache=cache)
         return np.asarray(output)
 
     def compute_grid_gga_dm(self, double[:, ::1] dm not None,
-                            double[:, ::1] points not None, double[:, ::1] output=None):
+                            double[:, ::1] points not None, double[:, ::1] output=None,
+                            GB1GridCache cache=None):
         """Compute the electron density and gradient on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1275,6 +2069,9 @@ cdef class GOBasis(GBasis):
         output : np.ndarray, shape=(npoint, 4), dtype=float
             Output array. When not given, it is allocated and returned. The first column
             contains the density. The last three columns contain the gradient.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1283,11 +2080,13 @@ cdef class GOBasis(GBasis):
         """
         if output is None:
             output = np.zeros((points.shape[0], 4), float)
-        self._compute_grid1_dm(dm, points, GB1DMGridGGAFn(self.max_shell_type), output)
+        self._compute_grid1_dm(dm, points, GB1DMGridGGAFn(self.max_shell_type), output,
+                               cache=cache)
         return np.asarray(output)
 
     def compute_grid_kinetic_dm(self, double[:, ::1] dm not None,
-                                double[:, ::1] points not None, double[::1] output=None):
+                                double[:, ::1] points not None, double[::1] output=None,
+                                GB1GridCache cache=None):
         """Compute the kinetic energy density on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1301,6 +2100,9 @@ cdef class GOBasis(GBasis):
             Cartesian grid points.
         output : np.ndarray, shape=(npoint,), dtype=float
             Output array. When not given, it is allocated and returned.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1309,11 +2111,13 @@ cdef class GOBasis(GBasis):
         """
         if output is None:
             output = np.zeros((points.shape[0],), float)
-        self._compute_grid1_dm(dm, points, GB1DMGridKineticFn(self.max_shell_type), output[:, None])
+        self._compute_grid1_dm(dm, points, GB1DMGridKineticFn(self.max_shell_type), output[:, None],
+                               cache=cache)
         return np.asarray(output)
 
     def compute_grid_hessian_dm(self, double[:, ::1] dm not None,
-                                double[:, ::1] points not None, double[:, ::1] output=None):
+                                double[:, ::1] points not None, double[:, ::1] output=None,
+                                GB1GridCache cache=None):
         """Compute the electron density Hessian on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1335,6 +2139,9 @@ cdef class GOBasis(GBasis):
             * 3: element (1, 1) of the Hessian
             * 4: element (1, 2) of the Hessian
             * 5: element (2, 2) of the Hessian
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1343,11 +2150,13 @@ cdef class GOBasis(GBasis):
         """
         if output is None:
             output = np.zeros((points.shape[0], 6), float)
-        self._compute_grid1_dm(dm, points, GB1DMGridHessianFn(self.max_shell_type), output)
+        self._compute_grid1_dm(dm, points, GB1DMGridHessianFn(self.max_shell_type), output,
+                               cache=cache)
         return np.asarray(output)
 
     def compute_grid_mgga_dm(self, double[:, ::1] dm not None,
-                             double[:, ::1] points not None, double[:, ::1] output=None):
+                             double[:, ::1] points not None, double[:, ::1] output=None,
+                             GB1GridCache cache=None):
         """Compute the MGGA quantities for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1372,6 +2181,9 @@ cdef class GOBasis(GBasis):
             * 3: gradient z
             * 4: laplacian
             * 5: kinetic energy density
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
@@ -1380,16 +2192,27 @@ cdef class GOBasis(GBasis):
         """
         if output is None:
             output = np.zeros((points.shape[0], 6), float)
-        self._compute_grid1_dm(dm, points, GB1DMGridMGGAFn(self.max_shell_type), output)
+        self._compute_grid1_dm(dm, points, GB1DMGridMGGAFn(self.max_shell_type), output,
+                               cache=cache)
         return np.asarray(output)
 
     def compute_grid_hartree_dm(self, double[:, ::1] dm not None,
-                                double[:, ::1] points not None, double[::1] output=None):
+                                double[:, ::1] points not None, double[::1] output=None,
+                                double threshold=0.0, long lmax=-1):
         """Compute the Hartree potential on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
         combine results from different spin components.
 
+        All products of two primitives are first contracted with the density matrix.
+        The grid points are processed in blocks, using ``nthread`` threads. By
+        default, the potential is computed exactly. For large grids, two
+        approximations can be enabled: products with a negligible prefactor are
+        discarded (``threshold > 0``) and the contributions of products near an atom
+        are replaced by a multipole expansion in points that are sufficiently far away
+        from that atom (``lmax >= 0``). With ``threshold=1e-14`` and ``lmax=8``, the
+        error is typically below 1e-10.
+
         Parameters
         ----------
         dm : np.ndarray, shape=(nbasis, nbasis), dtype=float
@@ -1398,6 +2221,13 @@ cdef class GOBasis(GBasis):
             Cartesian grid points.
         output : np.ndarray, shape=(npoint,), dtype=float
             Output array. When not given, it is allocated and returned.
+        threshold : float
+            Products of primitives are discarded when the sum of the absolute values
+            of their prefactors, including the density matrix, is below this
+            threshold. The default, zero, keeps all products.
+        lmax : int
+            The maximum order of the multipole expansion, at most 16. The default,
+            -1, computes the potential exactly in all points.
 
         Returns
         -------
@@ -1407,16 +2237,18 @@ cdef class GOBasis(GBasis):
         # type checking
         check_shape(dm, (self.nbasis, self.nbasis), 'dm')
         check_shape(points, (-1, 3), 'points')
-        npoint = points.shape[0]
+        cdef long npoint = points.shape[0]
         output = prepare_array(output, (npoint,), 'output')
         # compute
-        (<gbasis.GOBasis*>self._this).compute_grid2_dm(
-            &dm[0, 0], npoint, &points[0, 0], &output[0])
+        with nogil:
+            (<gbasis.GOBasis*>self._this).compute_grid2_dm(
+                &dm[0, 0], npoint, &points[0, 0], &output[0], threshold, lmax)
         return np.asarray(output)
 
     def compute_grid_esp_dm(self, double[:, ::1] dm not None,
                             double[:, ::1] coordinates not None, double[::1] charges not None,
-                            double[:, ::1] points not None, double[::1] output=None):
+                            double[:, ::1] points not None, double[::1] output=None,
+                            double threshold=0.0, long lmax=-1):
         """Compute the electrostatic potential on a grid for a given density matrix.
 
         **Warning:** the results are added to the output array! This may be useful to
@@ -1434,13 +2266,15 @@ cdef class GOBasis(GBasis):
             Cartesian grid points.
         output : np.ndarray, shape=(npoint,), dtype=float
             Output array. When not given, it is allocated and returned.
+        threshold, lmax
+            See ``compute_grid_hartree_dm``.
 
         Returns
         -------
         output : np.ndarray, shape=(npoint,), dtype=float
             The output array.
         """
-        output = self.compute_grid_hartree_dm(dm, points, output)
+        output = self.compute_grid_hartree_dm(dm, points, output, threshold, lmax)
         cdef np.ndarray[ndim=1, dtype=double] tmp = np.asarray(output)
         tmp *= -1
         compute_grid_nucpot(coordinates, charges, points, output)
@@ -1448,7 +2282,7 @@ cdef class GOBasis(GBasis):
 
     def _compute_grid1_fock(self, double[:, ::1] points not None, double[::1] weights not None,
                             double[:, :] pots not None, GB1DMGridFn grid_fn not None,
-                            double[:, ::1] fock=None):
+                            double[:, ::1] fock=None, GB1GridCache cache=None):
         """Compute a Fock operator from a some sort of potential.
 
         **Warning:** the results are added to the Fock operator!
@@ -1466,27 +2300,33 @@ cdef class GOBasis(GBasis):
             Implements the function to be evaluated on the grid.
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
         """
         fock = prepare_array(fock, (self.nbasis, self.nbasis), 'fock')
         check_shape(points, (-1, 3), 'points')
-        npoint = points.shape[0]
+        cdef long npoint = points.shape[0]
         check_shape(weights, (npoint,), 'weights')
         check_shape(pots, (npoint, grid_fn.dim_output), 'pots')
         if pots.strides[0] % 8 != 0:
             raise TypeError('stride[0] of the pots argument must be a multiple of 8.')
         if pots.strides[1] % 8 != 0:
             raise TypeError('stride[1] of the pots argument must be a multiple of 8.')
-        pot_stride = (pots.strides[0]//8)
+        cdef long pot_stride = (pots.strides[0]//8)
         if pots.shape[1] > 1:
-            pot_stride *= (pots.strides[1]/8)
-        (<gbasis.GOBasis*>self._this).compute_grid1_fock(
-            npoint, &points[0, 0], &weights[0], pot_stride, &pots[0, 0], grid_fn._this,
-            &fock[0, 0])
+            pot_stride *= (pots.strides[1]//8)
+        cdef gridcache.GB1GridCache* cache_ptr = self._get_grid_cache(cache, points)
+        with nogil:
+            (<gbasis.GOBasis*>self._this).compute_grid1_fock(
+                npoint, &points[0, 0], &weights[0], pot_stride, &pots[0, 0], grid_fn._this,
+                &fock[0, 0], dgemm, cache_ptr)
         return fock
 
     def compute_grid_density_fock(self, double[:, ::1] points not None,
                                   double[::1] weights not None, double[:] pots not None,
-                                  double[:, ::1] fock=None):
+                                  double[:, ::1] fock=None,
+                                  GB1GridCache cache=None):
         """Compute a Fock operator from a density potential.
 
         **Warning:** the results are added to the Fock operator!
@@ -1501,18 +2341,22 @@ cdef class GOBasis(GBasis):
             Derivative of the energy toward the density at all grid points.
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots[:, None], GB1DMGridDensityFn(self.max_shell_type), fock)
+            points, weights, pots[:, None], GB1DMGridDensityFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
     def compute_grid_gradient_fock(self, double[:, ::1] points not None,
                                    double[::1] weights not None, double[:, :] pots not None,
-                                   double[:, ::1] fock=None):
+                                   double[:, ::1] fock=None,
+                                   GB1GridCache cache=None):
         """Compute a Fock operator from a density gradient potential.
 
         **Warning:** the results are added to the Fock operator!
@@ -1528,18 +2372,22 @@ cdef class GOBasis(GBasis):
             points.
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots, GB1DMGridGradientFn(self.max_shell_type), fock)
+            points, weights, pots, GB1DMGridGradientFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
     def compute_grid_gga_fock(self, double[:, ::1] points not None,
                               double[::1] weights not None, double[:, :] pots not None,
-                              double[:, ::1] fock=None):
+                              double[:, ::1] fock=None,
+                              GB1GridCache cache=None):
         """Compute a Fock operator from GGA potential data.
 
         **Warning:** the results are added to the Fock operator!
@@ -1555,18 +2403,22 @@ cdef class GOBasis(GBasis):
             grid points.
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots, GB1DMGridGGAFn(self.max_shell_type), fock)
+            points, weights, pots, GB1DMGridGGAFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
     def compute_grid_kinetic_fock(self, double[:, ::1] points not None,
                                   double[::1] weights not None, double[:] pots not None,
-                                  double[:, ::1] fock=None):
+                                  double[:, ::1] fock=None,
+                                  GB1GridCache cache=None):
         """Compute a Fock operator from a kientic-energy-density potential.
 
         **Warning:** the results are added to the Fock operator!
@@ -1581,18 +2433,22 @@ cdef class GOBasis(GBasis):
             Derivative of the energy toward the kinetic energy density at all grid points.
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots[:, None], GB1DMGridKineticFn(self.max_shell_type), fock)
+            points, weights, pots[:, None], GB1DMGridKineticFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
     def compute_grid_hessian_fock(self, double[:, ::1] points not None,
                                   double[::1] weights not None, double[:, :] pots not None,
-                                  double[:, ::1] fock=None):
+                                  double[:, ::1] fock=None,
+                                  GB1GridCache cache=None):
         """Compute a Fock operator from a density hessian potential.
 
         **Warning:** the results are added to the Fock operator!
@@ -1616,18 +2472,22 @@ cdef class GOBasis(GBasis):
 
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots, GB1DMGridHessianFn(self.max_shell_type), fock)
+            points, weights, pots, GB1DMGridHessianFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
     def compute_grid_mgga_fock(self, double[:, ::1] points not None,
                                double[::1] weights not None, double[:, :] pots not None,
-                               double[:, ::1] fock=None):
+                               double[:, ::1] fock=None,
+                               GB1GridCache cache=None):
         """Compute a Fock operator from MGGA potential data.
 
         **Warning:** the results are added to the Fock operator!
@@ -1651,16 +2511,129 @@ cdef class GOBasis(GBasis):
 
         fock : np.ndarray, shape=(nbasis, nbasis), dtype=float
             Output two-index object, optional.
+        cache : GB1GridCache
+            Basis functions on the grid points are taken from, or stored in, this
+            cache, if given.
 
         Returns
         -------
         fock
         """
         fock = self._compute_grid1_fock(
-            points, weights, pots, GB1DMGridMGGAFn(self.max_shell_type), fock)
+            points, weights, pots, GB1DMGridMGGAFn(self.max_shell_type), fock, cache)
         return np.asarray(fock)
 
 
+#
+# packed wrappers
+#
+
+
+def get_packed_size(long nbasis):
+    """Return the length of a packed array of four-center integrals.
+
+    Only the symmetry-unique integrals (ij|kl), in chemist's notation, with
+    i >= j, k >= l and ij >= kl are stored.
+    """
+    cdef long npair = nbasis*(nbasis + 1)//2
+    return npair*(npair + 1)//2
+
+
+cdef long _get_packed_nbasis(double[::1] packed) except -1:
+    """Return the number of basis functions, given a packed array."""
+    cdef long npair = int(np.round((np.sqrt(8*packed.shape[0] + 1) - 1)/2))
+    cdef long nbasis = int(np.round((np.sqrt(8*npair + 1) - 1)/2))
+    if get_packed_size(nbasis) != packed.shape[0]:
+        raise TypeError('The length of the packed array is not valid.')
+    return nbasis
+
+
+def pack_four_index(double[:, :, :, ::1] dense not None):
+    """Convert four-center integrals with eight-fold symmetry to packed storage.
+
+    Parameters
+    ----------
+    dense : np.ndarray, shape=(nbasis, nbasis, nbasis, nbasis)
+        The integrals in physicist's notation.
+
+    Returns
+    -------
+    packed : np.ndarray, shape=(get_packed_size(nbasis),)
+    """
+    cdef long nbasis = dense.shape[0]
+    check_shape(dense, (nbasis, nbasis, nbasis, nbasis), 'dense')
+    cdef double[::1] result = np.zeros(get_packed_size(nbasis))
+    packed.packed_from_dense(&dense[0, 0, 0, 0], &result[0], nbasis)
+    return np.asarray(result)
+
+
+def unpack_four_index(double[::1] packed_ints not None):
+    """Convert packed four-center integrals to a dense array.
+
+    Parameters
+    ----------
+    packed_ints : np.ndarray, shape=(get_packed_size(nbasis),)
+        The packed integrals.
+
+    Returns
+    -------
+    dense : np.ndarray, shape=(nbasis, nbasis, nbasis, nbasis)
+        The integrals in physicist's notation.
+    """
+    cdef long nbasis = _get_packed_nbasis(packed_ints)
+    cdef double[:, :, :, ::1] result = np.zeros((nbasis, nbasis, nbasis, nbasis))
+    packed.packed_to_dense(&packed_ints[0], &result[0, 0, 0, 0], nbasis)
+    return np.asarray(result)
+
+
+def contract_direct_packed(double[::1] packed_ints not None, double[:, ::1] dm not None,
+                           double[:, ::1] output=None):
+    """Compute ``einsum('abcd,bd->ac', dense, dm)`` with packed integrals.
+
+    Parameters
+    ----------
+    packed_ints : np.ndarray, shape=(get_packed_size(nbasis),)
+        The packed integrals.
+    dm : np.ndarray, shape=(nbasis, nbasis)
+        The density matrix.
+    output : np.ndarray, shape=(nbasis, nbasis)
+        Optional output array. The old content is overwritten.
+
+    Returns
+    -------
+    output
+    """
+    cdef long nbasis = _get_packed_nbasis(packed_ints)
+    check_shape(dm, (nbasis, nbasis), 'dm')
+    output = prepare_array(output, (nbasis, nbasis), 'output')
+    packed.packed_contract_direct(&packed_ints[0], &dm[0, 0], &output[0, 0], nbasis)
+    return np.asarray(output)
+
+
+def contract_exchange_packed(double[::1] packed_ints not None, double[:, ::1] dm not None,
+                             double[:, ::1] output=None):
+    """Compute ``einsum('abcd,cb->ad', dense, dm)`` with packed integrals.
+
+    Parameters
+    ----------
+    packed_ints : np.ndarray, shape=(get_packed_size(nbasis),)
+        The packed integrals.
+    dm : np.ndarray, shape=(nbasis, nbasis)
+        The density matrix.
+    output : np.ndarray, shape=(nbasis, nbasis)
+        Optional output array. The old content is overwritten.
+
+    Returns
+    -------
+    output
+    """
+    cdef long nbasis = _get_packed_nbasis(packed_ints)
+    check_shape(dm, (nbasis, nbasis), 'dm')
+    output = prepare_array(output, (nbasis, nbasis), 'output')
+    packed.packed_contract_exchange(&packed_ints[0], &dm[0, 0], &output[0, 0], nbasis)
+    return np.asarray(output)
+
+
 #
 # gbw wrappers
 #
@@ -2022,6 +2995,74 @@ cdef class GB4RAlphaIntegralLibInt(GB4Integral):
             return (<ints.GB4RAlphaIntegralLibInt*>self._this).get_alpha()
 
 
+#
+# gridcache wrappers
+#
+
+
+cdef class GB1GridCache:
+    """Basis functions (and derivatives) evaluated on a fixed grid, for reuse.
+
+    The blocked grid methods of GOBasis, e.g. ``compute_grid_gga_dm`` and
+    ``compute_grid_gga_fock``, accept an instance of this class through their
+    ``cache`` argument. The first call stores the basis functions of every block of
+    grid points in the cache, as long as the memory budget allows it. Subsequent
+    calls with the same kind of grid function skip the evaluation of the basis
+    functions for these blocks. The remaining blocks are recomputed on the fly. Only
+    the basis functions of shells that are not negligible in a block are stored.
+
+    A cache can only be used with the basis set and the grid points (same array)
+    given to the constructor. The grid points may not be modified in-place.
+    """
+    cdef gridcache.GB1GridCache* _this
+    cdef object _obasis
+    cdef double[:, ::1] _points
+    cdef double _grid_tolerance
+
+    def __cinit__(self, GOBasis obasis not None, double[:, ::1] points not None,
+                  double memory=1e9):
+        """Initialize an empty cache.
+
+        Parameters
+        ----------
+        obasis : GOBasis
+            The basis set whose basis functions will be stored.
+        points : np.ndarray, shape=(npoint, 3), dtype=float
+            Cartesian grid points.
+        memory : float
+            The maximum amount of memory used by the cache, in bytes.
+        """
+        check_shape(points, (-1, 3), 'points')
+        if memory < 0:
+            raise ValueError('The memory of the grid cache must not be negative.')
+        self._obasis = obasis
+        self._points = points
+        self._grid_tolerance = obasis.grid_tolerance
+        self._this = new gridcache.GB1GridCache(points.shape[0], int(memory//8))
+
+    def __dealloc__(self):
+        del self._this
+
+    property npoint:
+        def __get__(self):
+            """The number of grid points."""
+            return self._this.get_npoint()
+
+    property memory:
+        def __get__(self):
+            """The maximum amount of memory used by the cache, in bytes."""
+            return self._this.get_max_size()*8
+
+    property used_memory:
+        def __get__(self):
+            """The amount of memory currently used by the cache, in bytes."""
+            return self._this.get_size()*8
+
+    def clear(self):
+        """Remove all stored basis functions."""
+        self._this.clear()
+
+
 #
 # fns wrappers (for testing and use in this module)
 #
@@ -19,26 +19,33 @@
 //--
 
 #include <cstddef>
+#include <cstdlib>
 #include <cstring>
 #include <cmath>
+#include <new>
 #include <stdexcept>
+#include <vector>
 #include "horton/gbasis/cholesky.h"
 
 /**
     Find the maximum diagonal error, used several times in the cholesky routine.
+    The diagonal error is stored in the reduced space of basis pairs. Basis
+    pairs that are discarded (reduced index -1) are skipped.
 */
-double find_maxdiag(double* diagerr, long nbasis, long begin1, long end1,
-    long begin2, long end2, long &index1, long &index2)
+double find_maxdiag(double* diagerr, long* reduced, long nbasis, long begin1,
+    long end1, long begin2, long end2, long &index1, long &index2)
 {
   double maxdiag = 0;
   index1 = -1; //safety
   index2 = -1; //safety
   for (long i1=begin1; i1<end1; i1++){
     for (long i2=begin2; i2<end2; i2++){
-       if (maxdiag < diagerr[i1*nbasis + i2]){
-         maxdiag = diagerr[i1*nbasis + i2];
-         index1 = i1;
-         index2 = i2;
+      long ipair = reduced[i1*nbasis + i2];
+      if (ipair < 0) continue;
+      if (maxdiag < diagerr[ipair]){
+        maxdiag = diagerr[ipair];
+        index1 = i1;
+        index2 = i2;
       }
     }
   }
@@ -46,135 +53,297 @@ double find_maxdiag(double* diagerr, long nbasis, long begin1, long end1,
 }
 
 
-long cholesky(GB4IntegralWrapper* gbw4, std::vector<double>* vectors,
-    double threshold)
+/**
+    Make sure there is room for at least one more vector in the buffer. The
+    capacity (in number of vectors) is doubled when the buffer is full.
+*/
+void reserve_vector(double** vectors, long* capacity, long nvec, long size)
+{
+  if (nvec < *capacity) return;
+  long new_capacity = 2*(*capacity);
+  double* new_vectors = static_cast<double*>(
+      realloc(*vectors, sizeof(double)*new_capacity*size));
+  if (new_vectors == NULL) throw std::bad_alloc();
+  *vectors = new_vectors;
+  *capacity = new_capacity;
+}
+
+
+/**
+    Subtract the contributions of nvec vectors from the slices of a pair of shells:
+    block -= sum_l L_l L_l[index1, index2], for all index1 and index2 in the
+    ranges of the two shells.
+*/
+void subtract_vectors(double* block, const double* vectors, long nvec, long size,
+    const long* reduced, long nbasis, long begin1, long end1, long begin2, long end2,
+    dgemm_t dgemm)
+{
+  if (nvec == 0) return;
+  char trans_n = 'N';
+  double one = 1.0;
+  double minus_one = -1.0;
+  int isize = size;
+  int n = (end1 - begin1)*(end2 - begin2);
+  int k = nvec;
+  std::vector<double> factors(nvec*n);
+  for (long i1 = begin1; i1 < end1; i1++) {
+    for (long i2 = begin2; i2 < end2; i2++) {
+      long iblock = (i1 - begin1)*(end2 - begin2) + i2 - begin2;
+      long ipair = reduced[i1*nbasis + i2];
+      for (long l = 0; l < nvec; l++) {
+        factors[iblock*nvec + l] = vectors[l*size + ipair];
+      }
+    }
+  }
+  dgemm(&trans_n, &trans_n, &isize, &n, &k, &minus_one, const_cast<double*>(vectors),
+        &isize, factors.data(), &k, &one, block, &isize);
+}
+
+
+long cholesky(GB4IntegralWrapper* gbw4, double** vectors, long** pairs,
+    long* npair, double threshold, dgemm_t dgemm, dgemv_t dgemv,
+    double memory, cholesky_store_t store, cholesky_load_t load, void* context)
 {
   if (threshold <= 0) {
     // The algorithm below may go crazy with a non-positive threshold.
     throw std::domain_error("Cholesky threshold must be strictly positive.");
   }
+  if ((store == NULL) != (load == NULL)) {
+    throw std::domain_error("The store and load functions must be given together.");
+  }
 
   long nbasis = gbw4->get_nbasis();
-  double* diagonal = new double[nbasis*nbasis];  // allocate 2 index object
-  double* diagerr = new double[nbasis*nbasis];   //  "
-  double* slice = NULL;                          //  "
-  double* pastvector_sum = new double[nbasis*nbasis];
-  // storage for 2-index cholesky vectors, start with allocation of 15% of the
-  // full 4-center matrix
-//  std::vector<double>* vectors = new std::vector<double>;
-  vectors->reserve(nbasis*nbasis*nbasis*nbasis*0.15);
-
-  /*
-    In some future version, we'll introduce a mask to only compute integrals
-    that will be relevant after some pre-screening test. These will be flagged
-    with a mask array.
-  */
-  //bool* mask = NULL;        // 2-index object
-
-  /*
-    Initialize the diagonal and set the diagerr equal to the diagonal (because
-    we start with zero Cholesky vectors).
-  */
-  gbw4->compute_diagonal(diagonal);
-  memcpy(diagerr, diagonal, sizeof(double)*nbasis*nbasis);
-
-  /*
-    This is extra stuff in the wrapper we'll need in future:
-    gb4w->compute_centers(centers);
-        centers of products 3 two 2-index objects
-        (one for x, one for y and one for z)
-    gb4w->compute_extents(extents);
-        2-index object (should be 2-index for shells)
-    gb4w->compute_qs(qs);
-        2-index object (should be 2-index for shells) ?????
-  */
-
-  // Locate the maximum of diagerr -> 2 indexes. This determines the first
-  // Cholesky vector that will be computed.
-  long index1;
-  long index2;
-  double maxdiag = find_maxdiag(diagerr, nbasis, 0, nbasis, 0, nbasis,
-                                index1, index2);
-
-  // std::cout << "initial maxdiag " << maxdiag << " " << index1 << " " << index2 << std::endl;
-  unsigned long nvec=0;
-  do {
-    // call wrapper to let it select a pair of shells for the given variables
-    // index1 and index2.
-    long begin1;
-    long begin2;
-    long end1;
-    long end2;
-    // index 2 is least significant
-    gbw4->select_2index(index1, index2, &begin1, &end1, &begin2, &end2);
-    // All integrals are computed for the selected pair of shells.
-    // gbw4->compute(mask);
-    gbw4->compute();
-
-    do {
-      // Get the the slice of computed four-center integrals that correspond
-      // to the pair index1,index2.
-      slice = gbw4->get_2index_slice(index1, index2);
-
-      // construct new cholesky vector
-      memset(pastvector_sum, 0, sizeof(double)*nbasis*nbasis);
-      maxdiag = 1.0 / sqrt(maxdiag);
-
-      // compute sum of past Ls
-      for (unsigned long l = 0; l < nvec; l++) {
-        double factor = (*vectors)[l*nbasis*nbasis + index1*nbasis + index2];
-        for (long i = nbasis*nbasis-1; i >= 0; i--) {
-          pastvector_sum[i] += factor*(*vectors)[l*nbasis*nbasis + i];
+  long nshell = gbw4->get_nshell();
+  *vectors = NULL;
+  *pairs = NULL;
+  *npair = 0;
+  double* diagonal = new double[nbasis*nbasis];  // allocate 2 index objects
+  long* reduced = new long[nbasis*nbasis];       //  "
+  bool* mask = new bool[nshell*nshell];          // 2-index object for shells
+  double* diagerr = NULL;    // objects in the reduced space of basis pairs
+  double* residual = NULL;   //  "
+  double* block = NULL;      // slices for one pair of shells
+
+  long nvec = 0;
+  try {
+    gbw4->compute_diagonal(diagonal);
+
+    /*
+      Discard all pairs of shells (ac) for which (ac|ac)*max(bd|bd) is below
+      the square of the threshold. By the Cauchy-Schwarz inequality, all
+      integrals (ac|bd) of such a pair are below the threshold. These pairs are
+      never selected as pivot, so their columns are never needed. The remaining
+      basis pairs get a reduced index, in row-major order, and the rest gets -1.
+    */
+    double diagmax = 0;
+    for (long i = 0; i < nbasis*nbasis; i++) {
+      if (diagmax < diagonal[i]) diagmax = diagonal[i];
+    }
+    long size = 0;
+    for (long ishell1 = 0; ishell1 < nshell; ishell1++) {
+      long begin1, end1;
+      gbw4->get_shell_range(ishell1, &begin1, &end1);
+      for (long ishell3 = 0; ishell3 < nshell; ishell3++) {
+        long begin3, end3;
+        gbw4->get_shell_range(ishell3, &begin3, &end3);
+        double shellmax = 0;
+        for (long i1 = begin1; i1 < end1; i1++) {
+          for (long i3 = begin3; i3 < end3; i3++) {
+            if (shellmax < diagonal[i1*nbasis + i3])
+              shellmax = diagonal[i1*nbasis + i3];
+          }
         }
-        /*
-        cblas_daxpy(nbasis*nbasis,
-                    (*vectors)[(l*nbasis*nbasis) + index1*nbasis + index2],
-                    &(*vectors)[l*nbasis*nbasis], 1, pastvector_sum, 1);
-        */
+        mask[ishell1*nshell + ishell3] = (shellmax*diagmax > threshold*threshold);
       }
-
-      // compute current L
-      for (long i = 0; i < nbasis; i++) {
-        for (long j = 0; j < nbasis; j++) {
-          vectors->push_back(maxdiag * (slice[i*nbasis + j] -
-                             pastvector_sum[i*nbasis + j]));
+      for (long i1 = begin1; i1 < end1; i1++) {
+        for (long ishell3 = 0; ishell3 < nshell; ishell3++) {
+          long begin3, end3;
+          gbw4->get_shell_range(ishell3, &begin3, &end3);
+          for (long i3 = begin3; i3 < end3; i3++) {
+            reduced[i1*nbasis + i3] = mask[ishell1*nshell + ishell3] ? size++ : -1;
+          }
         }
       }
+    }
+    *npair = size;
+    *pairs = static_cast<long*>(malloc(sizeof(long)*(size > 0 ? size : 1)));
+    if (*pairs == NULL) throw std::bad_alloc();
+    diagerr = new double[size];
+    residual = new double[size];
+    for (long i = 0; i < nbasis*nbasis; i++) {
+      if (reduced[i] < 0) continue;
+      (*pairs)[reduced[i]] = i;
+      // Initially, the error equals the diagonal (because we start with zero
+      // Cholesky vectors).
+      diagerr[reduced[i]] = diagonal[i];
+    }
+
+    // Storage for the 2-index Cholesky vectors, one contiguous buffer such
+    // that it can be used directly in BLAS calls and handed over to NumPy
+    // without a copy. Start with room for 4*nbasis vectors, which grows when
+    // needed. With external storage, the buffer only contains the vectors
+    // with indexes nstored and higher. It is flushed before a new vector would
+    // exceed max_vectors and earlier vectors are read back into loaded, such
+    // that it never holds more than max_vectors vectors.
+    long capacity = (4*nbasis < size) ? 4*nbasis : size;
+    long nstored = 0;
+    long max_vectors = 0;
+    std::vector<double> loaded;
+    if (store != NULL) {
+      max_vectors = static_cast<long>(0.5*memory/(sizeof(double)*(size > 0 ? size : 1)));
+      if (max_vectors < 1) max_vectors = 1;
+      if (capacity > max_vectors) capacity = max_vectors;
+    }
+    if (capacity < 1) capacity = 1;
+    *vectors = static_cast<double*>(
+        malloc(sizeof(double)*capacity*(size > 0 ? size : 1)));
+    if (*vectors == NULL) throw std::bad_alloc();
+
+    // Arguments for the BLAS routines, which are all passed by reference.
+    char trans_n = 'N';
+    double one = 1.0;
+    double minus_one = -1.0;
+    int isize = size;
+
+    // Locate the maximum of diagerr -> 2 indexes. This determines the first
+    // Cholesky vector that will be computed.
+    long index1;
+    long index2;
+    double maxdiag = find_maxdiag(diagerr, reduced, nbasis, 0, nbasis, 0,
+                                  nbasis, index1, index2);
+
+    while (maxdiag > threshold) {
+      // call wrapper to let it select a pair of shells for the given variables
+      // index1 and index2.
+      long begin1;
+      long begin2;
+      long end1;
+      long end2;
+      // index 2 is least significant
+      gbw4->select_2index(index1, index2, &begin1, &end1, &begin2, &end2);
+      // Integrals are only computed for the pairs of shells that survived the
+      // screening.
+      gbw4->compute(mask);
 
-      // update diagerr
-      for (long i=0; i<nbasis; i++){
-        for (long j=0; j<nbasis; j++){
-          diagerr[i*nbasis + j] -=
-              (*vectors)[(nvec*nbasis*nbasis) + i*nbasis + j] *
-              (*vectors)[(nvec*nbasis*nbasis) + i*nbasis + j];
+      // Gather the slices of the selected pair of shells in the reduced space.
+      long nblock = (end1 - begin1)*(end2 - begin2);
+      block = new double[nblock*size];
+      for (long i1 = begin1; i1 < end1; i1++) {
+        for (long i2 = begin2; i2 < end2; i2++) {
+          double* slice = gbw4->get_2index_slice(i1, i2);
+          double* row = block + ((i1 - begin1)*(end2 - begin2) + i2 - begin2)*size;
+          for (long ipair = 0; ipair < size; ipair++) {
+            row[ipair] = slice[(*pairs)[ipair]];
+          }
         }
       }
 
-      // We've just added one vector.
-      nvec++;
+      // Subtract the contributions of all previous vectors from all slices of
+      // the selected pair of shells at once, first those in the external
+      // storage, in blocks, and then those in the buffer.
+      long nvec_shell = nvec;
+      for (long begin = 0; begin < nstored; begin += max_vectors) {
+        long end = (begin + max_vectors < nstored) ? begin + max_vectors : nstored;
+        loaded.resize((end - begin)*size);
+        if (!load(context, loaded.data(), begin, end, size))
+          throw std::runtime_error("Cholesky vectors could not be loaded.");
+        subtract_vectors(block, loaded.data(), end - begin, size, reduced, nbasis,
+                         begin1, end1, begin2, end2, dgemm);
+      }
+      subtract_vectors(block, *vectors, nvec - nstored, size, reduced, nbasis,
+                       begin1, end1, begin2, end2, dgemm);
 
-      // Decide which 2-index within the shell, i.e. largest error.
-      // Here, begin1, end1, begin2 and end2 are used to limit the search for
-      // the maximum to the selected shells.
-      maxdiag = find_maxdiag(diagerr, nbasis, begin1, end1, begin2, end2,
-                             index1, index2);
-      // std::cout << "current maxdiag " << maxdiag << " " << index1 << " " << index2 << std::endl;
-    } while (maxdiag > threshold*1000);
+      do {
+        // Move the buffer to the external storage before it would exceed its
+        // size. Vectors of the current pair of shells are no longer available
+        // for the dgemv below, so they are subtracted from the block first.
+        if ((store != NULL) && (nvec - nstored >= max_vectors)) {
+          subtract_vectors(block, *vectors + (nvec_shell - nstored)*size, nvec - nvec_shell,
+                           size, reduced, nbasis, begin1, end1, begin2, end2, dgemm);
+          if (!store(context, *vectors, nvec - nstored, size))
+            throw std::runtime_error("Cholesky vectors could not be stored.");
+          nstored = nvec;
+          nvec_shell = nvec;
+        }
 
-    // Look for the new maximum error on the diagonal
-    maxdiag = find_maxdiag(diagerr, nbasis, 0, nbasis, 0, nbasis,
-                           index1, index2);
+        // Get the the slice of computed four-center integrals that correspond
+        // to the pair index1,index2, from which all previous vectors, except
+        // those computed for this pair of shells, are already subtracted.
+        long iblock = (index1 - begin1)*(end2 - begin2) + index2 - begin2;
+        long ipair = reduced[index1*nbasis + index2];
+        memcpy(residual, block + iblock*size, sizeof(double)*size);
+        if (nvec > nvec_shell) {
+          int n = nvec - nvec_shell;
+          int incx = size;
+          int incy = 1;
+          double* shell_vectors = *vectors + (nvec_shell - nstored)*size;
+          dgemv(&trans_n, &isize, &n, &minus_one, shell_vectors,
+                &isize, shell_vectors + ipair, &incx, &one,
+                residual, &incy);
+        }
 
-    // std::cout << "shell maxdiag " << maxdiag << " " << index1 << " " << index2 << std::endl;
-  } while (maxdiag > threshold);
+        // construct new cholesky vector and update diagerr
+        reserve_vector(vectors, &capacity, nvec - nstored, size);
+        double* current = *vectors + (nvec - nstored)*size;
+        maxdiag = 1.0 / sqrt(maxdiag);
+        for (long i = 0; i < size; i++) {
+          current[i] = maxdiag*residual[i];
+          diagerr[i] -= current[i]*current[i];
+        }
 
-  // Concatenate results array. Not efficient! Who cares?
-//  *uninit_result = &((*vectors)[0]);
+        // We've just added one vector.
+        nvec++;
+
+        // Decide which 2-index within the shell, i.e. largest error.
+        // Here, begin1, end1, begin2 and end2 are used to limit the search for
+        // the maximum to the selected shells.
+        maxdiag = find_maxdiag(diagerr, reduced, nbasis, begin1, end1, begin2,
+                               end2, index1, index2);
+      } while (maxdiag > threshold*1000);
+
+      delete[] block;
+      block = NULL;
+
+      // Look for the new maximum error on the diagonal
+      maxdiag = find_maxdiag(diagerr, reduced, nbasis, 0, nbasis, 0, nbasis,
+                             index1, index2);
+    }
+
+    // Move the remaining vectors to the external storage.
+    if ((store != NULL) && (nvec > nstored)) {
+      if (!store(context, *vectors, nvec - nstored, size))
+        throw std::runtime_error("Cholesky vectors could not be stored.");
+      nstored = nvec;
+    }
+  } catch (...) {
+    delete[] diagonal;
+    delete[] reduced;
+    delete[] mask;
+    delete[] diagerr;
+    delete[] residual;
+    delete[] block;
+    free(*vectors);
+    *vectors = NULL;
+    free(*pairs);
+    *pairs = NULL;
+    throw;
+  }
+
+  if (store != NULL) {
+    free(*vectors);
+    *vectors = NULL;
+  } else if (nvec*(*npair) > 0) {
+    // Release the unused part of the buffer.
+    double* new_vectors = static_cast<double*>(
+        realloc(*vectors, sizeof(double)*nvec*(*npair)));
+    if (new_vectors != NULL) *vectors = new_vectors;
+  }
 
-  // Free vectors
   delete[] diagonal;
+  delete[] reduced;
+  delete[] mask;
   delete[] diagerr;
-  delete[] pastvector_sum;
+  delete[] residual;
 
   return nvec;
 }
@@ -23,9 +23,41 @@
 #ifndef CHOLESKY_H
 #define CHOLESKY_H
 
-#include <vector>
+#include "horton/gbasis/blas.h"
 #include "horton/gbasis/gbw.h"
 
+
+/** @brief
+        Append Cholesky vectors to external storage.
+
+    @param context
+        The pointer that was given to the cholesky function.
+
+    @param vectors
+        The vectors to append, shape (nvec, npair).
+
+    @return
+        False when the vectors could not be stored.
+*/
+typedef bool (*cholesky_store_t)(void* context, const double* vectors, long nvec,
+                                 long npair);
+
+/** @brief
+        Read back a range of Cholesky vectors from external storage.
+
+    @param context
+        The pointer that was given to the cholesky function.
+
+    @param vectors
+        The output buffer, shape (end - begin, npair).
+
+    @return
+        False when the vectors could not be loaded.
+*/
+typedef bool (*cholesky_load_t)(void* context, double* vectors, long begin, long end,
+                                long npair);
+
+
 /**
     @brief
         Computes Cholesky vectors for a four-index object
@@ -33,21 +65,75 @@
     Only the 4-center integrals relevant for the decomposition are actually
     computed. This implementation computes slices of the four-index object for
     a pair of shells at a time. (This is because most implementations of a
-    four-center work like that.)
+    four-center work like that.) The contributions of all previous vectors to
+    the slices of a pair of shells are subtracted at once with dgemm. Vectors
+    generated for the same pair of shells are subtracted with dgemv.
+
+    Pairs of shells (first and third index in physicist notation) are
+    discarded before the decomposition starts when the product of their largest
+    diagonal element and the largest diagonal element overall is below the
+    square of the threshold. Hence, all integrals involving these pairs are
+    below the threshold (Cauchy-Schwarz) and they are never selected as pivot.
+    Their columns are never computed and the Cholesky vectors are only stored
+    for the remaining basis pairs, in row-major order.
 
     @param gbw4
         A wrapper around a definition of the 4-center integral. See gbw.h
 
     @param vectors
-        An output pointer. The Cholesky vectors will be added to this std::vector.
+        An output pointer. On return, *vectors points to a buffer with the
+        Cholesky vectors, with shape (nvec, npair). This buffer is allocated
+        with malloc and must be released with free by the caller. When store
+        is given, the vectors are moved to external storage instead and
+        *vectors is NULL on return.
+
+    @param pairs
+        An output pointer. On return, *pairs points to a buffer with npair
+        indexes of the basis pairs that are not discarded. The index of the
+        basis pair (a, c) is a*nbasis + c. This buffer is allocated with malloc
+        and must be released with free by the caller.
+
+    @param npair
+        Output argument. The number of basis pairs that are not discarded.
 
     @param threshold
         A threshold for the error on the (double) diagonal of the four-center
         object. The Cholesky decomposition stops when sufficient vectors are
         generated such that the error on the diagonal falls below this
         threshold.
+
+    @param dgemm
+        The BLAS dgemm routine.
+
+    @param dgemv
+        The BLAS dgemv routine.
+
+    @param memory
+        Only used with store and load. The amount of memory, in bytes, for
+        Cholesky vectors. New vectors are buffered in at most half of this
+        amount. Before the buffer would grow larger, it is appended to the
+        external storage. Vectors that are needed again are read back in
+        blocks of at most half of this amount. (At least one vector is
+        buffered and loaded at a time. The integrals of one pair of shells
+        and the diagonal come on top of this amount.)
+
+    @param store
+        A function that appends vectors to external storage. When NULL, all
+        vectors are kept in memory.
+
+    @param load
+        A function that reads back vectors from external storage. This must be
+        given together with store.
+
+    @param context
+        An arbitrary pointer passed on to store and load.
+
+    @return
+        The number of Cholesky vectors, nvec.
 */
-long cholesky(GB4IntegralWrapper* gbw4, std::vector<double>* vectors,
-    double threshold);
+long cholesky(GB4IntegralWrapper* gbw4, double** vectors, long** pairs,
+    long* npair, double threshold, dgemm_t dgemm, dgemv_t dgemv,
+    double memory = 0, cholesky_store_t store = NULL, cholesky_load_t load = NULL,
+    void* context = NULL);
 
 #endif
@@ -20,9 +20,17 @@
 # --
 #cython: language_level=3
 
-from libcpp.vector cimport vector
+cimport libcpp
 
 cimport horton.gbasis.gbw as gbw
+from horton.gbasis.blas cimport dgemm_t, dgemv_t
 
 cdef extern from "horton/gbasis/cholesky.h":
-    long cholesky(gbw.GB4IntegralWrapper* gbw4, vector[double]* vectors, double threshold)
+    ctypedef libcpp.bool (*cholesky_store_t)(void* context, const double* vectors,
+                                             long nvec, long npair)
+    ctypedef libcpp.bool (*cholesky_load_t)(void* context, double* vectors, long begin,
+                                            long end, long npair)
+    long cholesky(gbw.GB4IntegralWrapper* gbw4, double** vectors, long** pairs,
+        long* npair, double threshold, dgemm_t dgemm, dgemv_t dgemv,
+        double memory, cholesky_store_t store, cholesky_load_t load,
+        void* context) except +
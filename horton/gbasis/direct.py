@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Integral-direct contractions of four-center integrals."""
+
+
+import numpy as np
+
+from horton.gbasis.cext import GB4ElectronRepulsionIntegralLibInt, \
+    GB4ErfIntegralLibInt, GB4GaussIntegralLibInt, GB4RAlphaIntegralLibInt
+from horton.log import biblio
+
+
+__all__ = ['DirectFourIndex']
+
+
+class DirectFourIndex(object):
+    """Four-center integrals that are recomputed in every contraction.
+
+    An instance of this class can be used instead of a dense four-index array
+    in the Coulomb and exchange terms of :mod:`horton.meanfield`. Only the
+    density matrix and the result are kept in memory. By default, the direct and
+    exchange contractions are computed together. The last result is kept, such
+    that a direct and an exchange term with the same density matrix, e.g. in
+    restricted Hartree-Fock, only need one pass over all integrals.
+    """
+
+    def __init__(self, obasis, kind='er', args=(), schwarz_threshold=1e-12, together=True):
+        """Initialize a DirectFourIndex object.
+
+        Parameters
+        ----------
+        obasis : GOBasis
+            The orbital basis.
+        kind : str
+            The type of interaction: ``'er'`` (Coulomb), ``'erf'``, ``'gauss'``
+            or ``'ralpha'``. See the corresponding ``compute_*_repulsion``
+            methods of :class:`GOBasis`.
+        args : tuple
+            The parameters of the interaction, in the same order as in the
+            corresponding ``compute_*_repulsion`` method: ``(mu,)`` for erf,
+            ``(c, alpha)`` for gauss and ``(alpha,)`` for ralpha.
+        schwarz_threshold : float
+            Shell quartets whose Cauchy-Schwarz upper bound, multiplied by the
+            largest relevant density matrix element, is below this threshold
+            are skipped. Set to zero to disable the screening.
+        together : bool
+            When True, the direct and exchange contractions are always computed
+            together. Set to False when only one of them is needed, e.g. for a
+            pure Coulomb term.
+        """
+        if kind == 'er':
+            gb4int = GB4ElectronRepulsionIntegralLibInt(obasis.max_shell_type, *args)
+        elif kind == 'erf':
+            gb4int = GB4ErfIntegralLibInt(obasis.max_shell_type, *args)
+        elif kind == 'gauss':
+            gb4int = GB4GaussIntegralLibInt(obasis.max_shell_type, *args)
+        elif kind == 'ralpha':
+            gb4int = GB4RAlphaIntegralLibInt(obasis.max_shell_type, *args)
+            if schwarz_threshold > 0 and args[0] >= 0:
+                raise ValueError('Schwarz screening requires a negative alpha.')
+        else:
+            raise ValueError('Unknown kind of four-center integral: %s' % kind)
+        self._obasis = obasis
+        self._gb4int = gb4int
+        self._key = (kind,) + tuple(args)
+        self._schwarz_threshold = schwarz_threshold
+        self._together = together
+        self._last = None
+
+    def _get_nbasis(self):
+        '''The number of basis functions'''
+        return self._obasis.nbasis
+
+    nbasis = property(_get_nbasis)
+
+    def _get_shape(self):
+        '''The shape of the (virtual) four-index array'''
+        return (self.nbasis,)*4
+
+    shape = property(_get_shape)
+
+    def _contract(self, dm, index):
+        '''Return the direct (index 0) or exchange (index 1) contraction with a density matrix'''
+        if dm.shape != (self.nbasis, self.nbasis):
+            raise TypeError('The density matrix does not have the right shape.')
+        if (self._last is not None and self._last[index + 1] is not None and
+                (self._last[0] == dm).all()):
+            return self._last[index + 1]
+        biblio.cite('valeev2014',
+                    'the efficient implementation of four-center electron repulsion integrals')
+        dms = np.ascontiguousarray(dm, dtype=float).reshape(1, self.nbasis, self.nbasis)
+        results = [None, None]
+        for i in 0, 1:
+            if self._together or i == index:
+                results[i] = np.zeros(dms.shape)
+        self._obasis._compute_four_index_jk(
+            self._gb4int, self._key, dms, results[0], results[1], self._schwarz_threshold)
+        results = [None if result is None else result[0] for result in results]
+        self._last = (dms[0].copy(), results[0], results[1])
+        return results[index]
+
+    def contract_direct(self, dm):
+        """Return ``einsum('abcd,bd->ac', eri, dm)`` without storing the integrals.
+
+        Parameters
+        ----------
+        dm : np.ndarray, shape=(nbasis, nbasis)
+            The density matrix.
+        """
+        return self._contract(dm, 0).copy()
+
+    def contract_exchange(self, dm):
+        """Return ``einsum('abcd,cb->ad', eri, dm)`` without storing the integrals.
+
+        Parameters
+        ----------
+        dm : np.ndarray, shape=(nbasis, nbasis)
+            The density matrix.
+        """
+        return self._contract(dm, 1).copy()
@@ -0,0 +1,508 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+#include <algorithm>
+#include <cmath>
+#include <cstdlib>
+#include <stdexcept>
+#include <vector>
+#include "horton/gbasis/boys.h"
+#include "horton/gbasis/cartpure.h"
+#include "horton/gbasis/common.h"
+#include "horton/gbasis/esp.h"
+#include "horton/gbasis/iter_pow.h"
+#include "horton/gbasis/parallel.h"
+
+
+// The highest order of the multipole expansion.
+static const long esp_max_lmax = 16;
+// The number of points in one block.
+static const long esp_block_size = 256;
+// A product of primitives is treated as a point multipole when the exponent
+// times the squared distance to its center exceeds this value.
+static const double esp_far_exponent = 36.0;
+// The minimal ratio of the distance to a group and the extent of the group,
+// for the multipole expansion of the group to be used.
+static const double esp_separation = 2.0;
+
+
+/*
+
+  Auxiliary routines
+
+*/
+
+
+/** @brief
+        Matrix that transforms Cartesian into pure functions, shape (nbasis, ncart).
+
+    For Cartesian shells, the identity matrix is returned.
+  */
+static std::vector<double> cart_to_pure_matrix(long shell_type) {
+    const long ncart = get_shell_nbasis(abs(shell_type));
+    const long nbasis = get_shell_nbasis(shell_type);
+    std::vector<double> identity(ncart*ncart, 0.0);
+    for (long icart=0; icart < ncart; icart++) identity[icart*(ncart + 1)] = 1.0;
+    if (shell_type >= -1) return identity;
+    std::vector<double> result(nbasis*ncart);
+    cart_to_pure_low(identity.data(), result.data(), -shell_type, 1, ncart);
+    return result;
+}
+
+/** @brief
+        One-dimensional Hermite expansion coefficients of a product of two primitives.
+
+    The coefficients are stored in e[(i*(l1 + 1) + j)*(l0 + l1 + 1) + t] for
+    the product of powers i and j of the two primitives and Hermite order t.
+  */
+static void hermite_1d(long l0, long l1, double pa, double pb, double gamma,
+                       double* e) {
+    const long s = l0 + l1 + 1;
+    std::fill(e, e + (l0 + 1)*(l1 + 1)*s, 0.0);
+    e[0] = 1.0;
+    const double inv_2g = 0.5/gamma;
+    for (long i=0; i <= l0; i++) {
+        // Increase i, starting from (i - 1, 0) ...
+        if (i > 0) {
+            const double* prev = e + (i - 1)*(l1 + 1)*s;
+            double* cur = e + i*(l1 + 1)*s;
+            for (long t=0; t <= i; t++) {
+                double value = pa*prev[t];
+                if (t > 0) value += inv_2g*prev[t - 1];
+                if (t < i - 1) value += (t + 1)*prev[t + 1];
+                cur[t] = value;
+            }
+        }
+        // ... and then increase j.
+        for (long j=1; j <= l1; j++) {
+            const double* prev = e + (i*(l1 + 1) + j - 1)*s;
+            double* cur = e + (i*(l1 + 1) + j)*s;
+            for (long t=0; t <= i + j; t++) {
+                double value = pb*prev[t];
+                if (t > 0) value += inv_2g*prev[t - 1];
+                if (t < i + j - 1) value += (t + 1)*prev[t + 1];
+                cur[t] = value;
+            }
+        }
+    }
+}
+
+/** @brief
+        One-dimensional moments of Hermite Gaussians, divided by a!.
+
+    The result is stored in m[a*(order + 1) + t] and contains the integral of
+    (x - a)^a d^t/dp^t exp(-gamma (x - p)^2) over x, divided by a!. The
+    argument x is the distance p - a.
+  */
+static void hermite_moments_1d(long lmax, long order, double x, double gamma,
+                               double* m) {
+    const double g0 = sqrt(M_PI/gamma);
+    double factorial = 1.0;
+    for (long a=0; a <= lmax; a++) {
+        if (a > 0) factorial *= a;
+        for (long t=0; t <= order; t++) {
+            double value = 0.0;
+            double binom = 1.0;
+            double gk = g0;
+            for (long k=0; k <= a - t; k += 2) {
+                double falling = 1.0;
+                for (long i=0; i < t; i++) falling *= a - k - i;
+                value += binom*gk*falling*pow(x, a - k - t);
+                binom *= (a - k)*(a - k - 1)/((k + 1.0)*(k + 2.0));
+                gk *= (k + 1)/(2.0*gamma);
+            }
+            m[a*(order + 1) + t] = value/factorial;
+        }
+    }
+}
+
+/** @brief
+        McMurchie-Davidson recursion for derivatives of a radial function.
+
+    The result R^n_tuv is stored in work[((n*s + t)*s + u)*s + v], with s =
+    order + 1, for all n + t + u + v <= order. Only the elements with n = 0
+    are needed in the end: these are the derivatives of the radial function
+    towards the components of delta.
+
+    @param order
+        The maximum order of the derivatives.
+
+    @param rn
+        The starting values R^n_000, i.e. rn[n] = (2 d/ds)^n f(s), with s the
+        squared norm of delta.
+
+    @param delta
+        The relative vector at which the derivatives are computed.
+
+    @param work
+        The output array, size (order + 1)^4.
+  */
+static void hermite_coulomb(long order, const double* rn, const double* delta,
+                            double* work) {
+    const long s = order + 1;
+    for (long t=0; t <= order; t++) {
+        for (long u=0; u <= order - t; u++) {
+            for (long v=0; v <= order - t - u; v++) {
+                for (long n=0; n <= order - t - u - v; n++) {
+                    double* r = work + ((n*s + t)*s + u)*s + v;
+                    const long n1 = s*s*s;  // stride to next value of n
+                    double value;
+                    if (v > 0) {
+                        value = delta[2]*r[n1 - 1];
+                        if (v > 1) value += (v - 1)*r[n1 - 2];
+                    } else if (u > 0) {
+                        value = delta[1]*r[n1 - s];
+                        if (u > 1) value += (u - 1)*r[n1 - 2*s];
+                    } else if (t > 0) {
+                        value = delta[0]*r[n1 - s*s];
+                        if (t > 1) value += (t - 1)*r[n1 - 2*s*s];
+                    } else {
+                        value = rn[n];
+                    }
+                    *r = value;
+                }
+            }
+        }
+    }
+}
+
+//! Sum of products of coefficients and R^0_tuv for t + u + v <= order.
+static double hermite_dot(long order, const double* coeffs, const double* work) {
+    const long s = order + 1;
+    double result = 0.0;
+    for (long t=0; t <= order; t++) {
+        for (long u=0; u <= order - t; u++) {
+            const long offset = (t*s + u)*s;
+            for (long v=0; v <= order - t - u; v++) {
+                result += coeffs[offset + v]*work[offset + v];
+            }
+        }
+    }
+    return result;
+}
+
+
+/*
+
+  ESPEngine
+
+*/
+
+
+ESPEngine::ESPEngine(GOBasis* basis, const double* dm, double threshold, long lmax)
+    : lmax(lmax), max_order(0) {
+    if (threshold < 0) {
+        throw std::domain_error("The threshold must not be negative.");
+    }
+    if (lmax > esp_max_lmax) {
+        throw std::domain_error("The order of the multipole expansion is too high.");
+    }
+    const long nbasis = basis->get_nbasis();
+    const long ncenter = basis->ncenter;
+    const long* basis_offsets = basis->get_basis_offsets();
+    const GBShellPairs* prim_pairs = basis->get_shell_pairs();
+
+    // Transformations to pure functions for all shell types.
+    std::vector<std::vector<double> > tfs;
+    for (long shell_type=-MAX_SHELL_TYPE; shell_type <= MAX_SHELL_TYPE; shell_type++) {
+        tfs.push_back(cart_to_pure_matrix(shell_type));
+    }
+
+    // Products of primitives, before they are sorted by group.
+    std::vector<long> groups;
+    std::vector<double> centers;
+    std::vector<double> exponents;
+    std::vector<long> orders;
+    std::vector<std::vector<double> > coeffs;
+
+    const long max_ncart = get_shell_nbasis(MAX_SHELL_TYPE);
+    std::vector<double> tmp(max_ncart*max_ncart);
+    std::vector<double> dcart(max_ncart*max_ncart);
+    std::vector<double> weights(max_ncart*max_ncart);
+    std::vector<long> powers0(3*max_ncart), powers1(3*max_ncart);
+    std::vector<double> ex, ey, ez;
+    for (long ishell0=0; ishell0 < basis->nshell; ishell0++) {
+        const long shell_type0 = basis->shell_types[ishell0];
+        const long l0 = abs(shell_type0);
+        const long nbasis0 = get_shell_nbasis(shell_type0);
+        const long ncart0 = get_shell_nbasis(l0);
+        const double* tf0 = tfs[shell_type0 + MAX_SHELL_TYPE].data();
+        const double* r0 = basis->centers + 3*basis->shell_map[ishell0];
+        long n[3] = {l0, 0, 0};
+        long icart = 0;
+        do {
+            std::copy(n, n + 3, powers0.begin() + 3*icart);
+            icart++;
+        } while (iter_pow1_inc(n));
+
+        for (long ishell1=0; ishell1 <= ishell0; ishell1++) {
+            const long shell_type1 = basis->shell_types[ishell1];
+            const long l1 = abs(shell_type1);
+            const long nbasis1 = get_shell_nbasis(shell_type1);
+            const long ncart1 = get_shell_nbasis(l1);
+            const double* tf1 = tfs[shell_type1 + MAX_SHELL_TYPE].data();
+            const double* r1 = basis->centers + 3*basis->shell_map[ishell1];
+            n[0] = l1;
+            n[1] = 0;
+            n[2] = 0;
+            icart = 0;
+            do {
+                std::copy(n, n + 3, powers1.begin() + 3*icart);
+                icart++;
+            } while (iter_pow1_inc(n));
+
+            // Block of the density matrix in Cartesian functions. Off-diagonal
+            // blocks are counted twice.
+            const double factor = (ishell0 == ishell1) ? 1.0 : 2.0;
+            bool nonzero = false;
+            for (long ibasis0=0; ibasis0 < nbasis0; ibasis0++) {
+                const double* row = dm + (basis_offsets[ishell0] + ibasis0)*nbasis
+                                    + basis_offsets[ishell1];
+                for (long icart1=0; icart1 < ncart1; icart1++) {
+                    double value = 0.0;
+                    for (long ibasis1=0; ibasis1 < nbasis1; ibasis1++) {
+                        value += row[ibasis1]*tf1[ibasis1*ncart1 + icart1];
+                    }
+                    tmp[ibasis0*ncart1 + icart1] = value;
+                }
+            }
+            for (long icart0=0; icart0 < ncart0; icart0++) {
+                for (long icart1=0; icart1 < ncart1; icart1++) {
+                    double value = 0.0;
+                    for (long ibasis0=0; ibasis0 < nbasis0; ibasis0++) {
+                        value += tf0[ibasis0*ncart0 + icart0]*tmp[ibasis0*ncart1 + icart1];
+                    }
+                    dcart[icart0*ncart1 + icart1] = factor*value;
+                    nonzero |= (value != 0.0);
+                }
+            }
+            if (!nonzero) continue;
+
+            const long order = l0 + l1;
+            const long s = order + 1;
+            ex.resize((l0 + 1)*(l1 + 1)*s);
+            ey.resize((l0 + 1)*(l1 + 1)*s);
+            ez.resize((l0 + 1)*(l1 + 1)*s);
+            const GBPrimPair* begin = prim_pairs->get_pairs(ishell0, ishell1);
+            const GBPrimPair* end = begin + prim_pairs->get_npair(ishell0, ishell1);
+            for (const GBPrimPair* pair=begin; pair < end; pair++) {
+                const double gamma = pair->gamma;
+                const double* scales0 = pair->scales0;
+                const double* scales1 = pair->scales1;
+                const double pre = 2*M_PI*pair->gamma_inv*pair->prefac;
+
+                // Screening on the weights of all Cartesian products.
+                double sum = 0.0;
+                for (long icart0=0; icart0 < ncart0; icart0++) {
+                    for (long icart1=0; icart1 < ncart1; icart1++) {
+                        const long i = icart0*ncart1 + icart1;
+                        weights[i] = pre*scales0[icart0]*scales1[icart1]*dcart[i];
+                        sum += fabs(weights[i]);
+                    }
+                }
+                if ((sum == 0.0) || (sum < threshold)) continue;
+
+                // Hermite expansion of the weighted sum of all products.
+                const double* p = pair->center;
+                hermite_1d(l0, l1, p[0] - r0[0], p[0] - r1[0], gamma, ex.data());
+                hermite_1d(l0, l1, p[1] - r0[1], p[1] - r1[1], gamma, ey.data());
+                hermite_1d(l0, l1, p[2] - r0[2], p[2] - r1[2], gamma, ez.data());
+                std::vector<double> h(s*s*s, 0.0);
+                for (long icart0=0; icart0 < ncart0; icart0++) {
+                    const long* n0 = powers0.data() + 3*icart0;
+                    for (long icart1=0; icart1 < ncart1; icart1++) {
+                        const long* n1 = powers1.data() + 3*icart1;
+                        const double weight = weights[icart0*ncart1 + icart1];
+                        if (weight == 0.0) continue;
+                        const double* fx = ex.data() + (n0[0]*(l1 + 1) + n1[0])*s;
+                        const double* fy = ey.data() + (n0[1]*(l1 + 1) + n1[1])*s;
+                        const double* fz = ez.data() + (n0[2]*(l1 + 1) + n1[2])*s;
+                        for (long t=0; t <= n0[0] + n1[0]; t++) {
+                            for (long u=0; u <= n0[1] + n1[1]; u++) {
+                                const double wxy = weight*fx[t]*fy[u];
+                                for (long v=0; v <= n0[2] + n1[2]; v++) {
+                                    h[(t*s + u)*s + v] += wxy*fz[v];
+                                }
+                            }
+                        }
+                    }
+                }
+
+                // Assign the product to the nearest center.
+                long igroup = 0;
+                for (long icenter=1; icenter < ncenter; icenter++) {
+                    if (dist_sq(p, basis->centers + 3*icenter) <
+                        dist_sq(p, basis->centers + 3*igroup)) igroup = icenter;
+                }
+                groups.push_back(igroup);
+                centers.insert(centers.end(), p, p + 3);
+                exponents.push_back(gamma);
+                orders.push_back(order);
+                coeffs.push_back(std::move(h));
+                max_order = std::max(max_order, order);
+            }
+        }
+    }
+
+    // Sort the products by group and compute the radius of each group.
+    const long npair = groups.size();
+    group_offsets.assign(ncenter + 1, 0);
+    for (long ipair=0; ipair < npair; ipair++) group_offsets[groups[ipair] + 1]++;
+    for (long igroup=0; igroup < ncenter; igroup++) {
+        group_offsets[igroup + 1] += group_offsets[igroup];
+    }
+    group_centers.assign(basis->centers, basis->centers + 3*ncenter);
+    group_radii.assign(ncenter, 0.0);
+    group_extents.assign(ncenter, 0.0);
+    std::vector<long> order_pairs(npair);
+    std::vector<long> fill(group_offsets.begin(), group_offsets.end() - 1);
+    for (long ipair=0; ipair < npair; ipair++) order_pairs[fill[groups[ipair]]++] = ipair;
+    pair_offsets.push_back(0);
+    for (long i=0; i < npair; i++) {
+        const long ipair = order_pairs[i];
+        const long igroup = groups[ipair];
+        const double* p = centers.data() + 3*ipair;
+        pair_centers.insert(pair_centers.end(), p, p + 3);
+        pair_exponents.push_back(exponents[ipair]);
+        pair_orders.push_back(orders[ipair]);
+        hermite.insert(hermite.end(), coeffs[ipair].begin(), coeffs[ipair].end());
+        pair_offsets.push_back(hermite.size());
+        const double offset = sqrt(dist_sq(p, group_centers.data() + 3*igroup));
+        group_radii[igroup] = std::max(group_radii[igroup],
+            offset + sqrt(esp_far_exponent/exponents[ipair]));
+        group_extents[igroup] = std::max(group_extents[igroup],
+            offset + 1.0/sqrt(exponents[ipair]));
+    }
+
+    // Multipole moments of each group. The sum over the Hermite orders is
+    // carried out one Cartesian direction at a time.
+    if (lmax < 0) return;
+    const long sm = lmax + 1;
+    moments.assign(ncenter*sm*sm*sm, 0.0);
+    for (long igroup=0; igroup < ncenter; igroup++) {
+        double* group_moments = moments.data() + igroup*sm*sm*sm;
+        const double* a = group_centers.data() + 3*igroup;
+        for (long ipair=group_offsets[igroup]; ipair < group_offsets[igroup + 1]; ipair++) {
+            const long order = pair_orders[ipair];
+            const long s = order + 1;
+            const double gamma = pair_exponents[ipair];
+            const double* p = pair_centers.data() + 3*ipair;
+            const double* h = hermite.data() + pair_offsets[ipair];
+            std::vector<double> mx(sm*s), my(sm*s), mz(sm*s);
+            hermite_moments_1d(lmax, order, p[0] - a[0], gamma, mx.data());
+            hermite_moments_1d(lmax, order, p[1] - a[1], gamma, my.data());
+            hermite_moments_1d(lmax, order, p[2] - a[2], gamma, mz.data());
+            // tmp1[t, u, c] = sum_v h[t, u, v] mz[c, v]
+            std::vector<double> tmp1(s*s*sm, 0.0);
+            for (long t=0; t < s; t++)
+                for (long u=0; u < s - t; u++)
+                    for (long c=0; c < sm; c++)
+                        for (long v=0; v < s - t - u; v++)
+                            tmp1[(t*s + u)*sm + c] += h[(t*s + u)*s + v]*mz[c*s + v];
+            // tmp2[t, b, c] = sum_u tmp1[t, u, c] my[b, u]
+            std::vector<double> tmp2(s*sm*sm, 0.0);
+            for (long t=0; t < s; t++)
+                for (long b=0; b < sm; b++)
+                    for (long c=0; c < sm - b; c++)
+                        for (long u=0; u < s - t; u++)
+                            tmp2[(t*sm + b)*sm + c] += tmp1[(t*s + u)*sm + c]*my[b*s + u];
+            // moments[a, b, c] += gamma/(2 pi) sum_t tmp2[t, b, c] mx[a, t]
+            const double norm = gamma/(2*M_PI);
+            for (long ia=0; ia < sm; ia++)
+                for (long b=0; b < sm - ia; b++)
+                    for (long c=0; c < sm - ia - b; c++)
+                        for (long t=0; t < s; t++)
+                            group_moments[(ia*sm + b)*sm + c] +=
+                                norm*tmp2[(t*sm + b)*sm + c]*mx[ia*s + t];
+        }
+    }
+}
+
+void ESPEngine::compute(long npoint, const double* points, double* output,
+                        long nthread) const {
+    const long ngroup = group_radii.size();
+    const long nblock = (npoint + esp_block_size - 1)/esp_block_size;
+    const long nworker = std::max(1L, std::min(nthread, nblock));
+    const long s = std::max(max_order, lmax) + 1;
+    const long nmoment = (lmax + 1)*(lmax + 1)*(lmax + 1);
+    std::vector<std::vector<double> > works(nworker, std::vector<double>(s*s*s*s));
+    std::vector<std::vector<long> > nears(nworker, std::vector<long>(esp_block_size));
+
+    parallel_for(nworker, nblock, [&](long ithread, long iblock) {
+        double* work = works[ithread].data();
+        long* near = nears[ithread].data();
+        double rn[BOYS_MAX_M + 1];
+        const long ipoint0 = iblock*esp_block_size;
+        const long ipoint1 = std::min(ipoint0 + esp_block_size, npoint);
+
+        for (long igroup=0; igroup < ngroup; igroup++) {
+            // Use the multipole expansion of the group for all distant points
+            // and keep a list of the remaining points.
+            const double* a = group_centers.data() + 3*igroup;
+            const double min_distance = std::max(group_radii[igroup],
+                                                 esp_separation*group_extents[igroup]);
+            long nnear = 0;
+            for (long ipoint=ipoint0; ipoint < ipoint1; ipoint++) {
+                double delta[3];
+                for (long i=0; i < 3; i++) delta[i] = a[i] - points[3*ipoint + i];
+                const double d_sq = delta[0]*delta[0] + delta[1]*delta[1] + delta[2]*delta[2];
+                if ((lmax < 0) || (d_sq <= min_distance*min_distance)) {
+                    near[nnear] = ipoint;
+                    nnear++;
+                    continue;
+                }
+                rn[0] = 1.0/sqrt(d_sq);
+                for (long n=1; n <= lmax; n++) rn[n] = -(2*n - 1)*rn[n - 1]/d_sq;
+                hermite_coulomb(lmax, rn, delta, work);
+                output[ipoint] += hermite_dot(lmax, moments.data() + igroup*nmoment, work);
+            }
+            if (nnear == 0) continue;
+
+            // Exact potential of all products in the group for the other points.
+            for (long ipair=group_offsets[igroup]; ipair < group_offsets[igroup + 1]; ipair++) {
+                const long order = pair_orders[ipair];
+                const double gamma = pair_exponents[ipair];
+                const double* p = pair_centers.data() + 3*ipair;
+                const double* h = hermite.data() + pair_offsets[ipair];
+                for (long inear=0; inear < nnear; inear++) {
+                    const long ipoint = near[inear];
+                    double delta[3];
+                    for (long i=0; i < 3; i++) delta[i] = p[i] - points[3*ipoint + i];
+                    const double d_sq = delta[0]*delta[0] + delta[1]*delta[1] + delta[2]*delta[2];
+                    const double t = gamma*d_sq;
+                    if (t > esp_far_exponent) {
+                        // Asymptotic form of the Boys function: point multipoles.
+                        rn[0] = 0.5*sqrt(M_PI/t);
+                        for (long n=1; n <= order; n++) rn[n] = -(2*n - 1)*rn[n - 1]/d_sq;
+                    } else {
+                        boys_function_array(order, t, rn);
+                        double scale = 1.0;
+                        for (long n=1; n <= order; n++) {
+                            scale *= -2*gamma;
+                            rn[n] *= scale;
+                        }
+                    }
+                    hermite_coulomb(order, rn, delta, work);
+                    output[ipoint] += hermite_dot(order, h, work);
+                }
+            }
+        }
+    });
+}
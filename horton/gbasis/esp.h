@@ -0,0 +1,116 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Electrostatic potential of a density matrix on large grids
+
+#ifndef HORTON_GBASIS_ESP_H
+#define HORTON_GBASIS_ESP_H
+
+#include <vector>
+#include "horton/gbasis/gbasis.h"
+
+
+/**
+    @brief
+        Evaluates the Hartree potential of a density matrix on many grid points.
+
+    All products of two primitives are contracted with the density matrix once,
+    when the engine is constructed. Each product becomes a single Gaussian
+    distribution, stored as Hermite expansion coefficients (McMurchie-Davidson)
+    around the center of the product. The potential of such a distribution in
+    one point needs one array of Boys functions, irrespective of the number of
+    Cartesian functions in both shells.
+
+    Products whose coefficients are negligible, due to a small density matrix
+    block or a small overlap of the primitives, are discarded. Every remaining
+    product is assigned to the nearest center of the basis set. For each
+    center, the multipole moments of all its products are computed, such that
+    their potential in points far away from the center can be computed with a
+    multipole expansion.
+*/
+class ESPEngine {
+    private:
+        long lmax;  // maximum order of the multipole expansion, -1 if not used.
+        long max_order;  // maximum order of the Hermite expansion of a product.
+        std::vector<double> pair_centers;  // centers of the products, (npair, 3)
+        std::vector<double> pair_exponents;  // exponents of the products, (npair,)
+        std::vector<long> pair_orders;  // orders of the Hermite expansions, (npair,)
+        std::vector<long> pair_offsets;  // offsets in hermite, (npair+1,)
+        std::vector<double> hermite;  // Hermite expansion coefficients.
+        std::vector<double> group_centers;  // centers of the groups, (ngroup, 3)
+        std::vector<double> group_radii;  // radius of each group, (ngroup,)
+        std::vector<double> group_extents;  // extent of each group, (ngroup,)
+        std::vector<long> group_offsets;  // first product of each group, (ngroup+1,)
+        std::vector<double> moments;  // multipole moments, (ngroup, (lmax+1)^3)
+
+    public:
+        /**
+            @brief
+                Precompute the products of primitives for a given density matrix.
+
+            @param basis
+                The orbital basis set.
+
+            @param dm
+                The density matrix, assumed to be symmetric, shape (nbasis, nbasis).
+
+            @param threshold
+                Products of primitives are discarded when the sum of the
+                absolute values of their (density-matrix weighted) prefactors
+                is below this threshold. Set to zero to keep all products.
+
+            @param lmax
+                The maximum order of the multipole expansion. When negative,
+                the potential is always computed exactly.
+          */
+        ESPEngine(GOBasis* basis, const double* dm, double threshold, long lmax);
+
+        /**
+            @brief
+                Add the Hartree potential to the output.
+
+            The points are processed in blocks. For every group of products,
+            the multipole expansion is used in all points whose distance to
+            the center of the group exceeds (i) the radius of the group and
+            (ii) twice the extent of the group. Beyond the radius, all products
+            of the group act as point multipoles. The extent is the largest
+            distance between the center of the group and the center of one of
+            its products, increased by the width of that product.
+
+            @param npoint
+                The number of grid points.
+
+            @param points
+                The Cartesian grid points, shape (npoint, 3).
+
+            @param output
+                The results are added to this array, shape (npoint,).
+
+            @param nthread
+                The number of threads used to process the blocks.
+          */
+        void compute(long npoint, const double* points, double* output,
+                     long nthread) const;
+
+        //! The number of products of primitives that are not discarded.
+        long get_npair() const {return pair_exponents.size();}
+};
+
+#endif  // HORTON_GBASIS_ESP_H
@@ -27,6 +27,7 @@
 #include <cstdlib>
 #include <cstring>
 #include <stdexcept>
+#include <vector>
 #include "horton/moments.h"
 #include "horton/gbasis/boys.h"
 #include "horton/gbasis/cartpure.h"
@@ -75,6 +76,65 @@ void GB1GridFn::cart_to_pure() {
 }
 
 
+/*
+    GB1ExpGridFn
+*/
+
+void GB1ExpGridFn::compute_block_from_exp(double* work_block, double* coeffs, long nbasis,
+                                          long npoint, long nselect, const long* selected,
+                                          double* output, double* work_exp, dgemm_t dgemm) {
+  // Fall back to the evaluation point by point, using work_exp to store work_basis.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      for (long iwork=0; iwork < dim_work; iwork++) {
+        work_exp[ibasis*dim_work + iwork] = work_block[(iwork*npoint + ipoint)*nbasis + ibasis];
+      }
+    }
+    compute_point_from_exp(work_exp, coeffs, nbasis, output + ipoint*dim_output);
+  }
+}
+
+/*
+    Copy the coefficients of the selected basis functions and orbitals,
+    select[j, i] = coeffs[selected[j], iorbs[i]], with shape (nselect, norb).
+*/
+static void select_coeffs(const double* coeffs, long nfn, long nselect, const long* selected,
+                          long norb, const long* iorbs, double* select) {
+  for (long iselect=0; iselect < nselect; iselect++) {
+    for (long i=0; i < norb; i++) {
+      select[iselect*norb + i] = coeffs[selected[iselect]*nfn + iorbs[i]];
+    }
+  }
+}
+
+/*
+    Compute product[p, i] = sum_j basis[p, selected[j]] select[j, i] + beta*product[p, i]
+    for all points p in a block, where basis has shape (npoint, nbasis), select has shape
+    (nselect, norb) and product has shape (npoint, norb). The work array must have at
+    least npoint*nselect elements.
+*/
+static void orbital_product(const double* basis, long nbasis, long npoint, long nselect,
+                            const long* selected, double* select, long norb, double beta,
+                            double* product, double* work, dgemm_t dgemm) {
+  if (nselect == 0) {
+    if (beta == 0.0) memset(product, 0, npoint*norb*sizeof(double));
+    return;
+  }
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    for (long iselect=0; iselect < nselect; iselect++) {
+      work[ipoint*nselect + iselect] = basis[ipoint*nbasis + selected[iselect]];
+    }
+  }
+  char trans_n = 'N';
+  double one = 1.0;
+  int m = norb;
+  int n = npoint;
+  int k = nselect;
+  // In column-major order: product^T = select^T basis^T
+  dgemm(&trans_n, &trans_n, &m, &n, &k, &one, select, &m, work, &k, &beta, product, &m);
+}
+
+
 /*
     GB1ExpGridOrbitalFn
 */
@@ -116,6 +176,18 @@ void GB1ExpGridOrbitalFn::compute_point_from_exp(double* work_basis, double* coe
 }
 
 
+void GB1ExpGridOrbitalFn::compute_block_from_exp(double* work_block, double* coeffs,
+                                                 long nbasis, long npoint, long nselect,
+                                                 const long* selected, double* output,
+                                                 double* work_exp, dgemm_t dgemm) {
+  // The orbitals in all points of the block are obtained with one matrix product.
+  double* select = work_exp + npoint*nselect;
+  select_coeffs(coeffs, nfn, nselect, selected, norb, iorbs, select);
+  orbital_product(work_block, nbasis, npoint, nselect, selected, select, norb, 1.0, output,
+                  work_exp, dgemm);
+}
+
+
 /*
  GB1ExpGridOrbGradientFn
  */
@@ -175,6 +247,99 @@ void GB1ExpGridOrbGradientFn::compute_point_from_exp(double* work_basis, double*
   }
 }
 
+void GB1ExpGridOrbGradientFn::compute_block_from_exp(double* work_block, double* coeffs,
+                                                     long nbasis, long npoint, long nselect,
+                                                     const long* selected, double* output,
+                                                     double* work_exp, dgemm_t dgemm) {
+  // One matrix product for each Cartesian component of the gradient.
+  double* select = work_exp + npoint*nselect;
+  double* product = select + nselect*norb;
+  select_coeffs(coeffs, nfn, nselect, selected, norb, iorbs, select);
+  for (long icart=0; icart < 3; icart++) {
+    orbital_product(work_block + icart*npoint*nbasis, nbasis, npoint, nselect, selected,
+                    select, norb, 0.0, product, work_exp, dgemm);
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+      for (long i=0; i < norb; i++) {
+        output[(ipoint*norb + i)*3 + icart] += product[ipoint*norb + i];
+      }
+    }
+  }
+}
+
+
+/*
+    GB1DMGridFn
+*/
+
+/*
+    Compute product[p, a] = sum_b basis[p, b] dm[a, b] for all points p in a block, where
+    basis and product have shape (npoint, nbasis).
+*/
+static void dm_product(double* basis, double* dm, long nbasis, long npoint,
+                       double* product, dgemm_t dgemm) {
+  char trans_t = 'T';
+  char trans_n = 'N';
+  double one = 1.0;
+  double zero = 0.0;
+  int n = nbasis;
+  int m = npoint;
+  // In column-major order: product^T = dm basis^T
+  dgemm(&trans_t, &trans_n, &n, &m, &n, &one, dm, &n, basis, &n, &zero, product, &n);
+}
+
+// Dot product of two rows with nbasis elements.
+static double row_dot(const double* x, const double* y, long nbasis) {
+  double result = 0.0;
+  for (long ibasis=0; ibasis < nbasis; ibasis++) result += x[ibasis]*y[ibasis];
+  return result;
+}
+
+void GB1DMGridFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                        long npoint, double* output, double* work_dm,
+                                        dgemm_t dgemm) {
+  // Fall back to the evaluation point by point, using work_dm to store work_basis.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      for (long iwork=0; iwork < dim_work; iwork++) {
+        work_dm[ibasis*dim_work + iwork] = work_block[(iwork*npoint + ipoint)*nbasis + ibasis];
+      }
+    }
+    compute_point_from_dm(work_dm, dm, nbasis, output + ipoint*dim_output, 0.0, NULL);
+  }
+}
+
+/*
+    Add fock_half[a, b] += sum_r basis[r, a] scaled[r, b], where basis and scaled have
+    shape (nrow, nbasis).
+*/
+static void fock_product(double* basis, double* scaled, long nbasis, long nrow,
+                         double* fock_half, dgemm_t dgemm) {
+  char trans_t = 'T';
+  char trans_n = 'N';
+  double one = 1.0;
+  int n = nbasis;
+  int k = nrow;
+  // In column-major order: fock_half^T += scaled^T basis
+  dgemm(&trans_n, &trans_t, &n, &n, &k, &one, scaled, &n, basis, &n, &one, fock_half, &n);
+}
+
+void GB1DMGridFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                              long nbasis, long npoint, double* work_pot,
+                                              double* fock_half, dgemm_t dgemm) {
+  // Fall back to the evaluation point by point, using work_pot to store work_basis.
+  // Half of the potential gives half of the (symmetric) Fock matrix contribution.
+  std::vector<double> half_pot(dim_output);
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      for (long iwork=0; iwork < dim_work; iwork++) {
+        work_pot[ibasis*dim_work + iwork] = work_block[(iwork*npoint + ipoint)*nbasis + ibasis];
+      }
+    }
+    for (long i=0; i < dim_output; i++) half_pot[i] = 0.5*pot[ipoint*dim_output + i];
+    compute_fock_from_pot(half_pot.data(), work_pot, nbasis, fock_half);
+  }
+}
+
 
 /*
     GB1DMGridDensityFn
@@ -253,6 +418,18 @@ void GB1DMGridDensityFn::compute_point_from_dm(double* work_basis, double* dm,
   *output += rho;
 }
 
+void GB1DMGridDensityFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                               long npoint, double* output, double* work_dm,
+                                               dgemm_t dgemm) {
+  // The basis function values (rows in work_block) are multiplied with the density
+  // matrix in one go. The density is the dot product of each row of the result with the
+  // corresponding row of basis function values.
+  dm_product(work_block, dm, nbasis, npoint, work_dm, dgemm);
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    output[ipoint] += row_dot(work_dm + ipoint*nbasis, work_block + ipoint*nbasis, nbasis);
+  }
+}
+
 void GB1DMGridDensityFn::compute_fock_from_pot(double* pot, double* work_basis,
                                                long nbasis, double* fock) {
   // The potential in `point` (see reset method) is given in `*pot`. It is the functional
@@ -270,6 +447,19 @@ void GB1DMGridDensityFn::compute_fock_from_pot(double* pot, double* work_basis,
 }
 
 
+void GB1DMGridDensityFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                     long nbasis, long npoint, double* work_pot,
+                                                     double* fock_half, dgemm_t dgemm) {
+  // The basis functions are multiplied by half the potential.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    double factor = 0.5*pot[ipoint];
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      work_pot[ipoint*nbasis + ibasis] = factor*work_block[ipoint*nbasis + ibasis];
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, npoint, fock_half, dgemm);
+}
+
 
 /*
     GB1DMGridGradientFn
@@ -338,6 +528,21 @@ void GB1DMGridGradientFn::compute_point_from_dm(double* work_basis, double* dm,
   output[2] += 2*rho_z;
 }
 
+void GB1DMGridGradientFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                                long npoint, double* output, double* work_dm,
+                                                dgemm_t dgemm) {
+  // Rows of the basis function values times the density matrix, dotted with the rows of
+  // the derivatives of the basis functions.
+  dm_product(work_block, dm, nbasis, npoint, work_dm, dgemm);
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* row = work_dm + ipoint*nbasis;
+    for (long i=0; i < 3; i++) {
+      output[ipoint*3 + i] += 2*row_dot(row, work_block + ((i+1)*npoint + ipoint)*nbasis,
+                                        nbasis);
+    }
+  }
+}
+
 void GB1DMGridGradientFn::compute_fock_from_pot(double* pot, double* work_basis,
                                                 long nbasis, double* fock) {
   // The functional derivative of the energy w.r.t. to the density gradient is given in
@@ -362,6 +567,23 @@ void GB1DMGridGradientFn::compute_fock_from_pot(double* pot, double* work_basis,
   }
 }
 
+void GB1DMGridGradientFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                      long nbasis, long npoint, double* work_pot,
+                                                      double* fock_half, dgemm_t dgemm) {
+  // The derivatives of the basis functions are contracted with the potential and
+  // combined with the basis function values.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* p = pot + ipoint*3;
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      work_pot[ipoint*nbasis + ibasis] =
+          p[0]*work_block[(npoint + ipoint)*nbasis + ibasis] +
+          p[1]*work_block[(2*npoint + ipoint)*nbasis + ibasis] +
+          p[2]*work_block[(3*npoint + ipoint)*nbasis + ibasis];
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, npoint, fock_half, dgemm);
+}
+
 
 /*
     GB1DMGridGGAFn
@@ -390,6 +612,22 @@ void GB1DMGridGGAFn::compute_point_from_dm(double* work_basis, double* dm, long
   output[3] += 2*rho_z;
 }
 
+void GB1DMGridGGAFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                           long npoint, double* output, double* work_dm,
+                                           dgemm_t dgemm) {
+  // Rows of the basis function values times the density matrix, dotted with the rows of
+  // the basis functions and their derivatives.
+  dm_product(work_block, dm, nbasis, npoint, work_dm, dgemm);
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* row = work_dm + ipoint*nbasis;
+    output[ipoint*4] += row_dot(row, work_block + ipoint*nbasis, nbasis);
+    for (long i=0; i < 3; i++) {
+      output[ipoint*4 + i + 1] += 2*row_dot(row, work_block + ((i+1)*npoint + ipoint)*nbasis,
+                                            nbasis);
+    }
+  }
+}
+
 void GB1DMGridGGAFn::compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                            double* fock) {
   // The functional derivative of the energy w.r.t. to the density and its gradient are
@@ -417,6 +655,24 @@ void GB1DMGridGGAFn::compute_fock_from_pot(double* pot, double* work_basis, long
   }
 }
 
+void GB1DMGridGGAFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                 long nbasis, long npoint, double* work_pot,
+                                                 double* fock_half, dgemm_t dgemm) {
+  // The basis functions and their derivatives are contracted with the potential and
+  // combined with the basis function values.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* p = pot + ipoint*4;
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      work_pot[ipoint*nbasis + ibasis] =
+          0.5*p[0]*work_block[ipoint*nbasis + ibasis] +
+          p[1]*work_block[(npoint + ipoint)*nbasis + ibasis] +
+          p[2]*work_block[(2*npoint + ipoint)*nbasis + ibasis] +
+          p[3]*work_block[(3*npoint + ipoint)*nbasis + ibasis];
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, npoint, fock_half, dgemm);
+}
+
 
 /*
     GB1DMGridKineticFn
@@ -487,6 +743,25 @@ void GB1DMGridKineticFn::compute_point_from_dm(double* work_basis, double* dm,
   *output += tau;
 }
 
+void GB1DMGridKineticFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                               long npoint, double* output, double* work_dm,
+                                               dgemm_t dgemm) {
+  // The derivatives of the basis functions toward x, y and z are each multiplied with
+  // the density matrix.
+  for (long i=0; i < 3; i++) {
+    dm_product(work_block + i*npoint*nbasis, dm, nbasis, npoint,
+               work_dm + i*npoint*nbasis, dgemm);
+  }
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    double tau = 0.0;
+    for (long i=0; i < 3; i++) {
+      tau += row_dot(work_dm + (i*npoint + ipoint)*nbasis,
+                     work_block + (i*npoint + ipoint)*nbasis, nbasis);
+    }
+    output[ipoint] += 0.5*tau;
+  }
+}
+
 void GB1DMGridKineticFn::compute_fock_from_pot(double* pot, double* work_basis,
                                                long nbasis, double* fock) {
   // The derivative of the energy w.r.t. the kinetic energy density in `point`, is given
@@ -506,6 +781,22 @@ void GB1DMGridKineticFn::compute_fock_from_pot(double* pot, double* work_basis,
   }
 }
 
+void GB1DMGridKineticFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                     long nbasis, long npoint, double* work_pot,
+                                                     double* fock_half, dgemm_t dgemm) {
+  // The derivatives of the basis functions are multiplied by a quarter of the potential.
+  for (long i=0; i < 3; i++) {
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+      double factor = 0.25*pot[ipoint];
+      for (long ibasis=0; ibasis < nbasis; ibasis++) {
+        long index = (i*npoint + ipoint)*nbasis + ibasis;
+        work_pot[index] = factor*work_block[index];
+      }
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, 3*npoint, fock_half, dgemm);
+}
+
 
 /*
     GB1DMGridHessianFn
@@ -640,6 +931,34 @@ void GB1DMGridHessianFn::compute_point_from_dm(double* work_basis, double* dm,
   output[5] += 2*rho_zz;
 }
 
+void GB1DMGridHessianFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                               long npoint, double* output, double* work_dm,
+                                               dgemm_t dgemm) {
+  // The basis functions and their first derivatives are multiplied with the density
+  // matrix. Components: 0=value, 1=x, 2=y, 3=z, 4=xx, 5=xy, 6=xz, 7=yy, 8=yz, 9=zz.
+  for (long i=0; i < 4; i++) {
+    dm_product(work_block + i*npoint*nbasis, dm, nbasis, npoint,
+               work_dm + i*npoint*nbasis, dgemm);
+  }
+  auto basis = [&](long i, long ipoint) {return work_block + (i*npoint + ipoint)*nbasis;};
+  auto prod = [&](long i, long ipoint) {return work_dm + (i*npoint + ipoint)*nbasis;};
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    double* out = output + ipoint*6;
+    out[0] += 2*(row_dot(prod(0, ipoint), basis(4, ipoint), nbasis) +
+                 row_dot(prod(1, ipoint), basis(1, ipoint), nbasis));
+    out[1] += 2*(row_dot(prod(0, ipoint), basis(5, ipoint), nbasis) +
+                 row_dot(prod(1, ipoint), basis(2, ipoint), nbasis));
+    out[2] += 2*(row_dot(prod(0, ipoint), basis(6, ipoint), nbasis) +
+                 row_dot(prod(1, ipoint), basis(3, ipoint), nbasis));
+    out[3] += 2*(row_dot(prod(0, ipoint), basis(7, ipoint), nbasis) +
+                 row_dot(prod(2, ipoint), basis(2, ipoint), nbasis));
+    out[4] += 2*(row_dot(prod(0, ipoint), basis(8, ipoint), nbasis) +
+                 row_dot(prod(2, ipoint), basis(3, ipoint), nbasis));
+    out[5] += 2*(row_dot(prod(0, ipoint), basis(9, ipoint), nbasis) +
+                 row_dot(prod(3, ipoint), basis(3, ipoint), nbasis));
+  }
+}
+
 void GB1DMGridHessianFn::compute_fock_from_pot(double* pot, double* work_basis,
                                                long nbasis, double* fock) {
   // The derivative of the energy w.r.t. the density Hessian matrix elements, evaluated in
@@ -672,6 +991,32 @@ void GB1DMGridHessianFn::compute_fock_from_pot(double* pot, double* work_basis,
   }
 }
 
+void GB1DMGridHessianFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                     long nbasis, long npoint, double* work_pot,
+                                                     double* fock_half, dgemm_t dgemm) {
+  // The second derivatives of the basis functions are contracted with the potential
+  // and combined with the basis function values. The first derivatives are contracted
+  // with the potential and combined with the first derivatives.
+  // Components: 0=value, 1=x, 2=y, 3=z, 4=xx, 5=xy, 6=xz, 7=yy, 8=yz, 9=zz.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* p = pot + ipoint*6;
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      double basis[10];
+      for (long i=0; i < 10; i++) basis[i] = work_block[(i*npoint + ipoint)*nbasis + ibasis];
+      work_pot[ipoint*nbasis + ibasis] =
+          p[0]*basis[4] + p[1]*basis[5] + p[2]*basis[6] +
+          p[3]*basis[7] + p[4]*basis[8] + p[5]*basis[9];
+      work_pot[(npoint + ipoint)*nbasis + ibasis] =
+          p[0]*basis[1] + p[1]*basis[2] + p[2]*basis[3];
+      work_pot[(2*npoint + ipoint)*nbasis + ibasis] =
+          p[1]*basis[1] + p[3]*basis[2] + p[4]*basis[3];
+      work_pot[(3*npoint + ipoint)*nbasis + ibasis] =
+          p[2]*basis[1] + p[4]*basis[2] + p[5]*basis[3];
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, 4*npoint, fock_half, dgemm);
+}
+
 
 /*
     GB1DMGridMGGAFn
@@ -777,6 +1122,31 @@ void GB1DMGridMGGAFn::compute_point_from_dm(double* work_basis, double* dm, long
   output[5] += 0.5*tau2;
 }
 
+void GB1DMGridMGGAFn::compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                            long npoint, double* output, double* work_dm,
+                                            dgemm_t dgemm) {
+  // The basis functions and their first derivatives are multiplied with the density
+  // matrix. Components: 0=value, 1=x, 2=y, 3=z, 4=Laplacian.
+  for (long i=0; i < 4; i++) {
+    dm_product(work_block + i*npoint*nbasis, dm, nbasis, npoint,
+               work_dm + i*npoint*nbasis, dgemm);
+  }
+  auto basis = [&](long i, long ipoint) {return work_block + (i*npoint + ipoint)*nbasis;};
+  auto prod = [&](long i, long ipoint) {return work_dm + (i*npoint + ipoint)*nbasis;};
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    double* out = output + ipoint*6;
+    const double* row = prod(0, ipoint);
+    double tau2 = 0.0;
+    out[0] += row_dot(row, basis(0, ipoint), nbasis);
+    for (long i=1; i < 4; i++) {
+      out[i] += 2*row_dot(row, basis(i, ipoint), nbasis);
+      tau2 += row_dot(prod(i, ipoint), basis(i, ipoint), nbasis);
+    }
+    out[4] += 2*row_dot(row, basis(4, ipoint), nbasis) + 2*tau2;
+    out[5] += 0.5*tau2;
+  }
+}
+
 void GB1DMGridMGGAFn::compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                             double* fock) {
   // The functional derivative of the energy w.r.t. density, its gradient, the kinetic
@@ -808,6 +1178,27 @@ void GB1DMGridMGGAFn::compute_fock_from_pot(double* pot, double* work_basis, lon
   }
 }
 
+void GB1DMGridMGGAFn::compute_block_fock_from_pot(double* pot, double* work_block,
+                                                  long nbasis, long npoint, double* work_pot,
+                                                  double* fock_half, dgemm_t dgemm) {
+  // Components: 0=value, 1=x, 2=y, 3=z, 4=Laplacian.
+  for (long ipoint=0; ipoint < npoint; ipoint++) {
+    const double* p = pot + ipoint*6;
+    double auxpot = 0.25*p[5] + p[4];
+    for (long ibasis=0; ibasis < nbasis; ibasis++) {
+      double basis[5];
+      for (long i=0; i < 5; i++) basis[i] = work_block[(i*npoint + ipoint)*nbasis + ibasis];
+      work_pot[ipoint*nbasis + ibasis] =
+          0.5*p[0]*basis[0] + p[1]*basis[1] + p[2]*basis[2] + p[3]*basis[3] +
+          p[4]*basis[4];
+      for (long i=1; i < 4; i++) {
+        work_pot[(i*npoint + ipoint)*nbasis + ibasis] = auxpot*basis[i];
+      }
+    }
+  }
+  fock_product(work_block, work_pot, nbasis, 4*npoint, fock_half, dgemm);
+}
+
 
 /*
     GB2DMGridFn
@@ -912,9 +1303,7 @@ void GB2DMGridHartreeFn::add(double coeff, double alpha0, double alpha1,
 
   // Fill the work array with the Boys function values
   arg = gamma*(pc[0]*pc[0] + pc[1]*pc[1] + pc[2]*pc[2]);
-  for (long nu=abs(shell_type0)+abs(shell_type1); nu >= 0; nu--) {
-    work_boys[nu] = boys_function(nu, arg);
-  }
+  boys_function_batch(abs(shell_type0) + abs(shell_type1), 1, &arg, work_boys);
 
   // Iterate over all combinations of Cartesian exponents
   i2p.reset(abs(shell_type0), abs(shell_type1));
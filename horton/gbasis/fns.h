@@ -39,8 +39,9 @@
     GB2GridFn functions requires double loop to compute properties of basis pairs of basis
     functions. See following methods in gbasis.h:
 
-        GOBasis::compute_grid2_dm
-        GOBasis::compute_grid_point2 (called by compute_grid2_dm)
+        GOBasis::compute_grid_point2
+
+    (GOBasis::compute_grid2_dm uses the faster ESPEngine of esp.h instead.)
 
     The methods `reset`, `add`, `cart_to_pure` and `compute_point_from_*` or
     `compute_fock_from_pot`, are called from functions in gbasis.cpp (GOBasis). For a
@@ -119,6 +120,7 @@
 #ifndef HORTON_GBASIS_FNS_H_
 #define HORTON_GBASIS_FNS_H_
 
+#include "horton/gbasis/blas.h"
 #include "horton/gbasis/calc.h"
 #include "horton/gbasis/common.h"
 #include "horton/gbasis/iter_pow.h"
@@ -220,6 +222,14 @@ class GB1ExpGridFn : public GB1GridFn  {
   GB1ExpGridFn(long max_shell_type, long nfn, long dim_work, long dim_output)
       : GB1GridFn(max_shell_type, dim_work, dim_output), nfn(nfn) {}
 
+  /** @brief
+        Return a new, independent instance with the same parameters.
+
+      The copy has its own work arrays, such that it can be used concurrently with
+      the original in another thread. The caller is responsible for deleting the copy.
+    */
+  virtual GB1ExpGridFn* clone() const = 0;
+
   /** @brief
         Compute (final) results for a given grid point.
 
@@ -239,6 +249,48 @@ class GB1ExpGridFn : public GB1GridFn  {
   virtual void compute_point_from_exp(double* work_basis, double* coeffs, long nbasis,
                                       double* output) = 0;
 
+  /** @brief
+        Compute the final results on a block of grid points.
+
+      Only the selected basis functions, i.e. those that are not negligible in the
+      block, are taken into account. The products with the orbital coefficients are
+      computed with dgemm for all points in the block at once. The default
+      implementation just calls compute_point_from_exp for every point.
+
+      @param work_block
+        Properties of basis functions computed for all grid points in the block, with
+        one row per point for each property. (size=dim_work*npoint*nbasis)
+
+      @param coeffs
+        The orbital expansion coefficients. (size=nbasis*nfn)
+
+      @param nbasis
+        The number of basis functions.
+
+      @param npoint
+        The number of grid points in the block.
+
+      @param nselect
+        The number of selected basis functions.
+
+      @param selected
+        The indexes of the selected basis functions. (size=nselect)
+
+      @param output
+        The output array for the grid points in the block. Results are added.
+        (size=npoint*dim_output)
+
+      @param work_exp
+        Work array.
+        (size=max(npoint*(nbasis + dim_output) + nbasis*dim_output, nbasis*dim_work))
+
+      @param dgemm
+        The BLAS dgemm routine.
+    */
+  virtual void compute_block_from_exp(double* work_block, double* coeffs, long nbasis,
+                                      long npoint, long nselect, const long* selected,
+                                      double* output, double* work_exp, dgemm_t dgemm);
+
  protected:
   long nfn;  //!< Number of orbitals (occupied and virtual).
 };
@@ -273,6 +325,11 @@ class GB1ExpGridOrbitalFn : public GB1ExpGridFn  {
       : GB1ExpGridFn(max_shell_type, nfn, 1, norb), poly_work{0.0}, offset(0),
         iorbs(iorbs), norb(norb) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1ExpGridFn* clone() const {
+    return new GB1ExpGridOrbitalFn(max_shell_type, nfn, iorbs, norb);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -286,6 +343,11 @@ class GB1ExpGridOrbitalFn : public GB1ExpGridFn  {
   virtual void compute_point_from_exp(double* work_basis, double* coeffs,
                                       long nbasis, double* output);
 
+  //! Compute the final results on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_exp(double* work_block, double* coeffs, long nbasis,
+                                      long npoint, long nselect, const long* selected,
+                                      double* output, double* work_exp, dgemm_t dgemm);
+
  protected:
   double poly_work[MAX_NCART_CUMUL];  //!< Work array with Cartesian polynomials.
   long offset;  //!< Offset for the polynomials for the density.
@@ -326,6 +388,11 @@ class GB1ExpGridOrbGradientFn : public GB1ExpGridFn  {
   explicit GB1ExpGridOrbGradientFn(long max_shell_type, long nfn, long* iorbs, long norb)
       : GB1ExpGridFn(max_shell_type, nfn, 3, norb*3), poly_work{0.0}, offset(0),
         offset_l1(0), offset_h1(0), iorbs(iorbs), norb(norb) {}
+
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1ExpGridFn* clone() const {
+    return new GB1ExpGridOrbGradientFn(max_shell_type, nfn, iorbs, norb);
+  }
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -340,6 +407,11 @@ class GB1ExpGridOrbGradientFn : public GB1ExpGridFn  {
   virtual void compute_point_from_exp(double* work_basis, double* coeffs,
                                       long nbasis, double* output);
 
+  //! Compute the final results on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_exp(double* work_block, double* coeffs, long nbasis,
+                                      long npoint, long nselect, const long* selected,
+                                      double* output, double* work_exp, dgemm_t dgemm);
+
  protected:
   long* iorbs;     //!< Array of indices of orbitals to be evaluated on grid.
   long norb;       //!< The number of elements in iorbs.
@@ -360,6 +432,14 @@ class GB1DMGridFn : public GB1GridFn  {
   GB1DMGridFn(long max_shell_type, long dim_work, long dim_output)
       : GB1GridFn(max_shell_type, dim_work, dim_output) {}
 
+  /** @brief
+        Return a new, independent instance with the same parameters.
+
+      The copy has its own work arrays, such that it can be used concurrently with
+      the original in another thread. The caller is responsible for deleting the copy.
+    */
+  virtual GB1DMGridFn* clone() const = 0;
+
   /** @brief
         Compute the final result on one grid point.
 
@@ -385,6 +465,42 @@ class GB1DMGridFn : public GB1GridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow) = 0;
 
+  /** @brief
+        Compute the final result on a block of grid points.
+
+      The products of the basis functions (and derivatives) with the density matrix are
+      computed with dgemm for all points in the block at once. The default
+      implementation just calls compute_point_from_dm for every point. The density
+      matrix must be symmetric.
+
+      @param work_block
+        Properties of basis functions computed for all grid points in the block, with
+        one row per point for each property. (size=dim_work*npoint*nbasis, i.e. the
+        transpose of work_basis for all points)
+
+      @param dm
+        The coefficients of the first-order density matrix. (size=nbasis*nbasis)
+
+      @param nbasis
+        The number of basis functions.
+
+      @param npoint
+        The number of grid points in the block.
+
+      @param output
+        The output array for the grid points in the block. Results are added.
+        (size=npoint*dim_output)
+
+      @param work_dm
+        Work array for products with the density matrix. (size=dim_work*npoint*nbasis)
+
+      @param dgemm
+        The BLAS dgemm routine.
+    */
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   /** @brief
         Add contribution to Fock matrix from one grid point.
 
@@ -409,6 +525,43 @@ class GB1DMGridFn : public GB1GridFn  {
     */
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock) = 0;
+
+  /** @brief
+        Add contribution to Fock matrix from a block of grid points.
+
+      The contribution is computed as a half product X, such that the actual Fock matrix
+      contribution is X + X^T. All grid points in the block are included with a single
+      dgemm call. The default implementation just calls compute_fock_from_pot for every
+      point, with half of the potential.
+
+      @param pot
+        The potential at all grid points in the block, already multiplied by the
+        integration weights. (size=npoint*dim_output)
+
+      @param work_block
+        Properties of basis functions computed for all grid points in the block, with
+        one row per point for each property. (size=dim_work*npoint*nbasis, i.e. the
+        transpose of work_basis for all points)
+
+      @param nbasis
+        The number of basis functions.
+
+      @param npoint
+        The number of grid points in the block.
+
+      @param work_pot
+        Work array for the basis functions multiplied by the potential.
+        (size=dim_work*npoint*nbasis)
+
+      @param fock_half
+        The half product X to which the result will be added. (size=nbasis*nbasis)
+
+      @param dgemm
+        The BLAS dgemm routine.
+    */
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
 };
 
 
@@ -431,6 +584,11 @@ class GB1DMGridDensityFn : public GB1DMGridFn  {
   explicit GB1DMGridDensityFn(long max_shell_type)
       : GB1DMGridFn(max_shell_type, 1, 1), poly_work{0.0}, offset(0) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridDensityFn(max_shell_type);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -444,10 +602,20 @@ class GB1DMGridDensityFn : public GB1DMGridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
 
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
+
  private:
   double poly_work[MAX_NCART_CUMUL];  //!< Work array with Cartesian polynomials.
   long offset;  //!< Offset for the polynomials for the density
@@ -493,6 +661,11 @@ class GB1DMGridGradientFn : public GB1DMGridFn  {
       : GB1DMGridFn(max_shell_type, 4, dim_output), poly_work{0.0}, offset(0),
         offset_l1(0), offset_h1(0) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridGradientFn(max_shell_type);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -506,10 +679,20 @@ class GB1DMGridGradientFn : public GB1DMGridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
 
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
+
  protected:
   double poly_work[MAX_NCART_CUMUL_D];  //!< Work array with Cartesian polynomials.
   long offset;     //!< Offset for the polynomials for the density
@@ -542,13 +725,28 @@ class GB1DMGridGGAFn : public GB1DMGridGradientFn  {
     */
   explicit GB1DMGridGGAFn(long max_shell_type): GB1DMGridGradientFn(max_shell_type, 4) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridGGAFn(max_shell_type);
+  }
+
   //! Compute the final result on one grid point. (See base class for details.)
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
+
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
 };
 
 
@@ -574,6 +772,11 @@ class GB1DMGridKineticFn : public GB1DMGridFn  {
       : GB1DMGridFn(max_shell_type, 3, 1), poly_work{0.0}, offset(0), offset_l1(0),
         offset_h1(0) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridKineticFn(max_shell_type);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -587,10 +790,20 @@ class GB1DMGridKineticFn : public GB1DMGridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
 
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
+
  private:
   double poly_work[MAX_NCART_CUMUL_D];  //!< Work array with Cartesian polynomials.
   long offset;     //!< Offset for the polynomials for the density.
@@ -633,6 +846,11 @@ class GB1DMGridHessianFn : public GB1DMGridFn  {
       : GB1DMGridFn(max_shell_type, 10, 6), poly_work{0.0}, offset(0),
         offset_l1(0), offset_h1(0), offset_l2(0), offset_h2(0) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridHessianFn(max_shell_type);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -646,10 +864,20 @@ class GB1DMGridHessianFn : public GB1DMGridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
 
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
+
  private:
   double poly_work[MAX_NCART_CUMUL_DD];  //!< Work array with Cartesian polynomials.
   long offset;     //!< Offset for the polynomials for the density.
@@ -690,6 +918,11 @@ class GB1DMGridMGGAFn : public GB1DMGridFn  {
       : GB1DMGridFn(max_shell_type, 5, 6), poly_work{0.0}, offset(0), offset_l1(0),
         offset_h1(0), offset_l2(0), offset_h2(0) {}
 
+  //! Return a new, independent instance. (See base class for details.)
+  virtual GB1DMGridFn* clone() const {
+    return new GB1DMGridMGGAFn(max_shell_type);
+  }
+
   //! Reset calculator for a new contraction. (See base class for details.)
   virtual void reset(long _shell_type0, const double* _r0, const double* _point);
 
@@ -703,10 +936,20 @@ class GB1DMGridMGGAFn : public GB1DMGridFn  {
   virtual void compute_point_from_dm(double* work_basis, double* dm, long nbasis,
                                      double* output, double epsilon, double* dmmaxrow);
 
+  //! Compute the final result on a block of grid points. (See base class for details.)
+  virtual void compute_block_from_dm(double* work_block, double* dm, long nbasis,
+                                     long npoint, double* output, double* work_dm,
+                                     dgemm_t dgemm);
+
   //! Add contribution to Fock matrix for one grid point. (See base class for details.)
   virtual void compute_fock_from_pot(double* pot, double* work_basis, long nbasis,
                                      double* fock);
 
+  //! Add contribution to Fock matrix for a block of grid points. (See base class for details.)
+  virtual void compute_block_fock_from_pot(double* pot, double* work_block, long nbasis,
+                                           long npoint, double* work_pot,
+                                           double* fock_half, dgemm_t dgemm);
+
  private:
   double poly_work[MAX_NCART_CUMUL_DD];  //!< Work array with Cartesian polynomials.
   long offset;     //!< Offset for the polynomials for the density.
@@ -23,14 +23,20 @@
 #ifdef DEBUG
 #include <cstdio>
 #endif
+#include <algorithm>
 #include <cmath>
 #include <cstdlib>
 #include <stdexcept>
 #include <cstdlib>
 #include <cstring>
+#include <memory>
+#include <vector>
 #include "horton/gbasis/gbasis.h"
 #include "horton/gbasis/common.h"
+#include "horton/gbasis/esp.h"
+#include "horton/gbasis/gridcache.h"
 #include "horton/gbasis/iter_gb.h"
+#include "horton/gbasis/parallel.h"
 using std::abs;
 
 /*
@@ -61,7 +67,8 @@ const double gob_pure_normalization(const double alpha, const long l) {
 GBasis::GBasis(const double* centers, const long* shell_map, const long* nprims,
                const long* shell_types, const double* alphas, const double* con_coeffs,
                const long ncenter, const long nshell, const long nprim_total) :
-    nbasis(0), nscales(0), max_shell_type(0),
+    nbasis(0), nscales(0), max_shell_type(0), nthread(1), grid_tolerance(1e-20),
+    pair_threshold(1e-20),
     centers(centers), shell_map(shell_map), nprims(nprims),
     shell_types(shell_types), alphas(alphas), con_coeffs(con_coeffs),
     ncenter(ncenter), nshell(nshell), nprim_total(nprim_total)
@@ -118,6 +125,10 @@ GBasis::GBasis(const double* centers, const long* shell_map, const long* nprims,
     // scales
     scales = new double[nscales];
     scales_offsets = new long[nprim_total];
+
+    // shell_radii: computed after the normalization constants are known.
+    shell_radii = new double[nshell];
+    std::fill(shell_radii, shell_radii + nshell, HUGE_VAL);
 }
 
 GBasis::~GBasis() {
@@ -126,6 +137,7 @@ GBasis::~GBasis() {
     delete[] shell_lookup;
     delete[] scales;
     delete[] scales_offsets;
+    delete[] shell_radii;
 }
 
 void GBasis::init_scales() {
@@ -147,40 +159,515 @@ void GBasis::init_scales() {
     }
 }
 
+void GBasis::init_shell_radii() {
+    for (long ishell=0; ishell < nshell; ishell++) {
+        shell_radii[ishell] = 0.0;
+        if (grid_tolerance <= 0) {
+            shell_radii[ishell] = HUGE_VAL;
+            continue;
+        }
+        const long shell_type = abs(shell_types[ishell]);
+        const long nscale = get_shell_nbasis(shell_type);
+        for (long iprim=0; iprim < nprims[ishell]; iprim++) {
+            const long oprim = prim_offsets[ishell] + iprim;
+            const double alpha = alphas[oprim];
+            if (alpha <= 0) {
+                shell_radii[ishell] = HUGE_VAL;
+                break;
+            }
+            // Largest prefactor of all Cartesian functions in the primitive.
+            const double* prim_scales = get_scales(oprim);
+            double prefac = 0.0;
+            for (long iscale=0; iscale < nscale; iscale++) {
+                prefac = std::max(prefac, fabs(con_coeffs[oprim]*prim_scales[iscale]));
+            }
+            // Solve prefac*r^l*exp(-alpha*r^2) = grid_tolerance for the outermost
+            // root r with a fixed-point iteration, starting beyond the maximum.
+            double r = sqrt(0.5*shell_type/alpha);
+            if (prefac*pow(r, shell_type)*exp(-alpha*r*r) < grid_tolerance) continue;
+            r = std::max(r, sqrt(log(prefac/grid_tolerance)/alpha));
+            for (long irep=0; irep < 20; irep++) {
+                r = sqrt((log(prefac/grid_tolerance) + shell_type*log(r))/alpha);
+            }
+            shell_radii[ishell] = std::max(shell_radii[ishell], r);
+        }
+    }
+}
+
+void GBasis::set_grid_tolerance(double grid_tolerance) {
+    if (grid_tolerance < 0) {
+        throw std::domain_error("The grid tolerance must not be negative.");
+    }
+    this->grid_tolerance = grid_tolerance;
+    init_shell_radii();
+}
+
+void GBasis::set_pair_threshold(double pair_threshold) {
+    if (pair_threshold < 0) {
+        throw std::domain_error("The pair threshold must not be negative.");
+    }
+    this->pair_threshold = pair_threshold;
+    shell_pairs.reset();
+}
+
+const GBShellPairs* GBasis::get_shell_pairs() {
+    // The centers may have been changed in place since the table was built.
+    if (!shell_pairs || !shell_pairs->has_centers(centers))
+        shell_pairs.reset(new GBShellPairs(this, pair_threshold));
+    return shell_pairs.get();
+}
+
+long GBasis::select_grid_shells(long npoint, const double* points, long* shells) const {
+    // Bounding sphere of the points.
+    double center[3] = {0.0, 0.0, 0.0};
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+        for (long i=0; i < 3; i++) center[i] += points[3*ipoint + i]/npoint;
+    }
+    double radius_sq = 0.0;
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+        radius_sq = std::max(radius_sq, dist_sq(center, points + 3*ipoint));
+    }
+    const double radius = sqrt(radius_sq);
+    // Keep shells whose cutoff sphere overlaps with the bounding sphere.
+    long nshell_select = 0;
+    for (long ishell=0; ishell < nshell; ishell++) {
+        const double max_dist = radius + shell_radii[ishell];
+        if (dist_sq(center, centers + 3*shell_map[ishell]) < max_dist*max_dist) {
+            shells[nshell_select] = ishell;
+            nshell_select++;
+        }
+    }
+    return nshell_select;
+}
+
+void GBasis::set_nthread(long nthread) {
+    if (nthread < 1) {
+        throw std::domain_error("The number of threads must be strictly positive.");
+    }
+    this->nthread = nthread;
+}
+
 void GBasis::compute_two_index(double* output, GB2Integral* integral) {
-    IterGB2 iter = IterGB2(this);
-    iter.update_shell();
-    do {
-        integral->reset(iter.shell_type0, iter.shell_type1, iter.r0, iter.r1);
-        iter.update_prim();
+    // The first thread uses the given integral object, all others get a clone.
+    const long nworker = (nthread < nshell) ? nthread : nshell;
+    std::vector<std::unique_ptr<GB2Integral> > clones;
+    std::vector<GB2Integral*> integrals(1, integral);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB2Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+    }
+
+    // Each task covers all pairs with the same first shell, starting with
+    // the longest rows. Every pair is written to a different part of the
+    // output, so the threads never write to the same element.
+    // Integrals with several components are stored as a series of (nbasis, nbasis)
+    // blocks.
+    const GBShellPairs* prim_pairs = get_shell_pairs();
+    const long dim_work = integral->get_dim_work();
+    const long nbasis = get_nbasis();
+    parallel_for(nworker, nshell, [&](long ithread, long itask) {
+        const long ishell0 = nshell - 1 - itask;
+        GB2Integral* integral = integrals[ithread];
+        IterGB2 iter = IterGB2(this);
+        iter.set_shell(ishell0, 0);
         do {
-            integral->add(iter.con_coeff, iter.alpha0, iter.alpha1, iter.scales0, iter.scales1);
-        } while (iter.inc_prim());
-        integral->cart_to_pure();
-        iter.store(integral->get_work(), output);
-    } while (iter.inc_shell());
+            prim_pairs->compute_pair(integral, iter.ishell0, iter.ishell1);
+            const long nblock = get_shell_nbasis(integral->get_shell_type0())*
+                                get_shell_nbasis(integral->get_shell_type1());
+            for (long iwork=0; iwork < dim_work; iwork++) {
+                iter.store(integral->get_work() + iwork*nblock, output + iwork*nbasis*nbasis);
+            }
+        } while (iter.inc_shell() && (iter.ishell0 == ishell0));
+    });
 }
 
-void GBasis::compute_four_index(double* output, GB4Integral* integral) {
-    IterGB4 iter = IterGB4(this);
-    iter.update_shell();
-    do {
-        integral->reset(iter.shell_type0, iter.shell_type1, iter.shell_type2, iter.shell_type3,
-                        iter.r0, iter.r1, iter.r2, iter.r3);
-        iter.update_prim();
+/*
+    Make a list of all pairs of the first two shells of the symmetry-unique
+    quartets, in reverse order, such that the most expensive tasks come first.
+*/
+static std::vector<long> get_leading_pairs(long nshell) {
+    std::vector<long> pairs;
+    for (long ishell0=nshell-1; ishell0 >= 0; ishell0--) {
+        for (long ishell1=ishell0; ishell1 >= 0; ishell1--) {
+            pairs.push_back(ishell0);
+            pairs.push_back(ishell1);
+        }
+    }
+    return pairs;
+}
+
+long GBasis::compute_four_index(double* output, GB4Integral* integral,
+                                const double* bounds, double threshold, bool packed) {
+    const std::vector<long> pairs = get_leading_pairs(nshell);
+    const long npair = pairs.size()/2;
+
+    // The first thread uses the given integral object, all others get a clone.
+    const long nworker = (nthread < npair) ? nthread : npair;
+    std::vector<std::unique_ptr<GB4Integral> > clones;
+    std::vector<GB4Integral*> integrals(1, integral);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB4Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+    }
+
+    // Screened quartets are stored as zeros, such that no garbage is left
+    // behind in the output array.
+    std::vector<double> zeros;
+    if (bounds != NULL) zeros.resize(integral->get_nwork(), 0.0);
+    std::vector<long> nskips(nworker, 0);
+    const GBShellPairs* prim_pairs = get_shell_pairs();
+
+    // Each task covers all symmetry-unique quartets with the same first two
+    // shells. No two quartets write to the same element in the output.
+    parallel_for(nworker, npair, [&](long ithread, long itask) {
+        const long ishell0 = pairs[2*itask];
+        const long ishell1 = pairs[2*itask + 1];
+        GB4Integral* integral = integrals[ithread];
+        IterGB4 iter = IterGB4(this);
+        iter.set_shell(ishell0, ishell1, 0, 0);
         do {
-            integral->add(iter.con_coeff, iter.alpha0, iter.alpha1, iter.alpha2, iter.alpha3,
-                          iter.scales0, iter.scales1, iter.scales2, iter.scales3);
-        } while (iter.inc_prim());
-        integral->cart_to_pure();
-        iter.store(integral->get_work(), output);
-    } while (iter.inc_shell());
+            // The quartet <01|23> corresponds to (02|13) in chemist notation.
+            if ((bounds != NULL) &&
+                (bounds[iter.ishell0*nshell + iter.ishell2]*
+                 bounds[iter.ishell1*nshell + iter.ishell3] < threshold)) {
+                if (packed) {
+                    iter.store_packed(zeros.data(), output);
+                } else {
+                    iter.store(zeros.data(), output);
+                }
+                nskips[ithread]++;
+                continue;
+            }
+            prim_pairs->compute_quartet(integral, iter.ishell0, iter.ishell1, iter.ishell2, iter.ishell3);
+            if (packed) {
+                iter.store_packed(integral->get_work(), output);
+            } else {
+                iter.store(integral->get_work(), output);
+            }
+        } while (iter.inc_shell() && (iter.ishell0 == ishell0) && (iter.ishell1 == ishell1));
+    });
+
+    long nskip = 0;
+    for (long ithread=0; ithread < nworker; ithread++) nskip += nskips[ithread];
+    return nskip;
+}
+
+// The eight permutations of the indexes of <01|23> with the same value, in
+// the same order as in IterGB4::store.
+static const int eri_permutations[8][4] = {
+    {0, 1, 2, 3}, {1, 0, 3, 2}, {2, 3, 0, 1}, {3, 2, 1, 0},
+    {0, 3, 2, 1}, {1, 2, 3, 0}, {2, 1, 0, 3}, {3, 0, 1, 2},
+};
+
+long GBasis::compute_four_index_jk(GB4Integral* integral, long ndm, const double* dms,
+                                   double* directs, double* exchanges,
+                                   const double* bounds, double threshold) {
+    const std::vector<long> pairs = get_leading_pairs(nshell);
+    const long npair = pairs.size()/2;
+    const long nbasis_sq = nbasis*nbasis;
+
+    // Largest absolute density matrix element for every pair of shells, made
+    // symmetric, such that it can be used in the screening.
+    std::vector<double> dmmax;
+    if (bounds != NULL) {
+        dmmax.resize(nshell*nshell, 0.0);
+        for (long idm=0; idm < ndm; idm++) {
+            for (long ibasis0=0; ibasis0 < nbasis; ibasis0++) {
+                for (long ibasis1=0; ibasis1 < nbasis; ibasis1++) {
+                    const double value = fabs(dms[idm*nbasis_sq + ibasis0*nbasis + ibasis1]);
+                    const long ishell0 = shell_lookup[ibasis0];
+                    const long ishell1 = shell_lookup[ibasis1];
+                    if (value > dmmax[ishell0*nshell + ishell1]) {
+                        dmmax[ishell0*nshell + ishell1] = value;
+                        dmmax[ishell1*nshell + ishell0] = value;
+                    }
+                }
+            }
+        }
+    }
+
+    // The first thread uses the given integral object and writes directly to
+    // the output arrays. All others get a clone and private output arrays.
+    const long nworker = (nthread < npair) ? nthread : npair;
+    std::vector<std::unique_ptr<GB4Integral> > clones;
+    std::vector<GB4Integral*> integrals(1, integral);
+    std::vector<std::vector<double> > private_directs(nworker);
+    std::vector<std::vector<double> > private_exchanges(nworker);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB4Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+        if (directs != NULL) private_directs[ithread].resize(ndm*nbasis_sq, 0.0);
+        if (exchanges != NULL) private_exchanges[ithread].resize(ndm*nbasis_sq, 0.0);
+    }
+    std::vector<long> nskips(nworker, 0);
+    const GBShellPairs* prim_pairs = get_shell_pairs();
+
+    parallel_for(nworker, npair, [&](long ithread, long itask) {
+        const long ishell0 = pairs[2*itask];
+        const long ishell1 = pairs[2*itask + 1];
+        GB4Integral* integral = integrals[ithread];
+        double* my_directs = directs;
+        double* my_exchanges = exchanges;
+        if (ithread > 0) {
+            if (directs != NULL) my_directs = private_directs[ithread].data();
+            if (exchanges != NULL) my_exchanges = private_exchanges[ithread].data();
+        }
+        IterGB4 iter = IterGB4(this);
+        iter.set_shell(ishell0, ishell1, 0, 0);
+        do {
+            const long shells[4] = {iter.ishell0, iter.ishell1, iter.ishell2, iter.ishell3};
+            if (bounds != NULL) {
+                double dmmax_quartet = 0.0;
+                for (long i=0; i < 4; i++) {
+                    for (long j=0; j <= i; j++) {
+                        const double value = dmmax[shells[i]*nshell + shells[j]];
+                        if (value > dmmax_quartet) dmmax_quartet = value;
+                    }
+                }
+                // The quartet <01|23> corresponds to (02|13) in chemist notation.
+                if (bounds[iter.ishell0*nshell + iter.ishell2]*
+                    bounds[iter.ishell1*nshell + iter.ishell3]*dmmax_quartet < threshold) {
+                    nskips[ithread]++;
+                    continue;
+                }
+            }
+            prim_pairs->compute_quartet(integral, iter.ishell0, iter.ishell1, iter.ishell2, iter.ishell3);
+
+            // Contract every integral with the density matrices, once for
+            // every distinct element of the full four-index array it
+            // represents. When shells in the quartet coincide, several
+            // integrals in the quartet represent the same elements. Only the
+            // first of these, with the lowest indexes, is used.
+            const double* work = integral->get_work();
+            const long n0 = get_shell_nbasis(iter.shell_type0);
+            const long n1 = get_shell_nbasis(iter.shell_type1);
+            const long n2 = get_shell_nbasis(iter.shell_type2);
+            const long n3 = get_shell_nbasis(iter.shell_type3);
+            long indexes[4];
+            long elements[8][4];
+            for (long i0=0; i0 < n0; i0++) {
+            for (long i1=0; i1 < n1; i1++) {
+            for (long i2=0; i2 < n2; i2++) {
+            for (long i3=0; i3 < n3; i3++) {
+                const double value = *work;
+                work++;
+                if (value == 0.0) continue;
+                indexes[0] = iter.ibasis0 + i0;
+                indexes[1] = iter.ibasis1 + i1;
+                indexes[2] = iter.ibasis2 + i2;
+                indexes[3] = iter.ibasis3 + i3;
+                // Skip the integral when an equivalent one in this quartet
+                // comes first.
+                bool first = true;
+                for (long iperm=0; iperm < 8; iperm++) {
+                    long* el = elements[iperm];
+                    bool in_quartet = true;
+                    for (long i=0; i < 4; i++) {
+                        el[i] = indexes[eri_permutations[iperm][i]];
+                        in_quartet = in_quartet && (shell_lookup[el[i]] == shells[i]);
+                    }
+                    if (in_quartet && std::lexicographical_compare(el, el + 4, indexes, indexes + 4))
+                        first = false;
+                }
+                if (!first) continue;
+                for (long iperm=0; iperm < 8; iperm++) {
+                    const long* el = elements[iperm];
+                    // Skip elements that were already treated.
+                    bool seen = false;
+                    for (long jperm=0; (jperm < iperm) && !seen; jperm++) {
+                        seen = (el[0] == elements[jperm][0]) && (el[1] == elements[jperm][1]) &&
+                               (el[2] == elements[jperm][2]) && (el[3] == elements[jperm][3]);
+                    }
+                    if (seen) continue;
+                    for (long idm=0; idm < ndm; idm++) {
+                        const double* dm = dms + idm*nbasis_sq;
+                        if (my_directs != NULL)
+                            my_directs[idm*nbasis_sq + el[0]*nbasis + el[2]] +=
+                                value*dm[el[1]*nbasis + el[3]];
+                        if (my_exchanges != NULL)
+                            my_exchanges[idm*nbasis_sq + el[0]*nbasis + el[3]] +=
+                                value*dm[el[2]*nbasis + el[1]];
+                    }
+                }
+            }
+            }
+            }
+            }
+        } while (iter.inc_shell() && (iter.ishell0 == ishell0) && (iter.ishell1 == ishell1));
+    });
+
+    // Reduce the private outputs.
+    long nskip = nskips[0];
+    for (long ithread=1; ithread < nworker; ithread++) {
+        nskip += nskips[ithread];
+        for (long i=0; i < ndm*nbasis_sq; i++) {
+            if (directs != NULL) directs[i] += private_directs[ithread][i];
+            if (exchanges != NULL) exchanges[i] += private_exchanges[ithread][i];
+        }
+    }
+    return nskip;
 }
 
-void GBasis::compute_grid_point1(double* output, double* point, GB1GridFn* grid_fn) {
+void GBasis::compute_schwarz_bounds(double* output, GB4Integral* integral) {
+    const long nworker = (nthread < nshell) ? nthread : nshell;
+    std::vector<std::unique_ptr<GB4Integral> > clones;
+    std::vector<GB4Integral*> integrals(1, integral);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB4Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+    }
+
+    const GBShellPairs* prim_pairs = get_shell_pairs();
+    parallel_for(nworker, nshell, [&](long ithread, long itask) {
+        const long ishell0 = nshell - 1 - itask;
+        const long n0 = get_shell_nbasis(shell_types[ishell0]);
+        GB4Integral* integral = integrals[ithread];
+        for (long ishell1=0; ishell1 <= ishell0; ishell1++) {
+            // The quartet <00|11> corresponds to (01|01) in chemist notation.
+            prim_pairs->compute_quartet(integral, ishell0, ishell0, ishell1, ishell1);
+
+            // Take the largest diagonal element.
+            const double* work = integral->get_work();
+            const long n1 = get_shell_nbasis(shell_types[ishell1]);
+            double largest = 0.0;
+            for (long i0=0; i0 < n0; i0++) {
+                for (long i1=0; i1 < n1; i1++) {
+                    const double value = fabs(work[((i0*n0 + i0)*n1 + i1)*n1 + i1]);
+                    if (value > largest) largest = value;
+                }
+            }
+            output[ishell0*nshell + ishell1] = sqrt(largest);
+            output[ishell1*nshell + ishell0] = sqrt(largest);
+        }
+    });
+}
+
+/*
+    The unit function in the two- and three-center integrals: an s-type function
+    with a zero exponent and a unit normalization constant.
+*/
+static const double unit_scale = 1.0;
+
+void GBasis::compute_two_center(double* output, GB4Integral* integral) {
+    const long nworker = (nthread < nshell) ? nthread : nshell;
+    std::vector<std::unique_ptr<GB4Integral> > clones;
+    std::vector<GB4Integral*> integrals(1, integral);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB4Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+    }
+
+    // Each task covers all pairs with the same first shell, starting with the
+    // longest rows.
+    parallel_for(nworker, nshell, [&](long ithread, long itask) {
+        const long ishell0 = nshell - 1 - itask;
+        const long n0 = get_shell_nbasis(shell_types[ishell0]);
+        const double* r0 = centers + 3*shell_map[ishell0];
+        GB4Integral* integral = integrals[ithread];
+        for (long ishell1=0; ishell1 <= ishell0; ishell1++) {
+            const long n1 = get_shell_nbasis(shell_types[ishell1]);
+            const double* r1 = centers + 3*shell_map[ishell1];
+            // The quartet <01|uu> corresponds to (0u|1u) = (0|1) in chemist
+            // notation, where u is the unit function.
+            integral->reset(shell_types[ishell0], shell_types[ishell1], 0, 0, r0, r1, r0, r1);
+            for (long iprim0=prim_offsets[ishell0]; iprim0 < prim_offsets[ishell0] + nprims[ishell0]; iprim0++) {
+                for (long iprim1=prim_offsets[ishell1]; iprim1 < prim_offsets[ishell1] + nprims[ishell1]; iprim1++) {
+                    integral->add(con_coeffs[iprim0]*con_coeffs[iprim1], alphas[iprim0], alphas[iprim1],
+                                  0.0, 0.0, get_scales(iprim0), get_scales(iprim1), &unit_scale,
+                                  &unit_scale);
+                }
+            }
+            integral->cart_to_pure();
+
+            const double* work = integral->get_work();
+            for (long i0=0; i0 < n0; i0++) {
+                for (long i1=0; i1 < n1; i1++) {
+                    const long a = basis_offsets[ishell0] + i0;
+                    const long b = basis_offsets[ishell1] + i1;
+                    output[a*nbasis + b] = work[i0*n1 + i1];
+                    output[b*nbasis + a] = work[i0*n1 + i1];
+                }
+            }
+        }
+    });
+}
+
+void GBasis::compute_three_center(double* output, GBasis* auxbasis, GB4Integral* integral) {
+    const long nworker = (nthread < auxbasis->nshell) ? nthread : auxbasis->nshell;
+    std::vector<std::unique_ptr<GB4Integral> > clones;
+    std::vector<GB4Integral*> integrals(1, integral);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB4Integral>(integral->clone()));
+        integrals.push_back(clones.back().get());
+    }
+
+    // Each task covers all pairs of this basis for one auxiliary shell.
+    const GBShellPairs* prim_pairs = get_shell_pairs();
+    parallel_for(nworker, auxbasis->nshell, [&](long ithread, long ishellp) {
+        const long np = get_shell_nbasis(auxbasis->shell_types[ishellp]);
+        const double* rp = auxbasis->centers + 3*auxbasis->shell_map[ishellp];
+        const long beginp = auxbasis->get_prim_offsets()[ishellp];
+        const long endp = beginp + auxbasis->nprims[ishellp];
+        GB4Integral* integral = integrals[ithread];
+        for (long ishell0=0; ishell0 < nshell; ishell0++) {
+            const long n0 = get_shell_nbasis(shell_types[ishell0]);
+            const double* r0 = centers + 3*shell_map[ishell0];
+            for (long ishell1=0; ishell1 <= ishell0; ishell1++) {
+                const long n1 = get_shell_nbasis(shell_types[ishell1]);
+                const double* r1 = centers + 3*shell_map[ishell1];
+                // The quartet <p0|u1> corresponds to (pu|01) = (p|01) in
+                // chemist notation, where u is the unit function.
+                // The products of the primitives of shells 0 and 1 are taken
+                // from the table of this basis.
+                integral->reset(auxbasis->shell_types[ishellp], shell_types[ishell0], 0,
+                                shell_types[ishell1], rp, r0, rp, r1);
+                const GBPrimPair* begin01 = prim_pairs->get_pairs(ishell0, ishell1);
+                const GBPrimPair* end01 = begin01 + prim_pairs->get_npair(ishell0, ishell1);
+                for (long iprimp=beginp; iprimp < endp; iprimp++) {
+                    GBPrimPair pairpu;
+                    init_prim_pair(&pairpu, auxbasis->con_coeffs[iprimp], auxbasis->alphas[iprimp],
+                                   rp, 0.0, rp, auxbasis->get_scales(iprimp), &unit_scale);
+                    for (const GBPrimPair* pair01=begin01; pair01 < end01; pair01++) {
+                        integral->add_pairs(pairpu, *pair01);
+                    }
+                }
+                integral->cart_to_pure();
+
+                const double* work = integral->get_work();
+                for (long ip=0; ip < np; ip++) {
+                    double* slice = output + (auxbasis->get_basis_offsets()[ishellp] + ip)*nbasis*nbasis;
+                    for (long i0=0; i0 < n0; i0++) {
+                        for (long i1=0; i1 < n1; i1++) {
+                            const long a = basis_offsets[ishell0] + i0;
+                            const long b = basis_offsets[ishell1] + i1;
+                            slice[a*nbasis + b] = work[(ip*n0 + i0)*n1 + i1];
+                            slice[b*nbasis + a] = work[(ip*n0 + i0)*n1 + i1];
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+void GBasis::compute_grid_point1(double* output, double* point, GB1GridFn* grid_fn,
+                                 const long* shells, long nshell_select) {
     IterGB1 iter = IterGB1(this);
-    iter.update_shell();
-    do {
+    if (shells == NULL) {
+        iter.update_shell();
+        do {
+            grid_fn->reset(iter.shell_type0, iter.r0, point);
+            iter.update_prim();
+            do {
+                grid_fn->add(iter.con_coeff, iter.alpha0, iter.scales0);
+            } while (iter.inc_prim());
+            grid_fn->cart_to_pure();
+            iter.store(grid_fn->get_work(), output, grid_fn->get_dim_work());
+        } while (iter.inc_shell());
+        return;
+    }
+    for (long iselect=0; iselect < nshell_select; iselect++) {
+        iter.set_shell(shells[iselect]);
         grid_fn->reset(iter.shell_type0, iter.r0, point);
         iter.update_prim();
         do {
@@ -188,7 +675,7 @@ void GBasis::compute_grid_point1(double* output, double* point, GB1GridFn* grid_
         } while (iter.inc_prim());
         grid_fn->cart_to_pure();
         iter.store(grid_fn->get_work(), output, grid_fn->get_dim_work());
-    } while (iter.inc_shell());
+    }
 }
 
 double GBasis::compute_grid_point2(double* dm, double* point, GB2DMGridFn* grid_fn) {
@@ -213,6 +700,7 @@ GOBasis::GOBasis(const double* centers, const long* shell_map, const long* nprim
     GBasis(centers, shell_map, nprims, shell_types, alphas, con_coeffs,
     ncenter, nshell, nprim_total) {
     init_scales();
+    init_shell_radii();
 }
 
 const double GOBasis::normalization(const double alpha, const long* n) const {
@@ -255,6 +743,12 @@ void GOBasis::compute_multipole_moment(long* xyz, double* center, double* output
     compute_two_index(output, &integral);
 }
 
+void GOBasis::compute_multipole_moments(double* center, long lmax, double* output) {
+    GB2MultipoleMomentsIntegral integral = GB2MultipoleMomentsIntegral(get_max_shell_type(),
+                                                                       lmax, center);
+    compute_two_index(output, &integral);
+}
+
 void GOBasis::compute_electron_repulsion(double* output) {
   GB4ElectronRepulsionIntegralLibInt integral =
     GB4ElectronRepulsionIntegralLibInt(get_max_shell_type());
@@ -276,137 +770,317 @@ void GOBasis::compute_ralpha_repulsion(double* output, double alpha) {
     compute_four_index(output, &integral);
 }
 
-void GOBasis::compute_grid1_exp(long nfn, double* coeffs, long npoint, double* points,
-                                long norb, long* iorbs, double* output) {
-    // The work array contains the basis functions evaluated at the grid point,
-    // and optionally some of its derivatives.
-    GB1ExpGridOrbitalFn grid_fn = GB1ExpGridOrbitalFn(get_max_shell_type(), nfn, iorbs, norb);
+/*
+    Write the indexes of the basis functions in the given shells to basis. Returns the
+    number of basis functions.
+*/
+static long select_grid_basis(const GBasis* gbasis, long nshell_select, const long* shells,
+                              long* basis) {
+    long nselect = 0;
+    for (long iselect=0; iselect < nshell_select; iselect++) {
+        const long ishell = shells[iselect];
+        const long begin = gbasis->get_basis_offsets()[ishell];
+        const long end = begin + get_shell_nbasis(gbasis->shell_types[ishell]);
+        for (long ibasis=begin; ibasis < end; ibasis++) {
+            basis[nselect] = ibasis;
+            nselect++;
+        }
+    }
+    return nselect;
+}
 
-    long nwork = get_nbasis()*grid_fn.get_dim_work();
-    long dim_output = grid_fn.get_dim_output();
-    double* work_basis = new double[nwork];
+/*
+    Fill the work array of a block of points, shape (dim_work, npoint_block, nbasis), with
+    the basis functions computed by grid_fn. When a cache is given, the block is loaded
+    from the cache, if present, or stored in the cache after it is computed. The arrays
+    work and selected are used as scratch space, with sizes nbasis*dim_work and nbasis.
+*/
+static void compute_grid_block(GOBasis* basis, long npoint_block, double* points,
+                               GB1GridFn* grid_fn, long nshell_select, const long* shells,
+                               double* work, double* block, long iblock,
+                               GB1GridCache* cache, long* selected) {
+    const long nbasis = basis->get_nbasis();
+    const long dim_work = grid_fn->get_dim_work();
+    if ((cache != NULL) && cache->load(grid_fn, iblock, nbasis, block)) return;
+    for (long ipoint=0; ipoint < npoint_block; ipoint++) {
+        memset(work, 0, nbasis*dim_work*sizeof(double));
+        basis->compute_grid_point1(work, points + 3*ipoint, grid_fn, shells, nshell_select);
+        for (long ibasis=0; ibasis < nbasis; ibasis++) {
+            for (long iwork=0; iwork < dim_work; iwork++) {
+                block[(iwork*npoint_block + ipoint)*nbasis + ibasis] =
+                    work[ibasis*dim_work + iwork];
+            }
+        }
+    }
+    if (cache != NULL) {
+        const long nselect = select_grid_basis(basis, nshell_select, shells, selected);
+        cache->store(grid_fn, iblock, nbasis, nselect, selected, block);
+    }
+}
 
-    for (long ipoint=0; ipoint < npoint; ipoint++) {
-        // A) clear the basis functions.
-        memset(work_basis, 0, nwork*sizeof(double));
+/*
+    Evaluate a function of the orbital expansion coefficients on a grid, with one thread
+    for each grid_fn. When dgemm is given, the points are processed in blocks and the
+    orbital coefficients are multiplied with the selected basis functions of all points
+    in a block at once.
+*/
+static void compute_grid1_exp_threaded(GOBasis* basis, std::vector<GB1ExpGridFn*> grid_fns,
+                                       double* coeffs, long npoint, double* points,
+                                       double* output, dgemm_t dgemm) {
+    const long nbasis = basis->get_nbasis();
+    const long nwork = nbasis*grid_fns[0]->get_dim_work();
+    const long dim_output = grid_fns[0]->get_dim_output();
+    const long nblock = (npoint + grid_block_size - 1)/grid_block_size;
+    const bool blocked = (dgemm != NULL);
+    // Thread-private work arrays.
+    std::vector<double> work_basis(grid_fns.size()*nwork);
+    std::vector<long> shells(grid_fns.size()*basis->nshell);
+    std::vector<long> block_basis(blocked ? grid_fns.size()*nbasis : 0);
+    const long nwork_block = blocked ? grid_block_size*nwork : 0;
+    const long nwork_exp = blocked ? std::max(
+        grid_block_size*(nbasis + dim_output) + nbasis*dim_output, nwork) : 0;
+    std::vector<double> work_block(grid_fns.size()*nwork_block);
+    std::vector<double> work_exp(grid_fns.size()*nwork_exp);
 
-        // B) evaluate the basis functions in the current point.
-        compute_grid_point1(work_basis, points, &grid_fn);
+    parallel_for(grid_fns.size(), nblock, [&](long ithread, long iblock) {
+        GB1ExpGridFn* grid_fn = grid_fns[ithread];
+        double* work = work_basis.data() + ithread*nwork;
+        long* block_shells = shells.data() + ithread*basis->nshell;
+        const long ipoint0 = iblock*grid_block_size;
+        const long ipoint1 = std::min(ipoint0 + grid_block_size, npoint);
+        // Select the shells that are not negligible in this block of points.
+        const long nshell_select = basis->select_grid_shells(
+            ipoint1 - ipoint0, points + 3*ipoint0, block_shells);
 
-        // C) Use the basis function results and the density matrix to evaluate
-        // the function at the grid point. The result is added to the output.
-        grid_fn.compute_point_from_exp(work_basis, coeffs, get_nbasis(), output);
+        if (blocked) {
+            double* block = work_block.data() + ithread*nwork_block;
+            long* selected = block_basis.data() + ithread*nbasis;
+            compute_grid_block(basis, ipoint1 - ipoint0, points + 3*ipoint0, grid_fn,
+                               nshell_select, block_shells, work, block, iblock, NULL, NULL);
+            const long nselect = select_grid_basis(basis, nshell_select, block_shells,
+                                                   selected);
+            grid_fn->compute_block_from_exp(block, coeffs, nbasis, ipoint1 - ipoint0,
+                                            nselect, selected, output + ipoint0*dim_output,
+                                            work_exp.data() + ithread*nwork_exp, dgemm);
+            return;
+        }
 
-        // D) Prepare for next iteration
-        output += dim_output;
-        points += 3;
-    }
+        for (long ipoint=ipoint0; ipoint < ipoint1; ipoint++) {
+            // A) clear the basis functions.
+            memset(work, 0, nwork*sizeof(double));
+
+            // B) evaluate the basis functions in the current point.
+            basis->compute_grid_point1(work, points + 3*ipoint, grid_fn, block_shells,
+                                       nshell_select);
+
+            // C) Use the basis function results and the orbital coefficients to
+            // evaluate the function at the grid point.
+            grid_fn->compute_point_from_exp(work, coeffs, nbasis, output + ipoint*dim_output);
+        }
+    });
+}
 
-    delete[] work_basis;
+void GOBasis::compute_grid1_exp(long nfn, double* coeffs, long npoint, double* points,
+                                long norb, long* iorbs, double* output, dgemm_t dgemm) {
+    if (norb == 0) return;
+    // Every thread has its own grid function.
+    GB1ExpGridOrbitalFn grid_fn = GB1ExpGridOrbitalFn(get_max_shell_type(), nfn, iorbs, norb);
+    std::vector<std::unique_ptr<GB1ExpGridFn> > clones;
+    std::vector<GB1ExpGridFn*> grid_fns(1, &grid_fn);
+    for (long ithread=1; ithread < get_nthread(); ithread++) {
+        clones.push_back(std::unique_ptr<GB1ExpGridFn>(grid_fn.clone()));
+        grid_fns.push_back(clones.back().get());
+    }
+    compute_grid1_exp_threaded(this, grid_fns, coeffs, npoint, points, output, dgemm);
 }
 
 void GOBasis::compute_grid1_grad_exp(long nfn, double* coeffs, long npoint,
-                                     double* points, long norb, long* iorbs, double* output) {
-    // The work array contains the basis functions evaluated at the grid point,
-    // and optionally some of its derivatives.
+                                     double* points, long norb, long* iorbs, double* output,
+                                     dgemm_t dgemm) {
+    if (norb == 0) return;
+    // Every thread has its own grid function.
     GB1ExpGridOrbGradientFn grid_fn = GB1ExpGridOrbGradientFn(get_max_shell_type(),
                                                               nfn, iorbs, norb);
-
-    long nwork = get_nbasis()*grid_fn.get_dim_work();
-    long dim_output = grid_fn.get_dim_output();
-    double* work_basis = new double[nwork];
-
-    for (long ipoint=0; ipoint < npoint; ipoint++) {
-        // A) clear the basis functions.
-        memset(work_basis, 0, nwork*sizeof(double));
-
-        // B) evaluate the basis functions in the current point.
-        compute_grid_point1(work_basis, points, &grid_fn);
-
-        // C) Use the basis function results and the density matrix to evaluate
-        // the function at the grid point. The result is added to the output.
-        grid_fn.compute_point_from_exp(work_basis, coeffs, get_nbasis(), output);
-
-        // D) Prepare for next iteration
-        output += dim_output;
-        points += 3;
+    std::vector<std::unique_ptr<GB1ExpGridFn> > clones;
+    std::vector<GB1ExpGridFn*> grid_fns(1, &grid_fn);
+    for (long ithread=1; ithread < get_nthread(); ithread++) {
+        clones.push_back(std::unique_ptr<GB1ExpGridFn>(grid_fn.clone()));
+        grid_fns.push_back(clones.back().get());
     }
-
-    delete[] work_basis;
+    compute_grid1_exp_threaded(this, grid_fns, coeffs, npoint, points, output, dgemm);
 }
 
 void GOBasis::compute_grid1_dm(double* dm, long npoint, double* points,
                                GB1DMGridFn* grid_fn, double* output,
-                               double epsilon, double* dmmaxrow) {
-    // The work array contains the basis functions evaluated at the grid point,
-    // and optionally some of its derivatives.
-    long nwork = get_nbasis()*grid_fn->get_dim_work();
-    long dim_output = grid_fn->get_dim_output();
-    double* work_basis = new double[nwork];
+                               double epsilon, double* dmmaxrow, dgemm_t dgemm,
+                               GB1GridCache* cache) {
+    const long nbasis = get_nbasis();
+    const long dim_work = grid_fn->get_dim_work();
+    const long nwork = nbasis*dim_work;
+    const long dim_output = grid_fn->get_dim_output();
+    const long nblock = (npoint + grid_block_size - 1)/grid_block_size;
+    const bool blocked = (epsilon <= 0) && (dgemm != NULL);
+    if ((cache != NULL) && (cache->get_npoint() != npoint)) {
+        throw std::domain_error("The grid cache has a different number of points.");
+    }
 
-    for (long ipoint=0; ipoint < npoint; ipoint++) {
-        // A) clear the basis functions.
-        memset(work_basis, 0, nwork*sizeof(double));
+    // The first thread uses the given grid function, all others get a clone.
+    const long nworker = std::max(1L, std::min(get_nthread(), nblock));
+    std::vector<std::unique_ptr<GB1DMGridFn> > clones;
+    std::vector<GB1DMGridFn*> grid_fns(1, grid_fn);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB1DMGridFn>(grid_fn->clone()));
+        grid_fns.push_back(clones.back().get());
+    }
 
-        // B) evaluate the basis functions in the current point.
-        compute_grid_point1(work_basis, points, grid_fn);
-#ifdef DEBUG
-        for (int i=0; i<nwork; i++) printf("%f ", work_basis[i]);
-        printf("\n");
-#endif
+    // Thread-private work arrays. The work_basis array contains the basis functions
+    // evaluated at the grid point, and optionally some of its derivatives. In the blocked
+    // evaluation, the basis functions of a block of points are stored as (dim_work,
+    // nblock, nbasis) in work_block, such that the density matrix can be multiplied with
+    // all of them at once.
+    std::vector<double> work_basis(nworker*nwork);
+    std::vector<long> shells(nworker*nshell);
+    std::vector<long> block_basis((cache != NULL) ? nworker*nbasis : 0);
+    const long nwork_block = blocked ? grid_block_size*nwork : 0;
+    std::vector<double> work_block(nworker*nwork_block);
+    std::vector<double> work_dm(nworker*nwork_block);
 
-        // C) Use the basis function results and the density matrix to evaluate
-        // the function at the grid point. The result is added to the output.
-        grid_fn->compute_point_from_dm(work_basis, dm, get_nbasis(), output, epsilon, dmmaxrow);
+    parallel_for(nworker, nblock, [&](long ithread, long iblock) {
+        GB1DMGridFn* fn = grid_fns[ithread];
+        double* work = work_basis.data() + ithread*nwork;
+        long* block_shells = shells.data() + ithread*nshell;
+        const long ipoint0 = iblock*grid_block_size;
+        const long npoint_block = std::min(grid_block_size, npoint - ipoint0);
+        // Select the shells that are not negligible in this block of points.
+        const long nshell_select = select_grid_shells(npoint_block, points + 3*ipoint0,
+                                                      block_shells);
 
-        // D) Prepare for next iteration
-        output += dim_output;
-        points += 3;
-    }
+        if (blocked) {
+            double* block = work_block.data() + ithread*nwork_block;
+            compute_grid_block(this, npoint_block, points + 3*ipoint0, fn, nshell_select,
+                               block_shells, work, block, iblock, cache,
+                               block_basis.data() + ithread*nbasis);
+            fn->compute_block_from_dm(block, dm, nbasis, npoint_block,
+                                      output + ipoint0*dim_output,
+                                      work_dm.data() + ithread*nwork_block, dgemm);
+            return;
+        }
+
+        for (long ipoint=ipoint0; ipoint < ipoint0 + npoint_block; ipoint++) {
+            // A) clear the basis functions.
+            memset(work, 0, nwork*sizeof(double));
 
-    delete[] work_basis;
+            // B) evaluate the basis functions in the current point.
+            compute_grid_point1(work, points + 3*ipoint, fn, block_shells, nshell_select);
+
+            // C) Use the basis function results and the density matrix to evaluate
+            // the function at the grid point. The result is added to the output.
+            fn->compute_point_from_dm(work, dm, nbasis, output + ipoint*dim_output, epsilon,
+                                      dmmaxrow);
+        }
+    });
 }
 
-void GOBasis::compute_grid2_dm(double* dm, long npoint, double* points, double* output) {
+void GOBasis::compute_grid2_dm(double* dm, long npoint, double* points, double* output,
+                               double threshold, long lmax) {
     // For the moment, it is only possible to compute the Hartree potential on
     // a grid with this routine. Generalizations with electrical field and
     // other things are for later.
-    GB2DMGridHartreeFn grid_fn = GB2DMGridHartreeFn(get_max_shell_type());
+    ESPEngine engine(this, dm, threshold, lmax);
+    engine.compute(npoint, points, output, get_nthread());
+}
 
-    for (long ipoint=0; ipoint < npoint; ipoint++) {
-        *output += compute_grid_point2(dm, points, &grid_fn);
-        output++;
-        points += 3;
+void GOBasis::compute_grid1_fock(long npoint, double* points, double* weights, long pot_stride, double* pots, GB1DMGridFn* grid_fn, double* output, dgemm_t dgemm, GB1GridCache* cache) {
+    const long nbasis = get_nbasis();
+    const long dim_work = grid_fn->get_dim_work();
+    const long nwork = nbasis*dim_work;
+    const long dim_output = grid_fn->get_dim_output();
+    const long nblock = (npoint + grid_block_size - 1)/grid_block_size;
+    const bool blocked = (dgemm != NULL);
+    if ((cache != NULL) && (cache->get_npoint() != npoint)) {
+        throw std::domain_error("The grid cache has a different number of points.");
     }
-}
 
-void GOBasis::compute_grid1_fock(long npoint, double* points, double* weights, long pot_stride, double* pots, GB1DMGridFn* grid_fn, double* output) {
-    // The work array contains the basis functions evaluated at the grid point,
-    // and optionally some of its derivatives.
-    long nwork = get_nbasis()*grid_fn->get_dim_work();
-    double* work_basis = new double[nwork];
-    long dim_output = grid_fn->get_dim_output();
-    double* work_pot = new double[dim_output];
+    // The first thread uses the given grid function, all others get a clone.
+    const long nworker = std::max(1L, std::min(get_nthread(), nblock));
+    std::vector<std::unique_ptr<GB1DMGridFn> > clones;
+    std::vector<GB1DMGridFn*> grid_fns(1, grid_fn);
+    for (long ithread=1; ithread < nworker; ithread++) {
+        clones.push_back(std::unique_ptr<GB1DMGridFn>(grid_fn->clone()));
+        grid_fns.push_back(clones.back().get());
+    }
 
-    for (long ipoint=0; ipoint < npoint; ipoint++) {
-        // A) clear the work array.
-        memset(work_basis, 0, nwork*sizeof(double));
+    // Thread-private work arrays, see compute_grid1_dm. In the blocked evaluation, the
+    // contributions of all points in a block are accumulated in a half product, which
+    // is symmetrized at the end. Otherwise, the Fock matrix contributions are accumulated
+    // directly. Both are thread-private and reduced at the end.
+    std::vector<double> work_basis(nworker*nwork);
+    std::vector<long> shells(nworker*nshell);
+    std::vector<long> block_basis((cache != NULL) ? nworker*nbasis : 0);
+    const long nwork_block = blocked ? grid_block_size*nwork : 0;
+    std::vector<double> work_block(nworker*nwork_block);
+    std::vector<double> work_pot(nworker*std::max(nwork_block, dim_output));
+    std::vector<double> block_pots(nworker*grid_block_size*dim_output);
+    std::vector<double> focks(nworker*nbasis*nbasis, 0.0);
 
-        // B) evaluate the basis functions in the current point.
-        compute_grid_point1(work_basis, points, grid_fn);
+    parallel_for(nworker, nblock, [&](long ithread, long iblock) {
+        GB1DMGridFn* fn = grid_fns[ithread];
+        double* work = work_basis.data() + ithread*nwork;
+        long* block_shells = shells.data() + ithread*nshell;
+        double* fock = focks.data() + ithread*nbasis*nbasis;
+        const long ipoint0 = iblock*grid_block_size;
+        const long npoint_block = std::min(grid_block_size, npoint - ipoint0);
+        // Select the shells that are not negligible in this block of points.
+        const long nshell_select = select_grid_shells(npoint_block, points + 3*ipoint0,
+                                                      block_shells);
 
-        // C) Add the contribution from this grid point to the operator
-        for (long i=dim_output-1; i >= 0; i--) {
-            work_pot[i] = (*weights)*pots[i];
+        if (blocked) {
+            double* block = work_block.data() + ithread*nwork_block;
+            double* block_pot = block_pots.data() + ithread*grid_block_size*dim_output;
+            compute_grid_block(this, npoint_block, points + 3*ipoint0, fn, nshell_select,
+                               block_shells, work, block, iblock, cache,
+                               block_basis.data() + ithread*nbasis);
+            for (long ipoint=0; ipoint < npoint_block; ipoint++) {
+                double weight = weights[ipoint0 + ipoint];
+                double* pot = pots + (ipoint0 + ipoint)*pot_stride;
+                for (long i=0; i < dim_output; i++) {
+                    block_pot[ipoint*dim_output + i] = weight*pot[i];
+                }
+            }
+            fn->compute_block_fock_from_pot(block_pot, block, nbasis, npoint_block,
+                                            work_pot.data() + ithread*nwork_block, fock,
+                                            dgemm);
+            return;
         }
-        grid_fn->compute_fock_from_pot(work_pot, work_basis, get_nbasis(), output);
 
-        // D) Prepare for next iteration
-        points += 3;
-        weights++;
-        pots += pot_stride;
-    }
+        double* point_pot = work_pot.data() + ithread*dim_output;
+        for (long ipoint=ipoint0; ipoint < ipoint0 + npoint_block; ipoint++) {
+            // A) clear the work array.
+            memset(work, 0, nwork*sizeof(double));
+
+            // B) evaluate the basis functions in the current point.
+            compute_grid_point1(work, points + 3*ipoint, fn, block_shells, nshell_select);
 
-    delete[] work_basis;
-    delete[] work_pot;
+            // C) Add the contribution from this grid point to the operator
+            for (long i=dim_output-1; i >= 0; i--) {
+                point_pot[i] = weights[ipoint]*pots[ipoint*pot_stride + i];
+            }
+            fn->compute_fock_from_pot(point_pot, work, nbasis, fock);
+        }
+    });
+
+    // Reduction of the thread-private results.
+    for (long ithread=0; ithread < nworker; ithread++) {
+        const double* fock = focks.data() + ithread*nbasis*nbasis;
+        for (long ibasis0=0; ibasis0 < nbasis; ibasis0++) {
+            for (long ibasis1=0; ibasis1 < nbasis; ibasis1++) {
+                if (blocked) {
+                    output[ibasis0*nbasis + ibasis1] += fock[ibasis0*nbasis + ibasis1] +
+                                                        fock[ibasis1*nbasis + ibasis0];
+                } else {
+                    output[ibasis0*nbasis + ibasis1] += fock[ibasis0*nbasis + ibasis1];
+                }
+            }
+        }
+    }
 }
@@ -23,8 +23,11 @@
 #ifndef HORTON_GBASIS_GBASIS_H
 #define HORTON_GBASIS_GBASIS_H
 
+#include <memory>
 #include "horton/gbasis/ints.h"
 #include "horton/gbasis/fns.h"
+#include "horton/gbasis/gridcache.h"
+#include "horton/gbasis/shellpairs.h"
 
 
 const double gob_cart_normalization(const double alpha, const long* n);
@@ -41,6 +44,11 @@ class GBasis {
         double* scales;  // pre-computed normalization constants.
         long nbasis, nscales;
         long max_shell_type;
+        long nthread;  // number of threads used by the integral routines.
+        double grid_tolerance;  // basis functions below this value are neglected on grids.
+        double* shell_radii;  // distance beyond which each shell is negligible.
+        double pair_threshold;  // products of primitives below this overlap are neglected.
+        std::unique_ptr<GBShellPairs> shell_pairs;  // built on first use.
 
     public:
         // Arrays that fully describe the basis set.
@@ -58,9 +66,185 @@ class GBasis {
         virtual ~GBasis();
         virtual const double normalization(const double alpha, const long* n) const = 0;
         void init_scales();
+        void init_shell_radii();
         void compute_two_index(double* output, GB2Integral* integral);
-        void compute_four_index(double* output, GB4Integral* integral);
-        void compute_grid_point1(double* output, double* point, GB1GridFn* grid_fn);
+
+        /** @brief
+                Computes all symmetry-unique four-center integrals.
+
+            @param output
+                The output array with the integrals, shape (nbasis, nbasis,
+                nbasis, nbasis), in physicist notation. When packed is true,
+                the packed storage of packed.h is used instead.
+
+            @param integral
+                The four-center integral calculator.
+
+            @param bounds
+                Schwarz bounds for all pairs of shells, as computed with
+                compute_schwarz_bounds, shape (nshell, nshell). When NULL, no
+                screening is applied.
+
+            @param threshold
+                Shell quartets whose Schwarz bound is below this threshold are
+                not computed. The corresponding elements in the output are set
+                to zero.
+
+            @param packed
+                When true, only the symmetry-unique integrals are stored.
+
+            @return
+                The number of symmetry-unique shell quartets that were skipped.
+          */
+        long compute_four_index(double* output, GB4Integral* integral,
+                                const double* bounds = NULL, double threshold = 0.0,
+                                bool packed = false);
+
+        /** @brief
+                Computes Cauchy-Schwarz bounds for all pairs of shells.
+
+            For each pair of shells, a and b, the bound is the square root of
+            the largest (ab|ab) integral (chemist notation) over all pairs of
+            basis functions in these shells, such that |(ab|cd)| <=
+            bound[a, b]*bound[c, d]. This only holds for positive definite
+            interaction potentials.
+
+            @param output
+                The output array with the bounds, shape (nshell, nshell).
+
+            @param integral
+                The four-center integral calculator.
+          */
+        void compute_schwarz_bounds(double* output, GB4Integral* integral);
+
+        /** @brief
+                Contracts four-center integrals with density matrices on the fly.
+
+            Each symmetry-unique shell quartet is computed once and its
+            contributions to all direct and exchange operators are added
+            immediately. Only the density matrices and the outputs are kept
+            in memory. With the four-center integrals <ab|cd> in physicist
+            notation, the contractions are:
+
+                direct[a, c] += sum_bd <ab|cd> dm[b, d]
+                exchange[a, d] += sum_bc <ab|cd> dm[c, b]
+
+            @param integral
+                The four-center integral calculator.
+
+            @param ndm
+                The number of density matrices.
+
+            @param dms
+                The density matrices, shape (ndm, nbasis, nbasis).
+
+            @param directs
+                Output for the direct (Coulomb-like) operators, shape (ndm,
+                nbasis, nbasis). Results are added. May be NULL.
+
+            @param exchanges
+                Output for the exchange operators, shape (ndm, nbasis, nbasis).
+                Results are added. May be NULL.
+
+            @param bounds
+                Schwarz bounds for all pairs of shells, as computed with
+                compute_schwarz_bounds, shape (nshell, nshell). When NULL, no
+                screening is applied.
+
+            @param threshold
+                Shell quartets for which the product of the Schwarz bound and
+                the largest relevant density matrix element is below this
+                threshold, are skipped.
+
+            @return
+                The number of symmetry-unique shell quartets that were skipped.
+          */
+        long compute_four_index_jk(GB4Integral* integral, long ndm, const double* dms,
+                                   double* directs, double* exchanges,
+                                   const double* bounds = NULL, double threshold = 0.0);
+
+        /** @brief
+                Computes two-center integrals (P|Q) of a four-center integral.
+
+            The two-center integrals are computed as four-center integrals in
+            which the second function of each pair is a normalized s-type
+            function with a zero exponent, i.e. a constant function equal to
+            one. This is mainly useful for an auxiliary basis set in density
+            fitting.
+
+            @param output
+                The output array with the integrals, shape (nbasis, nbasis).
+
+            @param integral
+                The four-center integral calculator.
+          */
+        void compute_two_center(double* output, GB4Integral* integral);
+
+        /** @brief
+                Computes three-center integrals (P|ab) of a four-center integral.
+
+            P runs over the basis functions of an auxiliary basis, while a and
+            b are basis functions of this basis. The integrals are computed as
+            four-center integrals with a unit function, see
+            compute_two_center.
+
+            @param output
+                The output array with the integrals, shape (auxbasis.nbasis,
+                nbasis, nbasis).
+
+            @param auxbasis
+                The auxiliary basis set.
+
+            @param integral
+                The four-center integral calculator. It must support the
+                maximum shell type of both basis sets.
+          */
+        void compute_three_center(double* output, GBasis* auxbasis, GB4Integral* integral);
+
+        /** @brief
+                Evaluates (properties of) the basis functions in one grid point.
+
+            @param output
+                The output array, shape (nbasis, dim_work). Only the elements of
+                the selected shells are written.
+
+            @param point
+                Cartesian coordinates of the grid point.
+
+            @param grid_fn
+                The grid function that evaluates the basis functions.
+
+            @param shells
+                A list of shells to evaluate, e.g. as obtained with
+                select_grid_shells. When NULL, all shells are evaluated.
+
+            @param nshell_select
+                The number of elements in shells.
+          */
+        void compute_grid_point1(double* output, double* point, GB1GridFn* grid_fn,
+                                 const long* shells = NULL, long nshell_select = 0);
+
+        /** @brief
+                Selects the shells that are not negligible in a set of grid points.
+
+            A shell is selected when its center lies within the sum of its
+            cutoff radius (see get_shell_radii) and the radius of the bounding
+            sphere of the points.
+
+            @param npoint
+                The number of grid points.
+
+            @param points
+                Cartesian coordinates of the grid points, shape (npoint, 3).
+
+            @param shells
+                Output array for the selected shells, with at least nshell
+                elements.
+
+            @return
+                The number of selected shells.
+          */
+        long select_grid_shells(long npoint, const double* points, long* shells) const;
         double compute_grid_point2(double* dm, double* point, GB2DMGridFn* grid_fn);
 
         const long get_nbasis() const {return nbasis;}
@@ -70,6 +254,81 @@ class GBasis {
         const long* get_prim_offsets() const {return prim_offsets;}
         const long* get_shell_lookup() const {return shell_lookup;}
         const double* get_scales(long iprim) const {return scales + scales_offsets[iprim];}
+
+        /** @brief
+                The number of threads used to compute integrals and grid
+                properties. (Default is 1.)
+          */
+        const long get_nthread() const {return nthread;}
+
+        /** @brief
+                Set the number of threads used to compute integrals and grid
+                properties.
+
+            The shell pairs (two-index) or pairs of leading shells (four-index)
+            are distributed over the threads. Each thread uses its own copy of
+            the integral object. The results do not depend on the number of
+            threads. For grids, blocks of points are distributed over the
+            threads, each with its own copy of the grid function. Fock matrices
+            are accumulated per thread and summed at the end.
+
+            @param nthread
+                The number of threads, must be strictly positive.
+          */
+        void set_nthread(long nthread);
+
+        /** @brief
+                Basis functions smaller than this value are neglected on grids.
+                (Default is 1e-20.)
+          */
+        const double get_grid_tolerance() const {return grid_tolerance;}
+
+        /** @brief
+                Set the tolerance for the evaluation of basis functions on grids.
+
+            The cutoff radii of all shells are updated. A zero tolerance
+            disables the screening of shells on grids.
+
+            @param grid_tolerance
+                The new tolerance, must not be negative.
+          */
+        void set_grid_tolerance(double grid_tolerance);
+
+        /** @brief
+                The cutoff radius of each shell, shape (nshell,).
+
+            Beyond this distance from its center, all primitives in a shell,
+            including their contraction coefficient and normalization, are
+            smaller than the grid tolerance.
+          */
+        const double* get_shell_radii() const {return shell_radii;}
+
+        /** @brief
+                Products of primitives whose overlap is below this value are
+                neglected in all integrals. (Default is 1e-20.)
+          */
+        const double get_pair_threshold() const {return pair_threshold;}
+
+        /** @brief
+                Set the threshold for the screening of products of primitives.
+
+            The table of products, see get_shell_pairs, is rebuilt when it is
+            needed again. A zero threshold disables the screening.
+
+            @param pair_threshold
+                The new threshold, must not be negative.
+          */
+        void set_pair_threshold(double pair_threshold);
+
+        /** @brief
+                The table with products of primitives for all pairs of shells.
+
+            The table is constructed on the first call and reused afterwards,
+            unless the centers of the basis set have changed in the meantime.
+            This method is not thread-safe: it must be called before the work
+            is distributed over threads.
+          */
+        const GBShellPairs* get_shell_pairs();
 };
 
 
@@ -217,8 +476,57 @@ class GOBasis : public GBasis {
          */
         void compute_multipole_moment(long* xyz, double* center, double* output);
 
+        /** @brief
+                Computes all Cartesian multipole moment integrals up to a given order.
+
+            @param center
+                The location around which the moment integrals are computed.
+
+            @param lmax
+                The highest order of the multipole moments.
+
+            @param output
+                The output array with the integrals, with one (nbasis, nbasis) block
+                for each Cartesian component, including the overlap, ordered as in
+                horton.moments.get_cartesian_powers.
+         */
+        void compute_multipole_moments(double* center, long lmax, double* output);
+
+        /** @brief
+                Computes molecular orbitals on a grid.
+
+            When dgemm is given, the grid points are processed in blocks and the
+            orbital coefficients are multiplied with the non-negligible basis
+            functions of all points in a block at once.
+
+            @param nfn
+                The number of functions.
+
+            @param coeffs
+                The coefficients for the basisfunction expanion.
+
+            @param npoint
+                The number of grid points to be calculated.
+
+            @param points
+                The coordinates of grid points to be calculated.
+
+            @param norb
+                The number of orbitals to be calculated.
+
+            @param iorbs
+                The orbitals to be calculated.
+
+            @param output
+                The output array with the orbitals, shape=(npoint, norb). Results are
+                added.
+
+            @param dgemm
+                Pointer to the BLAS dgemm routine, or NULL.
+     */
         void compute_grid1_exp(long nfn, double* coeffs, long npoint, double* points,
-                               long norb, long* iorbs, double* output);
+                               long norb, long* iorbs, double* output,
+                               dgemm_t dgemm = NULL);
 
         /** @brief
                 Computes the gradient of the molecular orbital on a grid.
@@ -243,16 +551,119 @@ class GOBasis : public GBasis {
 
             @param output
                 The output array with the integrals.
+
+            @param dgemm
+                Pointer to the BLAS dgemm routine, or NULL. See compute_grid1_exp.
      */
         void compute_grid1_grad_exp(long nfn, double* coeffs, long npoint,
-                                    double* points, long norb, long* iorbs, double* output);
+                                    double* points, long norb, long* iorbs, double* output,
+                                    dgemm_t dgemm = NULL);
+    /** @brief
+            Evaluate a function of the density matrix on a grid.
+
+        When epsilon is zero and dgemm is given, the grid points are processed in
+        blocks and the density matrix is multiplied with all basis function values
+        of a block at once, with the BLAS routine dgemm. Otherwise, the points are
+        handled one by one, which allows screening with epsilon and dmmaxrow.
+
+        @param dm
+            The (symmetric) density matrix, shape=(nbasis, nbasis).
+
+        @param npoint
+            The number of grid points.
+
+        @param points
+            Cartesian coordinates of the grid points, shape=(npoint, 3).
+
+        @param grid_fn
+            The function to evaluate on the grid.
+
+        @param output
+            Results are added to this array, shape=(npoint, dim_output).
+
+        @param epsilon
+            Allowed error on the density for the sake of efficiency.
+
+        @param dmmaxrow
+            Maximum absolute value of each row of the density matrix.
+
+        @param dgemm
+            Pointer to the BLAS dgemm routine, or NULL.
+
+        @param cache
+            A cache for the basis functions on these grid points, or NULL. It is
+            only used in the blocked evaluation.
+     */
         void compute_grid1_dm(double* dm, long npoint, double* points,
                               GB1DMGridFn* grid_fn, double* output,
-                              double epsilon, double* dmmaxrow);
-        void compute_grid2_dm(double* dm, long npoint, double* points, double* output);
+                              double epsilon, double* dmmaxrow, dgemm_t dgemm = NULL,
+                              GB1GridCache* cache = NULL);
+    /** @brief
+            Add the Hartree potential of a density matrix on a grid.
+
+        The products of primitives are precomputed with an ESPEngine (see
+        esp.h), after which the grid points are processed in parallel blocks.
+
+        @param dm
+            The density matrix, assumed to be symmetric, shape=(nbasis, nbasis).
+
+        @param npoint
+            The number of grid points.
+
+        @param points
+            Cartesian grid points, shape=(npoint, 3).
+
+        @param output
+            Results are added to this array, shape=(npoint,).
+
+        @param threshold
+            Products of primitives with negligible prefactors are discarded.
+
+        @param lmax
+            The maximum order of the multipole expansion used for distant
+            points. When negative, no multipole expansion is used.
+     */
+        void compute_grid2_dm(double* dm, long npoint, double* points, double* output,
+                              double threshold = 0.0, long lmax = -1);
+    /** @brief
+            Add the Fock matrix of a potential on a grid.
+
+        When dgemm is given, the grid points are processed in blocks and the
+        contributions of all points in a block are added with a single dgemm call.
+        Otherwise, the contributions are added point by point.
+
+        @param npoint
+            The number of grid points.
+
+        @param points
+            Cartesian coordinates of the grid points, shape=(npoint, 3).
+
+        @param weights
+            Integration weights of the grid points, shape=(npoint,).
+
+        @param pot_stride
+            Distance between the potentials of consecutive grid points in pots.
+
+        @param pots
+            The derivatives of the energy toward the properties computed by grid_fn.
+
+        @param grid_fn
+            The function whose potential is converted into a Fock matrix.
+
+        @param output
+            The Fock matrix to which the result is added, shape=(nbasis, nbasis).
+
+        @param dgemm
+            Pointer to the BLAS dgemm routine, or NULL.
+
+        @param cache
+            A cache for the basis functions on these grid points, or NULL. It is
+            only used in the blocked evaluation.
+     */
         void compute_grid1_fock(long npoint, double* points, double* weights,
                                 long pot_stride, double* pots,
-                                GB1DMGridFn* grid_fn, double* output);
+                                GB1DMGridFn* grid_fn, double* output,
+                                dgemm_t dgemm = NULL, GB1GridCache* cache = NULL);
 };
 
 #endif  // HORTON_GBASIS_GBASIS_H_
@@ -22,6 +22,10 @@
 #cython: language_level=3
 
 cimport horton.gbasis.fns as fns
+cimport horton.gbasis.ints as ints
+cimport horton.gbasis.gridcache as gridcache
+cimport horton.gbasis.shellpairs as shellpairs
+from horton.gbasis.blas cimport dgemm_t
 
 cdef extern from "horton/gbasis/gbasis.h":
     double gob_cart_normalization(double alpha, long* n)
@@ -44,10 +48,27 @@ cdef extern from "horton/gbasis/gbasis.h":
         double* get_scales(long iprim)
         long* get_shell_lookup()
         long* get_basis_offsets()
+        long get_nthread()
+        void set_nthread(long nthread) except +
+        double get_grid_tolerance()
+        void set_grid_tolerance(double grid_tolerance) except +
+        double* get_shell_radii()
+        double get_pair_threshold()
+        void set_pair_threshold(double pair_threshold) except +
+        const shellpairs.GBShellPairs* get_shell_pairs() except +
 
         # low-level compute routines
         void compute_grid_point1(double* output, double* point, fns.GB1DMGridFn* grid_fn)
         double compute_grid_point2(double* dm, double* point, fns.GB2DMGridFn* grid_fn)
+        long compute_four_index(double* output, ints.GB4Integral* integral,
+                                double* bounds, double threshold, bint packed) except +
+        void compute_schwarz_bounds(double* output, ints.GB4Integral* integral) except +
+        long compute_four_index_jk(ints.GB4Integral* integral, long ndm, double* dms,
+                                   double* directs, double* exchanges,
+                                   double* bounds, double threshold) except +
+        void compute_two_center(double* output, ints.GB4Integral* integral) except +
+        void compute_three_center(double* output, GBasis* auxbasis,
+                                  ints.GB4Integral* integral) except +
 
     cdef cppclass GOBasis:
         GOBasis(double* centers, long* shell_map, long* nprims,
@@ -60,13 +81,14 @@ cdef extern from "horton/gbasis/gbasis.h":
         void compute_erf_attraction(double* charges, double* centers, long ncharge, double* output, double mu)
         void compute_gauss_attraction(double* charges, double* centers, long ncharge, double* output, double c, double alpha)
         void compute_multipole_moment(long* xyz, double* center, double* output)
+        void compute_multipole_moments(double* center, long lmax, double* output) except +
         void compute_electron_repulsion(double* output)
         void compute_erf_repulsion(double* output, double mu)
         void compute_gauss_repulsion(double* output, double c, double alpha)
         void compute_ralpha_repulsion(double* output, double alpha)
 
-        void compute_grid1_exp(long nfn, double* coeffs, long npoint, double* points, long norb, long* iorbs, double* output)
-        void compute_grid1_grad_exp(long nfn, double* coeffs, long npoint, double* points, long norb, long* iorbs, double* output)
-        void compute_grid1_dm(double* dm, long npoint, double* points, fns.GB1DMGridFn* grid_fn, double* output, double epsilon, double* dmmaxrow)
-        void compute_grid2_dm(double* dm, long npoint, double* points, double* output)
-        void compute_grid1_fock(long npoint, double* points, double* weights, long pot_stride, double* pots, fns.GB1DMGridFn* grid_fn, double* output)
+        void compute_grid1_exp(long nfn, double* coeffs, long npoint, double* points, long norb, long* iorbs, double* output, dgemm_t dgemm) except + nogil
+        void compute_grid1_grad_exp(long nfn, double* coeffs, long npoint, double* points, long norb, long* iorbs, double* output, dgemm_t dgemm) except + nogil
+        void compute_grid1_dm(double* dm, long npoint, double* points, fns.GB1DMGridFn* grid_fn, double* output, double epsilon, double* dmmaxrow, dgemm_t dgemm, gridcache.GB1GridCache* cache) except + nogil
+        void compute_grid2_dm(double* dm, long npoint, double* points, double* output, double threshold, long lmax) except + nogil
+        void compute_grid1_fock(long npoint, double* points, double* weights, long pot_stride, double* pots, fns.GB1DMGridFn* grid_fn, double* output, dgemm_t dgemm, gridcache.GB1GridCache* cache) except + nogil
@@ -21,10 +21,20 @@
 
 #include "horton/gbasis/gbw.h"
 #include "horton/gbasis/common.h"
+#include "horton/gbasis/parallel.h"
 
 GB4IntegralWrapper::GB4IntegralWrapper(GOBasis* gobasis, GB4Integral* gb4int) :
-    gobasis(gobasis), gb4int(gb4int)
+    gobasis(gobasis), gb4int(gb4int), shell_pairs(gobasis->get_shell_pairs()),
+    gb4ints(1, gb4int)
 {
+  // The first thread uses the given integral object, all others get a clone.
+  nworker = (gobasis->get_nthread() < gobasis->nshell) ?
+            gobasis->get_nthread() : gobasis->nshell;
+  for (long ithread = 1; ithread < nworker; ithread++) {
+    clones.push_back(std::unique_ptr<GB4Integral>(gb4int->clone()));
+    gb4ints.push_back(clones.back().get());
+  }
+
   max_shell_size = get_shell_nbasis(gobasis->get_max_shell_type());
   slice_size = gobasis->get_nbasis()*gobasis->get_nbasis();
   /*
@@ -40,42 +50,6 @@ GB4IntegralWrapper::~GB4IntegralWrapper() {
   delete[] integrals;
 }
 
-void GB4IntegralWrapper::compute_shell(long ishell1, long ishell3)
-{
-  // Configure the four-center integral with the right input for this
-  // quadruple of shells. (index0 and index2 are fixed.)
-  gb4int->reset(gobasis->shell_types[ishell0], gobasis->shell_types[ishell1],
-                gobasis->shell_types[ishell2], gobasis->shell_types[ishell3],
-                gobasis->centers + gobasis->shell_map[ishell0]*3, gobasis->centers + gobasis->shell_map[ishell1]*3,
-                gobasis->centers + gobasis->shell_map[ishell2]*3, gobasis->centers + gobasis->shell_map[ishell3]*3);
-
-  // Quadruple loop over all primitives for these four shells.
-  for (long iprim0 = 0; iprim0 < gobasis->nprims[ishell0]; iprim0++) {
-    for (long iprim1 = 0; iprim1 < gobasis->nprims[ishell1]; iprim1++) {
-      for (long iprim2 = 0; iprim2 < gobasis->nprims[ishell2]; iprim2++) {
-        for (long iprim3 = 0; iprim3 < gobasis->nprims[ishell3]; iprim3++) {
-          gb4int->add(gobasis->con_coeffs[gobasis->get_prim_offsets()[ishell0] + iprim0]*
-                      gobasis->con_coeffs[gobasis->get_prim_offsets()[ishell1] + iprim1]*
-                      gobasis->con_coeffs[gobasis->get_prim_offsets()[ishell2] + iprim2]*
-                      gobasis->con_coeffs[gobasis->get_prim_offsets()[ishell3] + iprim3],
-                      gobasis->alphas[gobasis->get_prim_offsets()[ishell0] + iprim0],
-                      gobasis->alphas[gobasis->get_prim_offsets()[ishell1] + iprim1],
-                      gobasis->alphas[gobasis->get_prim_offsets()[ishell2] + iprim2],
-                      gobasis->alphas[gobasis->get_prim_offsets()[ishell3] + iprim3],
-                      gobasis->get_scales(gobasis->get_prim_offsets()[ishell0] + iprim0),
-                      gobasis->get_scales(gobasis->get_prim_offsets()[ishell1] + iprim1),
-                      gobasis->get_scales(gobasis->get_prim_offsets()[ishell2] + iprim2),
-                      gobasis->get_scales(gobasis->get_prim_offsets()[ishell3] + iprim3));
-        }
-      }
-    }
-  }
-
-  // Convert to pure functions if needed.
-  gb4int->cart_to_pure();
-}
-
-
 void GB4IntegralWrapper::select_2index(long index0, long index2,
                             long* pbegin0, long* pend0,
                             long* pbegin2, long* pend2) {
@@ -90,17 +64,27 @@ void GB4IntegralWrapper::select_2index(long index0, long index2,
   *pend2 = *pbegin2 + get_shell_nbasis(gobasis->shell_types[ishell2]);
 }
 
-void GB4IntegralWrapper::compute() {
-  // Double loop over second and fourth shell of the four-index object. The
-  // entire range over these two indexes is included in the 2-index slices.
-  for (long ishell1 = 0; ishell1 < gobasis->nshell; ishell1++) {
+void GB4IntegralWrapper::get_shell_range(long ishell, long* pbegin, long* pend) {
+  *pbegin = gobasis->get_basis_offsets()[ishell];
+  *pend = *pbegin + get_shell_nbasis(gobasis->shell_types[ishell]);
+}
+
+void GB4IntegralWrapper::compute(const bool* mask) {
+  // Loop over second and fourth shell of the four-index object. The entire
+  // range over these two indexes is included in the 2-index slices. Each task
+  // covers one second shell, such that the threads write to different columns.
+  parallel_for(nworker, gobasis->nshell, [&](long ithread, long ishell1) {
+    GB4Integral* integral = gb4ints[ithread];
     for (long ishell3 = 0; ishell3 < gobasis->nshell; ishell3++) {
+      // Skip pairs of shells that are screened out.
+      if ((mask != NULL) && !mask[ishell1*gobasis->nshell + ishell3]) continue;
+
       // Compute integrals for the given combination of shells.
-      compute_shell(ishell1, ishell3);
+      shell_pairs->compute_quartet(integral, ishell0, ishell1, ishell2, ishell3);
 
       // Copy data from work array to ``integrals``, the temporary storage of
       // this wrapper.
-      const double* tmp = gb4int->get_work();
+      const double* tmp = integral->get_work();
       const long n0 = get_shell_nbasis(gobasis->shell_types[ishell0]);
       const long n1 = get_shell_nbasis(gobasis->shell_types[ishell1]);
       const long n2 = get_shell_nbasis(gobasis->shell_types[ishell2]);
@@ -118,21 +102,20 @@ void GB4IntegralWrapper::compute() {
         }
       }
     }
-  }
+  });
 }
 
 void GB4IntegralWrapper::compute_diagonal(double* diagonal) {
-  // Double loop over second and fourth shell of the four-index object. The
-  // entire range over these two indexes is included in the 2-index slices.
-  for (long ishell1 = 0; ishell1 < gobasis->nshell; ishell1++) {
+  // Loop over second and fourth shell of the four-index object. The entire
+  // range over these two indexes is included in the 2-index slices.
+  parallel_for(nworker, gobasis->nshell, [&](long ithread, long ishell1) {
+    GB4Integral* integral = gb4ints[ithread];
     for (long ishell3 = 0; ishell3 < gobasis->nshell; ishell3++) {
       // Compute integrals for the given combination of shells.
-      ishell0 = ishell1;
-      ishell2 = ishell3;
-      compute_shell(ishell1, ishell3);
+      shell_pairs->compute_quartet(integral, ishell1, ishell1, ishell3, ishell3);
 
       // copy data from work array to the output array.
-      const double* tmp = gb4int->get_work();
+      const double* tmp = integral->get_work();
       const long n1 = get_shell_nbasis(gobasis->shell_types[ishell1]);
       const long n3 = get_shell_nbasis(gobasis->shell_types[ishell3]);
       for (long i1=0; i1<n1; i1++) {
@@ -142,7 +125,7 @@ void GB4IntegralWrapper::compute_diagonal(double* diagonal) {
         }
       }
     }
-  }
+  });
 }
 
 double* GB4IntegralWrapper::get_2index_slice(long index0, long index2) {
@@ -23,6 +23,8 @@
 #ifndef GBW_H
 #define GBW_H
 
+#include <memory>
+#include <vector>
 #include "horton/gbasis/gbasis.h"
 #include "horton/gbasis/ints.h"
 
@@ -30,26 +32,29 @@
     @brief
         A wrapper around a four-center integral implementation that is suitable
         for a Cholesky algorithm.
+
+    The integrals are computed in parallel with the number of threads of the
+    basis set at the time of construction. Each thread gets its own clone of
+    the four-center integral object. The products of primitives are taken from
+    the table of the basis set, see GBasis::get_shell_pairs.
 */
 class GB4IntegralWrapper {
     private:
         GOBasis* gobasis;
         GB4Integral* gb4int;
+        const GBShellPairs* shell_pairs;
         long max_shell_size;
         long slice_size;
         double* integrals;
+        long nworker;
+        std::vector<std::unique_ptr<GB4Integral> > clones;
+        std::vector<GB4Integral*> gb4ints;
 
         long ishell0;
         long ishell2;
         long begin0; // beginning of the basis indexes for shell0
         long begin2; // beginning of the basis indexes for shell2
 
-        /**
-            @brief
-                Compute four-center integrals for a quadruplet of shells
-                (defined by ishell0, ishell1, ishell2 and ishell3).
-        */
-        void compute_shell(long ishell1, long ishell3);
     public:
         /**
             @brief
@@ -71,6 +76,27 @@ class GB4IntegralWrapper {
         */
         long get_nbasis() {return gobasis->get_nbasis();}
 
+        /**
+            @brief
+                The number of shells.
+        */
+        long get_nshell() {return gobasis->nshell;}
+
+        /**
+            @brief
+                Get the range of basis indexes of a shell.
+
+            @param ishell
+                The index of the shell.
+
+            @param pbegin
+                Output argument. The first basis index of the shell.
+
+            @param pend
+                Output argument. The end (non-inclusive) of the range.
+        */
+        void get_shell_range(long ishell, long* pbegin, long* pend);
+
         /**
             @brief
                 Select a pair of shells to which a pair of basis indexes belong.
@@ -107,8 +133,14 @@ class GB4IntegralWrapper {
             @brief
                 Compute four-center integrals for the slices selected with
                 the select_2index method.
+
+            @param mask
+                When given, an array of size nshell*nshell. Only the columns of
+                the slices for the pairs of shells (second and fourth index)
+                for which the mask is true are computed. The other columns are
+                left untouched. When NULL, all columns are computed.
         */
-        void compute();
+        void compute(const bool* mask = NULL);
 
         /**
             @brief
@@ -0,0 +1,95 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+#include <algorithm>
+#include <stdexcept>
+#include "horton/gbasis/gridcache.h"
+
+
+GB1GridCache::GB1GridCache(long npoint, long max_size)
+    : npoint(npoint), nblock((npoint + grid_block_size - 1)/grid_block_size),
+      max_size(max_size), size(0) {
+    if (npoint < 0) {
+        throw std::domain_error("The number of grid points must not be negative.");
+    }
+    if (max_size < 0) {
+        throw std::domain_error("The maximum size of the cache must not be negative.");
+    }
+}
+
+GB1GridCache::Table* GB1GridCache::get_table(GB1GridFn* grid_fn) {
+    std::lock_guard<std::mutex> lock(mutex);
+    Table& table = tables[std::type_index(typeid(*grid_fn))];
+    if (table.stored.empty()) {
+        table.stored.assign(nblock, 0);
+        table.basis.resize(nblock);
+        table.values.resize(nblock);
+    }
+    return &table;
+}
+
+long GB1GridCache::get_npoint_block(long iblock) const {
+    return std::min(grid_block_size, npoint - iblock*grid_block_size);
+}
+
+bool GB1GridCache::load(GB1GridFn* grid_fn, long iblock, long nbasis,
+                        double* block) {
+    const Table* table = get_table(grid_fn);
+    if (!table->stored[iblock]) return false;
+    const std::vector<long>& basis = table->basis[iblock];
+    const double* values = table->values[iblock].data();
+    const long nselect = basis.size();
+    const long nrow = grid_fn->get_dim_work()*get_npoint_block(iblock);
+    std::fill(block, block + nrow*nbasis, 0.0);
+    for (long irow=0; irow < nrow; irow++) {
+        for (long iselect=0; iselect < nselect; iselect++) {
+            block[irow*nbasis + basis[iselect]] = values[irow*nselect + iselect];
+        }
+    }
+    return true;
+}
+
+void GB1GridCache::store(GB1GridFn* grid_fn, long iblock, long nbasis, long nselect,
+                         const long* basis, const double* block) {
+    Table* table = get_table(grid_fn);
+    if (table->stored[iblock]) return;
+    const long nrow = grid_fn->get_dim_work()*get_npoint_block(iblock);
+    // Reserve space. When the block does not fit, the reservation is undone.
+    const long block_size = nrow*nselect;
+    if (size.fetch_add(block_size) + block_size > max_size) {
+        size -= block_size;
+        return;
+    }
+    table->basis[iblock].assign(basis, basis + nselect);
+    std::vector<double>& values = table->values[iblock];
+    values.resize(block_size);
+    for (long irow=0; irow < nrow; irow++) {
+        for (long iselect=0; iselect < nselect; iselect++) {
+            values[irow*nselect + iselect] = block[irow*nbasis + basis[iselect]];
+        }
+    }
+    table->stored[iblock] = 1;
+}
+
+void GB1GridCache::clear() {
+    std::lock_guard<std::mutex> lock(mutex);
+    tables.clear();
+    size = 0;
+}
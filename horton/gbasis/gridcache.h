@@ -0,0 +1,147 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Cache for basis functions evaluated on a grid
+
+#ifndef HORTON_GBASIS_GRIDCACHE_H
+#define HORTON_GBASIS_GRIDCACHE_H
+
+#include <atomic>
+#include <map>
+#include <mutex>
+#include <typeindex>
+#include <vector>
+#include "horton/gbasis/fns.h"
+
+
+// Number of grid points that are processed together in the compute_grid1_* methods.
+// The shells that are not negligible are selected once for every block. The blocks are
+// also the tasks that are distributed over the threads and the units of GB1GridCache.
+const long grid_block_size = 256;
+
+
+/**
+    @brief
+        Keeps basis functions (and derivatives) evaluated on a fixed grid.
+
+    The cache stores the work arrays of the blocked grid routines in GOBasis,
+    i.e. the results of GB1GridFn::add for all basis functions and all points
+    in one block. Only the basis functions of the shells that are not
+    negligible in a block are stored. Blocks are stored as long as the total
+    size remains below the given maximum. All other blocks are recomputed
+    every time they are needed.
+
+    Every type of grid function has its own table of blocks, because each
+    type computes different derivatives of the basis functions. The cache
+    is only valid for one basis set and one set of grid points. The caller is
+    responsible for using the cache only with those.
+*/
+class GB1GridCache {
+    private:
+        struct Table {
+            std::vector<char> stored;
+            std::vector<std::vector<long> > basis;  // selected basis functions
+            std::vector<std::vector<double> > values;  // (dim_work, npoint, nselect)
+        };
+        long npoint;
+        long nblock;
+        long max_size;
+        std::atomic<long> size;
+        std::map<std::type_index, Table> tables;
+        std::mutex mutex;
+
+        //! Return the table for the type of grid_fn, a new one when needed.
+        Table* get_table(GB1GridFn* grid_fn);
+
+    public:
+        /**
+            @brief
+                Construct an empty cache.
+
+            @param npoint
+                The number of grid points.
+
+            @param max_size
+                The maximum number of values (doubles) to be stored.
+          */
+        GB1GridCache(long npoint, long max_size);
+
+        /**
+            @brief
+                Copy a block from the cache into a dense work array.
+
+            @param grid_fn
+                The grid function that computed the block.
+
+            @param iblock
+                The index of the block.
+
+            @param nbasis
+                The number of basis functions.
+
+            @param block
+                The output array, shape (dim_work, npoint_block, nbasis).
+                Basis functions that are not stored are set to zero.
+
+            @return
+                True when the block was found in the cache. Otherwise, block is
+                not modified.
+          */
+        bool load(GB1GridFn* grid_fn, long iblock, long nbasis, double* block);
+
+        /**
+            @brief
+                Copy a block from a dense work array into the cache, if it fits.
+
+            @param grid_fn
+                The grid function that computed the block.
+
+            @param iblock
+                The index of the block.
+
+            @param nbasis
+                The number of basis functions.
+
+            @param nselect
+                The number of basis functions to store.
+
+            @param basis
+                The indexes of the basis functions to store, shape (nselect,).
+
+            @param block
+                The work array, shape (dim_work, npoint_block, nbasis).
+          */
+        void store(GB1GridFn* grid_fn, long iblock, long nbasis, long nselect,
+                   const long* basis, const double* block);
+
+        //! Remove all blocks from the cache.
+        void clear();
+
+        //! The number of grid points.
+        long get_npoint() const {return npoint;}
+        //! The number of points in a block.
+        long get_npoint_block(long iblock) const;
+        //! The maximum number of values stored.
+        long get_max_size() const {return max_size;}
+        //! The number of values stored.
+        long get_size() const {return size;}
+};
+
+#endif  // HORTON_GBASIS_GRIDCACHE_H
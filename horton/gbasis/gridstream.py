@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Evaluation of many orbitals on large grids, streamed block by block."""
+
+
+import numpy as np
+
+from horton.grid.cext import UniformGrid
+
+
+__all__ = ['stream_grid_orbitals']
+
+
+def _iter_grid_blocks(grid, blocksize):
+    """Iterate over blocks of grid points.
+
+    Parameters
+    ----------
+    grid : np.ndarray, shape=(npoint, 3), dtype=float or UniformGrid
+        Cartesian grid points. The points of a uniform grid are generated one block
+        at a time, in the same order as the data in a cube file.
+    blocksize : int
+        The number of points in one block.
+
+    Yields
+    ------
+    begin, end, points
+        The range of the block and the Cartesian coordinates of its points.
+    """
+    if isinstance(grid, UniformGrid):
+        shape = tuple(grid.shape)
+        npoint = np.prod(shape)
+        for begin in range(0, npoint, blocksize):
+            end = min(begin + blocksize, npoint)
+            indexes = np.array(np.unravel_index(np.arange(begin, end), shape)).T
+            yield begin, end, grid.origin + np.dot(indexes, grid.grid_rvecs)
+    else:
+        for begin in range(0, grid.shape[0], blocksize):
+            end = min(begin + blocksize, grid.shape[0])
+            yield begin, end, np.ascontiguousarray(grid[begin:end], dtype=float)
+
+
+def stream_grid_orbitals(obasis, orb, grid, iorbs, output=None, gradient=False,
+                         memory=1e8):
+    """Compute orbitals, or their gradients, on a grid and write them block by block.
+
+    The grid points are processed in blocks that fit in a given memory budget. For
+    every block, all requested orbitals are computed at once with a matrix product
+    of the non-negligible basis functions and the orbital coefficients. Each block
+    is written to the output with ``output[begin:end] = values``, such that the
+    orbitals on the full grid never have to be kept in memory.
+
+    Parameters
+    ----------
+    obasis : GOBasis
+        The orbital basis.
+    orb : Orbitals
+        The orbitals.
+    grid : np.ndarray, shape=(npoint, 3), dtype=float or UniformGrid
+        The grid points. The points of a UniformGrid are ordered as the data in a
+        cube file and they are generated block by block.
+    iorbs : np.ndarray, shape=(n,), dtype=int
+        Indexes of the orbitals to be computed.
+    output
+        Any object that supports assignment to slices along the first axis and that
+        has a ``shape`` attribute, e.g. an np.memmap, an h5py.Dataset or a
+        :class:`horton.io.cube.CubeWriter`. The shape must be (npoint, n) for the
+        orbitals and (npoint, n, 3) for the gradients. When not given, an array is
+        allocated.
+    gradient : bool
+        When True, the gradients of the orbitals are computed instead.
+    memory : float
+        The maximal size of the results for one block of points, in bytes.
+
+    Returns
+    -------
+    output
+        The output, which is allocated when not given.
+    """
+    iorbs = np.asarray(iorbs, dtype=int)
+    if isinstance(grid, UniformGrid):
+        npoint = np.prod(grid.shape)
+    else:
+        npoint = grid.shape[0]
+    shape = (npoint, len(iorbs), 3) if gradient else (npoint, len(iorbs))
+    if output is None:
+        output = np.zeros(shape)
+    elif tuple(output.shape) != shape:
+        raise TypeError('The output does not have the right shape.')
+    blocksize = max(1, int(memory//(8*(np.prod(shape[1:]) + 3))))
+    for begin, end, points in _iter_grid_blocks(grid, blocksize):
+        if gradient:
+            values = obasis.compute_grid_orb_gradient_exp(orb, points, iorbs)
+        else:
+            values = obasis.compute_grid_orbitals_exp(orb, points, iorbs)
+        output[begin:end] = values
+    return output
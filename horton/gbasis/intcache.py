@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Persistent cache for integrals that are reused in several runs."""
+
+
+import hashlib
+import os
+
+import numpy as np
+
+from horton.io.lockedh5 import LockedH5File
+
+
+__all__ = ['IntegralCache']
+
+
+class IntegralCache(object):
+    """A directory with integrals, shared by several runs and processes.
+
+    Every entry is stored in a ``.npy`` file, whose name is a hash of the basis set
+    (centers, shells, exponents, contraction coefficients and the screening
+    threshold for products of primitives) and of the type of integrals with all its
+    parameters. The sizes of the entries and the order in which they were last used
+    are kept in an index file, ``index.h5``. All access goes through a
+    :class:`horton.io.lockedh5.LockedH5File`, such that several processes can use
+    the same cache. When the total size exceeds a limit, the least recently used
+    entries are removed.
+
+    An instance can be assigned to the ``integral_cache`` attribute of a
+    :class:`GOBasis`.
+    """
+
+    def __init__(self, dirname, maxsize=1e10):
+        """Initialize an IntegralCache.
+
+        Parameters
+        ----------
+        dirname : str
+            The directory with the cache. It is created when it does not exist.
+        maxsize : float
+            The maximal total size of all entries, in bytes. Arrays that are larger
+            are never stored.
+        """
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.dirname = dirname
+        self.maxsize = maxsize
+
+    def _open_index(self):
+        """Open and lock the index file."""
+        return LockedH5File(os.path.join(self.dirname, 'index.h5'), 'a', count=100, wait=0.1)
+
+    def _get_fn(self, digest):
+        """Return the file name of an entry."""
+        return os.path.join(self.dirname, '%s.npy' % digest)
+
+    def get_digest(self, obasis, key):
+        """Return the hash that identifies a set of integrals.
+
+        Parameters
+        ----------
+        obasis : GOBasis
+            The basis set.
+        key : tuple
+            The type of integrals and all its parameters. Arrays, e.g. with the
+            positions of point charges, are hashed with their contents.
+        """
+        sha = hashlib.sha1()
+        sha.update(obasis.__class__.__name__.encode())
+        for array in (obasis.centers, obasis.shell_map, obasis.nprims, obasis.shell_types,
+                      obasis.alphas, obasis.con_coeffs, [obasis.pair_threshold]):
+            array = np.asarray(array)
+            sha.update(str(array.dtype).encode())
+            sha.update(str(array.shape).encode())
+            sha.update(np.ascontiguousarray(array).tobytes())
+        for item in key:
+            if hasattr(item, 'shape'):
+                array = np.asarray(item)
+                sha.update(str(array.shape).encode())
+                sha.update(np.ascontiguousarray(array, dtype=float).tobytes())
+            else:
+                sha.update(repr(item).encode())
+        return sha.hexdigest()
+
+    def load(self, obasis, key):
+        """Return integrals from the cache, or None when they are not present.
+
+        Parameters
+        ----------
+        obasis : GOBasis
+            The basis set.
+        key : tuple
+            See ``get_digest``.
+        """
+        digest = self.get_digest(obasis, key)
+        with self._open_index() as f:
+            if digest not in f:
+                return None
+            clock = f.attrs.get('clock', 0) + 1
+            f.attrs['clock'] = clock
+            f[digest].attrs['last_used'] = clock
+            return np.load(self._get_fn(digest))
+
+    def store(self, obasis, key, array):
+        """Add integrals to the cache, removing old entries if needed.
+
+        Parameters
+        ----------
+        obasis : GOBasis
+            The basis set.
+        key : tuple
+            See ``get_digest``.
+        array : np.ndarray
+            The integrals.
+        """
+        array = np.asarray(array)
+        if array.nbytes > self.maxsize:
+            return
+        digest = self.get_digest(obasis, key)
+        with self._open_index() as f:
+            fn = self._get_fn(digest)
+            with open(fn + '.tmp', 'wb') as fnpy:
+                np.save(fnpy, array)
+            os.rename(fn + '.tmp', fn)
+            clock = f.attrs.get('clock', 0) + 1
+            f.attrs['clock'] = clock
+            grp = f.require_group(digest)
+            grp.attrs['size'] = array.nbytes
+            grp.attrs['last_used'] = clock
+            self._evict(f)
+
+    def _evict(self, f):
+        """Remove the least recently used entries until the total size is small enough."""
+        entries = sorted((grp.attrs['last_used'], grp.attrs['size'], digest)
+                         for digest, grp in f.items())
+        total = sum(size for _last_used, size, _digest in entries)
+        for _last_used, size, digest in entries:
+            if total <= self.maxsize:
+                break
+            os.remove(self._get_fn(digest))
+            del f[digest]
+            total -= size
+
+    def _get_size(self):
+        '''The total size of all entries in the cache, in bytes'''
+        with self._open_index() as f:
+            return sum(grp.attrs['size'] for grp in f.values())
+
+    size = property(_get_size)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._open_index() as f:
+            for digest in list(f.keys()):
+                os.remove(self._get_fn(digest))
+                del f[digest]
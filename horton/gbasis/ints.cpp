@@ -48,6 +48,27 @@ using std::abs;
 */
 
 
+/*
+
+   GBPrimPair
+
+*/
+
+
+void init_prim_pair(GBPrimPair* pair, double coeff, double alpha0, const double* r0,
+                    double alpha1, const double* r1, const double* scales0,
+                    const double* scales1) {
+    pair->alpha0 = alpha0;
+    pair->alpha1 = alpha1;
+    pair->gamma = alpha0 + alpha1;
+    pair->gamma_inv = 1.0/pair->gamma;
+    compute_gpt_center(alpha0, r0, alpha1, r1, pair->gamma_inv, pair->center);
+    pair->prefac = coeff*exp(-alpha0*alpha1*pair->gamma_inv*dist_sq(r0, r1));
+    pair->scales0 = scales0;
+    pair->scales1 = scales1;
+}
+
+
 /*
 
    GB2Integral
@@ -55,8 +76,9 @@ using std::abs;
 */
 
 
-GB2Integral::GB2Integral(long max_shell_type): GBCalculator(max_shell_type) {
-    nwork = max_nbasis*max_nbasis;
+GB2Integral::GB2Integral(long max_shell_type, long dim_work)
+    : GBCalculator(max_shell_type), dim_work(dim_work) {
+    nwork = max_nbasis*max_nbasis*dim_work;
     work_cart = new double[nwork];
     work_pure = new double[nwork];
 }
@@ -78,6 +100,12 @@ void GB2Integral::reset(long _shell_type0, long _shell_type1, const double* _r0,
     memset(work_pure, 0, nwork*sizeof(double));
 }
 
+void GB2Integral::add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1) {
+    GBPrimPair pair;
+    init_prim_pair(&pair, coeff, alpha0, r0, alpha1, r1, scales0, scales1);
+    add_pair(pair);
+}
+
 void GB2Integral::cart_to_pure() {
     /*
        The initial results are always stored in work_cart. The projection
@@ -89,7 +117,7 @@ void GB2Integral::cart_to_pure() {
     // Project along index 0 (rows)
     if (shell_type0 < -1) {
         cart_to_pure_low(work_cart, work_pure, -shell_type0,
-            1, // anterior
+            dim_work, // anterior
             get_shell_nbasis(abs(shell_type1)) // posterior
         );
         swap_work();
@@ -98,7 +126,7 @@ void GB2Integral::cart_to_pure() {
     // Project along index 1 (cols)
     if (shell_type1 < -1) {
         cart_to_pure_low(work_cart, work_pure, -shell_type1,
-            get_shell_nbasis(shell_type0), // anterior
+            dim_work*get_shell_nbasis(shell_type0), // anterior
             1 // posterior
         );
         swap_work();
@@ -114,13 +142,12 @@ void GB2Integral::cart_to_pure() {
 */
 
 
-void GB2OverlapIntegral::add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1) {
-    double pre, gamma_inv;
-    double gpt_center[3];
-
-    gamma_inv = 1.0/(alpha0 + alpha1);
-    pre = coeff*exp(-alpha0*alpha1*gamma_inv*dist_sq(r0, r1));
-    compute_gpt_center(alpha0, r0, alpha1, r1, gamma_inv, gpt_center);
+void GB2OverlapIntegral::add_pair(const GBPrimPair& pair) {
+    const double pre = pair.prefac;
+    const double gamma_inv = pair.gamma_inv;
+    const double* gpt_center = pair.center;
+    const double* scales0 = pair.scales0;
+    const double* scales1 = pair.scales1;
     i2p.reset(abs(shell_type0), abs(shell_type1));
     do {
         work_cart[i2p.offset] += pre*(
@@ -161,13 +188,17 @@ double kinetic_helper(double alpha0, double alpha1, long n0, long n1, double pa,
     return poly;
 }
 
-void GB2KineticIntegral::add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1) {
-    double pre, gamma_inv, poly, fx0, fy0, fz0;
-    double gpt_center[3], pa[3], pb[3];
-
-    gamma_inv = 1.0/(alpha0 + alpha1);
-    pre = coeff*exp(-alpha0*alpha1*gamma_inv*dist_sq(r0, r1));
-    compute_gpt_center(alpha0, r0, alpha1, r1, gamma_inv, gpt_center);
+void GB2KineticIntegral::add_pair(const GBPrimPair& pair) {
+    double poly, fx0, fy0, fz0;
+    double pa[3], pb[3];
+
+    const double alpha0 = pair.alpha0;
+    const double alpha1 = pair.alpha1;
+    const double gamma_inv = pair.gamma_inv;
+    const double pre = pair.prefac;
+    const double* gpt_center = pair.center;
+    const double* scales0 = pair.scales0;
+    const double* scales1 = pair.scales1;
     pa[0] = gpt_center[0] - r0[0];
     pa[1] = gpt_center[1] - r0[1];
     pa[2] = gpt_center[2] - r0[2];
@@ -201,7 +232,9 @@ GB2AttractionIntegral::GB2AttractionIntegral(long max_shell_type, double* charge
     work_g0 = new double[2*max_shell_type+1];
     work_g1 = new double[2*max_shell_type+1];
     work_g2 = new double[2*max_shell_type+1];
-    work_boys = new double[2*max_shell_type+1];
+    work_pc = new double[3*ncharge];
+    work_arg = new double[ncharge];
+    work_boys = new double[(2*max_shell_type+1)*ncharge];
 }
 
 
@@ -209,18 +242,22 @@ GB2AttractionIntegral::~GB2AttractionIntegral() {
     delete[] work_g0;
     delete[] work_g1;
     delete[] work_g2;
+    delete[] work_pc;
+    delete[] work_arg;
     delete[] work_boys;
 }
 
 
-void GB2AttractionIntegral::add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1) {
-    double pre, gamma, gamma_inv, arg;
-    double gpt_center[3], pa[3], pb[3], pc[3];
+void GB2AttractionIntegral::add_pair(const GBPrimPair& pair) {
+    double arg;
+    double pa[3], pb[3];
 
-    gamma = alpha0 + alpha1;
-    gamma_inv = 1.0/gamma;
-    pre = 2*M_PI*gamma_inv*coeff*exp(-alpha0*alpha1*gamma_inv*dist_sq(r0, r1));
-    compute_gpt_center(alpha0, r0, alpha1, r1, gamma_inv, gpt_center);
+    const double gamma = pair.gamma;
+    const double gamma_inv = pair.gamma_inv;
+    const double pre = 2*M_PI*gamma_inv*pair.prefac;
+    const double* gpt_center = pair.center;
+    const double* scales0 = pair.scales0;
+    const double* scales1 = pair.scales1;
     pa[0] = gpt_center[0] - r0[0];
     pa[1] = gpt_center[1] - r0[1];
     pa[2] = gpt_center[2] - r0[2];
@@ -228,23 +265,22 @@ void GB2AttractionIntegral::add(double coeff, double alpha0, double alpha1, cons
     pb[1] = gpt_center[1] - r1[1];
     pb[2] = gpt_center[2] - r1[2];
 
+    // Third centers and rescaled distances for all charges
     for (long icharge=0; icharge < ncharge; icharge++) {
-        // thrid center for the current charge
+        double* pc = work_pc + 3*icharge;
         pc[0] = gpt_center[0] - centers[icharge*3  ];
         pc[1] = gpt_center[1] - centers[icharge*3+1];
         pc[2] = gpt_center[2] - centers[icharge*3+2];
+        work_arg[icharge] = gamma*(pc[0]*pc[0] + pc[1]*pc[1] + pc[2]*pc[2]);
+    }
 
-        // Fill the work array with the Boys function values
-        arg = gamma*(pc[0]*pc[0] + pc[1]*pc[1] + pc[2]*pc[2]);
-        // for (long nu=abs(shell_type0)+abs(shell_type1); nu>=0; nu--) {
-        //    work_boys[nu] = boys_function(nu, arg);
-        //}
-        /*
-           Laplace transform of the potential
-        */
+    // Laplace transform of the potential for all charges in one go
+    const long mmax = abs(shell_type0) + abs(shell_type1);
+    laplace_of_potential_batch(gamma, ncharge, work_arg, mmax, work_boys);
 
-        int mmax = abs(shell_type0) + abs(shell_type1);
-        laplace_of_potential(gamma, arg, mmax, work_boys);
+    for (long icharge=0; icharge < ncharge; icharge++) {
+        const double* pc = work_pc + 3*icharge;
+        const double* boys = work_boys + icharge;
 
         // Iterate over all combinations of Cartesian exponents
         i2p.reset(abs(shell_type0), abs(shell_type1));
@@ -259,7 +295,7 @@ void GB2AttractionIntegral::add(double coeff, double alpha0, double alpha1, cons
             for (long i0=i2p.n0[0]+i2p.n1[0]; i0>=0; i0--)
                 for (long i1=i2p.n0[1]+i2p.n1[1]; i1>=0; i1--)
                     for (long i2=i2p.n0[2]+i2p.n1[2]; i2>=0; i2--)
-                        arg += work_g0[i0]*work_g1[i1]*work_g2[i2]*work_boys[i0+i1+i2];
+                        arg += work_g0[i0]*work_g1[i1]*work_g2[i2]*boys[(i0+i1+i2)*ncharge];
 
             // Finally add to the work array, accounting for opposite charge of electron and nucleus
             work_cart[i2p.offset] -= pre*scales0[i2p.ibasis0]*scales1[i2p.ibasis1]*arg*charges[icharge];
@@ -268,12 +304,30 @@ void GB2AttractionIntegral::add(double coeff, double alpha0, double alpha1, cons
 }
 
 
+void GB2AttractionIntegral::laplace_of_potential_batch(double gamma, long npoint,
+                                                       const double* args, long mmax,
+                                                       double* output) {
+    double tmp[2*MAX_SHELL_TYPE+1];
+    for (long ipoint=0; ipoint < npoint; ipoint++) {
+        laplace_of_potential(gamma, args[ipoint], mmax, tmp);
+        for (long m=0; m <= mmax; m++) output[m*npoint + ipoint] = tmp[m];
+    }
+}
+
+
 void GB2NuclearAttractionIntegral::laplace_of_potential(double gamma, double arg, long mmax,
                                                         double* output) {
   boys_function_array(mmax, arg, output);
 }
 
 
+void GB2NuclearAttractionIntegral::laplace_of_potential_batch(double gamma, long npoint,
+                                                              const double* args, long mmax,
+                                                              double* output) {
+  boys_function_batch(mmax, npoint, args, output);
+}
+
+
 void GB2ErfAttractionIntegral::laplace_of_potential(double gamma, double arg, long mmax,
                                                     double* output) {
   double efac = mu*mu/(mu*mu + gamma);
@@ -286,6 +340,21 @@ void GB2ErfAttractionIntegral::laplace_of_potential(double gamma, double arg, lo
 }
 
 
+void GB2ErfAttractionIntegral::laplace_of_potential_batch(double gamma, long npoint,
+                                                          const double* args, long mmax,
+                                                          double* output) {
+  double efac = mu*mu/(mu*mu + gamma);
+  work_scaled_args.resize(npoint);
+  for (long ipoint=0; ipoint < npoint; ipoint++) work_scaled_args[ipoint] = args[ipoint]*efac;
+  boys_function_batch(mmax, npoint, work_scaled_args.data(), output);
+  double prefac = sqrt(efac);
+  for (long m=0; m <= mmax; m++) {
+    for (long ipoint=0; ipoint < npoint; ipoint++) output[m*npoint + ipoint] *= prefac;
+    prefac *= efac;
+  }
+}
+
+
 void GB2GaussAttractionIntegral::laplace_of_potential(double gamma, double arg, long mmax,
                                                       double* output) {
   double afac = alpha/(gamma+alpha);
@@ -304,7 +373,8 @@ void GB2GaussAttractionIntegral::laplace_of_potential(double gamma, double arg,
  */
 
 
-double moment_helper(long n0, long n1, long n2, double pa, double pb, double pc, double gamma_inv) {
+static void moment_helper_all(long n0, long n1, long n2, double pa, double pb, double pc,
+                              double gamma_inv, double* output) {
     /*
      The Obara Saika Scheme, equations A7 and A8 in "Efficient recursive computation of
      molecular integrals over Cartesian Gaussian functions", S. Obara, A. Saika, Journal
@@ -314,57 +384,70 @@ double moment_helper(long n0, long n1, long n2, double pa, double pb, double pc,
      (0_A|R(0)|0_B) in the paper is stored in work_mm[1][1][1].
      In this allows to set all terms in with the angular momentum index becomes -1 to 0,
      avoiding a lot of if-statements.
+
+     All intermediate results (l|R(n)|m), with l <= n0, m <= n1 and n <= n2, are
+     written to output[(l*(n1+1) + m)*(n2+1) + n].
     */
 
-    double result;
-    // if n2 == 0, we just need the overlap.
-    if (n2 == 0) {
-        result = gb_overlap_int1d(n0, n1, pa, pb, (2.0e0 * gamma_inv));
-    } else {
-        long m, l, n;
-        double work_mm[n0+2][n1+2][n2+2];
-
-        for (l=0; l < (n0+2); l++) {
-            for (m=0; m < (n1+2); m++) {
-                for (n=0; n < (n2+2); n++) {
-                    work_mm[l][m][n] = 0.0e0;
-                }
+    long m, l, n;
+    double work_mm[n0+2][n1+2][n2+2];
+
+    for (l=0; l < (n0+2); l++) {
+        for (m=0; m < (n1+2); m++) {
+            for (n=0; n < (n2+2); n++) {
+                work_mm[l][m][n] = 0.0e0;
             }
         }
+    }
+
+    // The auxiliary overlap (0_A|R(0)|0_B) is stored in work_mm[1][1][1]:
+    work_mm[1][1][1] = gb_overlap_int1d(0, 0, pa, pb, (2.0e0 * gamma_inv));
 
-        // The auxiliary overlap (0_A|R(0)|0_B) is stored in work_mm[1][1][1]:
-        work_mm[1][1][1] = gb_overlap_int1d(0, 0, pa, pb, (2.0e0 * gamma_inv));
+    // Equation A8 in the Obara-Saika paper for (0_A|R(mu + 1)|0_B):
+    for (n=1; n < (n2+1); n++) {
+        work_mm[1][1][n+1] = pc * work_mm[1][1][n] + (gamma_inv * (n-1) * work_mm[1][1][n-1]);
+    }
 
-        // Equation A8 in the Obara-Saika paper for (0_A|R(mu + 1)|0_B):
-        for (n=1; n < (n2+1); n++) {
-            work_mm[1][1][n+1] = pc * work_mm[1][1][n] + (gamma_inv * (n-1) * work_mm[1][1][n-1]);
+    // Equation A7 in the Obara-Saika paper for (0_A|R(mu)|b + 1):
+    for (m=1; m < (n1+1); m++) {
+        for (n=1; n <= (n2+1); n++) {
+            work_mm[1][m+1][n] = pb * work_mm[1][m][n]
+                                            + (gamma_inv * (m-1) * work_mm[1][m-1][n])
+                                            + (gamma_inv * (n-1) * work_mm[1][m][n-1]);
         }
+    }
 
-        // Equation A7 in the Obara-Saika paper for (0_A|R(mu)|b + 1):
-        for (m=1; m < (n1+1); m++) {
+    // Equation A7 in the Obara-Saika paper for (a + 1|R(mu)|b):
+    for (l=1; l < (n0+1); l++) {
+        for (m=1; m <= (n1+1); m++) {
             for (n=1; n <= (n2+1); n++) {
-                work_mm[1][m+1][n] = pb * work_mm[1][m][n]
-                                                + (gamma_inv * (m-1) * work_mm[1][m-1][n])
-                                                + (gamma_inv * (n-1) * work_mm[1][m][n-1]);
+                work_mm[l+1][m][n] = pa * work_mm[l][m][n]
+                                            + (gamma_inv * (l-1) * work_mm[l-1][m][n])
+                                            + (gamma_inv * (m-1) * work_mm[l][m-1][n])
+                                            + (gamma_inv * (n-1) * work_mm[l][m][n-1]);
             }
         }
+    }
 
-        // Equation A7 in the Obara-Saika paper for (a + 1|R(mu)|b):
-        for (l=1; l < (n0+1); l++) {
-            for (m=1; m <= (n1+1); m++) {
-                for (n=1; n <= (n2+1); n++) {
-                    work_mm[l+1][m][n] = pa * work_mm[l][m][n]
-                                                + (gamma_inv * (l-1) * work_mm[l-1][m][n])
-                                                + (gamma_inv * (m-1) * work_mm[l][m-1][n])
-                                                + (gamma_inv * (n-1) * work_mm[l][m][n-1]);
-                }
+    for (l=0; l <= n0; l++) {
+        for (m=0; m <= n1; m++) {
+            for (n=0; n <= n2; n++) {
+                output[(l*(n1+1) + m)*(n2+1) + n] = work_mm[l+1][m+1][n+1];
             }
         }
-
-        result = work_mm[n0+1][n1+1][n2+1];
     }
+}
+
 
-    return result;
+double moment_helper(long n0, long n1, long n2, double pa, double pb, double pc, double gamma_inv) {
+    // if n2 == 0, we just need the overlap.
+    if (n2 == 0) {
+        return gb_overlap_int1d(n0, n1, pa, pb, (2.0e0 * gamma_inv));
+    }
+    const long nresult = (n0+1)*(n1+1)*(n2+1);
+    double work[nresult];
+    moment_helper_all(n0, n1, n2, pa, pb, pc, gamma_inv, work);
+    return work[nresult-1];
 }
 
 
@@ -377,15 +460,14 @@ GB2MomentIntegral::GB2MomentIntegral(long max_shell_type, long* xyz, double* cen
 }
 
 
-void GB2MomentIntegral::add(double coeff, double alpha0, double alpha1,
-                            const double* scales0, const double* scales1) {
-    double pre, gamma_inv, twogamma_inv;
-    double gpt_center[3], pa[3], pb[3], pc[3];
+void GB2MomentIntegral::add_pair(const GBPrimPair& pair) {
+    double pa[3], pb[3], pc[3];
 
-    gamma_inv = 1.0/(alpha0 + alpha1);
-    twogamma_inv = 0.50/(alpha0 + alpha1);
-    pre = coeff*exp(-alpha0*alpha1*gamma_inv*dist_sq(r0, r1));
-    compute_gpt_center(alpha0, r0, alpha1, r1, gamma_inv, gpt_center);
+    const double twogamma_inv = 0.5*pair.gamma_inv;
+    const double pre = pair.prefac;
+    const double* gpt_center = pair.center;
+    const double* scales0 = pair.scales0;
+    const double* scales1 = pair.scales1;
     pa[0] = gpt_center[0] - r0[0];
     pa[1] = gpt_center[1] - r0[1];
     pa[2] = gpt_center[2] - r0[2];
@@ -406,6 +488,62 @@ void GB2MomentIntegral::add(double coeff, double alpha0, double alpha1,
     } while (i2p.inc());
 }
 
+/*
+
+ GB2MultipoleMomentsIntegral
+
+ */
+
+
+GB2MultipoleMomentsIntegral::GB2MultipoleMomentsIntegral(long max_shell_type, long lmax,
+                                                         double* center)
+    : GB2Integral(max_shell_type, ((lmax+1)*(lmax+2)*(lmax+3))/6), lmax(lmax),
+      center(center) {
+    if (lmax < 0) {
+      throw std::domain_error("lmax can not be negative.");
+    }
+    work_axis = new double[3*(max_shell_type+1)*(max_shell_type+1)*(lmax+1)];
+}
+
+
+GB2MultipoleMomentsIntegral::~GB2MultipoleMomentsIntegral() {
+    delete[] work_axis;
+}
+
+
+void GB2MultipoleMomentsIntegral::add_pair(const GBPrimPair& pair) {
+    const long n0 = abs(shell_type0);
+    const long n1 = abs(shell_type1);
+    const long naxis = (n0+1)*(n1+1)*(lmax+1);
+    const long nblock = get_shell_nbasis(n0)*get_shell_nbasis(n1);
+    const double twogamma_inv = 0.5*pair.gamma_inv;
+    const double* gpt_center = pair.center;
+
+    // One-dimensional moments of all orders, for all powers of both primitives.
+    for (long i=0; i < 3; i++) {
+        moment_helper_all(n0, n1, lmax, gpt_center[i] - r0[i], gpt_center[i] - r1[i],
+                          gpt_center[i] - center[i], twogamma_inv, work_axis + i*naxis);
+    }
+
+    i2p.reset(n0, n1);
+    do {
+        const double pre = pair.prefac*pair.scales0[i2p.ibasis0]*pair.scales1[i2p.ibasis1];
+        const double* mx = work_axis + (i2p.n0[0]*(n1+1) + i2p.n1[0])*(lmax+1);
+        const double* my = work_axis + naxis + (i2p.n0[1]*(n1+1) + i2p.n1[1])*(lmax+1);
+        const double* mz = work_axis + 2*naxis + (i2p.n0[2]*(n1+1) + i2p.n1[2])*(lmax+1);
+        double* output = work_cart + i2p.offset;
+        for (long l=0; l <= lmax; l++) {
+            for (long nx=l; nx >= 0; nx--) {
+                for (long ny=l-nx; ny >= 0; ny--) {
+                    *output += pre*mx[nx]*my[ny]*mz[l-nx-ny];
+                    output += nblock;
+                }
+            }
+        }
+    } while (i2p.inc());
+}
+
+
 /*
 
    GB4Integral
@@ -446,6 +584,16 @@ void GB4Integral::reset(
   memset(work_pure, 0, nwork*sizeof(double));
 }
 
+void GB4Integral::add(double coeff, double alpha0, double alpha1, double alpha2,
+                      double alpha3, const double* scales0, const double* scales1,
+                      const double* scales2, const double* scales3) {
+  GBPrimPair pair02;
+  GBPrimPair pair13;
+  init_prim_pair(&pair02, coeff, alpha0, r0, alpha2, r2, scales0, scales2);
+  init_prim_pair(&pair13, 1.0, alpha1, r1, alpha3, r3, scales1, scales3);
+  add_pairs(pair02, pair13);
+}
+
 void GB4Integral::cart_to_pure() {
   /* The initial results are always stored in work_cart. The projection routine always
      outputs its result in work_pure. Once that is done, the pointers to both blocks are
@@ -513,7 +661,7 @@ void GB4Integral::cart_to_pure() {
 GB4IntegralLibInt::GB4IntegralLibInt(long max_shell_type)
     : GB4Integral(max_shell_type),
       libint_args{{0, NULL, 0.0}, {0, NULL, 0.0}, {0, NULL, 0.0}, {0, NULL, 0.0}},
-      order{0, 0, 0, 0}, ab{0.0, 0.0, 0.0}, cd{0.0, 0.0, 0.0}, ab2(0.0), cd2(0.0) {
+      order{0, 0, 0, 0}, ab{0.0, 0.0, 0.0}, cd{0.0, 0.0, 0.0} {
   libint2_init_eri(&erieval, max_shell_type, 0);
   erieval.contrdepth = 1;
 }
@@ -581,7 +729,7 @@ void GB4IntegralLibInt::reset(
     order[3] = tmp;
   }
 
-  /* Compute the distances squared of AB and CD.
+  /* Compute the relative vectors AB and CD.
      AB corresponds to libint_args[order[0]].r - libint_args[order[2]].r
      CD corresponds to libint_args[order[1]].r - libint_args[order[3]].r
   */
@@ -589,7 +737,6 @@ void GB4IntegralLibInt::reset(
   ab[0] = libint_args[order[0]].r[0] - libint_args[order[2]].r[0];
   ab[1] = libint_args[order[0]].r[1] - libint_args[order[2]].r[1];
   ab[2] = libint_args[order[0]].r[2] - libint_args[order[2]].r[2];
-  ab2 = ab[0] * ab[0] + ab[1] * ab[1] + ab[2] * ab[2];
 #if LIBINT2_DEFINED(eri, AB_x)
   erieval.AB_x[0] = ab[0];
 #endif
@@ -603,7 +750,6 @@ void GB4IntegralLibInt::reset(
   cd[0] = libint_args[order[1]].r[0] - libint_args[order[3]].r[0];
   cd[1] = libint_args[order[1]].r[1] - libint_args[order[3]].r[1];
   cd[2] = libint_args[order[1]].r[2] - libint_args[order[3]].r[2];
-  cd2 = cd[0] * cd[0] + cd[1] * cd[1] + cd[2] * cd[2];
 #if LIBINT2_DEFINED(eri, CD_x)
   erieval.CD_x[0] = cd[0];
 #endif
@@ -616,30 +762,34 @@ void GB4IntegralLibInt::reset(
 }
 
 
-void GB4IntegralLibInt::add(
-    double coeff, double alpha0, double alpha1, double alpha2, double alpha3,
-    const double* scales0, const double* scales1, const double* scales2, const double* scales3) {
+void GB4IntegralLibInt::add_pairs(const GBPrimPair& pair02, const GBPrimPair& pair13) {
   /*
       Store the arguments for libint such that they can be reordered
       conveniently.
   */
 
-  libint_args[0].alpha = alpha0;
-  libint_args[1].alpha = alpha1;
-  libint_args[2].alpha = alpha2;
-  libint_args[3].alpha = alpha3;
+  libint_args[0].alpha = pair02.alpha0;
+  libint_args[1].alpha = pair13.alpha0;
+  libint_args[2].alpha = pair02.alpha1;
+  libint_args[3].alpha = pair13.alpha1;
+  const double* scales0 = pair02.scales0;
+  const double* scales1 = pair13.scales0;
+  const double* scales2 = pair02.scales1;
+  const double* scales3 = pair13.scales1;
 
   /*
-      Precompute some variables for libint. The approach here is not
-      super-efficient, but why bother...
+      The first pair in LibInt order, (order[0], order[2]), is either (0, 2) or
+      (1, 3), possibly swapped. The Gaussian product centers and the exponent
+      sums do not depend on the order within a pair.
   */
 
-  const double gammap = libint_args[order[0]].alpha + libint_args[order[2]].alpha;
-  const double gammap_inv = 1.0/gammap;
-  double p[3];
-  compute_gpt_center(libint_args[order[0]].alpha, libint_args[order[0]].r,
-                     libint_args[order[2]].alpha, libint_args[order[2]].r,
-                     gammap_inv, p);
+  const bool swap = (order[0] == 1) || (order[0] == 3);
+  const GBPrimPair& pairp = swap ? pair13 : pair02;
+  const GBPrimPair& pairq = swap ? pair02 : pair13;
+
+  const double gammap = pairp.gamma;
+  const double gammap_inv = pairp.gamma_inv;
+  const double* p = pairp.center;
   const double pa[3] = {
       p[0] - libint_args[order[0]].r[0],
       p[1] - libint_args[order[0]].r[1],
@@ -673,12 +823,9 @@ void GB4IntegralLibInt::add(
   erieval.oo2z[0] = 0.5*gammap_inv;
 #endif
 
-  const double gammaq = libint_args[order[1]].alpha + libint_args[order[3]].alpha;
-  const double gammaq_inv = 1.0/gammaq;
-  double q[3];
-  compute_gpt_center(libint_args[order[1]].alpha, libint_args[order[1]].r,
-                     libint_args[order[3]].alpha, libint_args[order[3]].r,
-                     gammaq_inv, q);
+  const double gammaq = pairq.gamma;
+  const double gammaq_inv = pairq.gamma_inv;
+  const double* q = pairq.center;
   const double qc[3] = {
     q[0] - libint_args[order[1]].r[0],
     q[1] - libint_args[order[1]].r[1],
@@ -783,12 +930,8 @@ void GB4IntegralLibInt::add(
       Arguments for the kernel (using Boy's function or something else)
   */
 
-  const double k1 = exp(-libint_args[order[0]].alpha * libint_args[order[2]].alpha *
-                        ab2 * gammap_inv);
-  const double k2 = exp(-libint_args[order[1]].alpha * libint_args[order[3]].alpha *
-                        cd2 * gammaq_inv);
 #define PI_POW_3_2 5.5683279968317078
-  const double pfac = PI_POW_3_2*k1*k2*eta_inv*sqrt(eta_inv)*coeff;
+  const double pfac = PI_POW_3_2*pair02.prefac*pair13.prefac*eta_inv*sqrt(eta_inv);
   const double rho = 1.0/(gammaq_inv + gammap_inv);
   const double t = pq2*rho;
 
@@ -23,23 +23,98 @@
 #ifndef HORTON_GBASIS_INTS_H
 #define HORTON_GBASIS_INTS_H
 
+#include <vector>
 #include "libint2.h"
 #include "horton/gbasis/calc.h"
 #include "horton/gbasis/iter_pow.h"
 
 
+//! All data of a product of two primitive shells that does not depend on the operator.
+typedef struct {
+  double alpha0;          //!< Exponent of primitive 0.
+  double alpha1;          //!< Exponent of primitive 1.
+  double gamma;           //!< Sum of both exponents.
+  double gamma_inv;       //!< Inverse of gamma.
+  double center[3];       //!< Gaussian product center.
+  double prefac;          //!< Contraction coefficients times exp(-alpha0*alpha1*|r0-r1|^2/gamma).
+  const double* scales0;  //!< Normalization constants of primitive 0.
+  const double* scales1;  //!< Normalization constants of primitive 1.
+} GBPrimPair;
+
+
+/** @brief
+        Fill in a product of two primitive shells.
+
+    @param pair
+        The output.
+
+    @param coeff
+        The product of the contraction coefficients.
+
+    @param alpha0, alpha1
+        The exponents of both primitives.
+
+    @param r0, r1
+        The centers of both primitives.
+
+    @param scales0, scales1
+        The normalization constants of both primitives.
+  */
+void init_prim_pair(GBPrimPair* pair, double coeff, double alpha0, const double* r0,
+                    double alpha1, const double* r1, const double* scales0,
+                    const double* scales1);
+
+
 class GB2Integral : public GBCalculator {
     protected:
         long shell_type0, shell_type1;
         const double *r0, *r1;
         IterPow2 i2p;
+        long dim_work;  //!< The number of components computed for each pair of basis functions.
     public:
-        GB2Integral(long max_shell_type);
+        /** @brief
+                Initialize a GB2Integral object.
+
+            @param max_shell_type
+                Highest angular momentum index to be expected in the reset method.
+
+            @param dim_work
+                The number of components, e.g. of an operator with several Cartesian
+                components, computed at once. The work array contains one block for
+                each component.
+          */
+        GB2Integral(long max_shell_type, long dim_work=1);
         void reset(long shell_type0, long shell_type1, const double* r0, const double* r1);
-        virtual void add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1) = 0;
+
+        /** @brief
+                Add results for a pair of Cartesian primitive shells to the work array.
+
+            The product of the primitives is computed on the fly and passed on
+            to add_pair.
+          */
+        void add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1);
+
+        /** @brief
+                Add results for a precomputed product of two primitive shells.
+
+            @param pair
+                The product of the primitives, with index 0 and 1 referring to
+                the centers r0 and r1 given to the reset method.
+          */
+        virtual void add_pair(const GBPrimPair& pair) = 0;
         void cart_to_pure();
+
+        /** @brief
+                Return a new, independent instance with the same parameters.
+
+            The copy has its own work arrays, such that it can be used
+            concurrently with the original in another thread. The caller is
+            responsible for deleting the copy.
+          */
+        virtual GB2Integral* clone() const = 0;
         const long get_shell_type0() const {return shell_type0;}
         const long get_shell_type1() const {return shell_type1;}
+        const long get_dim_work() const {return dim_work;}
 };
 
 /** @brief
@@ -48,7 +123,8 @@ class GB2Integral : public GBCalculator {
 class GB2OverlapIntegral: public GB2Integral {
     public:
         GB2OverlapIntegral(long max_shell_type) : GB2Integral(max_shell_type) {};
-        virtual void add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1);
+        virtual void add_pair(const GBPrimPair& pair);
+        virtual GB2Integral* clone() const {return new GB2OverlapIntegral(max_shell_type);}
 };
 
 /** @brief
@@ -57,22 +133,26 @@ class GB2OverlapIntegral: public GB2Integral {
 class GB2KineticIntegral: public GB2Integral {
     public:
         GB2KineticIntegral(long max_shell_type) : GB2Integral(max_shell_type) {};
-        virtual void add(double coeff, double alpha0, double alpha1, const double* scales0, const double* scales1);
+        virtual void add_pair(const GBPrimPair& pair);
+        virtual GB2Integral* clone() const {return new GB2KineticIntegral(max_shell_type);}
 };
 
 /** @brief
  Compute the nuclear attraction integrals in a Gaussian orbital basis.
  */
 class GB2AttractionIntegral: public GB2Integral {
-     private:
+     protected:
         double* charges;    //!< Array with values of the nuclear charges.
         double* centers;    //!< The centers where the charges are located.
         long ncharge;       //!< Number of nuclear charges.
 
+     private:
         double* work_g0;    //!< Temporary array to store intermediate results.
         double* work_g1;    //!< Temporary array to store intermediate results.
         double* work_g2;    //!< Temporary array to store intermediate results.
-        double* work_boys;  //!< Temporary array to store the laplace of the interaction potential.
+        double* work_pc;    //!< Distances from the product center to all charges.
+        double* work_arg;   //!< Rescaled squared distances to all charges.
+        double* work_boys;  //!< The laplace of the interaction potential for all charges.
 
      public:
         /** @brief
@@ -85,25 +165,12 @@ class GB2AttractionIntegral: public GB2Integral {
         GB2AttractionIntegral(long max_shell_type, double* charges, double* centers, long ncharge);
         ~GB2AttractionIntegral();
         /** @brief
-          Add results for a combination of Cartesian primitive shells to the work array.
-
-         @param coeff
-             Product of the contraction coefficients of the four primitives.
-
-         @param alpha0
-             The exponent of primitive shell 0.
+          Add results for a product of two primitive shells to the work array.
 
-         @param alpha1
-             The exponent of primitive shell 1.
-
-         @param scales0
-            The normalization prefactors for basis functions in primitive shell 0
-
-         @param scales1
-            The normalization prefactors for basis functions in primitive shell 1
+         @param pair
+             The product of the primitives.
         */
-        virtual void add(double coeff, double alpha0, double alpha1, const double* scales0,
-                         const double* scales1);
+        virtual void add_pair(const GBPrimPair& pair);
         /** @brief
           Evaluate the Laplace transform of the the potential applied to nuclear attraction terms.
 
@@ -132,6 +199,31 @@ class GB2AttractionIntegral: public GB2Integral {
              Output array. The size must be at least mmax + 1.
          */
         virtual void laplace_of_potential(double gamma, double arg, long mmax, double* output) = 0;
+
+        /** @brief
+          Evaluate the Laplace transform of the potential for many arguments at once.
+
+         The default implementation calls laplace_of_potential for every argument.
+         Subclasses override this method when the transform can be vectorized.
+
+         @param gamma
+             Sum of the exponents of the two gaussian functions involved in the integral.
+
+         @param npoint
+             The number of arguments.
+
+         @param args
+             Rescaled distances, see laplace_of_potential. (size=npoint)
+
+         @param mmax
+             Maximum derivative of the Laplace transform to be considered.
+
+         @param output
+             Output array, output[m*npoint + ipoint] is the m-th derivative for
+             args[ipoint]. (size=(mmax+1)*npoint)
+         */
+        virtual void laplace_of_potential_batch(double gamma, long npoint, const double* args,
+                                                long mmax, double* output);
 };
 
 /** @brief
@@ -160,6 +252,10 @@ class GB2NuclearAttractionIntegral : public GB2AttractionIntegral {
                                         double* centers, long ncharge)
       : GB2AttractionIntegral(max_shell_type, charges, centers, ncharge) {}
 
+  virtual GB2Integral* clone() const {
+    return new GB2NuclearAttractionIntegral(max_shell_type, charges, centers, ncharge);
+  }
+
   /** @brief
           Evaluate the Laplace transform of the ordinary Coulomb potential.
 
@@ -168,6 +264,10 @@ class GB2NuclearAttractionIntegral : public GB2AttractionIntegral {
       See base class for more details.
     */
   virtual void laplace_of_potential(double gamma, double arg, long mmax, double* output);
+
+  //! Vectorized version of laplace_of_potential. (See base class for details.)
+  virtual void laplace_of_potential_batch(double gamma, long npoint, const double* args,
+                                          long mmax, double* output);
 };
 
 /** @brief
@@ -199,6 +299,10 @@ class GB2ErfAttractionIntegral : public GB2AttractionIntegral {
                            long ncharge, double mu)
       : GB2AttractionIntegral(max_shell_type, charges, centers, ncharge), mu(mu) {}
 
+  virtual GB2Integral* clone() const {
+    return new GB2ErfAttractionIntegral(max_shell_type, charges, centers, ncharge, mu);
+  }
+
   /** @brief
           Evaluate the Laplace transform of the long-range Coulomb potential.
           (The short-range part is damped away using an error function.) See (52) in
@@ -208,10 +312,15 @@ class GB2ErfAttractionIntegral : public GB2AttractionIntegral {
     */
   virtual void laplace_of_potential(double gamma, double arg, long mmax, double* output);
 
+  //! Vectorized version of laplace_of_potential. (See base class for details.)
+  virtual void laplace_of_potential_batch(double gamma, long npoint, const double* args,
+                                          long mmax, double* output);
+
   const double get_mu() const {return mu;}  //!< The range-separation parameter.
 
  private:
   double mu;  //!< The range-separation parameter.
+  std::vector<double> work_scaled_args;  //!< Arguments of the Boys function in the batch.
 };
 
 
@@ -246,6 +355,10 @@ class GB2GaussAttractionIntegral : public GB2AttractionIntegral {
   GB2GaussAttractionIntegral(long max_shell_type, double* charges, double* centers, long ncharge,
                              double c, double alpha)
       : GB2AttractionIntegral(max_shell_type, charges, centers, ncharge), c(c), alpha(alpha) {}
+
+  virtual GB2Integral* clone() const {
+    return new GB2GaussAttractionIntegral(max_shell_type, charges, centers, ncharge, c, alpha);
+  }
   /** @brief
           Evaluate the Laplace transform of the Gaussian potential.
 
@@ -298,25 +411,62 @@ class GB2MomentIntegral: public GB2Integral {
         GB2MomentIntegral(long max_shell_type, long* xyz, double* center);
 
         /** @brief
-                Add integrals for a pair of primite shells to the current contraction.
+                Add integrals for a product of primitive shells to the current contraction.
 
-            @param coeff
-                The contraction coefficient for the current primitive.
+            @param pair
+                The product of the primitives.
+          */
+        virtual void add_pair(const GBPrimPair& pair);
 
-            @param alpha0
-                The exponent of the primitive shell 0.
+        virtual GB2Integral* clone() const {
+            return new GB2MomentIntegral(max_shell_type, xyz, center);
+        }
+};
 
-            @param alpha1
-                The exponent of the primitive shell 1.
 
-            @param scales0
-                The normalization constants for the basis functions in primitive shell 0.
+/** @brief
+        Compute all Cartesian multipole moment integrals up to a given order at once.
+
+    The one-dimensional Obara-Saika recursion for a pair of primitives yields the
+    moments of all orders in one go. These intermediates are shared by all
+    Cartesian components. The work array contains one block for each component,
+    ordered as in horton.moments.get_cartesian_powers, starting with the overlap.
+  */
+class GB2MultipoleMomentsIntegral: public GB2Integral {
+    private:
+        long lmax;          //!< The highest order of the multipole moments.
+        double* center;     //!< The origin w.r.t. to which the multipole moments are computed.
+        double* work_axis;  //!< One-dimensional moments along x, y and z.
+
+    public:
+        /** @brief
+                Initialize a GB2MultipoleMomentsIntegral object.
+
+            @param max_shell_type
+                The highest angular momentum index suported
+
+            @param lmax
+                The highest order of the multipole moments.
 
-            @param scales1
-                The normalization constants for the basis functions in primitive shell 1.
+            @param center
+                The center [C_x, C_y, C_z] around which the moment integrals are computed.
+        */
+        GB2MultipoleMomentsIntegral(long max_shell_type, long lmax, double* center);
+        ~GB2MultipoleMomentsIntegral();
+
+        /** @brief
+                Add integrals for a product of primitive shells to the current contraction.
+
+            @param pair
+                The product of the primitives.
           */
-        virtual void add(double coeff, double alpha0, double alpha1,
-                         const double* scales0, const double* scales1);
+        virtual void add_pair(const GBPrimPair& pair);
+
+        virtual GB2Integral* clone() const {
+            return new GB2MultipoleMomentsIntegral(max_shell_type, lmax, center);
+        }
+
+        const long get_lmax() const {return lmax;}  //!< The highest order.
 };
 
 
@@ -391,14 +541,38 @@ class GB4Integral : public GBCalculator {
 
       @param scales3
           The normalization prefactors for basis functions in primitive shell 3
+
+      The products of primitives 0 and 2 and of primitives 1 and 3 are
+      computed on the fly and passed on to add_pairs.
+    */
+  void add(double coeff, double alpha0, double alpha1, double alpha2,
+           double alpha3, const double* scales0, const double* scales1,
+           const double* scales2, const double* scales3);
+
+  /** @brief
+          Add results for two precomputed products of primitive shells to the work array.
+
+      @param pair02
+          The product of primitives 0 and 2, i.e. the first pair in chemist
+          notation. Index 0 and 1 of the pair refer to r0 and r2, respectively.
+
+      @param pair13
+          The product of primitives 1 and 3, i.e. the second pair in chemist
+          notation. Index 0 and 1 of the pair refer to r1 and r3, respectively.
     */
-  virtual void add(double coeff, double alpha0, double alpha1, double alpha2,
-                   double alpha3, const double* scales0, const double* scales1,
-                   const double* scales2, const double* scales3) = 0;
+  virtual void add_pairs(const GBPrimPair& pair02, const GBPrimPair& pair13) = 0;
 
   //! Transform the results in the work array from Cartesian to pure functions where needed.
   void cart_to_pure();
 
+  /** @brief
+          Return a new, independent instance with the same parameters.
+
+      The copy has its own work arrays, such that it can be used concurrently with
+      the original in another thread. The caller is responsible for deleting the copy.
+    */
+  virtual GB4Integral* clone() const = 0;
+
   const long get_shell_type0() const {return shell_type0;}  //!< Shell type of contraction 0
   const long get_shell_type1() const {return shell_type1;}  //!< Shell type of contraction 1
   const long get_shell_type2() const {return shell_type2;}  //!< Shell type of contraction 2
@@ -444,13 +618,11 @@ class GB4IntegralLibInt : public GB4Integral {
   virtual void reset(long shell_type0, long shell_type1, long shell_type2, long shell_type3,
                      const double* r0, const double* r1, const double* r2, const double* r3);
   /** @brief
-          Add results for a combination of Cartesian primitive shells to the work array.
+          Add results for two products of primitive shells to the work array.
 
       See base class for details.
     */
-  virtual void add(double coeff, double alpha0, double alpha1, double alpha2, double alpha3,
-                   const double* scales0, const double* scales1, const double* scales2,
-                   const double* scales3);
+  virtual void add_pairs(const GBPrimPair& pair02, const GBPrimPair& pair13);
 
   /** @brief
           Evaluate the Laplace transform of the the potential.
@@ -490,8 +662,6 @@ class GB4IntegralLibInt : public GB4Integral {
   long order[4];                //!< Re-ordering of shells for compatibility with LibInt.
   double ab[3];                 //!< Relative vector from shell 2 to 0 (LibInt order).
   double cd[3];                 //!< Relative vector from shell 3 to 1 (LibInt order).
-  double ab2;                   //!< Norm squared of ab.
-  double cd2;                   //!< Norm squared of cd.
 };
 
 
@@ -511,6 +681,10 @@ class GB4ElectronRepulsionIntegralLibInt : public GB4IntegralLibInt {
   explicit GB4ElectronRepulsionIntegralLibInt(long max_shell_type)
       : GB4IntegralLibInt(max_shell_type) {}
 
+  virtual GB4Integral* clone() const {
+    return new GB4ElectronRepulsionIntegralLibInt(max_shell_type);
+  }
+
   /** @brief
           Evaluate the Laplace transform of the ordinary Coulomb potential.
 
@@ -542,6 +716,8 @@ class GB4ErfIntegralLibInt : public GB4IntegralLibInt {
   GB4ErfIntegralLibInt(long max_shell_type, double mu)
       : GB4IntegralLibInt(max_shell_type), mu(mu) {}
 
+  virtual GB4Integral* clone() const {return new GB4ErfIntegralLibInt(max_shell_type, mu);}
+
   /** @brief
           Evaluate the Laplace transform of the long-range Coulomb potential.
           (The short-range part is damped away using an error function.) See (52) in
@@ -581,6 +757,10 @@ class GB4GaussIntegralLibInt : public GB4IntegralLibInt {
   GB4GaussIntegralLibInt(long max_shell_type, double c, double alpha)
       : GB4IntegralLibInt(max_shell_type), c(c), alpha(alpha) {}
 
+  virtual GB4Integral* clone() const {
+    return new GB4GaussIntegralLibInt(max_shell_type, c, alpha);
+  }
+
   /** @brief
           Evaluate the Laplace transform of the Gaussian potential.
 
@@ -628,6 +808,8 @@ class GB4RAlphaIntegralLibInt : public GB4IntegralLibInt {
   GB4RAlphaIntegralLibInt(long max_shell_type, double alpha)
       : GB4IntegralLibInt(max_shell_type), alpha(alpha) {}
 
+  virtual GB4Integral* clone() const {return new GB4RAlphaIntegralLibInt(max_shell_type, alpha);}
+
   /** @brief
           Evaluate the Laplace transform of the r^alpha potential. See Eq. (49) in
           Ahlrichs' paper.
@@ -32,6 +32,7 @@ cdef extern from "horton/gbasis/ints.h":
 
         long get_shell_type0()
         long get_shell_type1()
+        long get_dim_work()
         double* get_work()
 
     cdef cppclass GB2OverlapIntegral:
@@ -55,6 +56,9 @@ cdef extern from "horton/gbasis/ints.h":
     cdef cppclass GB2MomentIntegral:
         GB2MomentIntegral(long max_shell_type, long* xyz, double* center) except +
 
+    cdef cppclass GB2MultipoleMomentsIntegral:
+        GB2MultipoleMomentsIntegral(long max_shell_type, long lmax, double* center) except +
+
     cdef cppclass GB4Integral:
         long get_nwork()
         long get_max_shell_type()
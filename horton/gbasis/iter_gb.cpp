@@ -23,6 +23,7 @@
 #include <cstring>
 #include "horton/gbasis/common.h"
 #include "horton/gbasis/iter_gb.h"
+#include "horton/gbasis/packed.h"
 using namespace std;
 
 
@@ -72,6 +73,14 @@ void IterGB1::update_shell() {
 }
 
 
+void IterGB1::set_shell(long ishell0) {
+    // Jump to an arbitrary shell, e.g. to skip shells that are negligible.
+    this->ishell0 = ishell0;
+    oprim0 = gbasis->get_prim_offsets()[ishell0];
+    update_shell();
+}
+
+
 int IterGB1::inc_prim() {
     // Increment primitive counters.
     if (iprim0 < nprim0-1) {
@@ -165,6 +174,18 @@ void IterGB2::update_shell() {
 }
 
 
+void IterGB2::set_shell(long ishell0, long ishell1) {
+    // Jump to an arbitrary pair of shells, e.g. to let threads start at
+    // different points in the loop.
+    const long* prim_offsets = gbasis->get_prim_offsets();
+    this->ishell0 = ishell0;
+    this->ishell1 = ishell1;
+    oprim0 = prim_offsets[ishell0];
+    oprim1 = prim_offsets[ishell1];
+    update_shell();
+}
+
+
 int IterGB2::inc_prim() {
     // Increment primitive counters.
     if (iprim1 < nprim1-1) {
@@ -360,6 +381,22 @@ void IterGB4::update_shell() {
 }
 
 
+void IterGB4::set_shell(long ishell0, long ishell1, long ishell2, long ishell3) {
+    // Jump to an arbitrary quartet of shells, e.g. to let threads start at
+    // different points in the loop.
+    const long* prim_offsets = gbasis->get_prim_offsets();
+    this->ishell0 = ishell0;
+    this->ishell1 = ishell1;
+    this->ishell2 = ishell2;
+    this->ishell3 = ishell3;
+    oprim0 = prim_offsets[ishell0];
+    oprim1 = prim_offsets[ishell1];
+    oprim2 = prim_offsets[ishell2];
+    oprim3 = prim_offsets[ishell3];
+    update_shell();
+}
+
+
 int IterGB4::inc_prim() {
     // Increment primitive counters.
     if (iprim3 < nprim3-1) {
@@ -442,3 +479,23 @@ void IterGB4::store(const double *work, double *output) {
         }
     }
 }
+
+void IterGB4::store_packed(const double *work, double *output) {
+    // Only one of the eight equivalent elements is stored, see packed.h.
+    const long n0 = get_shell_nbasis(shell_type0);
+    const long n1 = get_shell_nbasis(shell_type1);
+    const long n2 = get_shell_nbasis(shell_type2);
+    const long n3 = get_shell_nbasis(shell_type3);
+    const double* tmp = work;
+    for (long i0=0; i0<n0; i0++) {
+        for (long i1=0; i1<n1; i1++) {
+            for (long i2=0; i2<n2; i2++) {
+                for (long i3=0; i3<n3; i3++) {
+                    output[packed_four_index(i0 + ibasis0, i1 + ibasis1,
+                                             i2 + ibasis2, i3 + ibasis3)] = *tmp;
+                    tmp++;
+                }
+            }
+        }
+    }
+}
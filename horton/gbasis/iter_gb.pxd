@@ -28,6 +28,7 @@ cdef extern from "horton/gbasis/iter_gb.h":
 
         bint inc_shell()
         void update_shell()
+        void set_shell(long ishell0)
         bint inc_prim()
         void update_prim()
         void store(double* work, double* output, long dim)
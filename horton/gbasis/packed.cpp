@@ -0,0 +1,116 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+
+#include <cstring>
+#include "horton/gbasis/packed.h"
+
+
+/*
+    All kernels loop over the packed array in the order of storage, i.e. over
+    the symmetry-unique (ij|kl) with i >= j, k >= l and ij >= kl. For every
+    element, the distinct permutations (pq|rs) of the indexes are visited with
+    the following macros. This avoids double counting of elements whose indexes
+    coincide partially.
+*/
+#define PACKED_LOOP_BEGIN \
+    long ipacked = 0; \
+    for (long i=0; i < nbasis; i++) { \
+    for (long j=0; j <= i; j++) { \
+        const long ij = i*(i + 1)/2 + j; \
+        for (long k=0; k <= i; k++) { \
+        for (long l=0; l <= k; l++) { \
+            const long kl = k*(k + 1)/2 + l; \
+            if (kl > ij) break; \
+            const double value = packed[ipacked]; \
+            ipacked++; \
+            for (int iswap=0; iswap <= (ij != kl); iswap++) { \
+                const long i0 = (iswap == 0) ? i : k; \
+                const long j0 = (iswap == 0) ? j : l; \
+                const long k0 = (iswap == 0) ? k : i; \
+                const long l0 = (iswap == 0) ? l : j; \
+                for (int ipq=0; ipq <= (i0 != j0); ipq++) { \
+                    const long p = (ipq == 0) ? i0 : j0; \
+                    const long q = (ipq == 0) ? j0 : i0; \
+                    for (int irs=0; irs <= (k0 != l0); irs++) { \
+                        const long r = (irs == 0) ? k0 : l0; \
+                        const long s = (irs == 0) ? l0 : k0;
+
+#define PACKED_LOOP_END \
+                    } \
+                } \
+            } \
+        } \
+        } \
+    } \
+    }
+
+
+void packed_contract_direct(const double* packed, const double* dm, double* output,
+                            long nbasis) {
+    memset(output, 0, nbasis*nbasis*sizeof(double));
+    // (pq|rs) = <pr|qs>
+    PACKED_LOOP_BEGIN
+    output[p*nbasis + q] += value*dm[r*nbasis + s];
+    PACKED_LOOP_END
+}
+
+
+void packed_contract_exchange(const double* packed, const double* dm, double* output,
+                              long nbasis) {
+    memset(output, 0, nbasis*nbasis*sizeof(double));
+    // (pq|rs) = <pr|qs>
+    PACKED_LOOP_BEGIN
+    output[p*nbasis + s] += value*dm[q*nbasis + r];
+    PACKED_LOOP_END
+}
+
+
+void packed_from_dense(const double* dense, double* packed, long nbasis) {
+    long ipacked = 0;
+    for (long i=0; i < nbasis; i++) {
+    for (long j=0; j <= i; j++) {
+        const long ij = i*(i + 1)/2 + j;
+        for (long k=0; k <= i; k++) {
+        for (long l=0; l <= k; l++) {
+            const long kl = k*(k + 1)/2 + l;
+            if (kl > ij) break;
+            // (ij|kl) = <ik|jl>
+            packed[ipacked] = dense[((i*nbasis + k)*nbasis + j)*nbasis + l];
+            ipacked++;
+        }
+        }
+    }
+    }
+}
+
+
+void packed_to_dense(const double* packed, double* dense, long nbasis) {
+    for (long a=0; a < nbasis; a++) {
+    for (long b=0; b < nbasis; b++) {
+    for (long c=0; c < nbasis; c++) {
+    for (long d=0; d < nbasis; d++) {
+        *dense = packed[packed_four_index(a, b, c, d)];
+        dense++;
+    }
+    }
+    }
+    }
+}
@@ -0,0 +1,122 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Packed storage of four-center integrals with eight-fold symmetry
+
+#ifndef HORTON_GBASIS_PACKED_H
+#define HORTON_GBASIS_PACKED_H
+
+
+/** @brief
+        Index of a pair of basis functions in a packed lower triangle.
+
+    The order of the arguments does not matter.
+  */
+inline long packed_pair_index(long i, long j) {
+    return (i >= j) ? i*(i + 1)/2 + j : j*(j + 1)/2 + i;
+}
+
+
+/** @brief
+        Index of the physicist's integral <ab|cd> in the packed array.
+
+    The packed array contains the chemist's integrals (ij|kl), with i >= j,
+    k >= l and ij >= kl, stored as a lower triangle of the lower triangle. The
+    index of (ij|kl) is pair(pair(i, j), pair(k, l)). Its length is
+    npair*(npair + 1)/2 with npair = nbasis*(nbasis + 1)/2.
+  */
+inline long packed_four_index(long a, long b, long c, long d) {
+    return packed_pair_index(packed_pair_index(a, c), packed_pair_index(b, d));
+}
+
+
+/** @brief
+        Compute the direct contraction with a density matrix, on a packed array.
+
+    output[a, c] = sum_bd <ab|cd> dm[b, d]
+
+    @param packed
+        The packed four-center integrals.
+
+    @param dm
+        The density matrix, shape (nbasis, nbasis).
+
+    @param output
+        The output, shape (nbasis, nbasis). The old content is overwritten.
+
+    @param nbasis
+        The number of basis functions.
+  */
+void packed_contract_direct(const double* packed, const double* dm, double* output,
+                            long nbasis);
+
+
+/** @brief
+        Compute the exchange contraction with a density matrix, on a packed array.
+
+    output[a, d] = sum_bc <ab|cd> dm[c, b]
+
+    @param packed
+        The packed four-center integrals.
+
+    @param dm
+        The density matrix, shape (nbasis, nbasis).
+
+    @param output
+        The output, shape (nbasis, nbasis). The old content is overwritten.
+
+    @param nbasis
+        The number of basis functions.
+  */
+void packed_contract_exchange(const double* packed, const double* dm, double* output,
+                              long nbasis);
+
+
+/** @brief
+        Convert a dense four-index array with eight-fold symmetry to packed storage.
+
+    @param dense
+        The input, shape (nbasis, nbasis, nbasis, nbasis), physicist's notation.
+
+    @param packed
+        The output in packed storage.
+
+    @param nbasis
+        The number of basis functions.
+  */
+void packed_from_dense(const double* dense, double* packed, long nbasis);
+
+
+/** @brief
+        Convert a packed array to a dense four-index array.
+
+    @param packed
+        The input in packed storage.
+
+    @param dense
+        The output, shape (nbasis, nbasis, nbasis, nbasis), physicist's notation.
+
+    @param nbasis
+        The number of basis functions.
+  */
+void packed_to_dense(const double* packed, double* dense, long nbasis);
+
+
+#endif
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+
+#cython: language_level=3
+
+cdef extern from "horton/gbasis/packed.h":
+    void packed_contract_direct(double* packed, double* dm, double* output, long nbasis)
+    void packed_contract_exchange(double* packed, double* dm, double* output, long nbasis)
+    void packed_from_dense(double* dense, double* packed, long nbasis)
+    void packed_to_dense(double* packed, double* dense, long nbasis)
@@ -0,0 +1,87 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Minimal thread pool for embarrassingly parallel loops
+
+#ifndef HORTON_GBASIS_PARALLEL_H
+#define HORTON_GBASIS_PARALLEL_H
+
+#include <atomic>
+#include <exception>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+
+/** @brief
+        Execute fn(ithread, itask) for all itask in [0, ntask) with a pool of threads.
+
+    Tasks are handed out dynamically, one at a time, so tasks with unequal costs
+    are balanced automatically. It is best to order the tasks from expensive to
+    cheap. Every thread gets a unique index ithread in [0, nthread), which can be
+    used to select thread-private work arrays. When nthread <= 1, all tasks are
+    executed in the calling thread, in order.
+
+    An exception raised by one of the tasks stops the remaining tasks from being
+    started and is rethrown in the calling thread.
+
+    @param nthread
+        The number of threads to use.
+
+    @param ntask
+        The number of tasks.
+
+    @param fn
+        A callable with signature void fn(long ithread, long itask).
+  */
+template <typename Fn>
+void parallel_for(long nthread, long ntask, Fn fn) {
+  if (nthread > ntask) nthread = ntask;
+  if (nthread <= 1) {
+    for (long itask = 0; itask < ntask; itask++) fn(0, itask);
+    return;
+  }
+
+  std::atomic<long> next(0);
+  std::atomic<bool> failed(false);
+  std::exception_ptr error;
+  std::mutex error_mutex;
+
+  auto worker = [&](long ithread) {
+    try {
+      long itask;
+      while (!failed && ((itask = next++) < ntask)) fn(ithread, itask);
+    } catch (...) {
+      std::lock_guard<std::mutex> lock(error_mutex);
+      if (!failed) error = std::current_exception();
+      failed = true;
+    }
+  };
+
+  std::vector<std::thread> threads;
+  for (long ithread = 1; ithread < nthread; ithread++)
+    threads.push_back(std::thread(worker, ithread));
+  worker(0);
+  for (long ithread = 0; ithread < nthread - 1; ithread++) threads[ithread].join();
+  if (error) std::rethrow_exception(error);
+}
+
+
+#endif  // HORTON_GBASIS_PARALLEL_H
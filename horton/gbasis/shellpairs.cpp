@@ -0,0 +1,94 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include "horton/gbasis/common.h"
+#include "horton/gbasis/gbasis.h"
+#include "horton/gbasis/shellpairs.h"
+
+
+GBShellPairs::GBShellPairs(const GBasis* gbasis, double threshold)
+    : gbasis(gbasis), nshell(gbasis->nshell), threshold(threshold),
+      centers(gbasis->centers, gbasis->centers + 3*gbasis->ncenter),
+      offsets(nshell*nshell + 1, 0) {
+  if (threshold < 0) {
+    throw std::domain_error("The threshold for products of primitives must not be negative.");
+  }
+  const long* prim_offsets = gbasis->get_prim_offsets();
+  GBPrimPair pair;
+  for (long ishell0=0; ishell0 < nshell; ishell0++) {
+    const double* r0 = gbasis->centers + 3*gbasis->shell_map[ishell0];
+    for (long ishell1=0; ishell1 < nshell; ishell1++) {
+      const double* r1 = gbasis->centers + 3*gbasis->shell_map[ishell1];
+      for (long iprim0=prim_offsets[ishell0]; iprim0 < prim_offsets[ishell0] + gbasis->nprims[ishell0]; iprim0++) {
+        for (long iprim1=prim_offsets[ishell1]; iprim1 < prim_offsets[ishell1] + gbasis->nprims[ishell1]; iprim1++) {
+          init_prim_pair(&pair, gbasis->con_coeffs[iprim0]*gbasis->con_coeffs[iprim1],
+                         gbasis->alphas[iprim0], r0, gbasis->alphas[iprim1], r1,
+                         gbasis->get_scales(iprim0), gbasis->get_scales(iprim1));
+          // Overlap of the s-type primitives with the same exponents.
+          const double overlap = fabs(pair.prefac*pair.scales0[0]*pair.scales1[0])*
+                                 pow(M_PI*pair.gamma_inv, 1.5);
+          if ((threshold > 0) && (overlap < threshold)) continue;
+          pairs.push_back(pair);
+        }
+      }
+      offsets[ishell0*nshell + ishell1 + 1] = pairs.size();
+    }
+  }
+}
+
+
+bool GBShellPairs::has_centers(const double* centers) const {
+  return std::equal(this->centers.begin(), this->centers.end(), centers);
+}
+
+
+void GBShellPairs::compute_pair(GB2Integral* integral, long ishell0, long ishell1) const {
+  integral->reset(gbasis->shell_types[ishell0], gbasis->shell_types[ishell1],
+                  gbasis->centers + 3*gbasis->shell_map[ishell0],
+                  gbasis->centers + 3*gbasis->shell_map[ishell1]);
+  const GBPrimPair* begin = get_pairs(ishell0, ishell1);
+  const GBPrimPair* end = begin + get_npair(ishell0, ishell1);
+  for (const GBPrimPair* pair=begin; pair < end; pair++) integral->add_pair(*pair);
+  integral->cart_to_pure();
+}
+
+
+void GBShellPairs::compute_quartet(GB4Integral* integral, long ishell0, long ishell1,
+                                   long ishell2, long ishell3) const {
+  integral->reset(gbasis->shell_types[ishell0], gbasis->shell_types[ishell1],
+                  gbasis->shell_types[ishell2], gbasis->shell_types[ishell3],
+                  gbasis->centers + 3*gbasis->shell_map[ishell0],
+                  gbasis->centers + 3*gbasis->shell_map[ishell1],
+                  gbasis->centers + 3*gbasis->shell_map[ishell2],
+                  gbasis->centers + 3*gbasis->shell_map[ishell3]);
+  const GBPrimPair* begin02 = get_pairs(ishell0, ishell2);
+  const GBPrimPair* end02 = begin02 + get_npair(ishell0, ishell2);
+  const GBPrimPair* begin13 = get_pairs(ishell1, ishell3);
+  const GBPrimPair* end13 = begin13 + get_npair(ishell1, ishell3);
+  for (const GBPrimPair* pair02=begin02; pair02 < end02; pair02++) {
+    for (const GBPrimPair* pair13=begin13; pair13 < end13; pair13++) {
+      integral->add_pairs(*pair02, *pair13);
+    }
+  }
+  integral->cart_to_pure();
+}
@@ -0,0 +1,132 @@
+// HORTON: Helpful Open-source Research TOol for N-fermion systems.
+// Copyright (C) 2011-2022 The HORTON Development Team
+//
+// This file is part of HORTON.
+//
+// HORTON is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// HORTON is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, see <http://www.gnu.org/licenses/>
+//
+//--
+
+// UPDATELIBDOCTITLE: Precomputed products of primitive Gaussian functions
+
+#ifndef HORTON_GBASIS_SHELLPAIRS_H
+#define HORTON_GBASIS_SHELLPAIRS_H
+
+#include <vector>
+#include "horton/gbasis/ints.h"
+
+
+class GBasis;
+
+
+/** @brief
+        Table with all non-negligible products of primitives for all pairs of shells.
+
+    The products of primitives recur in all two-, three- and four-center integrals
+    and in the electrostatic potential on grids. They are computed once, when the
+    table is constructed, and the integral kernels loop over the products of a
+    pair of shells instead of over the primitives of both shells.
+
+    Products are screened with the overlap of the two s-type primitives with the
+    same exponents, including contraction coefficients and normalization. Products
+    whose overlap is below the threshold are left out. A pair of shells for which
+    all products are negligible has an empty list.
+*/
+class GBShellPairs {
+ public:
+  /** @brief
+          Construct the table for all ordered pairs of shells of a basis.
+
+      @param gbasis
+          The basis set, with normalization constants initialized.
+
+      @param threshold
+          Products of primitives with a smaller overlap are left out. When zero,
+          all products are kept.
+    */
+  GBShellPairs(const GBasis* gbasis, double threshold);
+
+  //! The threshold used to screen the products.
+  double get_threshold() const {return threshold;}
+
+  /** @brief
+          Check whether the table was built for the given positions of the centers.
+
+      The table stores a copy of the centers of the basis set, which may be
+      changed in place afterwards.
+
+      @param centers
+          The Cartesian coordinates of the centers, shape (ncenter, 3).
+    */
+  bool has_centers(const double* centers) const;
+
+  //! The total number of products in the table, counting both orders.
+  long get_npair_total() const {return pairs.size();}
+
+  //! The number of products for a pair of shells.
+  long get_npair(long ishell0, long ishell1) const {
+    const long i = ishell0*nshell + ishell1;
+    return offsets[i + 1] - offsets[i];
+  }
+
+  /** @brief
+          The products for a pair of shells.
+
+      Index 0 of each product refers to ishell0 and index 1 refers to ishell1.
+      Primitives of ishell1 run fastest.
+    */
+  const GBPrimPair* get_pairs(long ishell0, long ishell1) const {
+    return pairs.data() + offsets[ishell0*nshell + ishell1];
+  }
+
+  /** @brief
+          Compute a block of two-center integrals for a pair of shells.
+
+      The integral object is reset, all products of the pair are added and the
+      result is transformed to pure functions where needed.
+
+      @param integral
+          The two-center integral calculator.
+
+      @param ishell0, ishell1
+          The indexes of the two shells.
+    */
+  void compute_pair(GB2Integral* integral, long ishell0, long ishell1) const;
+
+  /** @brief
+          Compute a block of four-center integrals for a quartet of shells.
+
+      The quartet <01|23> in physicist notation is computed from the products
+      of shells 0 and 2 and of shells 1 and 3. Otherwise, this works like
+      compute_pair.
+
+      @param integral
+          The four-center integral calculator.
+
+      @param ishell0, ishell1, ishell2, ishell3
+          The indexes of the four shells.
+    */
+  void compute_quartet(GB4Integral* integral, long ishell0, long ishell1,
+                       long ishell2, long ishell3) const;
+
+ private:
+  const GBasis* gbasis;           //!< The basis set.
+  long nshell;                    //!< The number of shells.
+  double threshold;               //!< See constructor.
+  std::vector<double> centers;    //!< Copy of the centers used to build the table.
+  std::vector<long> offsets;      //!< First product of each pair of shells, (nshell**2+1,).
+  std::vector<GBPrimPair> pairs;  //!< All products.
+};
+
+#endif  // HORTON_GBASIS_SHELLPAIRS_H
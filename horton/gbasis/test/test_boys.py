@@ -22,6 +22,7 @@
 
 import numpy as np
 from nose.tools import assert_raises
+from scipy.special import gamma, gammainc
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
@@ -525,3 +526,30 @@ def test_boys_array():
             output = boys_function_array(mmax, t)
             for m in range(mmax + 1):
                 assert output[m] == boys_function(m, t)
+
+
+def test_boys_batch():
+    t = np.concatenate([np.random.uniform(0, 60, 500), [0.0, 36.9, 37.0, 1e3, 1e5]])
+    for mmax in range(get_max_shell_type() * 4 + 1):
+        output = boys_function_batch(mmax, t)
+        assert output.shape == (mmax + 1, len(t))
+        for m in range(mmax + 1):
+            # Compare with boys_function inside the tabulated range.
+            mask = t < 30
+            expected = np.array([boys_function(m, ti) for ti in t[mask]])
+            np.testing.assert_allclose(output[m, mask], expected, rtol=1e-13, atol=0)
+            # Compare with the closed form, which is also accurate for large t.
+            mask = t > 0
+            expected = 0.5*gamma(m + 0.5)*gammainc(m + 0.5, t[mask])/t[mask]**(m + 0.5)
+            np.testing.assert_allclose(output[m, mask], expected, rtol=1e-13, atol=0)
+        np.testing.assert_allclose(output[:, t == 0].ravel(), 1.0/(2*np.arange(mmax + 1) + 1),
+                                   rtol=1e-14, atol=0)
+
+
+def test_boys_batch_domain_error():
+    with assert_raises(ValueError):
+        boys_function_batch(-1, np.zeros(3))
+    with assert_raises(ValueError):
+        boys_function_batch(get_max_shell_type() * 4 + 1, np.zeros(3))
+    with assert_raises(ValueError):
+        boys_function_batch(5, np.array([0.0, 1.0, -1.0]))
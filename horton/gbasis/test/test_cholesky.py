@@ -87,3 +87,72 @@ def test_cholesky_ralpha():
     vecs = obasis.compute_ralpha_repulsion_cholesky(alpha)
     chol = np.einsum('kac,kbd->abcd', vecs, vecs)
     np.testing.assert_allclose(ref, chol, rtol=1e-5, atol=1e-8)
+
+
+def get_h_chain_obasis():
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4], [0.0, 0.3, 3.0],
+                            [0.2, 0.0, 4.3], [0.0, 0.0, 5.9]])
+    return get_gobasis(coordinates, np.ones(5, int), '3-21g')
+
+
+def test_cholesky_h_chain():
+    obasis = get_h_chain_obasis()
+    ref = obasis.compute_electron_repulsion()
+    vecs = obasis.compute_electron_repulsion_cholesky()
+    assert vecs.flags['C_CONTIGUOUS']
+    assert vecs.flags['WRITEABLE']
+    chol = np.einsum('kac,kbd->abcd', vecs, vecs)
+    np.testing.assert_allclose(ref, chol, rtol=1e-5, atol=1e-8)
+    # The vectors must agree with a straightforward reference implementation.
+    vecs_ref = np.array(pcholesky4(ref))
+    assert abs(chol - np.einsum('kac,kbd->abcd', vecs_ref, vecs_ref)).max() < 1e-7
+
+
+def test_cholesky_threshold():
+    obasis = get_h_chain_obasis()
+    ref = obasis.compute_electron_repulsion()
+    vecs_tight = obasis.compute_electron_repulsion_cholesky(threshold=1e-10)
+    vecs_loose = obasis.compute_electron_repulsion_cholesky(threshold=1e-2)
+    assert len(vecs_loose) < len(vecs_tight)
+    error = abs(ref - np.einsum('kac,kbd->abcd', vecs_loose, vecs_loose)).max()
+    assert error > 1e-8
+    assert error < 1e-1
+    with assert_raises(ValueError):
+        obasis.compute_electron_repulsion_cholesky(threshold=0.0)
+
+
+def test_cholesky_nthread():
+    obasis = get_h_chain_obasis()
+    vecs1 = obasis.compute_erf_repulsion_cholesky(2.0)
+    for nthread in 2, 3, 7:
+        obasis.nthread = nthread
+        vecsn = obasis.compute_erf_repulsion_cholesky(2.0)
+        np.testing.assert_allclose(vecs1, vecsn, rtol=1e-12, atol=1e-14)
+    obasis.nthread = 1
+
+
+def test_cholesky_reduced():
+    # A sparse chain of hydrogen atoms: the products of basis functions on
+    # atoms that are far apart are discarded by the screening.
+    coordinates = np.array([[0.0, 0.0, 8.0*i] for i in range(6)])
+    obasis = get_gobasis(coordinates, np.ones(6, int), '3-21g')
+    nbasis = obasis.nbasis
+    ref = obasis.compute_electron_repulsion()
+    vecs, pairs = obasis.compute_electron_repulsion_cholesky(reduced=True)
+    npair = len(pairs)
+    assert npair < nbasis**2/2
+    assert vecs.shape == (len(vecs), npair)
+    assert (np.diff(pairs) > 0).all()
+    # The full vectors are consistent with the reduced ones.
+    full = obasis.compute_electron_repulsion_cholesky()
+    assert full.shape == (len(vecs), nbasis, nbasis)
+    np.testing.assert_equal(full.reshape(len(vecs), -1)[:, pairs], vecs)
+    mask = np.ones(nbasis**2, bool)
+    mask[pairs] = False
+    assert (full.reshape(len(vecs), -1)[:, mask] == 0).all()
+    chol = np.einsum('kac,kbd->abcd', full, full)
+    np.testing.assert_allclose(ref, chol, rtol=1e-5, atol=1e-8)
+    # In a compact molecule, nothing is discarded.
+    obasis = get_h_chain_obasis()
+    vecs, pairs = obasis.compute_electron_repulsion_cholesky(reduced=True)
+    np.testing.assert_equal(pairs, np.arange(obasis.nbasis**2))
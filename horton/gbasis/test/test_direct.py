@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for horton/gbasis/direct.py."""
+
+
+import numpy as np
+from nose.tools import assert_raises
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.meanfield.observable import contract_direct, contract_exchange
+
+
+def get_random_dm(nbasis, seed):
+    np.random.seed(seed)
+    dm = np.random.uniform(-1, 1, (nbasis, nbasis))
+    return dm + dm.T
+
+
+def get_h_chain_obasis():
+    """Return an s-only basis for a chain of hydrogen atoms."""
+    coordinates = np.array([[0.0, 0.0, 1.4*i] for i in range(5)])
+    coordinates[:, 0] += np.array([0.0, 0.3, -0.2, 0.1, 0.4])
+    numbers = np.ones(5, int)
+    return get_gobasis(coordinates, numbers, '3-21g')
+
+
+def get_water_obasis(basis='sto-3g'):
+    mol = IOData.from_file(context.get_fn('test/water.xyz'))
+    return get_gobasis(mol.coordinates, mol.numbers, basis)
+
+
+def check_direct(obasis, kind='er', args=()):
+    eri = getattr(obasis, 'compute_%s_repulsion' % {
+        'er': 'electron', 'erf': 'erf', 'gauss': 'gauss', 'ralpha': 'ralpha'}[kind])(*args)
+    for nthread in 1, 3:
+        obasis.nthread = nthread
+        for seed in range(3):
+            dm = get_random_dm(obasis.nbasis, seed)
+            direct_ref = np.einsum('abcd,bd->ac', eri, dm)
+            exchange_ref = np.einsum('abcd,cb->ad', eri, dm)
+            # Without and with screening
+            for threshold in 0.0, 1e-14:
+                op = DirectFourIndex(obasis, kind, args, threshold)
+                assert op.shape == eri.shape
+                assert abs(op.contract_direct(dm) - direct_ref).max() < 1e-10
+                assert abs(op.contract_exchange(dm) - exchange_ref).max() < 1e-10
+                # also go through the functions used in the meanfield terms
+                assert abs(contract_direct(op, dm) - direct_ref).max() < 1e-10
+                assert abs(contract_exchange(op, dm) - exchange_ref).max() < 1e-10
+    obasis.nthread = 1
+
+
+def test_direct_h_chain():
+    check_direct(get_h_chain_obasis())
+
+
+def test_direct_water():
+    check_direct(get_water_obasis())
+
+
+def test_direct_water_ccpvdz():
+    check_direct(get_water_obasis('cc-pvdz'))
+
+
+def test_direct_erf_h_chain():
+    check_direct(get_h_chain_obasis(), 'erf', (0.8,))
+
+
+def test_direct_gauss_h_chain():
+    check_direct(get_h_chain_obasis(), 'gauss', (0.7, 1.5))
+
+
+def test_direct_ralpha_h_chain():
+    check_direct(get_h_chain_obasis(), 'ralpha', (-0.5,))
+
+
+def test_direct_screening():
+    # Two H2 molecules far apart, with a density matrix localized on the first.
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4],
+                            [20.0, 0.0, 0.0], [20.0, 0.0, 1.4]])
+    obasis = get_gobasis(coordinates, np.ones(4, int), '3-21g')
+    eri = obasis.compute_electron_repulsion()
+    dm = get_random_dm(obasis.nbasis, 1)
+    dm[4:] = 0.0
+    dm[:, 4:] = 0.0
+    gb4int = GB4ElectronRepulsionIntegralLibInt(obasis.max_shell_type)
+    dms = dm.reshape(1, obasis.nbasis, obasis.nbasis)
+    directs = np.zeros(dms.shape)
+    exchanges = np.zeros(dms.shape)
+    nskip = obasis._compute_four_index_jk(gb4int, ('er',), dms, directs, exchanges, 1e-12)
+    assert nskip > 0
+    assert abs(directs[0] - np.einsum('abcd,bd->ac', eri, dm)).max() < 1e-10
+    assert abs(exchanges[0] - np.einsum('abcd,cb->ad', eri, dm)).max() < 1e-10
+
+
+def test_direct_multiple_dms():
+    obasis = get_h_chain_obasis()
+    eri = obasis.compute_electron_repulsion()
+    gb4int = GB4ElectronRepulsionIntegralLibInt(obasis.max_shell_type)
+    dms = np.array([get_random_dm(obasis.nbasis, seed) for seed in range(3)])
+    # Results are added to the output and only the requested outputs are computed.
+    directs = np.ones(dms.shape)
+    obasis._compute_four_index_jk(gb4int, ('er',), dms, directs)
+    for idm in range(3):
+        assert abs(directs[idm] - 1 - np.einsum('abcd,bd->ac', eri, dms[idm])).max() < 1e-10
+    with assert_raises(TypeError):
+        obasis._compute_four_index_jk(gb4int, ('er',), dms, np.zeros((2, 4, 4)))
+
+
+def test_direct_exceptions():
+    obasis = get_h_chain_obasis()
+    with assert_raises(ValueError):
+        DirectFourIndex(obasis, 'foo')
+    with assert_raises(ValueError):
+        DirectFourIndex(obasis, 'ralpha', (0.5,))
+    op = DirectFourIndex(obasis)
+    with assert_raises(TypeError):
+        op.contract_direct(np.zeros((3, 3)))
+
+
+def test_direct_separate():
+    obasis = get_h_chain_obasis()
+    eri = obasis.compute_electron_repulsion()
+    dm = get_random_dm(obasis.nbasis, 1)
+    op = DirectFourIndex(obasis, together=False)
+    assert abs(op.contract_exchange(dm) - np.einsum('abcd,cb->ad', eri, dm)).max() < 1e-10
+    # Only the exchange contraction was computed.
+    assert op._last[1] is None
+    assert abs(op.contract_direct(dm) - np.einsum('abcd,bd->ac', eri, dm)).max() < 1e-10
+    assert op._last[2] is None
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for the two- and three-center integrals used in density fitting."""
+
+
+import numpy as np
+from scipy.special import erf
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+
+
+def get_h_chain_obasis():
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4], [0.0, 0.3, 3.0],
+                            [0.2, 0.0, 4.3]])
+    return get_gobasis(coordinates, np.ones(4, int), '3-21g')
+
+
+def get_product_auxbasis(obasis):
+    """Return an auxiliary basis with all products of primitives of an s-type basis.
+
+    Density fitting with this auxiliary basis is exact.
+    """
+    alphas = []
+    centers = []
+    iprim0 = 0
+    prims = []
+    for ishell in range(obasis.nshell):
+        assert obasis.shell_types[ishell] == 0
+        for iprim in range(obasis.nprims[ishell]):
+            prims.append((obasis.alphas[iprim0 + iprim],
+                          obasis.centers[obasis.shell_map[ishell]]))
+        iprim0 += obasis.nprims[ishell]
+    for i0, (alpha0, center0) in enumerate(prims):
+        for alpha1, center1 in prims[:i0+1]:
+            alphas.append(alpha0 + alpha1)
+            centers.append((alpha0*center0 + alpha1*center1)/(alpha0 + alpha1))
+    naux = len(alphas)
+    return GOBasis(np.array(centers), np.arange(naux), np.ones(naux, int),
+                   np.zeros(naux, int), np.array(alphas), np.ones(naux))
+
+
+def test_two_center_analytic():
+    centers = np.array([[0.0, 0.0, 0.0], [0.3, -0.2, 1.1], [0.0, 0.0, 0.0]])
+    alphas = np.array([0.7, 1.3, 0.2])
+    auxbasis = GOBasis(centers, np.arange(3), np.ones(3, int), np.zeros(3, int),
+                       alphas, np.ones(3))
+    metric = auxbasis.compute_electron_repulsion_two_center()
+    for i0 in range(3):
+        for i1 in range(3):
+            p, q = alphas[i0], alphas[i1]
+            norm = (2*p/np.pi)**0.75*(2*q/np.pi)**0.75
+            t = p*q/(p + q)*((centers[i0] - centers[i1])**2).sum()
+            boys = 1.0 if t == 0 else 0.5*np.sqrt(np.pi/t)*erf(np.sqrt(t))
+            expected = norm*2*np.pi**2.5/(p*q*np.sqrt(p + q))*boys
+            assert abs(metric[i0, i1] - expected) < 1e-10*expected
+
+
+def test_three_center_symmetry():
+    obasis = get_h_chain_obasis()
+    auxbasis = get_product_auxbasis(obasis)
+    three_center = obasis.compute_electron_repulsion_three_center(auxbasis)
+    assert three_center.shape == (auxbasis.nbasis, obasis.nbasis, obasis.nbasis)
+    np.testing.assert_equal(three_center, three_center.transpose(0, 2, 1))
+    assert (three_center > 0).all()
+    obasis.nthread = 3
+    np.testing.assert_equal(
+        three_center, obasis.compute_electron_repulsion_three_center(auxbasis))
+    obasis.nthread = 1
+
+
+def test_density_fitting_exact():
+    obasis = get_h_chain_obasis()
+    auxbasis = get_product_auxbasis(obasis)
+    vecs = obasis.compute_electron_repulsion_density_fitting(auxbasis)
+    assert vecs.shape[1:] == (obasis.nbasis, obasis.nbasis)
+    assert vecs.shape[0] <= auxbasis.nbasis
+    ref = obasis.compute_electron_repulsion()
+    np.testing.assert_allclose(np.einsum('kac,kbd->abcd', vecs, vecs), ref,
+                               rtol=1e-6, atol=1e-8)
+
+
+def test_density_fitting_approximate():
+    obasis = get_h_chain_obasis()
+    # A small auxiliary basis gives a reasonable but not exact fit, which always
+    # underestimates the Coulomb energy of a density.
+    auxbasis = get_gobasis(obasis.centers, np.ones(4, int), '6-31g')
+    vecs = obasis.compute_electron_repulsion_density_fitting(auxbasis)
+    assert vecs.shape == (auxbasis.nbasis, obasis.nbasis, obasis.nbasis)
+    ref = obasis.compute_electron_repulsion()
+    dm = np.identity(obasis.nbasis)*0.1
+    energy_ref = np.einsum('abcd,ac,bd', ref, dm, dm)
+    energy_fit = np.einsum('kac,kbd,ac,bd', vecs, vecs, dm, dm)
+    assert energy_fit < energy_ref
+    assert energy_fit > 0.9*energy_ref
+
+
+def test_scf_density_fitting():
+    obasis = get_h_chain_obasis()
+    auxbasis = get_product_auxbasis(obasis)
+    olp = obasis.compute_overlap()
+    kin = obasis.compute_kinetic()
+    na = obasis.compute_nuclear_attraction(obasis.centers, np.ones(4))
+    results = []
+    for er in obasis.compute_electron_repulsion(), \
+              obasis.compute_electron_repulsion_density_fitting(auxbasis):
+        terms = [
+            RTwoIndexTerm(kin, 'kin'),
+            RDirectTerm(er, 'hartree'),
+            RExchangeTerm(er, 'x_hf'),
+            RTwoIndexTerm(na, 'ne'),
+        ]
+        ham = REffHam(terms)
+        orb_alpha = Orbitals(obasis.nbasis)
+        guess_core_hamiltonian(olp, kin + na, orb_alpha)
+        occ_model = AufbauOccModel(2)
+        occ_model.assign(orb_alpha)
+        scf_solver = PlainSCFSolver(1e-10)
+        scf_solver(ham, olp, occ_model, orb_alpha)
+        results.append(ham.cache['energy'])
+    assert abs(results[0] - results[1]) < 1e-8
@@ -918,3 +918,103 @@ def test_mgga_functional_deriv_4():
 
 def test_mgga_functional_deriv_5():
     check_mgga_functional_deriv('test/water_sto3g_hf_g03.fchk', 5)
+
+
+def check_blocked_dm(grid_fn_class):
+    """Compare the blocked evaluation of a density function with point-by-point results.
+
+    A tiny epsilon forces the evaluation point by point, without noticeable screening.
+    The number of points is chosen such that the last block is incomplete.
+    """
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    obasis = mol.obasis
+    dm_full = mol.get_dm_full()
+    points = np.random.uniform(-3, 3, (600, 3))
+    grid_fn = grid_fn_class(obasis.max_shell_type)
+    output_blocked = np.zeros((600, grid_fn.dim_output))
+    obasis._compute_grid1_dm(dm_full, points, grid_fn, output_blocked)
+    output_point = np.zeros((600, grid_fn.dim_output))
+    obasis._compute_grid1_dm(dm_full, points, grid_fn, output_point, 1e-300)
+    np.testing.assert_allclose(output_blocked, output_point, rtol=1e-10, atol=1e-12)
+
+
+def test_blocked_dm_density():
+    check_blocked_dm(GB1DMGridDensityFn)
+
+
+def test_blocked_dm_gradient():
+    check_blocked_dm(GB1DMGridGradientFn)
+
+
+def test_blocked_dm_gga():
+    check_blocked_dm(GB1DMGridGGAFn)
+
+
+def test_blocked_dm_kinetic():
+    check_blocked_dm(GB1DMGridKineticFn)
+
+
+def test_blocked_dm_hessian():
+    check_blocked_dm(GB1DMGridHessianFn)
+
+
+def test_blocked_dm_mgga():
+    check_blocked_dm(GB1DMGridMGGAFn)
+
+
+def check_fock_dm_consistency(dm_method, fock_method, nout, comps=None):
+    """Check that the Fock matrix of a potential is consistent with the density.
+
+    The density-related quantities are linear in the density matrix, such that the
+    trace of the Fock matrix with the density matrix must equal the integral of the
+    potential times the density-related quantities. The number of points is chosen such
+    that the last block of grid points is incomplete. When comps is given, only these
+    components of the potential are non-zero.
+    """
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    obasis = mol.obasis
+    dm_full = mol.get_dm_full()
+    points = np.random.uniform(-3, 3, (600, 3))
+    weights = np.random.uniform(0, 1, 600)
+    pots = np.random.uniform(-1, 1, (600, nout))
+    if comps is not None:
+        mask = np.zeros(nout, bool)
+        mask[comps] = True
+        pots[:, ~mask] = 0.0
+    output = dm_method(obasis, dm_full, points)
+    fock = fock_method(obasis, points, weights, pots.reshape(output.shape))
+    np.testing.assert_allclose(fock, fock.T)
+    expected = np.einsum('p,pi,pi', weights, pots, output.reshape(600, nout))
+    assert abs(np.einsum('ab,ab', fock, dm_full) - expected) < 1e-10*abs(expected)
+
+
+def test_fock_dm_consistency_density():
+    check_fock_dm_consistency(GOBasis.compute_grid_density_dm,
+                              GOBasis.compute_grid_density_fock, 1)
+
+
+def test_fock_dm_consistency_gradient():
+    check_fock_dm_consistency(GOBasis.compute_grid_gradient_dm,
+                              GOBasis.compute_grid_gradient_fock, 3)
+
+
+def test_fock_dm_consistency_gga():
+    check_fock_dm_consistency(GOBasis.compute_grid_gga_dm,
+                              GOBasis.compute_grid_gga_fock, 4)
+
+
+def test_fock_dm_consistency_kinetic():
+    check_fock_dm_consistency(GOBasis.compute_grid_kinetic_dm,
+                              GOBasis.compute_grid_kinetic_fock, 1)
+
+
+def test_fock_dm_consistency_hessian():
+    # Only the diagonal elements of the Hessian: for the off-diagonal elements, the
+    # Fock build contains the products of first derivatives twice.
+    check_fock_dm_consistency(GOBasis.compute_grid_hessian_dm,
+                              GOBasis.compute_grid_hessian_fock, 6, [0, 3, 5])
+
+
+def test_fock_dm_consistency_mgga():
+    check_fock_dm_consistency(GOBasis.compute_grid_mgga_dm,
+                              GOBasis.compute_grid_mgga_fock, 6)
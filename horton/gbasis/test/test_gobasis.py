@@ -617,3 +617,313 @@ def check_normalization(number, basis):
 def test_normalization_ccpvdz():
     for number in range(1, 18+1):
         check_normalization(number, 'cc-pvdz')
+
+
+def test_nthread_two_index():
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    obasis = mol.obasis
+    assert obasis.nthread == 1
+    olp1 = obasis.compute_overlap()
+    na1 = obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers)
+    for nthread in 2, 3, 100:
+        obasis.nthread = nthread
+        assert obasis.nthread == nthread
+        assert (obasis.compute_overlap() == olp1).all()
+        assert (obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers) == na1).all()
+
+
+def test_nthread_four_index():
+    mol = IOData.from_file(context.get_fn('test/water_sto3g_hf_g03.fchk'))
+    obasis = mol.obasis
+    er1 = obasis.compute_electron_repulsion()
+    gauss1 = obasis.compute_gauss_repulsion(0.5, 1.2)
+    obasis.nthread = 4
+    assert (obasis.compute_electron_repulsion() == er1).all()
+    assert (obasis.compute_gauss_repulsion(0.5, 1.2) == gauss1).all()
+
+
+def test_nthread_grid():
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    obasis = mol.obasis
+    dm_full = mol.get_dm_full()
+    points = np.random.uniform(-3, 3, (1000, 3))
+    weights = np.random.uniform(0, 1, 1000)
+    pots = np.random.uniform(-1, 1, (1000, 4))
+    iorbs = np.array([0, 3])
+    results = []
+    for nthread in 1, 3:
+        obasis.nthread = nthread
+        results.append([
+            obasis.compute_grid_density_dm(dm_full, points),
+            obasis.compute_grid_density_dm(dm_full, points, epsilon=1e-10),
+            obasis.compute_grid_mgga_dm(dm_full, points),
+            obasis.compute_grid_hartree_dm(dm_full, points[:100]),
+            obasis.compute_grid_orbitals_exp(mol.orb_alpha, points, iorbs),
+            obasis.compute_grid_orb_gradient_exp(mol.orb_alpha, points, iorbs),
+        ])
+        fock_gga = obasis.compute_grid_gga_fock(points, weights, pots)
+        fock_density = obasis.compute_grid_density_fock(points, weights, pots[:, 0])
+        results[-1].extend([fock_gga, fock_density])
+    obasis.nthread = 1
+    # Results on grid points do not depend on the number of threads. The Fock
+    # matrices are only affected by the order of the summation.
+    for result1, result3 in zip(results[0][:6], results[1][:6]):
+        assert (result1 == result3).all()
+    for result1, result3 in zip(results[0][6:], results[1][6:]):
+        np.testing.assert_allclose(result1, result3, rtol=1e-12, atol=1e-12)
+
+
+def test_nthread_exceptions():
+    obasis = get_gobasis(np.zeros((1, 3)), np.array([1]), 'sto-3g')
+    with assert_raises(ValueError):
+        obasis.nthread = 0
+    assert obasis.nthread == 1
+
+
+def check_schwarz_screening(method, *args):
+    # Two hydrogen molecules far apart. The integrals of all overlap
+    # distributions between the two molecules vanish.
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4],
+                            [0.0, 20.0, 0.0], [0.0, 20.0, 1.4]])
+    obasis = get_gobasis(coordinates, np.array([1, 1, 1, 1]), '3-21g')
+    ints0 = getattr(obasis, method)(*args)
+    ints1 = getattr(obasis, method)(*args, schwarz_threshold=1e-12)
+    assert abs(ints0 - ints1).max() < 1e-12
+    assert (ints1 == 0.0).sum() > (ints0 == 0.0).sum()
+    # The output argument must be overwritten with zeros where needed.
+    ints2 = np.ones(ints0.shape)
+    getattr(obasis, method)(*args, output=ints2, schwarz_threshold=1e-12)
+    assert (ints1 == ints2).all()
+    # Repeated calls reuse the bounds and give the same result.
+    obasis.nthread = 3
+    assert (getattr(obasis, method)(*args, schwarz_threshold=1e-12) == ints1).all()
+
+
+def test_schwarz_screening_electron_repulsion():
+    check_schwarz_screening('compute_electron_repulsion')
+
+
+def test_schwarz_screening_erf_repulsion():
+    check_schwarz_screening('compute_erf_repulsion', 0.8)
+
+
+def test_schwarz_screening_gauss_repulsion():
+    check_schwarz_screening('compute_gauss_repulsion', 0.7, 1.5)
+
+
+def test_schwarz_screening_ralpha_repulsion():
+    check_schwarz_screening('compute_ralpha_repulsion', -0.5)
+    obasis = get_gobasis(np.zeros((1, 3)), np.array([1]), 'sto-3g')
+    with assert_raises(ValueError):
+        obasis.compute_ralpha_repulsion(2.0, schwarz_threshold=1e-12)
+
+
+def test_schwarz_bounds():
+    mol = IOData.from_file(context.get_fn('test/water_sto3g_hf_g03.fchk'))
+    obasis = mol.obasis
+    er = obasis.compute_electron_repulsion()
+    bounds = obasis._get_schwarz_bounds(GB4ElectronRepulsionIntegralLibInt(obasis.max_shell_type), ('er',))
+    assert bounds.shape == (obasis.nshell, obasis.nshell)
+    assert (bounds == bounds.T).all()
+    # Check the Cauchy-Schwarz inequality for every element.
+    shell_lookup = obasis.shell_lookup
+    # (ij|kl) = <ik|jl>
+    bound_ijkl = (bounds[shell_lookup[:, None], shell_lookup][:, None, :, None] *
+                  bounds[shell_lookup[:, None], shell_lookup][None, :, None, :])
+    assert (abs(er) <= bound_ijkl*(1 + 1e-10)).all()
+
+
+def test_shell_radii():
+    alphas = np.array([0.5, 2.0])
+    obasis = GOBasis(np.zeros((2, 3)), np.array([0, 1]), np.array([1, 1]), np.array([0, 1]),
+                     alphas, np.array([1.0, 1.0]))
+    assert obasis.grid_tolerance == 1e-20
+    radii = obasis.shell_radii
+    # The radius of the s-type function is known analytically.
+    norm = (2*alphas[0]/np.pi)**0.75
+    assert abs(radii[0] - np.sqrt(np.log(norm/1e-20)/alphas[0])) < 1e-10
+    # The p-type function is exactly at the tolerance at its radius.
+    norm = (2*alphas[1]/np.pi)**0.75*2*np.sqrt(alphas[1])
+    assert abs(norm*radii[1]*np.exp(-alphas[1]*radii[1]**2) - 1e-20) < 1e-30
+    obasis.grid_tolerance = 1e-10
+    assert (obasis.shell_radii < radii).all()
+    obasis.grid_tolerance = 0.0
+    assert np.isinf(obasis.shell_radii).all()
+    with assert_raises(ValueError):
+        obasis.grid_tolerance = -1.0
+    assert obasis.grid_tolerance == 0.0
+
+
+def test_grid_shell_screening():
+    # Three water molecules far apart, with points around each molecule.
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    coordinates = np.concatenate([mol.coordinates + [0.0, 0.0, 15.0*i] for i in range(3)])
+    numbers = np.tile(mol.numbers, 3)
+    obasis = get_gobasis(coordinates, numbers, 'cc-pvdz')
+    dm_full = np.random.uniform(-0.1, 0.1, (obasis.nbasis, obasis.nbasis))
+    dm_full = dm_full + dm_full.T
+    points = np.random.normal(0, 1.5, (900, 3))
+    points[:, 2] += 15.0*np.repeat(np.arange(3), 300)
+    weights = np.random.uniform(0, 1, 900)
+    pots = np.random.uniform(-1, 1, (900, 4))
+    orb_alpha = Orbitals(obasis.nbasis)
+    orb_alpha.coeffs[:] = np.random.uniform(-1, 1, orb_alpha.coeffs.shape)
+    iorbs = np.array([0, 5])
+    results = []
+    for grid_tolerance in 0.0, 1e-20:
+        obasis.grid_tolerance = grid_tolerance
+        results.append([
+            obasis.compute_grid_density_dm(dm_full, points),
+            obasis.compute_grid_density_dm(dm_full, points, epsilon=1e-300),
+            obasis.compute_grid_gga_dm(dm_full, points),
+            obasis.compute_grid_gga_fock(points, weights, pots),
+            obasis.compute_grid_orbitals_exp(orb_alpha, points, iorbs),
+            obasis.compute_grid_orb_gradient_exp(orb_alpha, points, iorbs),
+        ])
+    for result0, result1 in zip(*results):
+        assert abs(result0 - result1).max() < 1e-14
+
+
+def test_grid_hartree_dm_nuclear_attraction():
+    # The Hartree potential in a point is the nuclear attraction of a unit charge.
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    dm_full = mol.get_dm_full()
+    points = np.random.uniform(-3, 3, (10, 3))
+    pots = mol.obasis.compute_grid_hartree_dm(dm_full, points)
+    for point, pot in zip(points, pots):
+        na = mol.obasis.compute_nuclear_attraction(point.reshape(1, 3), np.ones(1))
+        assert abs(pot + (na*dm_full).sum()) < 1e-10
+
+
+def test_grid_hartree_dm_multipole():
+    # Four water molecules in a row with a regular grid around them. Most
+    # molecules are far away from most points.
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    coordinates = np.concatenate([mol.coordinates + [0.0, 0.0, 8.0*i] for i in range(4)])
+    numbers = np.tile(mol.numbers, 4)
+    obasis = get_gobasis(coordinates, numbers, 'cc-pvdz')
+    dm_full = np.zeros((obasis.nbasis, obasis.nbasis))
+    for i in range(4):
+        dm_full[24*i:24*(i + 1), 24*i:24*(i + 1)] = mol.get_dm_full()
+    x = np.linspace(-6.0, 6.0, 7)
+    z = np.linspace(-6.0, 30.0, 19)
+    points = np.array(np.meshgrid(x, x, z, indexing='ij')).reshape(3, -1).T.copy()
+    exact = obasis.compute_grid_hartree_dm(dm_full, points)
+    approx = obasis.compute_grid_hartree_dm(dm_full, points, threshold=1e-14, lmax=8)
+    assert abs(exact - approx).max() < 1e-10
+    assert abs(exact - approx).max() > 0.0
+    pots = obasis.compute_grid_hartree_dm(dm_full, points, lmax=4)
+    assert abs(exact - pots).max() < 1e-6
+    pots = obasis.compute_grid_hartree_dm(dm_full, points, threshold=1e-14)
+    assert abs(exact - pots).max() < 1e-10
+    obasis.nthread = 3
+    pots = obasis.compute_grid_hartree_dm(dm_full, points, threshold=1e-14, lmax=8)
+    assert abs(approx - pots).max() < 1e-12
+    obasis.nthread = 1
+    with assert_raises(ValueError):
+        obasis.compute_grid_hartree_dm(dm_full, points, threshold=-1.0)
+    with assert_raises(ValueError):
+        obasis.compute_grid_hartree_dm(dm_full, points, lmax=17)
+
+
+def test_grid_cache():
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    obasis = mol.obasis
+    dm_full = mol.get_dm_full()
+    points = np.random.uniform(-3, 3, (1000, 3))
+    weights = np.random.uniform(0, 1, 1000)
+    pots = np.random.uniform(-1, 1, (1000, 6))
+    # The cache is large enough for a part of the blocks of the MGGA functions.
+    cache = GB1GridCache(obasis, points, 2e5)
+    assert cache.npoint == 1000
+    assert cache.memory == 2e5
+    assert cache.used_memory == 0
+    results = []
+    for icall in range(3):
+        results.append([
+            obasis.compute_grid_density_dm(dm_full, points, cache=cache),
+            obasis.compute_grid_gga_dm(dm_full, points, cache=cache),
+            obasis.compute_grid_mgga_dm(dm_full, points, cache=cache),
+            obasis.compute_grid_density_fock(points, weights, pots[:, 0], cache=cache),
+            obasis.compute_grid_gga_fock(points, weights, pots[:, :4], cache=cache),
+            obasis.compute_grid_mgga_fock(points, weights, pots, cache=cache),
+        ])
+        assert 0 < cache.used_memory <= cache.memory
+        if icall == 1:
+            cache.clear()
+            assert cache.used_memory == 0
+    expected = [
+        obasis.compute_grid_density_dm(dm_full, points),
+        obasis.compute_grid_gga_dm(dm_full, points),
+        obasis.compute_grid_mgga_dm(dm_full, points),
+        obasis.compute_grid_density_fock(points, weights, pots[:, 0]),
+        obasis.compute_grid_gga_fock(points, weights, pots[:, :4]),
+        obasis.compute_grid_mgga_fock(points, weights, pots),
+    ]
+    for result in results:
+        for value, ref in zip(result, expected):
+            assert abs(value - ref).max() < 1e-12
+    # The cache can only be used with its own basis and points.
+    with assert_raises(ValueError):
+        obasis.compute_grid_density_dm(dm_full, points.copy(), cache=cache)
+    with assert_raises(ValueError):
+        obasis.compute_grid_density_dm(dm_full, points[:500], cache=cache)
+    other = get_gobasis(mol.coordinates, mol.numbers, 'cc-pvdz')
+    with assert_raises(ValueError):
+        other.compute_grid_density_dm(dm_full, points, cache=cache)
+    with assert_raises(ValueError):
+        GB1GridCache(obasis, points, -1.0)
+
+
+def test_pair_threshold():
+    obasis = get_gobasis(np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 30.0]]), np.ones(2, int),
+                         '3-21g')
+    assert obasis.pair_threshold == 1e-20
+    # Only the products of primitives on the same atom survive.
+    assert obasis.nprim_pair == 2*3**2
+    obasis.pair_threshold = 0.0
+    assert obasis.nprim_pair == obasis.nprim_total**2
+    with assert_raises(ValueError):
+        obasis.pair_threshold = -1.0
+    assert obasis.pair_threshold == 0.0
+
+
+def test_pair_table_moved_center():
+    obasis = get_gobasis(np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4]]), np.ones(2, int), '6-31g')
+    olp = obasis.compute_overlap()
+    assert olp[0, 2] > 0.1
+    # Change the geometry in place, after the table of products was built.
+    obasis.centers[1, 2] = 3.0
+    other = get_gobasis(np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 3.0]]), np.ones(2, int), '6-31g')
+    np.testing.assert_allclose(obasis.compute_overlap(), other.compute_overlap(), atol=1e-14)
+    np.testing.assert_allclose(obasis.compute_kinetic(), other.compute_kinetic(), atol=1e-14)
+    assert abs(obasis.compute_overlap() - olp).max() > 0.1
+
+
+def test_pair_screening():
+    # Three water molecules far apart.
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    coordinates = np.concatenate([mol.coordinates + [0.0, 0.0, 15.0*i] for i in range(3)])
+    numbers = np.tile(mol.numbers, 3)
+    obasis = get_gobasis(coordinates, numbers, 'cc-pvdz')
+    dm_full = np.random.uniform(-0.1, 0.1, (obasis.nbasis, obasis.nbasis))
+    dm_full = dm_full + dm_full.T
+    points = np.random.normal(0, 3.0, (100, 3))
+    # An s-type basis, for which the four-center integrals are also tested.
+    sbasis = get_gobasis(coordinates[::3], np.ones(3, int), '3-21g')
+    results = []
+    nprim_pairs = []
+    for pair_threshold in 0.0, 1e-20:
+        obasis.pair_threshold = pair_threshold
+        sbasis.pair_threshold = pair_threshold
+        results.append([
+            obasis.compute_overlap(),
+            obasis.compute_kinetic(),
+            obasis.compute_nuclear_attraction(coordinates, numbers.astype(float)),
+            obasis.compute_grid_hartree_dm(dm_full, points),
+            sbasis.compute_electron_repulsion(),
+        ])
+        nprim_pairs.append(obasis.nprim_pair)
+    assert nprim_pairs[1] < nprim_pairs[0]
+    for result0, result1 in zip(*results):
+        assert abs(result0 - result1).max() < 1e-12
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for the streamed evaluation of orbitals on grids."""
+
+
+import h5py as h5
+import numpy as np
+from nose.tools import assert_raises
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.test.common import tmpdir
+
+
+def get_water():
+    return IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+
+
+def get_points_per_point(obasis, orb, points, iorbs, gradient):
+    """Evaluate the orbitals point by point, as a reference for the blocked code.
+
+    compute_grid_orbitals_exp and compute_grid_orb_gradient_exp always use the blocked
+    dgemm code, also for a single point. Here, the basis functions are computed with
+    compute_grid_point1 instead and they are contracted with the orbital coefficients
+    in NumPy.
+    """
+    if gradient:
+        grid_fn = GB1DMGridGradientFn(obasis.max_shell_type)
+    else:
+        grid_fn = GB1DMGridDensityFn(obasis.max_shell_type)
+    coeffs = orb.coeffs[:, iorbs]
+    result = []
+    for point in points:
+        work = np.zeros(obasis.nbasis*grid_fn.dim_work)
+        obasis.compute_grid_point1(work, point, grid_fn)
+        work = work.reshape(obasis.nbasis, grid_fn.dim_work)
+        if gradient:
+            # Columns one to three contain the derivatives toward x, y and z.
+            result.append(np.dot(coeffs.T, work[:, 1:]))
+        else:
+            result.append(np.dot(work[:, 0], coeffs))
+    return np.array(result)
+
+
+def test_stream_grid_orbitals_array():
+    mol = get_water()
+    points = np.random.normal(0, 2, (700, 3))
+    iorbs = np.array([0, 3, 4, 7, 20])
+    for gradient in False, True:
+        expected = get_points_per_point(mol.obasis, mol.orb_alpha, points, iorbs, gradient)
+        for nthread in 1, 2:
+            mol.obasis.nthread = nthread
+            # A tiny memory budget, such that the points are split in many blocks.
+            result = stream_grid_orbitals(mol.obasis, mol.orb_alpha, points, iorbs,
+                                          gradient=gradient, memory=3e3)
+            np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-14)
+        mol.obasis.nthread = 1
+
+
+def test_stream_grid_orbitals_memmap_h5():
+    mol = get_water()
+    points = np.random.normal(0, 2, (300, 3))
+    iorbs = np.arange(mol.orb_alpha.nfn)
+    expected = get_points_per_point(mol.obasis, mol.orb_alpha, points, iorbs, False)
+    with tmpdir('horton.gbasis.test.test_gridstream.test_stream_grid_orbitals_memmap_h5') as dn:
+        output = np.memmap('%s/orbs.bin' % dn, dtype=float, mode='w+',
+                           shape=(300, len(iorbs)))
+        stream_grid_orbitals(mol.obasis, mol.orb_alpha, points, iorbs, output, memory=1e4)
+        np.testing.assert_allclose(output, expected, rtol=1e-12, atol=1e-14)
+        del output
+    with h5.File('horton.gbasis.test.test_gridstream.h5', 'w', driver='core',
+                 backing_store=False) as f:
+        output = f.create_dataset('orbs', shape=(300, len(iorbs)), dtype=float)
+        stream_grid_orbitals(mol.obasis, mol.orb_alpha, points, iorbs, output, memory=1e4)
+        np.testing.assert_allclose(output[:], expected, rtol=1e-12, atol=1e-14)
+        with assert_raises(TypeError):
+            stream_grid_orbitals(mol.obasis, mol.orb_alpha, points, iorbs, output,
+                                 gradient=True)
+
+
+def test_stream_grid_orbitals_cube():
+    mol = get_water()
+    origin = np.array([-3.0, -2.5, -2.0])
+    grid_rvecs = np.diag([0.5, 0.45, 0.4])
+    mol.grid = UniformGrid(origin, grid_rvecs, np.array([13, 12, 11]), np.ones(3, int))
+    iorbs = np.array([2, 4])
+    with tmpdir('horton.gbasis.test.test_gridstream.test_stream_grid_orbitals_cube') as dn:
+        fns = ['%s/orb%i.cube' % (dn, iorb) for iorb in iorbs]
+        with CubeWriter(fns, mol) as writer:
+            stream_grid_orbitals(mol.obasis, mol.orb_alpha, mol.grid, iorbs, writer,
+                                 memory=5e3)
+        for i, fn in enumerate(fns):
+            cube = IOData.from_file(fn)
+            indexes = np.indices(cube.cube_data.shape).reshape(3, -1).T
+            points = origin + np.dot(indexes, grid_rvecs)
+            expected = get_points_per_point(mol.obasis, mol.orb_alpha, points,
+                                            iorbs[i:i+1], False)
+            assert abs(cube.cube_data.ravel() - expected[:, 0]).max() < 1e-4
+            assert (cube.numbers == mol.numbers).all()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for the persistent integral cache."""
+
+
+import numpy as np
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.test.common import tmpdir
+
+
+def get_h_chain_obasis(shift=0.0):
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.4], [0.0, 0.3, 3.0 + shift]])
+    return get_gobasis(coordinates, np.ones(3, int), '3-21g')
+
+
+def test_integral_cache_roundtrip():
+    with tmpdir('horton.gbasis.test.test_intcache.test_integral_cache_roundtrip') as dn:
+        obasis = get_h_chain_obasis()
+        olp = obasis.compute_overlap()
+        kin = obasis.compute_kinetic()
+        na = obasis.compute_nuclear_attraction(obasis.centers, np.ones(3))
+        er = obasis.compute_electron_repulsion()
+        cholesky = obasis.compute_electron_repulsion_cholesky()
+
+        obasis.integral_cache = IntegralCache(dn)
+        np.testing.assert_equal(obasis.compute_overlap(), olp)
+        np.testing.assert_equal(obasis.compute_kinetic(), kin)
+        np.testing.assert_equal(obasis.compute_nuclear_attraction(obasis.centers, np.ones(3)),
+                                na)
+        np.testing.assert_equal(obasis.compute_electron_repulsion(), er)
+        np.testing.assert_equal(obasis.compute_electron_repulsion_cholesky(), cholesky)
+        size = olp.nbytes + kin.nbytes + na.nbytes + er.nbytes + cholesky.nbytes
+        assert obasis.integral_cache.size == size
+
+        # A new basis object and a new cache object see the same entries. To be sure
+        # that the integrals are loaded instead of recomputed, the entries are modified.
+        obasis = get_h_chain_obasis()
+        cache = IntegralCache(dn)
+        cache.store(obasis, ('olp',), 2*olp)
+        cache.store(obasis, ('cholesky', 'er', 1e-8), 2*cholesky)
+        obasis.integral_cache = cache
+        np.testing.assert_equal(obasis.compute_overlap(), 2*olp)
+        np.testing.assert_equal(obasis.compute_electron_repulsion_cholesky(), 2*cholesky)
+        output = np.zeros(olp.shape)
+        obasis.compute_overlap(output)
+        np.testing.assert_equal(output, 2*olp)
+        assert cache.size == size
+
+        # Different parameters or geometries are different entries.
+        na2 = obasis.compute_nuclear_attraction(obasis.centers, 2*np.ones(3))
+        np.testing.assert_allclose(na2, 2*na)
+        obasis2 = get_h_chain_obasis(0.1)
+        obasis2.integral_cache = cache
+        assert abs(obasis2.compute_overlap() - olp).max() > 1e-3
+        np.testing.assert_equal(obasis.compute_electron_repulsion(schwarz_threshold=1e-14),
+                                obasis.compute_electron_repulsion(schwarz_threshold=1e-14))
+        assert cache.size == size + na.nbytes + olp.nbytes + er.nbytes
+
+        cache.clear()
+        assert cache.size == 0
+        np.testing.assert_equal(obasis.compute_overlap(), olp)
+
+
+def test_integral_cache_lru():
+    with tmpdir('horton.gbasis.test.test_intcache.test_integral_cache_lru') as dn:
+        obasis = get_h_chain_obasis()
+        nbytes = obasis.nbasis**2*8
+        cache = IntegralCache(dn, maxsize=2.5*nbytes)
+        obasis.integral_cache = cache
+        olp = obasis.compute_overlap()
+        kin = obasis.compute_kinetic()
+        # Use the overlap, such that the kinetic energy is the least recently used.
+        cache.store(obasis, ('olp',), 2*olp)
+        assert cache.size == 2*nbytes
+        obasis.compute_nuclear_attraction(obasis.centers, np.ones(3))
+        assert cache.size == 2*nbytes
+        assert cache.load(obasis, ('kin',)) is None
+        np.testing.assert_equal(cache.load(obasis, ('olp',)), 2*olp)
+        np.testing.assert_equal(obasis.compute_kinetic(), kin)
+        # Arrays larger than the maximum size are not stored.
+        obasis.compute_electron_repulsion()
+        assert cache.size == 2*nbytes
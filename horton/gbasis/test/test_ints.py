@@ -4415,6 +4415,34 @@ def check_g09_dipole(fn_fchk):
     np.testing.assert_almost_equal(dipole, mol.dipole_moment, decimal=6)
 
 
+def test_multipole_moments_all():
+    mol = IOData.from_file(context.get_fn('test/water_ccpvdz_pure_hf_g03.fchk'))
+    center = np.array([0.1, -0.2, 0.3])
+    lmax = 4
+    moments = mol.obasis.compute_multipole_moments(center, lmax)
+    assert moments.shape == (get_ncart_cumul(lmax), mol.obasis.nbasis, mol.obasis.nbasis)
+    np.testing.assert_allclose(moments[0], mol.obasis.compute_overlap(), rtol=0, atol=1e-12)
+    for icart, xyz in enumerate(get_cartesian_powers(lmax)[1:]):
+        expected = mol.obasis.compute_multipole_moment(xyz, center)
+        np.testing.assert_allclose(moments[icart + 1], expected, rtol=0, atol=1e-12)
+    # The result must not depend on the number of threads.
+    mol.obasis.nthread = 2
+    np.testing.assert_equal(mol.obasis.compute_multipole_moments(center, lmax), moments)
+    mol.obasis.nthread = 1
+    # Pure moments
+    pure = mol.obasis.compute_multipole_moments(center, 2, mtype=2)
+    assert pure.shape == (9, mol.obasis.nbasis, mol.obasis.nbasis)
+    np.testing.assert_allclose(pure[:4], moments[[0, 3, 1, 2]], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(pure[4], moments[9] - 0.5*moments[4] - 0.5*moments[7],
+                               rtol=0, atol=1e-12)
+    np.testing.assert_allclose(pure[8], np.sqrt(3)*moments[5], rtol=0, atol=1e-12)
+    # Errors
+    with assert_raises(ValueError):
+        mol.obasis.compute_multipole_moments(center, -1)
+    with assert_raises(ValueError):
+        mol.obasis.compute_multipole_moments(center, 2, mtype=3)
+
+
 def test_dipole_water_sto3g_hf():
     check_g09_dipole(context.get_fn('test/water_sto3g_hf_g03.fchk'))
 
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for the packed storage of four-center integrals."""
+
+
+import numpy as np
+from nose.tools import assert_raises
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.meanfield.observable import contract_direct, contract_exchange
+
+
+def get_random_four_index(nbasis, seed):
+    """Return a random four-index array with eight-fold symmetry."""
+    np.random.seed(seed)
+    result = np.random.uniform(-1, 1, (nbasis,)*4)
+    result += result.transpose(1, 0, 3, 2)
+    result += result.transpose(2, 3, 0, 1)
+    result += result.transpose(0, 3, 2, 1)
+    return result
+
+
+def get_h_chain_obasis():
+    """Return an s-only basis for a chain of hydrogen atoms."""
+    coordinates = np.array([[0.0, 0.0, 1.4*i] for i in range(5)])
+    coordinates[:, 0] += np.array([0.0, 0.3, -0.2, 0.1, 0.4])
+    return get_gobasis(coordinates, np.ones(5, int), '3-21g')
+
+
+def get_water_obasis():
+    mol = IOData.from_file(context.get_fn('test/water.xyz'))
+    return get_gobasis(mol.coordinates, mol.numbers, 'sto-3g')
+
+
+def test_packed_size():
+    for nbasis in range(1, 10):
+        npair = nbasis*(nbasis + 1)//2
+        assert get_packed_size(nbasis) == npair*(npair + 1)//2
+    assert get_packed_size(250)*8 < 250**4*1.05
+
+
+def test_pack_unpack():
+    for nbasis in 1, 2, 5:
+        dense = get_random_four_index(nbasis, nbasis)
+        packed = pack_four_index(dense)
+        assert packed.shape == (get_packed_size(nbasis),)
+        assert abs(unpack_four_index(packed) - dense).max() < 1e-12
+
+
+def test_contract_packed():
+    dense = get_random_four_index(6, 1)
+    packed = pack_four_index(dense)
+    for seed in range(3):
+        np.random.seed(seed)
+        # Also works for non-symmetric density matrices.
+        dm = np.random.uniform(-1, 1, (6, 6))
+        direct = np.einsum('abcd,bd->ac', dense, dm)
+        exchange = np.einsum('abcd,cb->ad', dense, dm)
+        assert abs(contract_direct_packed(packed, dm) - direct).max() < 1e-12
+        assert abs(contract_exchange_packed(packed, dm) - exchange).max() < 1e-12
+        assert abs(contract_direct(packed, dm) - direct).max() < 1e-12
+        assert abs(contract_exchange(packed, dm) - exchange).max() < 1e-12
+        # Old content of the output is discarded.
+        output = np.ones((6, 6))
+        contract_exchange_packed(packed, dm, output)
+        assert abs(output - exchange).max() < 1e-12
+
+
+def check_compute_packed(obasis, method, *args):
+    dense = getattr(obasis, method)(*args)
+    for nthread in 1, 3:
+        obasis.nthread = nthread
+        packed = getattr(obasis, method)(*args, packed=True)
+        assert abs(packed - pack_four_index(dense)).max() < 1e-12
+        # Screening gives the same result when the threshold is small.
+        packed = np.ones(get_packed_size(obasis.nbasis))
+        getattr(obasis, method)(*args, output=packed, schwarz_threshold=1e-15, packed=True)
+        assert abs(packed - pack_four_index(dense)).max() < 1e-10
+    obasis.nthread = 1
+
+
+def test_electron_repulsion_packed_h_chain():
+    check_compute_packed(get_h_chain_obasis(), 'compute_electron_repulsion')
+
+
+def test_electron_repulsion_packed_water():
+    check_compute_packed(get_water_obasis(), 'compute_electron_repulsion')
+
+
+def test_erf_repulsion_packed_h_chain():
+    check_compute_packed(get_h_chain_obasis(), 'compute_erf_repulsion', 0.8)
+
+
+def test_gauss_repulsion_packed_h_chain():
+    check_compute_packed(get_h_chain_obasis(), 'compute_gauss_repulsion', 0.7, 1.5)
+
+
+def test_ralpha_repulsion_packed_h_chain():
+    check_compute_packed(get_h_chain_obasis(), 'compute_ralpha_repulsion', -0.5)
+
+
+def test_packed_exceptions():
+    obasis = get_h_chain_obasis()
+    with assert_raises(TypeError):
+        obasis.compute_electron_repulsion(np.zeros(10), packed=True)
+    with assert_raises(TypeError):
+        unpack_four_index(np.zeros(7))
+    with assert_raises(TypeError):
+        contract_direct_packed(np.zeros(get_packed_size(3)), np.zeros((4, 4)))
+    with assert_raises(TypeError):
+        pack_four_index(np.zeros((2, 3, 2, 2)))
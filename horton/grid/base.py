@@ -24,7 +24,7 @@
 import numpy as np
 
 from horton.log import timer
-from horton.grid.utils import parse_args_integrate
+from horton.grid.utils import parse_args_integrate, get_hilbert_order
 from horton.grid.cext import dot_multi, eval_spline_grid, \
     dot_multi_moments, eval_decomposition_grid
 from horton.cext import Cell
@@ -99,6 +99,16 @@ class IntGrid(object):
     def zeros(self):
         return np.zeros(self.shape)
 
+    def get_spatial_order(self):
+        '''Return a permutation that sorts the grid points along a Hilbert curve
+
+           Consecutive blocks of grid points in this order are compact. This
+           improves the memory locality and the screening of basis functions
+           when properties are evaluated on the grid in blocks of points. See
+           ``get_hilbert_order`` in ``horton.grid.utils``.
+        '''
+        return get_hilbert_order(self.points)
+
     def integrate(self, *args, **kwargs):
         '''Integrate the product of all arguments
 
@@ -24,8 +24,10 @@
 #ifdef DEBUG
 #include <cstdio>
 #endif
+#include <algorithm>
 #include <cmath>
 #include <stdexcept>
+#include <vector>
 
 #include "horton/grid/becke.h"
 
@@ -46,6 +48,67 @@ static double dist(double* p0, double* p1) {
 }
 
 
+/* becke_switch
+
+   The switching function of Becke, Eq. (18-20), after the heteronuclear
+   correction of Eq. (A2).
+
+   nu
+        The corrected elliptical coordinate.
+
+   order
+        The order of the switching function in the Becke scheme.
+*/
+static double becke_switch(double nu, int order) {
+    for (int k=1; k <= order; k++) { // Eq. (19) and (20)
+        nu = 0.5*nu*(3-nu*nu);
+    }
+    return 0.5*(1-nu); // Eq. (18)
+}
+
+
+/* becke_switch_margin
+
+   Returns delta, such that the switching function is below epsilon for
+   nu > 1 - delta and above 1 - epsilon for nu < delta - 1. The switching
+   function is decreasing, so delta is found by bisection.
+*/
+static double becke_switch_margin(int order, double epsilon) {
+    double low = 0.0;  // nu where the switching function is above epsilon
+    double high = 1.0;  // nu where the switching function is below epsilon
+    for (int irep = 0; irep < 100; irep++) {
+        double mid = 0.5*(low + high);
+        if (becke_switch(mid, order) < epsilon) {
+            high = mid;
+        } else {
+            low = mid;
+        }
+    }
+    return 1 - high;
+}
+
+
+/* sort_neighbors
+
+   For each atom, write the indexes of all other atoms to neighbors, sorted by
+   increasing distance. The result has shape (natom, natom-1).
+*/
+static void sort_neighbors(int natom, const std::vector<double>& inv_dists,
+                           std::vector<int>* neighbors) {
+    neighbors->resize(natom*(natom-1));
+    for (int iatom0 = 0; iatom0 < natom; iatom0++) {
+        int* begin = neighbors->data() + iatom0*(natom-1);
+        int ineighbor = 0;
+        for (int iatom1 = 0; iatom1 < natom; iatom1++) {
+            if (iatom0 != iatom1) begin[ineighbor++] = iatom1;
+        }
+        const double* row = &inv_dists[iatom0*natom];
+        std::sort(begin, begin + natom - 1,
+                  [row](int a, int b) {return row[a] > row[b];});
+    }
+}
+
+
 /* becke_helper_atom
 
    Computes the Becke weighting function for every point in the grid
@@ -75,21 +138,44 @@ static double dist(double* p0, double* p1) {
    order
         The order of the switching function in the Becke scheme.
 
+   epsilon
+        Switching functions closer than epsilon to zero or one are treated as
+        exactly zero or one. When zero, all atom pairs are taken into account.
+
+        Otherwise, each point only interacts with atoms in its neighborhood:
+        (i) The factor of atom B in the cell function of atom A is one when
+        1 + nu_AB < delta, with delta given by becke_switch_margin. Because
+        1 + nu_AB < 1.9*(1 + mu_AB) < 3.8*d_A/R_AB, this holds for all B with
+        R_AB > 3.8*d_A/delta. The neighbors of A are sorted by distance, such
+        that the product can be stopped at the first such neighbor. (ii) A cell
+        function is set to zero as soon as the product drops below epsilon. In
+        particular, atoms whose factor for the atom nearest to the point is
+        below epsilon are skipped altogether. Hence, all factors that are left
+        out are within epsilon from one and all cell functions that are set to
+        zero are below epsilon. The cell function of the nearest atom is never
+        set to zero.
+
    See Becke's paper for the details:
    A. D. Becke, The Journal of Chemical Physics 88, 2547 (1988)
    URL http://dx.doi.org/10.1063/1.454033.
 */
 void becke_helper_atom(int npoint, double* points, double* weights, int natom,
-                       double* radii, double* centers, int select, int order)
+                       double* radii, double* centers, int select, int order,
+                       double epsilon)
 {
-    double nom, denom; // The nominator and the denominator in the weight definition
-    double p, s; // Used to build up the value of the switching function
+    if (epsilon < 0) {
+        throw std::domain_error("epsilon can not be negative.");
+    }
+    const bool screen = (epsilon > 0);
 
-    // precompute the the alpha parameters for each atom pair
-    double alphas[(natom*(natom+1))/2];
-    long offset = 0;
+    // precompute the the alpha parameters and the inverse distances for each
+    // ordered atom pair. These tables are allocated on the heap because they
+    // become large for big molecules.
+    std::vector<double> alphas(natom*natom);
+    std::vector<double> inv_dists(natom*natom);
     for (int iatom0 = 0; iatom0 < natom; iatom0++) {
-        for (int iatom1 = 0; iatom1 <= iatom0; iatom1++) {
+        for (int iatom1 = 0; iatom1 < natom; iatom1++) {
+            if (iatom0 == iatom1) continue;
             // Heteronuclear assignment of the boundary. (Appendix in Becke's paper.)
             double alpha = (radii[iatom0] - radii[iatom1])/(radii[iatom0] + radii[iatom1]); // Eq. (A6)
             alpha = alpha/(alpha*alpha-1); // Eq. (A5)
@@ -100,54 +186,70 @@ void becke_helper_atom(int npoint, double* points, double* weights, int natom,
             } else if (alpha < -0.45) {
                 alpha = -0.45;
             }
-            alphas[offset] = alpha;
-            offset += 1;
+            alphas[iatom0*natom + iatom1] = alpha;
+            inv_dists[iatom0*natom + iatom1] = 1/dist(&centers[3*iatom0], &centers[3*iatom1]);
         }
     }
 
-    // precompute interatomic distances
-    double atomic_dists[(natom*(natom+1))/2];
-    offset = 0;
-    for (int iatom0 = 0; iatom0 < natom; iatom0++) {
-        for (int iatom1 = 0; iatom1 <= iatom0; iatom1++) {
-            atomic_dists[offset] = dist(&centers[3*iatom0], &centers[3*iatom1]);
-            offset += 1;
-        }
+    // When screening, the neighbors of each atom are sorted by distance and the
+    // product over neighbors stops at the distance dist_factor*d_A.
+    std::vector<int> neighbors;
+    double dist_factor = 0;
+    if (screen) {
+        sort_neighbors(natom, inv_dists, &neighbors);
+        dist_factor = 3.8/becke_switch_margin(order, epsilon);
     }
 
+    // distances between the current grid point and all atoms
+    std::vector<double> point_dists(natom);
+
     // actual computations of Becke weights
-    for (int ipoint = npoint-1; ipoint>=0; ipoint--) {
-        nom = 0;
-        denom = 0;
+    for (int ipoint = 0; ipoint < npoint; ipoint++) {
+        int nearest = 0;
+        for (int iatom = 0; iatom < natom; iatom++) {
+            point_dists[iatom] = dist(points, &centers[3*iatom]);
+            if (point_dists[iatom] < point_dists[nearest]) nearest = iatom;
+        }
+
+        double nom = 0; // The nominator in the weight definition
+        double denom = 0; // The denominator in the weight definition
         for (int iatom0 = 0; iatom0 < natom; iatom0++) {
-            p = 1;
-            for (int iatom1 = 0; iatom1 < natom; iatom1++) {
-                if (iatom0 == iatom1) continue;
-
-                // compute offset for alpha and interatomic distance
-                if (iatom0 < iatom1) {
-                    offset = (iatom1*(iatom1+1))/2+iatom0;
-                } else {
-                    offset = (iatom0*(iatom0+1))/2+iatom1;
+            const double* alpha_row = &alphas[iatom0*natom];
+            const double* inv_dist_row = &inv_dists[iatom0*natom];
+            const double d0 = point_dists[iatom0];
+            double p = 1; // Used to build up the cell function, Eq. (13)
+            if (screen) {
+                if (iatom0 != nearest) {
+                    // Cheap upper bound for the cell function.
+                    double mu = (d0 - point_dists[nearest])*inv_dist_row[nearest]; // Eq. (11)
+                    mu += alpha_row[nearest]*(1-mu*mu); // Eq. (A2)
+                    if (becke_switch(mu, order) < epsilon) continue;
                 }
-
-                // Diatomic switching function
-                s = (dist(points, &centers[3*iatom0])
-                     -dist(points, &centers[3*iatom1]))
-                    /atomic_dists[offset]; // Eq. (11)
-                s = s + alphas[offset]*(1 - 2*(iatom0<iatom1))*(1-s*s); // Eq. (A2)
-
-                for (int k=1; k <= order; k++) { // Eq. (19) and (20)
-                    s = 0.5*s*(3-s*s);
+                const int* begin = &neighbors[iatom0*(natom-1)];
+                const double cutoff = dist_factor*d0;
+                for (const int* neighbor = begin; neighbor < begin + natom - 1; neighbor++) {
+                    const int iatom1 = *neighbor;
+                    if (cutoff*inv_dist_row[iatom1] < 1) break;
+                    double mu = (d0 - point_dists[iatom1])*inv_dist_row[iatom1]; // Eq. (11)
+                    mu += alpha_row[iatom1]*(1-mu*mu); // Eq. (A2)
+                    p *= becke_switch(mu, order); // Eq. (13)
+                    // The nearest atom is never dropped, such that denom > 0.
+                    if ((p < epsilon) && (iatom0 != nearest)) {
+                        p = 0;
+                        break;
+                    }
                 }
-                s = 0.5*(1-s); // Eq. (18)
-
-                p *= s; // Eq. (13)
+            } else {
+                for (int iatom1 = 0; iatom1 < natom; iatom1++) {
+                    if (iatom0 == iatom1) continue;
+                    double mu = (d0 - point_dists[iatom1])*inv_dist_row[iatom1]; // Eq. (11)
+                    mu += alpha_row[iatom1]*(1-mu*mu); // Eq. (A2)
+                    p *= becke_switch(mu, order); // Eq. (13)
+                }
+            }
 #ifdef DEBUG
-                printf("iatom0=%i  iatom1=%i s=%f p=%f\n", iatom0, iatom1, s, p);
+            printf("iatom0=%i p=%f\n", iatom0, p);
 #endif
-            }
-
             if (iatom0 == select) nom = p;
             denom += p; // Eq. (22)
         }
@@ -163,3 +265,117 @@ void becke_helper_atom(int npoint, double* points, double* weights, int natom,
         weights++;
     }
 }
+
+
+/* ssf_switch
+
+   The switching function of Stratmann, Scuseria and Frisch, Eq. (14) and (18).
+   It is exactly one for mu <= -a and exactly zero for mu >= a.
+*/
+static double ssf_switch(double mu) {
+    const double a = SSF_A;
+    if (mu <= -a) return 1;
+    if (mu >= a) return 0;
+    const double x = mu/a;
+    const double x2 = x*x;
+    const double g = x*(35 + x2*(-35 + x2*(21 - 5*x2)))/16;
+    return 0.5*(1 - g);
+}
+
+
+/* ssf_helper_atom
+
+   Computes the weighting function of Stratmann, Scuseria and Frisch for every
+   point in the grid.
+
+   npoint
+        The number of grid points
+
+   points
+        The grid points. row-major storate of (npoint,3) array.
+
+   weights
+        The output, i.e. the SSF weights for the grid points. Note that the
+        weight is **multiplied** with the original contents of the array!
+
+   natom
+        The number of atoms
+
+   centers
+        The positions of the atoms.
+
+   select
+        The selected atom for which the weights are to be computed.
+
+   The switching function has a hard cutoff, which leads to the following
+   exact shortcuts: (i) Points closer to the selected atom than
+   0.5*(1-a)*R_min, where R_min is the distance to the nearest neighbor of the
+   selected atom, have a weight of exactly one. (ii) The cell function of an
+   atom is zero when mu >= a for the atom nearest to the point. (iii) Because
+   mu_AB <= 2*d_A/R_AB - 1, all factors of neighbors B with
+   R_AB >= 2*d_A/(1-a) are exactly one. The neighbors of each atom are sorted
+   by distance, such that the product can be stopped at the first of them.
+
+   See the paper of Stratmann, Scuseria and Frisch for the details:
+   R. E. Stratmann, G. E. Scuseria and M. J. Frisch, Chemical Physics Letters
+   257, 213 (1996) URL http://dx.doi.org/10.1016/0009-2614(96)00600-8.
+*/
+void ssf_helper_atom(int npoint, double* points, double* weights, int natom,
+                     double* centers, int select)
+{
+    // All points of a single atom get a weight of one.
+    if (natom == 1) return;
+
+    // precompute the inverse distances for each ordered atom pair and sort the
+    // neighbors of each atom.
+    std::vector<double> inv_dists(natom*natom);
+    for (int iatom0 = 0; iatom0 < natom; iatom0++) {
+        for (int iatom1 = 0; iatom1 < natom; iatom1++) {
+            if (iatom0 == iatom1) continue;
+            inv_dists[iatom0*natom + iatom1] = 1/dist(&centers[3*iatom0], &centers[3*iatom1]);
+        }
+    }
+    std::vector<int> neighbors;
+    sort_neighbors(natom, inv_dists, &neighbors);
+
+    // Points inside this sphere around the selected atom get a weight of one.
+    const double sure_radius = 0.5*(1 - SSF_A)/inv_dists[select*natom + neighbors[select*(natom-1)]];
+    // Neighbors further than dist_factor*d_A do not affect the cell function of A.
+    const double dist_factor = 2/(1 - SSF_A);
+
+    // distances between the current grid point and all atoms
+    std::vector<double> point_dists(natom);
+
+    for (int ipoint = 0; ipoint < npoint; ipoint++, points += 3, weights++) {
+        if (dist(points, &centers[3*select]) < sure_radius) continue;
+
+        int nearest = 0;
+        for (int iatom = 0; iatom < natom; iatom++) {
+            point_dists[iatom] = dist(points, &centers[3*iatom]);
+            if (point_dists[iatom] < point_dists[nearest]) nearest = iatom;
+        }
+
+        double nom = 0; // The nominator in the weight definition
+        double denom = 0; // The denominator in the weight definition
+        for (int iatom0 = 0; iatom0 < natom; iatom0++) {
+            const double* inv_dist_row = &inv_dists[iatom0*natom];
+            const double d0 = point_dists[iatom0];
+            if ((iatom0 != nearest) &&
+                ((d0 - point_dists[nearest])*inv_dist_row[nearest] >= SSF_A)) continue;
+            double p = 1;
+            const int* begin = &neighbors[iatom0*(natom-1)];
+            const double cutoff = dist_factor*d0;
+            for (const int* neighbor = begin; neighbor < begin + natom - 1; neighbor++) {
+                const int iatom1 = *neighbor;
+                if (cutoff*inv_dist_row[iatom1] <= 1) break;
+                p *= ssf_switch((d0 - point_dists[iatom1])*inv_dist_row[iatom1]);
+                if (p == 0) break;
+            }
+            if (iatom0 == select) nom = p;
+            denom += p;
+        }
+
+        // Weight function at this grid point:
+        *weights *= nom/denom;
+    }
+}
@@ -24,6 +24,13 @@
 #define HORTON_GRID_BECKE_H
 
 void becke_helper_atom(int npoint, double* points, double* weights, int natom,
-                       double* radii, double* centers, int select, int order);
+                       double* radii, double* centers, int select, int order,
+                       double epsilon = 0.0);
+
+//! The parameter a in the switching function of Stratmann, Scuseria and Frisch.
+const double SSF_A = 0.64;
+
+void ssf_helper_atom(int npoint, double* points, double* weights, int natom,
+                     double* centers, int select);
 
 #endif
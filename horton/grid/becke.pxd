@@ -24,4 +24,6 @@
 cdef extern from "horton/grid/becke.h":
     void becke_helper_atom(int npoint, double* points, double* weights,
                            int natom, double* radii, double* centers, int
-                           select, int order)
+                           select, int order, double epsilon) except + nogil
+    void ssf_helper_atom(int npoint, double* points, double* weights,
+                         int natom, double* centers, int select) nogil
@@ -50,7 +50,7 @@ __all__ = [
     # lebedev_laikov
     'lebedev_laikov_npoints', 'lebedev_laikov_lmaxs', 'lebedev_laikov_sphere',
     # becke
-    'becke_helper_atom',
+    'becke_helper_atom', 'ssf_helper_atom',
     # cubic_spline
     'Extrapolation', 'ZeroExtrapolation', 'CuspExtrapolation',
     'PowerExtrapolation', 'PotentialExtrapolation', 'tridiagsym_solve', 'CubicSpline',
@@ -134,8 +134,8 @@ def becke_helper_atom(np.ndarray[double, ndim=2] points not None,
                       np.ndarray[double, ndim=1] weights not None,
                       np.ndarray[double, ndim=1] radii not None,
                       np.ndarray[double, ndim=2] centers not None,
-                      int select, int order):
-    '''beck_helper_atom(points, weights, radii, centers, i, k)
+                      int select, int order, double epsilon=0.0):
+    '''beck_helper_atom(points, weights, radii, centers, i, k, epsilon=0.0)
 
        Compute the Becke weights for a given atom an a grid.
 
@@ -162,8 +162,18 @@ def becke_helper_atom(np.ndarray[double, ndim=2] points not None,
        order
             The order of the switching functions. (That is k in Becke's paper.)
 
+       **Optional arguments:**
+
+       epsilon
+            When positive, switching functions closer than epsilon to zero or
+            one are treated as exactly zero or one. Each grid point then only
+            interacts with the atoms in its neighborhood, which makes the cost
+            nearly linear in the number of atoms for points close to a nucleus.
+            When zero, all pairs of atoms are taken into account.
+
        See Becke's paper for the details: http://dx.doi.org/10.1063/1.454033
     '''
+    cdef int npoint, natom
     assert points.flags['C_CONTIGUOUS']
     assert points.shape[1] == 3
     npoint = points.shape[0]
@@ -177,8 +187,61 @@ def becke_helper_atom(np.ndarray[double, ndim=2] points not None,
     assert select >= 0 and select < natom
     assert order > 0
 
-    becke.becke_helper_atom(points.shape[0], &points[0, 0], &weights[0], natom,
-                            &radii[0], &centers[0, 0], select, order)
+    cdef double* points_ptr = &points[0, 0]
+    cdef double* weights_ptr = &weights[0]
+    cdef double* radii_ptr = &radii[0]
+    cdef double* centers_ptr = &centers[0, 0]
+    with nogil:
+        becke.becke_helper_atom(npoint, points_ptr, weights_ptr, natom, radii_ptr,
+                                centers_ptr, select, order, epsilon)
+
+
+def ssf_helper_atom(np.ndarray[double, ndim=2] points not None,
+                    np.ndarray[double, ndim=1] weights not None,
+                    np.ndarray[double, ndim=2] centers not None,
+                    int select):
+    '''ssf_helper_atom(points, weights, centers, i)
+
+       Compute the Stratmann-Scuseria-Frisch weights for a given atom an a grid.
+
+       **Arguments:**
+
+       points
+            The Cartesian coordinates of the grid points. Numpy array with
+            shape (npoint, 3)
+
+       weights
+            The output array. The SSF partitioning weights are multiplied with
+            its contents. Numpy array with shape (npoint,)
+
+       centers
+            The positions of the nuclei.
+
+       select
+            The selected atom for which the weights should be created.
+
+       The switching function has a hard cutoff, such that each grid point only
+       interacts with the atoms in its neighborhood and points close to the
+       selected atom are skipped altogether. No atomic size adjustments are
+       made. See http://dx.doi.org/10.1016/0009-2614(96)00600-8
+    '''
+    cdef int npoint, natom
+    assert points.flags['C_CONTIGUOUS']
+    assert points.shape[1] == 3
+    npoint = points.shape[0]
+    assert weights.flags['C_CONTIGUOUS']
+    assert weights.shape[0] == npoint
+    assert centers.flags['C_CONTIGUOUS']
+    natom = centers.shape[0]
+    assert centers.shape[1] == 3
+    assert select >= 0 and select < natom
+
+    cdef double* points_ptr = &points[0, 0]
+    cdef double* weights_ptr = &weights[0]
+    cdef double* centers_ptr = &centers[0, 0]
+    with nogil:
+        becke.ssf_helper_atom(npoint, points_ptr, weights_ptr, natom, centers_ptr,
+                              select)
 
 
 #
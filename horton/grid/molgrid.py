@@ -22,11 +22,14 @@
 
 
 
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
 
 from horton.grid.base import IntGrid
+from horton.grid.utils import get_hilbert_order
 from horton.grid.atgrid import AtomicGrid, AtomicGridSpec
-from horton.grid.cext import becke_helper_atom
+from horton.grid.cext import becke_helper_atom, ssf_helper_atom
 from horton.log import log, timer, biblio
 from horton.periodic import periodic
 from horton.utils import typecheck_geo, doc_inherit
@@ -39,10 +42,12 @@ __all__ = [
 
 
 class BeckeMolGrid(IntGrid):
-    '''Molecular integration grid using Becke weights'''
+    '''Molecular integration grid using Becke (or SSF) weights'''
 
     @timer.with_section('Becke-Lebedev')
-    def __init__(self, centers, numbers, pseudo_numbers=None, agspec='medium', k=3, random_rotate=True, mode='discard'):
+    def __init__(self, centers, numbers, pseudo_numbers=None, agspec='medium', k=3,
+                 random_rotate=True, mode='discard', epsilon=1e-14, weights='becke',
+                 nworkers=1, prune=0.0, prune_density=False, spatial_order=False):
         '''
            **Arguments:**
 
@@ -66,6 +71,54 @@ class BeckeMolGrid(IntGrid):
            k
                 The order of the switching function in Becke's weighting scheme.
 
+           epsilon
+                Switching functions closer than epsilon to zero or one are
+                treated as exactly zero or one, such that every grid point only
+                interacts with the atoms in its neighborhood. This makes the
+                construction of grids for large molecules much faster. Set to
+                zero to take into account all pairs of atoms.
+
+           weights
+                The scheme for the partitioning weights of the atomic grids:
+
+                * ``'becke'`` (the default) uses Becke's switching function of
+                  order ``k``, with atomic size adjustments based on covalent
+                  radii.
+
+                * ``'ssf'`` uses the switching function of Stratmann, Scuseria
+                  and Frisch, which has a hard cutoff. Points close to their own
+                  nucleus are skipped and other points only interact with nearby
+                  atoms, which makes this much faster for large molecules. The
+                  arguments ``k`` and ``epsilon`` are not used.
+
+           nworkers
+                The number of threads used to compute the partitioning weights
+                of different atoms concurrently. The results do not depend on
+                the number of threads.
+
+           prune
+                When larger than zero, all points whose integration weight is
+                below this threshold are removed from the molecular grid. These
+                are mostly points deep inside the cells of other atoms or far
+                away from the molecule. The number of removed points is given
+                by the ``npruned`` attribute. The atomic subgrids are not
+                pruned, so methods that need complete atomic grids, e.g.
+                spherical decompositions, can not be used with pruned grids.
+
+           prune_density
+                When set to True, points are only removed when the product of
+                the integration weight and a crude estimate of the promolecular
+                density is below the threshold ``prune``. More points are then
+                removed far away from the molecule, where the density is small.
+
+           spatial_order
+                When set to True, the points of the molecular grid are sorted
+                along a Hilbert curve instead of being stored atom by atom.
+                Consecutive points are then close in space, which makes the
+                evaluation of basis functions in blocks of grid points more
+                efficient. The ``order`` attribute and the ``to_atomic_grid``
+                method relate the points to the atomic grids.
+
            random_rotate
                 Flag to control random rotation of spherical grids.
 
@@ -90,6 +143,14 @@ class BeckeMolGrid(IntGrid):
         # check if the mode argument is valid
         if mode not in ['discard', 'keep', 'only']:
             raise ValueError('The mode argument must be \'discard\', \'keep\' or \'only\'.')
+        # check if the weights argument is valid
+        if weights not in ['becke', 'ssf']:
+            raise ValueError('The weights argument must be \'becke\' or \'ssf\'.')
+        # pruning needs the molecular integration weights
+        if prune < 0:
+            raise ValueError('The prune argument can not be negative.')
+        if prune > 0 and mode == 'only':
+            raise ValueError('Pruning can not be combined with mode=\'only\'.')
 
         # transform agspec into a usable format
         if not isinstance(agspec, AtomicGridSpec):
@@ -98,22 +159,20 @@ class BeckeMolGrid(IntGrid):
 
         # assign attributes
         self._k = k
+        self._epsilon = epsilon
+        self._weights_scheme = weights
         self._random_rotate = random_rotate
         self._mode = mode
+        self._prune = prune
+        self._prune_density = prune_density
+        self._spatial_order = spatial_order
 
         # allocate memory for the grid
         size = sum(agspec.get_size(self.numbers[i], self.pseudo_numbers[i]) for i in range(natom))
         points = np.zeros((size, 3), float)
-        weights = np.zeros(size, float)
+        grid_weights = np.zeros(size, float)
         self._becke_weights = np.ones(size, float)
 
-        # construct the atomic grids
-        if mode != 'discard':
-            atgrids = []
-        else:
-            atgrids = None
-        offset = 0
-
         if mode != 'only':
             # More recent covalent radii are used than in the original work of Becke.
             # No covalent radius is defined for elements heavier than Curium and a
@@ -124,23 +183,96 @@ class BeckeMolGrid(IntGrid):
         if log.do_medium:
             log('Preparing Becke-Lebedev molecular integration grid.')
         pb = log.progress(natom)
+
+        # Construct the atomic grids. This is cheap and it is done serially, such
+        # that random rotations do not depend on the number of workers.
+        atgrids = []
+        offsets = [0]
         for i in range(natom):
             atsize = agspec.get_size(self.numbers[i], self.pseudo_numbers[i])
-            atgrid = AtomicGrid(
+            begin = offsets[-1]
+            atgrids.append(AtomicGrid(
                 self.numbers[i], self.pseudo_numbers[i],
                 self.centers[i], agspec, random_rotate,
-                points[offset:offset+atsize])
-            if mode != 'only':
-                atbecke_weights = self._becke_weights[offset:offset+atsize]
-                becke_helper_atom(points[offset:offset+atsize], atbecke_weights, cov_radii, self.centers, i, self._k)
-                weights[offset:offset+atsize] = atgrid.weights*atbecke_weights
-            if mode != 'discard':
-                atgrids.append(atgrid)
-            offset += atsize
-            pb()
+                points[begin:begin+atsize]))
+            offsets.append(begin + atsize)
+            if mode == 'only':
+                pb()
+
+        def compute_atom_weights(i):
+            """Compute the partitioning and integration weights of one atomic grid."""
+            begin, end = offsets[i], offsets[i+1]
+            atbecke_weights = self._becke_weights[begin:end]
+            if weights == 'ssf':
+                ssf_helper_atom(points[begin:end], atbecke_weights, self.centers, i)
+            else:
+                becke_helper_atom(points[begin:end], atbecke_weights, cov_radii, self.centers, i,
+                                  self._k, self._epsilon)
+            grid_weights[begin:end] = atgrids[i].weights*atbecke_weights
+
+        # The partitioning weights of different atoms are written to disjoint
+        # slices. The kernels release the GIL, so threads run concurrently.
+        if mode != 'only':
+            if nworkers > 1:
+                pool = ThreadPool(nworkers)
+                try:
+                    for _result in pool.imap_unordered(compute_atom_weights, range(natom)):
+                        pb()
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                for i in range(natom):
+                    compute_atom_weights(i)
+                    pb()
+
+        if mode == 'discard':
+            atgrids = None
+
+        # Remove points with negligible contributions to integrals and sort
+        # the remaining points. The order array keeps track of the original
+        # position of each point in the concatenation of the atomic grids.
+        self._npruned = 0
+        self._order = None
+        if prune > 0:
+            criterion = grid_weights
+            if prune_density:
+                criterion = criterion*_estimate_promolecular_density(
+                    points, self.centers, self.pseudo_numbers)
+            mask = criterion >= prune
+            self._npruned = size - mask.sum()
+            self._order = mask.nonzero()[0]
+        if spatial_order:
+            hilbert_order = get_hilbert_order(
+                points if self._order is None else points[self._order])
+            self._order = hilbert_order if self._order is None else self._order[hilbert_order]
+        if self._order is not None:
+            points = points[self._order]
+            grid_weights = grid_weights[self._order]
+            self._becke_weights = self._becke_weights[self._order]
 
         # finish
-        IntGrid.__init__(self, points, weights, atgrids)
+        if spatial_order:
+            # The points of one atom are no longer contiguous, so the subgrids
+            # do not get begin and end attributes.
+            IntGrid.__init__(self, points, grid_weights)
+            self._subgrids = atgrids
+        else:
+            IntGrid.__init__(self, points, grid_weights, atgrids)
+
+        # Positions of the points of the atomic grids in the molecular grid,
+        # or -1 for points that were removed.
+        self._subgrid_indexes = None
+        if atgrids is not None and self._order is not None:
+            positions = np.zeros(size, int) - 1
+            positions[self._order] = np.arange(len(self._order))
+            self._subgrid_indexes = [positions[offsets[i]:offsets[i+1]] for i in range(natom)]
+            if not spatial_order:
+                offset = 0
+                for atgrid, indexes in zip(atgrids, self._subgrid_indexes):
+                    atgrid.begin = offset
+                    offset += (indexes >= 0).sum()
+                    atgrid.end = offset
 
         # Some screen info
         self._log_init()
@@ -155,6 +287,11 @@ class BeckeMolGrid(IntGrid):
             grp['k'][()],
             grp['random_rotate'][()],
             grp.attrs['mode'],
+            grp['epsilon'][()] if 'epsilon' in grp else 0.0,
+            grp.attrs.get('weights', 'becke'),
+            prune=grp.attrs.get('prune', 0.0),
+            prune_density=grp.attrs.get('prune_density', False),
+            spatial_order=grp.attrs.get('spatial_order', False),
         )
 
     def to_hdf5(self, grp):
@@ -166,7 +303,12 @@ class BeckeMolGrid(IntGrid):
         self.agspec.to_hdf5(grp_agspec, (self._numbers, self._pseudo_numbers))
         grp['random_rotate'] = self._random_rotate
         grp['k'] = self._k
+        grp['epsilon'] = self._epsilon
         grp.attrs['mode'] = self._mode
+        grp.attrs['weights'] = self._weights_scheme
+        grp.attrs['prune'] = self._prune
+        grp.attrs['prune_density'] = self._prune_density
+        grp.attrs['spatial_order'] = self._spatial_order
 
     def _get_centers(self):
         '''The positions of the nuclei'''
@@ -198,6 +340,18 @@ class BeckeMolGrid(IntGrid):
 
     k = property(_get_k)
 
+    def _get_epsilon(self):
+        '''The threshold for switching functions, see ``__init__``.'''
+        return self._epsilon
+
+    epsilon = property(_get_epsilon)
+
+    def _get_weights_scheme(self):
+        '''The scheme for the partitioning weights: 'becke' or 'ssf'.'''
+        return self._weights_scheme
+
+    weights_scheme = property(_get_weights_scheme)
+
     def _get_random_rotate(self):
         '''The random rotation flag.'''
         return self._random_rotate
@@ -211,25 +365,109 @@ class BeckeMolGrid(IntGrid):
     mode = property(_get_mode)
 
     def _get_becke_weights(self):
-        '''The becke weights of the grid points'''
+        '''The becke (or SSF) weights of the grid points'''
         return self._becke_weights
 
     becke_weights = property(_get_becke_weights)
 
+    def _get_prune(self):
+        '''The threshold for the removal of grid points, see ``__init__``.'''
+        return self._prune
+
+    prune = property(_get_prune)
+
+    def _get_prune_density(self):
+        '''Whether the promolecular density is used for pruning.'''
+        return self._prune_density
+
+    prune_density = property(_get_prune_density)
+
+    def _get_npruned(self):
+        '''The number of grid points removed by pruning.'''
+        return self._npruned
+
+    npruned = property(_get_npruned)
+
+    def _get_spatial_order(self):
+        '''Whether the points are sorted along a Hilbert curve.'''
+        return self._spatial_order
+
+    spatial_order = property(_get_spatial_order)
+
+    def _get_order(self):
+        '''The position of each point in the concatenation of the atomic grids.
+
+           This is None when no points were removed or sorted.
+        '''
+        return self._order
+
+    order = property(_get_order)
+
+    def to_atomic_grid(self, index, data):
+        '''Return data on the molecular grid for all points of an atomic grid
+
+           **Arguments:**
+
+           index
+                The index of the atom.
+
+           data
+                An array with values on the points of the molecular grid.
+
+           The result is an array with the size of the atomic grid. The values
+           at points that were removed by pruning are set to zero.
+        '''
+        if self.subgrids is None:
+            raise TypeError('The atomic grids are only available when mode==\'keep\' or '
+                            'mode==\'only\'.')
+        atgrid = self.subgrids[index]
+        if self._subgrid_indexes is None:
+            return data[atgrid.begin:atgrid.end]
+        indexes = self._subgrid_indexes[index]
+        mask = indexes >= 0
+        result = np.zeros((atgrid.size,) + data.shape[1:], data.dtype)
+        result[mask] = data[indexes[mask]]
+        return result
+
     def _log_init(self):
         if log.do_medium:
             log('Initialized: %s' % self)
-            log.deflist([
+            deflist = [
                 ('Size', self.size),
-                ('Switching function', 'k=%i' % self._k),
-            ])
+                ('Switching function',
+                 'SSF' if self._weights_scheme == 'ssf' else 'k=%i' % self._k),
+            ]
+            if self._prune > 0:
+                deflist.append(('Pruned points',
+                                '%i (threshold=%.1e)' % (self._npruned, self._prune)))
+            if self._spatial_order:
+                deflist.append(('Point order', 'Hilbert curve'))
+            log.deflist(deflist)
             log.blank()
         # Cite reference
         biblio.cite('becke1988_multicenter', 'the multicenter integration scheme used for the molecular integration grid')
-        biblio.cite('cordero2008', 'the covalent radii used for the Becke-Lebedev molecular integration grid')
+        if self._weights_scheme == 'ssf':
+            biblio.cite('stratmann1996',
+                        'the partitioning weights used for the molecular integration grid')
+        else:
+            biblio.cite('cordero2008', 'the covalent radii used for the Becke-Lebedev molecular integration grid')
 
     @doc_inherit(IntGrid)
     def integrate(self, *args, **kwargs):
         if self.mode == 'only':
             raise NotImplementedError('When mode==\'only\', only the subgrids can be used for integration.')
         return IntGrid.integrate(self, *args, **kwargs)
+
+
+def _estimate_promolecular_density(points, centers, pseudo_numbers):
+    '''Return a crude estimate of the promolecular density at the grid points
+
+       Every atom contributes a normalized exponential, with the decay of a
+       hydrogen 1s density, multiplied by its effective core charge.
+    '''
+    result = np.zeros(len(points))
+    for center, pseudo_number in zip(centers, pseudo_numbers):
+        dists = np.sqrt(((points - center)**2).sum(axis=1))
+        result += pseudo_number*np.exp(-2*dists)
+    result /= np.pi
+    return result
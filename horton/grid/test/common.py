@@ -25,7 +25,7 @@ import numpy as np
 from horton.grid.cext import LinearRTransform, CubicSpline
 
 
-__all__ = ['get_cosine_spline', 'get_exp_spline']
+__all__ = ['get_cosine_spline', 'get_exp_spline', 'get_block_volume']
 
 
 def get_cosine_spline():
@@ -43,3 +43,14 @@ def get_exp_spline():
     y = np.exp(-0.2*x)
     d = -0.2*np.exp(-0.2*x)
     return CubicSpline(y, d, rtf)
+
+
+def get_block_volume(points, block_size=256):
+    """Return the summed volume of the bounding boxes of blocks of consecutive points.
+
+    The default block size is the one used by GOBasis to evaluate properties on grids.
+    """
+    begins = np.arange(0, len(points), block_size)
+    lower = np.minimum.reduceat(points, begins, axis=0)
+    upper = np.maximum.reduceat(points, begins, axis=0)
+    return np.prod(upper - lower, axis=1).sum()
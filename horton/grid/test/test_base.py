@@ -24,7 +24,7 @@ import numpy as np
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
-from horton.grid.test.common import get_cosine_spline
+from horton.grid.test.common import get_cosine_spline, get_block_volume
 from horton.test.common import get_random_cell, numpy_seed
 
 
@@ -399,3 +399,14 @@ def test_density_decomposition_n2():
         nucgrid.eval_decomposition(splines[:(lmax+1)**2], mol.coordinates[0], tmp)
         np.testing.assert_almost_equal(tmp[0], tmp_s[0]/np.sqrt(4*np.pi))
         assert np.isfinite(tmp).all()
+
+
+def test_grid_spatial_order():
+    npoint = 1000
+    grid = IntGrid(np.random.uniform(-5, 5, (npoint, 3)), np.random.normal(0, 1, npoint))
+    # Spatial sorting makes the blocks more compact.
+    order = grid.get_spatial_order()
+    assert (np.sort(order) == np.arange(npoint)).all()
+    sorted_grid = IntGrid(grid.points[order], grid.weights[order])
+    assert abs(sorted_grid.integrate() - grid.integrate()) < 1e-10
+    assert get_block_volume(sorted_grid.points, 64) < 0.2*get_block_volume(grid.points, 64)
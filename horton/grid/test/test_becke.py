@@ -21,6 +21,7 @@
 
 
 import numpy as np
+from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
@@ -82,3 +83,77 @@ def test_becke_special_points():
     assert abs(weights[0]) < 1e-10
     assert abs(weights[1]) < 1e-10
     assert abs(weights[2] - 1.0) < 1e-10
+
+
+def test_becke_epsilon():
+    # A chain of atoms, such that most pairs are far apart.
+    natom = 12
+    centers = np.zeros((natom, 3))
+    centers[:, 0] = np.arange(natom)*2.5
+    centers[:, 1] = np.random.uniform(-0.5, 0.5, natom)
+    radii = np.random.uniform(0.3, 1.5, natom)
+    # Points at all distances from the nuclei.
+    points = centers[3] + np.random.normal(0, 1, (500, 3))*np.random.uniform(
+        0, 5, 500)[:, None]**2
+    total = np.zeros(len(points))
+    for iatom in range(natom):
+        expected = np.ones(len(points))
+        becke_helper_atom(points, expected, radii, centers, iatom, 3)
+        for epsilon in 1e-14, 1e-8:
+            weights = np.ones(len(points))
+            becke_helper_atom(points, weights, radii, centers, iatom, 3, epsilon)
+            assert abs(weights - expected).max() < 100*epsilon
+        total += weights
+    assert abs(total - 1).max() < 1e-6
+
+
+def test_becke_epsilon_negative():
+    centers = np.array([[1.2, 2.3, 0.1], [-0.4, 0.0, -2.2]])
+    weights = np.ones(2, float)
+    with assert_raises(ValueError):
+        becke_helper_atom(centers, weights, np.ones(2), centers, 0, 3, -1.0)
+
+
+def ssf_reference(points, centers, select):
+    """Straightforward implementation of the SSF weights, without shortcuts."""
+    dists = np.sqrt(((points[:, None] - centers)**2).sum(axis=2))
+    rab = np.sqrt(((centers[:, None] - centers)**2).sum(axis=2))
+    natom = len(centers)
+    cells = np.ones((len(points), natom))
+    for iatom0 in range(natom):
+        for iatom1 in range(natom):
+            if iatom0 != iatom1:
+                x = np.clip((dists[:, iatom0] - dists[:, iatom1])/rab[iatom0, iatom1]/0.64,
+                            -1, 1)
+                cells[:, iatom0] *= 0.5*(1 - (35*x - 35*x**3 + 21*x**5 - 5*x**7)/16)
+    return cells[:, select]/cells.sum(axis=1)
+
+
+def test_ssf():
+    natom = 10
+    centers = np.random.uniform(-4, 4, (natom, 3))
+    points = np.concatenate([
+        np.random.uniform(-8, 8, (500, 3)),
+        centers[2] + np.random.normal(0, 0.1, (100, 3)),
+    ])
+    total = np.zeros(len(points))
+    for iatom in range(natom):
+        weights = np.random.uniform(1, 2, len(points))
+        expected = weights*ssf_reference(points, centers, iatom)
+        ssf_helper_atom(points, weights, centers, iatom)
+        assert abs(weights - expected).max() < 1e-12
+        weights = np.ones(len(points))
+        ssf_helper_atom(points, weights, centers, iatom)
+        total += weights
+    assert abs(total - 1).max() < 1e-10
+
+    # Special points
+    for iatom in range(natom):
+        weights = np.ones(natom)
+        ssf_helper_atom(centers, weights, centers, iatom)
+        assert (weights == np.identity(natom)[iatom]).all()
+
+    # Single atom
+    weights = np.ones(len(points))
+    ssf_helper_atom(points, weights, centers[:1], 0)
+    assert (weights == 1).all()
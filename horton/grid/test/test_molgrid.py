@@ -21,8 +21,10 @@
 
 
 import numpy as np, h5py as h5
+from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.grid.test.common import get_block_volume
 
 
 
@@ -68,6 +70,123 @@ def test_integrate_hydrogen_trimer_1s():
     assert abs(occupation - 3.0) < 1e-3
 
 
+def test_integrate_hydrogen_trimer_1s_ssf():
+    numbers = np.array([1, 1, 1], int)
+    coordinates = np.array([[0.0, 0.0, -0.5], [0.0, 0.0, 0.5], [0.0, 0.5, 0.0]], float)
+    rtf = ExpRTransform(1e-3, 1e1, 100)
+    rgrid = RadialGrid(rtf)
+
+    mg = BeckeMolGrid(coordinates, numbers, None, (rgrid, 110), random_rotate=False,
+                      weights='ssf')
+    assert mg.weights_scheme == 'ssf'
+    dists = np.sqrt(((coordinates[:, None] - mg.points)**2).sum(axis=2))
+    fn = (np.exp(-2*dists)/np.pi).sum(axis=0)
+    occupation = mg.integrate(fn)
+    assert abs(occupation - 3.0) < 1e-3
+
+
+def test_molgrid_nworkers():
+    numbers = np.array([8, 1, 1, 6], int)
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 1.4, 1.1], [0.0, -1.4, 1.1],
+                            [2.5, 0.3, -0.2]])
+    for weights in 'becke', 'ssf':
+        mg1 = BeckeMolGrid(coordinates, numbers, None, 'coarse', random_rotate=False,
+                           mode='keep', weights=weights)
+        mg2 = BeckeMolGrid(coordinates, numbers, None, 'coarse', random_rotate=False,
+                           mode='keep', weights=weights, nworkers=3)
+        assert (mg1.points == mg2.points).all()
+        assert (mg1.weights == mg2.weights).all()
+        assert (mg1.becke_weights == mg2.becke_weights).all()
+        assert len(mg2.subgrids) == 4
+        for atgrid1, atgrid2 in zip(mg1.subgrids, mg2.subgrids):
+            assert (atgrid1.weights == atgrid2.weights).all()
+
+
+def test_molgrid_weights_error():
+    numbers = np.array([1, 1], int)
+    coordinates = np.array([[0.0, 0.0, -0.5], [0.0, 0.0, 0.5]], float)
+    with assert_raises(ValueError):
+        BeckeMolGrid(coordinates, numbers, None, 'coarse', weights='foo')
+
+
+def test_molgrid_prune():
+    numbers = np.array([8, 1, 1], int)
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 1.4, 1.1], [0.0, -1.4, 1.1]])
+    mg1 = BeckeMolGrid(coordinates, numbers, None, 'fine', random_rotate=False, mode='keep')
+    assert mg1.npruned == 0
+    dists = np.sqrt(((coordinates[:, None] - mg1.points)**2).sum(axis=2))
+    fn1 = np.exp(-2*dists).sum(axis=0)
+    for prune_density in False, True:
+        mg2 = BeckeMolGrid(coordinates, numbers, None, 'fine', random_rotate=False,
+                           mode='keep', prune=1e-12, prune_density=prune_density)
+        assert mg2.prune == 1e-12
+        assert mg2.prune_density == prune_density
+        assert mg2.npruned > 0
+        assert mg2.size == mg1.size - mg2.npruned
+        assert mg2.becke_weights.shape == (mg2.size,)
+        dists = np.sqrt(((coordinates[:, None] - mg2.points)**2).sum(axis=2))
+        fn2 = np.exp(-2*dists).sum(axis=0)
+        assert abs(mg1.integrate(fn1) - mg2.integrate(fn2)) < 1e-8
+        # consistency of the subgrids
+        assert mg2.subgrids[0].begin == 0
+        assert mg2.subgrids[-1].end == mg2.size
+        for index in range(3):
+            atgrid1 = mg1.subgrids[index]
+            atgrid2 = mg2.subgrids[index]
+            assert atgrid2.size == atgrid1.size
+            assert (atgrid2.points == atgrid1.points).all()
+            atpoints = mg2.to_atomic_grid(index, mg2.points)
+            mask = (atpoints != 0).any(axis=1)
+            assert mask.sum() == atgrid2.end - atgrid2.begin
+            assert (atpoints[mask] == atgrid2.points[mask]).all()
+            atweights = mg2.to_atomic_grid(index, mg2.weights)
+            np.testing.assert_equal(atweights[mask], mg1.to_atomic_grid(index, mg1.weights)[mask])
+            assert (atweights[~mask] == 0).all()
+    assert mg2.npruned > BeckeMolGrid(coordinates, numbers, None, 'fine', random_rotate=False,
+                                      prune=1e-12).npruned
+
+
+def test_molgrid_spatial_order():
+    numbers = np.array([8, 1, 1], int)
+    coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 1.4, 1.1], [0.0, -1.4, 1.1]])
+    mg1 = BeckeMolGrid(coordinates, numbers, None, 'coarse', random_rotate=False, mode='keep')
+    assert not mg1.spatial_order
+    assert mg1.order is None
+    for prune in 0.0, 1e-12:
+        mg2 = BeckeMolGrid(coordinates, numbers, None, 'coarse', random_rotate=False,
+                           mode='keep', prune=prune, spatial_order=True)
+        assert mg2.spatial_order
+        assert mg2.order.shape == (mg2.size,)
+        assert mg2.size == mg1.size - mg2.npruned
+        assert (mg2.points == mg1.points[mg2.order]).all()
+        assert (mg2.weights == mg1.weights[mg2.order]).all()
+        assert (mg2.becke_weights == mg1.becke_weights[mg2.order]).all()
+        assert abs(mg1.integrate() - mg2.integrate()) < 1e-8
+        offset = 0
+        for index in range(3):
+            atgrid = mg2.subgrids[index]
+            assert not hasattr(atgrid, 'begin')
+            atpoints = mg2.to_atomic_grid(index, mg2.points)
+            mask = (atpoints != 0).any(axis=1)
+            assert mask.sum() == ((mg2.order >= offset) & (mg2.order < offset + atgrid.size)).sum()
+            assert (atpoints[mask] == atgrid.points[mask]).all()
+            atweights = mg2.to_atomic_grid(index, mg2.weights)
+            np.testing.assert_equal(atweights[mask], mg1.to_atomic_grid(index, mg1.weights)[mask])
+            assert (atweights[~mask] == 0).all()
+            offset += atgrid.size
+        # Blocks of points are more compact.
+        assert get_block_volume(mg2.points) < get_block_volume(mg1.points)
+
+
+def test_molgrid_prune_error():
+    numbers = np.array([1, 1], int)
+    coordinates = np.array([[0.0, 0.0, -0.5], [0.0, 0.0, 0.5]], float)
+    with assert_raises(ValueError):
+        BeckeMolGrid(coordinates, numbers, None, 'coarse', prune=-1.0)
+    with assert_raises(ValueError):
+        BeckeMolGrid(coordinates, numbers, None, 'coarse', mode='only', prune=1e-10)
+
+
 def test_all_elements():
     numbers = np.array([1, 118], int)
     coordinates = np.array([[0.0, 0.0, -1.0], [0.0, 0.0, 1.0]], float)
@@ -138,19 +257,37 @@ def test_molgrid_hdf5():
     coordinates = np.array([[0.0, 0.2, -0.5], [0.1, 0.0, 0.5]], float)
     rtf = ExpRTransform(1e-3, 1e1, 100)
     rgrid = RadialGrid(rtf)
-    mg1 = BeckeMolGrid(coordinates, numbers, None, (rgrid, 110), k=2, random_rotate=False, mode='keep')
+    for weights in 'becke', 'ssf':
+        mg1 = BeckeMolGrid(coordinates, numbers, None, (rgrid, 110), k=2, random_rotate=False,
+                           mode='keep', weights=weights)
+
+        # run the routines that need testing
+        with h5.File('horton.grid.test.test_molgrid.test_molgrid_hdf5', "w", driver='core', backing_store=False) as f:
+            mg1.to_hdf5(f)
+            mg2 = BeckeMolGrid.from_hdf5(f)
+        check_molgrid_hdf5(mg1, mg2)
 
-    # run the routines that need testing
+    mg1 = BeckeMolGrid(coordinates, numbers, None, (rgrid, 110), random_rotate=False,
+                       prune=1e-10, prune_density=True, spatial_order=True)
     with h5.File('horton.grid.test.test_molgrid.test_molgrid_hdf5', "w", driver='core', backing_store=False) as f:
         mg1.to_hdf5(f)
         mg2 = BeckeMolGrid.from_hdf5(f)
+    check_molgrid_hdf5(mg1, mg2)
+
 
+def check_molgrid_hdf5(mg1, mg2):
     assert (mg1.centers == mg2.centers).all()
     assert (mg1.numbers == mg2.numbers).all()
     assert (mg1.pseudo_numbers == mg2.pseudo_numbers).all()
     assert sorted(mg2.agspec.members.keys()) == [6, 8]
     assert mg1.k == mg2.k
+    assert mg1.epsilon == mg2.epsilon
+    assert mg1.weights_scheme == mg2.weights_scheme
     assert mg1.random_rotate == mg2.random_rotate
     assert mg1.mode == mg2.mode
+    assert mg1.prune == mg2.prune
+    assert mg1.prune_density == mg2.prune_density
+    assert mg1.npruned == mg2.npruned
+    assert mg1.spatial_order == mg2.spatial_order
     assert (mg1.points == mg2.points).all()
     assert (mg1.weights == mg2.weights).all()
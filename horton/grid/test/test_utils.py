@@ -24,6 +24,7 @@ from nose.tools import assert_raises
 import numpy as np
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.grid.utils import get_hilbert_order
 
 
 def test_dot_multi():
@@ -38,3 +39,20 @@ def test_dot_multi():
 
     with assert_raises(AssertionError):
         dot_multi(np.arange(5.0), np.arange(10.0))
+
+
+def test_hilbert_order():
+    # All cells of a cube are visited, moving one cell at a time.
+    nbit = 3
+    ncell = 1 << nbit
+    ipoints = np.indices((ncell, ncell, ncell)).reshape(3, -1).T
+    points = ipoints*0.5 + np.array([-1.0, 0.3, 2.0])
+    order = get_hilbert_order(points, nbit)
+    assert (np.sort(order) == np.arange(ncell**3)).all()
+    steps = abs(ipoints[order[1:]] - ipoints[order[:-1]]).sum(axis=1)
+    assert (steps == 1).all()
+    # Degenerate cases
+    assert get_hilbert_order(np.zeros((0, 3))).shape == (0,)
+    assert (get_hilbert_order(np.ones((4, 3))) == np.arange(4)).all()
+    with assert_raises(ValueError):
+        get_hilbert_order(points, 21)
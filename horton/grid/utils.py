@@ -21,7 +21,10 @@
 '''Auxiliaries for numerical integrals'''
 
 
-__all__ = ['parse_args_integrate']
+import numpy as np
+
+
+__all__ = ['parse_args_integrate', 'get_hilbert_order']
 
 
 def parse_args_integrate(*args, **kwargs):
@@ -87,3 +90,62 @@ def parse_args_integrate(*args, **kwargs):
         if len(kwargs) > 0:
             raise TypeError('Unexpected keyword argument: %s' % kwargs.popitem()[0])
         return args, (center, lmax, mtype), segments
+
+
+def get_hilbert_order(points, nbit=16):
+    '''Return a permutation that sorts points along a 3D Hilbert curve
+
+       **Arguments:**
+
+       points
+            An array (N, 3) with Cartesian coordinates.
+
+       **Optional arguments:**
+
+       nbit
+            The number of bits used to discretize each Cartesian coordinate
+            within the bounding box of the points, at most 20.
+
+       **Returns:** an integer array (N,) with the order of the points.
+
+       Points that are close along the curve are also close in space, such
+       that consecutive blocks of sorted points are compact. Points that fall
+       into the same cell of the discretization keep their original order.
+    '''
+    if nbit < 1 or nbit > 20:
+        raise ValueError('The number of bits must be in the range [1, 20].')
+    points = np.asarray(points)
+    if len(points) == 0:
+        return np.zeros(0, int)
+    lower = points.min(axis=0)
+    extent = (points.max(axis=0) - lower).max()
+    if extent == 0:
+        return np.arange(len(points))
+    # Transpose of the Hilbert index, see Skilling, AIP Conf. Proc. 707, 381 (2004).
+    x = ((points - lower)*(((1 << nbit) - 1)/extent) + 0.5).astype(np.int64).T.copy()
+    top = 1 << (nbit - 1)
+    q = top
+    while q > 1:
+        p = q - 1
+        for i in range(3):
+            high = (x[i] & q) != 0
+            x[0] = np.where(high, x[0] ^ p, x[0])
+            t = np.where(high, 0, (x[0] ^ x[i]) & p)
+            x[0] ^= t
+            x[i] ^= t
+        q >>= 1
+    # Gray encoding
+    x[1] ^= x[0]
+    x[2] ^= x[1]
+    t = np.zeros(len(points), np.int64)
+    q = top
+    while q > 1:
+        t = np.where((x[2] & q) != 0, t ^ (q - 1), t)
+        q >>= 1
+    x ^= t
+    # Interleave the bits of the three coordinates into a single key.
+    keys = np.zeros(len(points), np.int64)
+    for j in range(nbit - 1, -1, -1):
+        for i in range(3):
+            keys = (keys << 1) | ((x[i] >> j) & 1)
+    return keys.argsort(kind='stable')
@@ -26,7 +26,7 @@ from horton.cext import Cell
 from horton.grid.cext import UniformGrid
 
 
-__all__ = ['load_cube', 'dump_cube']
+__all__ = ['load_cube', 'dump_cube', 'CubeWriter']
 
 
 def _read_cube_header(f):
@@ -134,13 +134,13 @@ def _write_cube_header(f, title, coordinates, numbers, ugrid, pseudo_numbers):
         print('%5i % 11.6f % 11.6f % 11.6f % 11.6f' % (numbers[i], q, x, y, z), file=f)
 
 
-def _write_cube_data(f, cube_data):
-    counter = 0
+def _write_cube_data(f, cube_data, counter=0):
     for value in cube_data.flat:
         f.write(' % 12.5E' % value)
         if counter%6 == 5:
             f.write('\n')
         counter += 1
+    return counter
 
 
 def dump_cube(filename, data):
@@ -162,3 +162,65 @@ def dump_cube(filename, data):
         title = getattr(data, 'title', 'Created with HORTON')
         _write_cube_header(f, title, data.coordinates, data.numbers, data.grid, data.pseudo_numbers)
         _write_cube_data(f, data.cube_data)
+
+
+class CubeWriter(object):
+    '''Write data on a uniform grid to several cube files, block by block.
+
+       The headers are written when the files are opened. The data are written
+       with ``writer[begin:end] = values``, for consecutive ranges of grid
+       points, in the order of a cube file. This can be used as the output of
+       :func:`horton.gbasis.gridstream.stream_grid_orbitals`, such that
+       orbitals on a fine grid never have to be kept in memory.
+    '''
+    def __init__(self, filenames, data):
+        '''
+           **Arguments:**
+
+           filenames
+                A list with the names of the cube files, one for each column of
+                the data.
+
+           data
+                An IOData instance. Must contain ``coordinates``, ``numbers``,
+                ``grid``. May contain ``title``, ``pseudo_numbers``.
+        '''
+        if not isinstance(data.grid, UniformGrid):
+            raise ValueError('The system grid must be a UniformGrid instance.')
+        self._npoint = np.prod(data.grid.shape)
+        self._counter = 0
+        self._fs = []
+        title = getattr(data, 'title', 'Created with HORTON')
+        for filename in filenames:
+            f = open(filename, 'w')
+            self._fs.append(f)
+            _write_cube_header(f, title, data.coordinates, data.numbers, data.grid,
+                               data.pseudo_numbers)
+
+    def _get_shape(self):
+        '''The shape of the data: (number of grid points, number of files)'''
+        return (self._npoint, len(self._fs))
+
+    shape = property(_get_shape)
+
+    def __setitem__(self, index, values):
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError('Only contiguous slices can be written to cube files.')
+        begin, end, _step = index.indices(self._npoint)
+        if begin != self._counter:
+            raise ValueError('The data must be written in consecutive blocks.')
+        values = np.asarray(values).reshape(end - begin, len(self._fs))
+        for i, f in enumerate(self._fs):
+            _write_cube_data(f, values[:, i], begin)
+        self._counter = end
+
+    def close(self):
+        '''Close all cube files'''
+        for f in self._fs:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -21,6 +21,7 @@
 
 
 import numpy as np
+from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
@@ -70,3 +71,27 @@ def test_load_dump_load_aelta():
         assert (ugrid1.shape == ugrid2.shape).all()
         assert abs(mol1.cube_data - mol2.cube_data).max() < 1e-4
         assert abs(mol1.pseudo_numbers - mol2.pseudo_numbers).max() < 1e-4
+
+
+def test_cube_writer_aelta():
+    fn_cube1 = context.get_fn('test/aelta.cube')
+    mol1 = IOData.from_file(fn_cube1)
+    npoint = mol1.cube_data.size
+    values = np.array([mol1.cube_data.ravel(), 2*mol1.cube_data.ravel()]).T
+
+    with tmpdir('horton.io.test.test_cube.test_cube_writer_aelta') as dn:
+        fn_cube2 = '%s/%s' % (dn, 'aelta.cube')
+        mol1.to_file(fn_cube2)
+        fns = ['%s/%s' % (dn, 'aelta1.cube'), '%s/%s' % (dn, 'aelta2.cube')]
+        with CubeWriter(fns, mol1) as writer:
+            assert writer.shape == (npoint, 2)
+            # Blocks with a size that is not a multiple of six values per line.
+            for begin in range(0, npoint, 250):
+                writer[begin:begin + 250] = values[begin:begin + 250]
+            with assert_raises(ValueError):
+                writer[0:10] = values[:10]
+        with open(fn_cube2) as f1, open(fns[0]) as f2:
+            assert f2.read() == f1.read()
+        mol2 = IOData.from_file(fns[1])
+        assert abs(mol2.cube_data - 2*mol1.cube_data).max() < 1e-4
+        assert (mol2.grid.shape == mol1.grid.shape).all()
@@ -33,6 +33,7 @@ from horton.meanfield.libxc import *
 from horton.meanfield.observable import *
 from horton.meanfield.occ import *
 from horton.meanfield.orbitals import *
+from horton.meanfield.outofcore import *
 from horton.meanfield.project import *
 from horton.meanfield.rotate import *
 from horton.meanfield.response import *
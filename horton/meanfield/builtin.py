@@ -56,21 +56,21 @@ class BeckeHartree(GridObservable):
             raise TypeError('The BeckeHatree term only works for Becke-Lebedev molecular integration grids')
         if grid.mode != 'keep':
             raise TypeError('The mode option of the molecular grid must be \'keep\'.')
+        if grid.npruned > 0:
+            raise TypeError('The spherical decompositions need complete atomic grids, so the molecular grid can not be pruned.')
 
         pot, new = cache.load('pot_%s' % self.label, alloc=grid.size)
         if new:
             rho = cache['rho_full']
             # Construct spherical decompositions of atomic densities, derive
             # hartree potentials and evaluate
-            begin = 0
             pot[:] = 0
-            for atgrid in grid.subgrids:
-                end = begin + atgrid.size
-                becke_weights = grid.becke_weights[begin:end]
-                density_decomposition = atgrid.get_spherical_decomposition(rho[begin:end], becke_weights, lmax=self.lmax)
+            for index, atgrid in enumerate(grid.subgrids):
+                becke_weights = grid.to_atomic_grid(index, grid.becke_weights)
+                atrho = grid.to_atomic_grid(index, rho)
+                density_decomposition = atgrid.get_spherical_decomposition(atrho, becke_weights, lmax=self.lmax)
                 hartree_decomposition = solve_poisson_becke(density_decomposition)
                 grid.eval_decomposition(hartree_decomposition, atgrid.center, pot)
-                begin = end
         return pot
 
     @doc_inherit(GridObservable)
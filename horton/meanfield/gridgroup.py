@@ -21,6 +21,7 @@
 """Container for observables involving numerical integration"""
 
 
+from horton.gbasis.cext import GB1GridCache
 from horton.meanfield.observable import Observable
 from horton.utils import doc_inherit
 
@@ -44,7 +45,8 @@ DF_LEVEL_MGGA = 2
 class GridGroup(Observable):
     """Group of terms for the effective Hamiltonian that use numerical integration."""
 
-    def __init__(self, obasis, grid, grid_terms, label='grid_group', density_cutoff=1e-9):
+    def __init__(self, obasis, grid, grid_terms, label='grid_group', density_cutoff=1e-9,
+                 basis_cache_memory=0):
         """Initialize a GridGroup instance.
 
         Parameters
@@ -62,11 +64,19 @@ class GridGroup(Observable):
             Whenever the density on a grid point falls below this threshold, all data for
             that grid point is set to zero. This is mainly relevant for functionals that
             use derivatives of the density or the orbitals, i.e. GGA and MGGA functionals.
+        basis_cache_memory : float
+            The maximum amount of memory (in bytes) used to keep the basis functions on
+            the grid between SCF iterations. When zero, the basis functions are
+            recomputed every time they are needed.
         """
         self.grid_terms = grid_terms
         self.obasis = obasis
         self.grid = grid
         self.density_cutoff = density_cutoff
+        if basis_cache_memory > 0:
+            self.basis_cache = GB1GridCache(obasis, grid.points, basis_cache_memory)
+        else:
+            self.basis_cache = None
         Observable.__init__(self, label)
 
     def _get_df_level(self):
@@ -134,19 +144,22 @@ class GridGroup(Observable):
                                          alloc=(self.grid.size, 1), tags=tags)
             if new:
                 dm = cache['%sdm_%s' % (prefix, select)]
-                self.obasis.compute_grid_density_dm(dm, self.grid.points, all_basics[:, 0])
+                self.obasis.compute_grid_density_dm(dm, self.grid.points, all_basics[:, 0],
+                                                    cache=self.basis_cache)
         elif self.df_level == DF_LEVEL_GGA:
             all_basics, new = cache.load('%sall_%s' % (prefix, select),
                                          alloc=(self.grid.size, 4), tags=tags)
             if new:
                 dm = cache['%sdm_%s' % (prefix, select)]
-                self.obasis.compute_grid_gga_dm(dm, self.grid.points, all_basics)
+                self.obasis.compute_grid_gga_dm(dm, self.grid.points, all_basics,
+                                                cache=self.basis_cache)
         elif self.df_level == DF_LEVEL_MGGA:
             all_basics, new = cache.load('%sall_%s' % (prefix, select),
                                          alloc=(self.grid.size, 6), tags=tags)
             if new:
                 dm = cache['%sdm_%s' % (prefix, select)]
-                self.obasis.compute_grid_mgga_dm(dm, self.grid.points, all_basics)
+                self.obasis.compute_grid_mgga_dm(dm, self.grid.points, all_basics,
+                                                 cache=self.basis_cache)
         else:
             raise ValueError('Internal error: non-existent DF level.')
 
@@ -222,15 +235,15 @@ class GridGroup(Observable):
             if self.df_level == DF_LEVEL_LDA:
                 self.obasis.compute_grid_density_fock(
                     self.grid.points, self.grid.weights,
-                    pots[ichannel][:, 0], focks[ichannel])
+                    pots[ichannel][:, 0], focks[ichannel], cache=self.basis_cache)
             elif self.df_level == DF_LEVEL_GGA:
                 self.obasis.compute_grid_gga_fock(
                     self.grid.points, self.grid.weights,
-                    pots[ichannel], focks[ichannel])
+                    pots[ichannel], focks[ichannel], cache=self.basis_cache)
             elif self.df_level == DF_LEVEL_MGGA:
                 self.obasis.compute_grid_mgga_fock(
                     self.grid.points, self.grid.weights,
-                    pots[ichannel], focks[ichannel])
+                    pots[ichannel], focks[ichannel], cache=self.basis_cache)
 
     def add_fock(self, cache, *focks):
         """Add contributions to the Fock matrix.
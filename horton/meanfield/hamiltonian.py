@@ -50,7 +50,7 @@ class EffHam(object):
     ndm = None
     deriv_scale = 1.0
 
-    def __init__(self, terms, external=None):
+    def __init__(self, terms, external=None, rebuild_interval=None):
         """Initialize an EffHam instance.
 
         Parameters
@@ -61,10 +61,20 @@ class EffHam(object):
             A dictionary with external energy contributions that do not depend on the
             wavefunction, e.g. nuclear-nuclear interactions or QM/MM mechanical embedding
             terms. Use ``nn`` as key for the nuclear-nuclear term.
+        rebuild_interval : int
+            When given, the incremental mode is activated. Operators that depend linearly
+            on the density matrices, e.g. the direct and exchange operators, are then
+            updated with the change in density matrix since the previous call to
+            ``reset``, instead of being recomputed from scratch. This is much cheaper with
+            integral-direct operators and screening, because the change in density matrix
+            becomes small near convergence. To avoid the accumulation of numerical errors,
+            a full rebuild is carried out after ``rebuild_interval`` incremental updates.
         """
         # check arguments:
         if len(terms) == 0:
             raise ValueError('At least one term must be present in the Hamiltonian.')
+        if rebuild_interval is not None and rebuild_interval < 0:
+            raise ValueError('The rebuild_interval can not be negative.')
 
         # Assign attributes
         self.terms = list(terms)
@@ -75,6 +85,46 @@ class EffHam(object):
         # need to be updated at each SCF cycle.
         self.cache = Cache()
 
+        # Settings and state of the incremental mode.
+        self.rebuild_interval = rebuild_interval
+        self.nincremental = 0
+
+    def _reset_dms(self, names, in_dms):
+        """Clear the cache and store copies of the input density matrices.
+
+        In incremental mode, the operators linear in the density matrices (with tag 'l'
+        in the cache) are kept with a prefix ``prev_`` and the changes in density
+        matrices are stored with a prefix ``incr_``.
+
+        Parameters
+        ----------
+        names : list of str
+            The keys of the density matrices in the cache.
+        in_dms : list of np.ndarray, shape=(nbasis, nbasis)
+            The new density matrices.
+        """
+        previous_ops = {}
+        previous_dms = []
+        if self.rebuild_interval is not None and self.nincremental < self.rebuild_interval \
+                and all(name in self.cache for name in names):
+            # Copies are needed because clearing the cache resets all arrays to zero.
+            previous_ops = dict((key, value.copy()) for key, value in self.cache.items(tags='l'))
+            previous_dms = [self.cache[name].copy() for name in names]
+        self.cache.clear()
+        for name, in_dm in zip(names, in_dms):
+            dm = self.cache.load(name, alloc=in_dm.shape)[0]
+            dm[:] = in_dm
+        if len(previous_ops) > 0:
+            for key, op in previous_ops.items():
+                self.cache.dump('prev_%s' % key, op)
+            for name, in_dm, previous_dm in zip(names, in_dms, previous_dms):
+                incr_dm = self.cache.load('incr_%s' % name, alloc=in_dm.shape)[0]
+                incr_dm[:] = in_dm
+                incr_dm -= previous_dm
+            self.nincremental += 1
+        else:
+            self.nincremental = 0
+
     def reset(self, *dms):
         """Remove intermediate results from cache and specify new input density matrices.
 
@@ -190,10 +240,8 @@ class REffHam(EffHam):
 
     @doc_inherit(EffHam)
     def reset(self, in_dm_alpha):
-        self.cache.clear()
         # Take a copy of the input alpha density matrix in the cache.
-        dm_alpha = self.cache.load('dm_alpha', alloc=in_dm_alpha.shape)[0]
-        dm_alpha[:] = in_dm_alpha
+        self._reset_dms(['dm_alpha'], [in_dm_alpha])
 
     @doc_inherit(EffHam)
     def reset_delta(self, in_delta_dm_alpha):
@@ -218,12 +266,8 @@ class UEffHam(EffHam):
 
     @doc_inherit(EffHam)
     def reset(self, in_dm_alpha, in_dm_beta):
-        self.cache.clear()
         # Take copies of the input alpha and beta density matrices in the cache.
-        dm_alpha = self.cache.load('dm_alpha', alloc=in_dm_alpha.shape)[0]
-        dm_alpha[:] = in_dm_alpha
-        dm_beta = self.cache.load('dm_beta', alloc=in_dm_beta.shape)[0]
-        dm_beta[:] = in_dm_beta
+        self._reset_dms(['dm_alpha', 'dm_beta'], [in_dm_alpha, in_dm_beta])
 
     @doc_inherit(EffHam)
     def reset_delta(self, in_delta_dm_alpha, in_delta_dm_beta):
@@ -69,25 +69,107 @@ def _parse_four_index_transform_orbs(orb0, orb1, orb2, orb3):
     return orb0, orb1, orb2, orb3
 
 
+def _unpack_pairs(pairs, n):
+    """Convert rows of packed lower triangles to symmetric matrices.
+
+    Parameters
+    ----------
+    pairs : np.ndarray, shape=(nrow, n*(n+1)/2)
+        Each row is a lower triangle, stored row by row.
+    n : int
+        The size of the matrices.
+
+    Returns
+    -------
+    matrices : np.ndarray, shape=(nrow, n, n)
+    """
+    il, jl = np.tril_indices(n)
+    result = np.zeros((pairs.shape[0], n, n))
+    result[:, il, jl] = pairs
+    result[:, jl, il] = pairs
+    return result
+
+
+def _four_index_transform_packed(ao_integrals, orb, blocksize=None):
+    """Perform a four index transformation of packed integrals with one set of orbitals.
+
+    The transformation is carried out in two half transformations, each working on
+    blocks of pairs of indexes. The intermediate result needs about twice the memory of
+    the packed integrals. No dense four-index array is ever allocated.
+
+    Parameters
+    ----------
+    ao_integrals : np.ndarray
+        Packed integrals over atomic orbitals, see ``horton.gbasis.get_packed_size``.
+    orb
+        An Orbitals object with molecular orbitals.
+    blocksize : int
+        The number of pairs of indexes treated at once. When not given, it is chosen
+        such that the blocks are about 8 MB large.
+
+    Returns
+    -------
+    mo_integrals : np.ndarray
+        Packed integrals in the MO basis.
+    """
+    nbasis, nfn = orb.coeffs.shape
+    npair = nbasis*(nbasis + 1)//2
+    nmopair = nfn*(nfn + 1)//2
+    if ao_integrals.shape != (npair*(npair + 1)//2,):
+        raise TypeError('The packed integrals do not match the number of basis functions.')
+    if blocksize is None:
+        blocksize = max(1, 1000000//max(npair, nbasis*nbasis))
+    mil, mjl = np.tril_indices(nfn)
+
+    # First half transformation: (pq|rs) -> (pq|kl)
+    half = np.zeros((npair, nmopair))
+    pairs = np.arange(npair)
+    for begin in range(0, npair, blocksize):
+        rows = pairs[begin:begin + blocksize, np.newaxis]
+        big = np.maximum(rows, pairs)
+        small = np.minimum(rows, pairs)
+        block = _unpack_pairs(ao_integrals[big*(big + 1)//2 + small], nbasis)
+        block = np.matmul(orb.coeffs.T, np.matmul(block, orb.coeffs))
+        half[begin:begin + blocksize] = block[:, mil, mjl]
+
+    # Second half transformation: (pq|kl) -> (ij|kl), only ij >= kl is stored.
+    result = np.zeros(nmopair*(nmopair + 1)//2)
+    mopairs = np.arange(nmopair)
+    for begin in range(0, nmopair, blocksize):
+        cols = mopairs[begin:begin + blocksize, np.newaxis]
+        block = _unpack_pairs(half[:, begin:begin + blocksize].T, nbasis)
+        block = np.matmul(orb.coeffs.T, np.matmul(block, orb.coeffs))[:, mil, mjl]
+        mask = mopairs >= cols
+        result[(mopairs*(mopairs + 1)//2 + cols)[mask]] = block[mask]
+    return result
+
+
 def four_index_transform(ao_integrals, orb0, orb1=None, orb2=None, orb3=None, method='tensordot'):
     """Perform four index transformation.
 
     Parameters
     ----------
     oa_integrals
-        A four-index array with integrals over atomic orbitals.
+        A four-index array with integrals over atomic orbitals. Packed integrals, i.e.
+        a one-dimensional array with only the symmetry-unique elements, are also
+        supported, provided that all indexes are transformed with the same orbitals.
     orb0
         A Orbitalas object with molecular orbitals
     orb1, orb2, orb3
         Can be provided to transform each index differently.
     method
-        Either ``einsum`` or ``tensordot`` (default).
+        Either ``einsum`` or ``tensordot`` (default). Not used for packed integrals.
 
     Returns
     -------
     mo_integrals
-        A four-index array with the integrals in the MO basis.
+        A four-index array with the integrals in the MO basis. For packed input, the
+        result is also packed.
     """
+    if ao_integrals.ndim == 1:
+        if any(orb is not None and orb is not orb0 for orb in (orb1, orb2, orb3)):
+            raise TypeError('Packed integrals can only be transformed with one set of orbitals.')
+        return _four_index_transform_packed(ao_integrals, orb0)
     # parse arguments
     orb0, orb1, orb2, orb3 = _parse_four_index_transform_orbs(orb0, orb1, orb2, orb3)
     # actual transform
@@ -231,22 +313,43 @@ def split_core_active(one, two, ecore, orb, ncore, nactive, indextrans='tensordo
     return one_mo_small, two_mo_small, ecore
 
 
-def four_index_transform_cholesky(ao_integrals, orb0, orb1=None, method='tensordot'):
+def four_index_transform_cholesky(ao_integrals, orb0, orb1=None, method='tensordot',
+                                  output=None):
     """Perform four index transformation on a Cholesky-decomposed four-index object.
 
     Parameters
     ----------
     oa_integrals : np.ndarray, shape=(nvec, nbasis, nbasis)
-        Cholesky decomposition of four-index object in the AO basis.
+        Cholesky decomposition of four-index object in the AO basis. An
+        OutOfCoreFourIndex instance is also supported, in which case the vectors are
+        transformed in blocks.
     orb0
         A Orbitals object with molecular orbitals.
     orb1
         Can be provided to transform the second index differently.
     method
         Either ``einsum`` or ``tensordot`` (default).
+    output
+        When given, the result is written to this array with shape (nvec, nfn0,
+        nfn1), e.g. an np.memmap or an h5py.Dataset, and it is returned. This is
+        useful to keep the transformed vectors on disk.
     """
     if orb1 is None:
         orb1 = orb0
+    if hasattr(ao_integrals, 'iter_blocks') or output is not None:
+        if output is None:
+            output = np.zeros((ao_integrals.shape[0], orb0.coeffs.shape[1],
+                               orb1.coeffs.shape[1]))
+        elif output.shape != (ao_integrals.shape[0], orb0.coeffs.shape[1],
+                              orb1.coeffs.shape[1]):
+            raise TypeError('The output does not have the right shape.')
+        if hasattr(ao_integrals, 'iter_blocks'):
+            blocks = ao_integrals.iter_blocks()
+        else:
+            blocks = [(0, ao_integrals.shape[0], ao_integrals)]
+        for begin, end, block in blocks:
+            output[begin:end] = four_index_transform_cholesky(block, orb0, orb1, method)
+        return output
     result = np.zeros(ao_integrals.shape)
     if method == 'einsum':
         result = np.einsum('ai,kac->kic', orb0.coeffs, ao_integrals)
@@ -23,6 +23,7 @@
 
 import numpy as np
 
+from horton.gbasis.cext import contract_direct_packed, contract_exchange_packed
 from horton.utils import doc_inherit
 
 
@@ -59,6 +60,42 @@ def compute_dm_full(cache, prefix='', tags=None):
     return dm_full
 
 
+def update_linear_operator(cache, key, dm_key, contract, op, scale=1.0):
+    """Add an operator that depends linearly on a density matrix to the cache, if needed.
+
+    When the effective Hamiltonian works in incremental mode, the operator of the
+    previous call to ``reset`` is present in the cache as ``'prev_' + key`` and the
+    change in density matrix as ``'incr_' + dm_key``. In that case, only the
+    contribution from the change in density matrix is computed.
+
+    Parameters
+    ----------
+    cache : Cache
+        Used to store intermediate results that can be reused or inspected later.
+    key : str
+        The key of the operator in the cache. It is stored with the tag 'l', such that
+        the effective Hamiltonian can recognize it as a linear operator.
+    dm_key : str
+        The key of the density matrix in the cache.
+    contract : function
+        A function that computes the operator from op and a density matrix, e.g.
+        ``contract_direct`` or ``contract_exchange``.
+    op
+        The two-body operator, passed on to contract.
+    scale : float
+        A factor to multiply the operator with.
+    """
+    dm = cache[dm_key]
+    result, new = cache.load(key, alloc=dm.shape, tags='l')
+    if new:
+        if 'prev_%s' % key in cache:
+            result[:] = cache['prev_%s' % key]
+            result += scale*contract(op, cache['incr_%s' % dm_key])
+        else:
+            result[:] = contract(op, dm)
+            result *= scale
+
+
 class Observable(object):
     """Base class for contribution to EffHam classes.
 
@@ -199,11 +236,19 @@ def contract_direct(op, dm):
     Parameters
     ----------
     op : np.ndarray, shape=(nvec, nbasis, nbasis) or
-        The four-index operator or its Cholesky decomposition
+        The four-index operator, its packed form or its Cholesky decomposition. An
+        object with a ``contract_direct`` method, e.g. a DirectFourIndex instance for
+        integral-direct calculations, is also supported.
     dm : np.ndarray, shape=(nbasis, nbasis)
         The density matrix
     """
-    if op.ndim == 3:
+    if hasattr(op, 'contract_direct'):
+        # Integral-direct operator
+        return op.contract_direct(dm)
+    elif op.ndim == 1:
+        # Packed storage of the symmetry-unique elements
+        return contract_direct_packed(op, np.ascontiguousarray(dm))
+    elif op.ndim == 3:
         # Cholesky decomposition
         tmp = np.tensordot(op, dm, axes=([(1, 2), (1, 0)]))
         return np.tensordot(op, tmp, [0, 0])
@@ -239,11 +284,9 @@ class RDirectTerm(Observable):
         cache : Cache
             Used to store intermediate results that can be reused or inspected later.
         """
-        dm_alpha = cache['dm_alpha']
-        direct, new = cache.load('op_%s_alpha' % self.label, alloc=dm_alpha.shape)
-        if new:
-            direct[:] = contract_direct(self.op_alpha, dm_alpha)
-            direct *= 2  # contribution from beta electrons is identical
+        # The factor two accounts for the identical contribution from beta electrons.
+        update_linear_operator(cache, 'op_%s_alpha' % self.label, 'dm_alpha',
+                               contract_direct, self.op_alpha, 2.0)
 
     @doc_inherit(Observable)
     def compute_energy(self, cache):
@@ -294,10 +337,11 @@ class UDirectTerm(Observable):
         """
         if self.op_alpha is self.op_beta:
             # This branch is nearly always going to be followed in practice.
-            dm_full = compute_dm_full(cache)
-            direct, new = cache.load('op_%s' % self.label, alloc=dm_full.shape)
-            if new:
-                direct[:] = contract_direct(self.op_alpha, dm_full)
+            compute_dm_full(cache)
+            if 'incr_dm_alpha' in cache:
+                compute_dm_full(cache, prefix='incr_')
+            update_linear_operator(cache, 'op_%s' % self.label, 'dm_full',
+                                   contract_direct, self.op_alpha)
         else:
             # This is probably never going to happen. In case it does, please
             # add the proper code here.
@@ -347,11 +391,19 @@ def contract_exchange(op, dm):
     Parameters
     ----------
     op : np.ndarray, shape=(nvec, nbasis, nbasis) or
-        The four-index operator or its Cholesky decomposition
+        The four-index operator, its packed form or its Cholesky decomposition. An
+        object with a ``contract_exchange`` method, e.g. a DirectFourIndex instance for
+        integral-direct calculations, is also supported.
     dm : np.ndarray, shape=(nbasis, nbasis)
         The density matrix
     """
-    if op.ndim == 3:
+    if hasattr(op, 'contract_exchange'):
+        # Integral-direct operator
+        return op.contract_exchange(dm)
+    elif op.ndim == 1:
+        # Packed storage of the symmetry-unique elements
+        return contract_exchange_packed(op, np.ascontiguousarray(dm))
+    elif op.ndim == 3:
         # Cholesky decomposition
         tmp = np.tensordot(op, dm, axes=([1, 1]))
         return np.tensordot(op, tmp, ([0, 2], [0, 2]))
@@ -389,11 +441,8 @@ class RExchangeTerm(Observable):
         cache : Cache
             Used to store intermediate results that can be reused or inspected later.
         """
-        dm_alpha = cache['dm_alpha']
-        exchange_alpha, new = cache.load('op_%s_alpha' % self.label,
-                                         alloc=dm_alpha.shape)
-        if new:
-            exchange_alpha[:] = contract_exchange(self.op_alpha, dm_alpha)
+        update_linear_operator(cache, 'op_%s_alpha' % self.label, 'dm_alpha',
+                               contract_exchange, self.op_alpha)
 
     @doc_inherit(Observable)
     def compute_energy(self, cache):
@@ -447,17 +496,11 @@ class UExchangeTerm(Observable):
             Used to store intermediate results that can be reused or inspected later.
         """
         # alpha
-        dm_alpha = cache['dm_alpha']
-        exchange_alpha, new = cache.load('op_%s_alpha' % self.label,
-                                         alloc=dm_alpha.shape)
-        if new:
-            exchange_alpha[:] = contract_exchange(self.op_alpha, dm_alpha)
+        update_linear_operator(cache, 'op_%s_alpha' % self.label, 'dm_alpha',
+                               contract_exchange, self.op_alpha)
         # beta
-        dm_beta = cache['dm_beta']
-        exchange_beta, new = cache.load('op_%s_beta' % self.label,
-                                         alloc=dm_beta.shape)
-        if new:
-            exchange_beta[:] = contract_exchange(self.op_beta, dm_beta)
+        update_linear_operator(cache, 'op_%s_beta' % self.label, 'dm_beta',
+                               contract_exchange, self.op_beta)
 
     @doc_inherit(Observable)
     def compute_energy(self, cache):
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Four-index operators stored on disk, processed in blocks"""
+
+
+import numpy as np
+
+from horton.meanfield.observable import contract_direct, contract_exchange
+
+
+__all__ = ['OutOfCoreFourIndex']
+
+
+class OutOfCoreFourIndex(object):
+    """A four-index operator, or its Cholesky decomposition, stored on disk.
+
+    The operator is never loaded completely into memory. All operations read it in
+    blocks along the first axis, such that one block does not exceed a given memory
+    budget. An instance can be used in the Coulomb and exchange terms of the effective
+    Hamiltonian, instead of a regular array, and in ``four_index_transform_cholesky``.
+    """
+
+    def __init__(self, array, memory=1e9):
+        """Initialize an OutOfCoreFourIndex instance.
+
+        Parameters
+        ----------
+        array : np.memmap or h5py.Dataset
+            The operator, with shape (nbasis, nbasis, nbasis, nbasis) for the dense
+            four-index operator, or shape (nvec, nbasis, nbasis) for its Cholesky
+            decomposition. Any object that supports slicing along the first axis and
+            that has ``shape`` and ``dtype`` attributes can be used.
+        memory : float
+            The maximal size of one block read from disk, in bytes.
+        """
+        if len(array.shape) not in (3, 4):
+            raise TypeError('The operator must be a three- or four-index array.')
+        if len(set(array.shape[1:])) != 1 or (len(array.shape) == 4 and
+                                              array.shape[0] != array.shape[1]):
+            raise TypeError('The shape of the operator is not valid.')
+        self.array = array
+        self.memory = memory
+
+    def _get_shape(self):
+        '''The shape of the operator'''
+        return self.array.shape
+
+    shape = property(_get_shape)
+
+    def _get_ndim(self):
+        '''The number of dimensions of the operator'''
+        return len(self.array.shape)
+
+    ndim = property(_get_ndim)
+
+    def _get_blocksize(self):
+        '''The number of slices along the first axis that are read at once'''
+        slice_size = np.prod(self.shape[1:])*np.dtype(self.array.dtype).itemsize
+        return max(1, int(self.memory//slice_size))
+
+    blocksize = property(_get_blocksize)
+
+    def iter_blocks(self):
+        """Iterate over all blocks along the first axis.
+
+        Yields
+        ------
+        begin, end, block
+            The range of the block along the first axis and its contents, as an
+            np.ndarray.
+        """
+        blocksize = self.blocksize
+        for begin in range(0, self.shape[0], blocksize):
+            end = min(begin + blocksize, self.shape[0])
+            yield begin, end, np.asarray(self.array[begin:end], dtype=float)
+
+    def _contract(self, contract, dm):
+        """Apply a contraction with a density matrix, block by block.
+
+        Parameters
+        ----------
+        contract : function
+            ``contract_direct`` or ``contract_exchange``.
+        dm : np.ndarray, shape=(nbasis, nbasis)
+            The density matrix.
+        """
+        result = np.zeros(dm.shape)
+        for begin, end, block in self.iter_blocks():
+            if self.ndim == 4:
+                # Each block contains a range of rows of the result.
+                result[begin:end] = contract(block, dm)
+            else:
+                # Each block contains a subset of the Cholesky vectors.
+                result += contract(block, dm)
+        return result
+
+    def contract_direct(self, dm):
+        """Return the direct contraction with a density matrix.
+
+        See ``horton.meanfield.observable.contract_direct``.
+        """
+        return self._contract(contract_direct, dm)
+
+    def contract_exchange(self, dm):
+        """Return the exchange contraction with a density matrix.
+
+        See ``horton.meanfield.observable.contract_exchange``.
+        """
+        return self._contract(contract_exchange, dm)
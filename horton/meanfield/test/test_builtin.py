@@ -21,6 +21,7 @@
 
 
 import numpy as np
+from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 
@@ -73,3 +74,30 @@ def test_becke_hartree_h3_hfs_321g():
     ham2.compute_fock(fock_alpha2, fock_beta2)
     np.testing.assert_allclose(fock_alpha1, fock_alpha2, atol=1e-3)
     np.testing.assert_allclose(fock_beta1, fock_beta2, atol=1e-3)
+
+
+def test_becke_hartree_prune():
+    fn_fchk = context.get_fn('test/n2_hfs_sto3g.fchk')
+    mol = IOData.from_file(fn_fchk)
+    grid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, 'coarse',
+                        random_rotate=False, mode='keep', prune=1e-10)
+    assert grid.npruned > 0
+    ham = REffHam([RGridGroup(mol.obasis, grid, [RBeckeHartree(8)])])
+    ham.reset(mol.orb_alpha.to_dm())
+    with assert_raises(TypeError):
+        ham.compute_energy()
+
+
+def test_becke_hartree_spatial_order():
+    fn_fchk = context.get_fn('test/h3_hfs_321g.fchk')
+    mol = IOData.from_file(fn_fchk)
+    dm_alpha = mol.orb_alpha.to_dm()
+    dm_beta = mol.orb_beta.to_dm()
+    energies = []
+    for spatial_order in False, True:
+        grid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, random_rotate=False,
+                            mode='keep', spatial_order=spatial_order)
+        ham = UEffHam([UGridGroup(mol.obasis, grid, [UBeckeHartree(8)])])
+        ham.reset(dm_alpha, dm_beta)
+        energies.append(ham.compute_energy())
+    assert abs(energies[0] - energies[1]) < 1e-10
@@ -21,6 +21,7 @@
 """Test horton/meanfield/gridgroup.py."""
 
 
+import numpy as np
 from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
@@ -77,3 +78,27 @@ def test_gridgroup_exceptions():
         ugg._update_grid_basics(cache, 'alpha')
     with assert_raises(ValueError):
         ugg._get_potentials(cache)
+
+
+def test_gridgroup_basis_cache():
+    fn_fchk = context.get_fn('test/co_pbe_sto3g.fchk')
+    mol = IOData.from_file(fn_fchk)
+    grid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, random_rotate=False)
+    dm1 = mol.orb_alpha.to_dm()
+    noise = np.random.uniform(-0.01, 0.01, dm1.shape)
+    dm2 = dm1 + noise + noise.T
+    results = []
+    for basis_cache_memory in 0, 1e8:
+        rgg = RGridGroup(mol.obasis, grid, [RLibXCGGA('x_pbe')],
+                         basis_cache_memory=basis_cache_memory)
+        assert (rgg.basis_cache is None) == (basis_cache_memory == 0)
+        ham = REffHam([rgg])
+        for dm in dm1, dm2:
+            ham.reset(dm)
+            fock = np.zeros(dm.shape)
+            ham.compute_fock(fock)
+            results.append((ham.compute_energy(), fock))
+    assert rgg.basis_cache.used_memory > 0
+    for (energy0, fock0), (energy1, fock1) in zip(results[:2], results[2:]):
+        assert abs(energy0 - energy1) < 1e-12
+        assert abs(fock0 - fock1).max() < 1e-12
@@ -20,6 +20,9 @@
 # --
 
 
+import numpy as np
+from nose.tools import assert_raises
+
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 from horton.meanfield.test.common import check_interpolation, helper_compute
 
@@ -143,3 +146,83 @@ def test_ghost_hf():
     # The convergence should be reasonable, not perfect because of limited
     # precision in Gaussian fchk file:
     assert convergence_error_eigen(ham, olp, mol.orb_alpha) < 1e-5
+
+
+def get_incremental_hams(fn, restricted, direct, rebuild_interval):
+    mol = IOData.from_file(context.get_fn(fn))
+    kin = mol.obasis.compute_kinetic()
+    na = mol.obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers)
+    if direct:
+        er = DirectFourIndex(mol.obasis)
+    else:
+        er = mol.obasis.compute_electron_repulsion()
+    hams = []
+    for interval in None, rebuild_interval:
+        if restricted:
+            terms = [RTwoIndexTerm(kin, 'kin'), RDirectTerm(er, 'hartree'),
+                     RExchangeTerm(er, 'x_hf'), RTwoIndexTerm(na, 'ne')]
+            hams.append(REffHam(terms, rebuild_interval=interval))
+        else:
+            terms = [UTwoIndexTerm(kin, 'kin'), UDirectTerm(er, 'hartree'),
+                     UExchangeTerm(er, 'x_hf'), UTwoIndexTerm(na, 'ne')]
+            hams.append(UEffHam(terms, rebuild_interval=interval))
+    return mol, hams
+
+
+def check_incremental(fn, restricted, direct):
+    mol, (ham_full, ham_incr) = get_incremental_hams(fn, restricted, direct, 2)
+    orbs = [mol.orb_alpha] if restricted else [mol.orb_alpha, mol.orb_beta]
+    np.random.seed(1)
+    nincrementals = []
+    for _ in range(6):
+        # Randomly perturbed density matrices
+        dms = []
+        for orb in orbs:
+            dm = orb.to_dm()
+            noise = np.random.uniform(-1e-3, 1e-3, dm.shape)
+            dms.append(dm + noise + noise.T)
+        ham_full.reset(*dms)
+        ham_incr.reset(*dms)
+        nincrementals.append(ham_incr.nincremental)
+        assert abs(ham_full.compute_energy() - ham_incr.compute_energy()) < 1e-10
+        focks_full = [np.zeros(dm.shape) for dm in dms]
+        focks_incr = [np.zeros(dm.shape) for dm in dms]
+        ham_full.compute_fock(*focks_full)
+        ham_incr.compute_fock(*focks_incr)
+        for fock_full, fock_incr in zip(focks_full, focks_incr):
+            assert abs(fock_full - fock_incr).max() < 1e-10
+    assert nincrementals == [0, 1, 2, 0, 1, 2]
+
+
+def test_incremental_rhf():
+    check_incremental('test/water_sto3g_hf_g03.fchk', True, False)
+
+
+def test_incremental_rhf_direct():
+    check_incremental('test/water_sto3g_hf_g03.fchk', True, True)
+
+
+def test_incremental_uhf():
+    check_incremental('test/h3_hfs_321g.fchk', False, False)
+
+
+def test_incremental_uhf_direct():
+    check_incremental('test/h3_hfs_321g.fchk', False, True)
+
+
+def test_incremental_scf_direct():
+    mol, hams = get_incremental_hams('test/h3_hfs_321g.fchk', False, True, 3)
+    olp = mol.obasis.compute_overlap()
+    occ_model = AufbauOccModel(2, 1)
+    energies = []
+    for ham in hams:
+        dms = [mol.orb_alpha.to_dm(), mol.orb_beta.to_dm()]
+        scf_solver = CDIISSCFSolver(threshold=1e-8)
+        scf_solver(ham, olp, occ_model, *dms)
+        energies.append(ham.compute_energy())
+    assert abs(energies[0] - energies[1]) < 1e-8
+
+
+def test_incremental_exceptions():
+    with assert_raises(ValueError):
+        REffHam([RTwoIndexTerm(np.identity(2), 'foo')], rebuild_interval=-1)
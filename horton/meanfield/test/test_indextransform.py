@@ -24,7 +24,8 @@ import numpy as np
 from nose.tools import assert_raises
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
-from horton.meanfield.indextransform import _parse_four_index_transform_orbs
+from horton.meanfield.indextransform import _parse_four_index_transform_orbs, \
+    _four_index_transform_packed
 
 
 def test_parse_index_transform_orbs():
@@ -55,6 +56,30 @@ def test_exceptions():
         split_core_active_cholesky(np.zeros((5, 5)), None, 0.0, None, 3, 7)
 
 
+def test_four_index_transform_packed():
+    nbasis = 5
+    np.random.seed(1)
+    dense = np.random.uniform(-1, 1, (nbasis,)*4)
+    dense += dense.transpose(1, 0, 3, 2)
+    dense += dense.transpose(2, 3, 0, 1)
+    dense += dense.transpose(0, 3, 2, 1)
+    packed = pack_four_index(dense)
+    for nfn in 5, 3:
+        orb = Orbitals(nbasis, nfn)
+        orb.coeffs[:] = np.random.uniform(-1, 1, (nbasis, nfn))
+        c = orb.coeffs
+        expected = pack_four_index(np.einsum('pa,qb,rc,sd,pqrs->abcd', c, c, c, c, dense))
+        assert abs(four_index_transform(packed, orb) - expected).max() < 1e-10
+        assert abs(four_index_transform(packed, orb, orb, orb, orb) - expected).max() < 1e-10
+        # Small blocks
+        result = _four_index_transform_packed(packed, orb, blocksize=2)
+        assert abs(result - expected).max() < 1e-10
+    with assert_raises(TypeError):
+        four_index_transform(packed, orb, orb.copy())
+    with assert_raises(TypeError):
+        four_index_transform(packed[:-1], orb)
+
+
 def helper_hf(olp, ecore, one, two, nocc):
     # Initial guess
     orb_alpha = Orbitals(olp.shape[0])
@@ -161,6 +186,21 @@ def test_core_active_2h_azirine():
     check_core_active(mol, '3-21g', 3, 15)
 
 
+def test_hf_packed_h_chain():
+    mol = IOData(
+        coordinates=np.array([[0.0, 0.0, 1.4*i] for i in range(4)]),
+        numbers=np.ones(4, int)
+    )
+    obasis, olp, kin, na, one, two, enucnuc = prepare_hf(mol, '3-21g')
+    energy1, orb_alpha1 = helper_hf(olp, enucnuc, one, two, 2)
+    packed = obasis.compute_electron_repulsion(packed=True)
+    energy2, orb_alpha2 = helper_hf(olp, enucnuc, one, packed, 2)
+    np.testing.assert_almost_equal(energy1, energy2)
+    # Compare MO integrals
+    two_mo = pack_four_index(four_index_transform(two, orb_alpha1))
+    np.testing.assert_allclose(four_index_transform(packed, orb_alpha1), two_mo, atol=1e-10)
+
+
 def helper_hf_cholesky(olp, ecore, one, two_vecs, nocc):
     # Initial guess
     orb_alpha = Orbitals(olp.shape[0])
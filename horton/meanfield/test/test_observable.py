@@ -21,12 +21,14 @@
 """Unit tests for horton/meanfield/observable.py."""
 
 
+import numpy as np
+
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
 from horton.meanfield.test.common import check_dot_hessian, \
     check_dot_hessian_polynomial, check_dot_hessian_cache
 
 
-def setup_rhf_case(cholesky=False):
+def setup_rhf_case(cholesky=False, direct=False):
     """Prepare datastructures for R-HF calculation on Water."""
     fn_fchk = context.get_fn('test/water_sto3g_hf_g03.fchk')
     mol = IOData.from_file(fn_fchk)
@@ -38,6 +40,8 @@ def setup_rhf_case(cholesky=False):
     mol.obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers, core)
     if cholesky:
         er = mol.obasis.compute_electron_repulsion_cholesky()
+    elif direct:
+        er = DirectFourIndex(mol.obasis)
     else:
         er = mol.obasis.compute_electron_repulsion()
     terms = [
@@ -80,7 +84,25 @@ def test_cache_dot_hessian_rhf_cholesky():
     check_dot_hessian_cache(ham, mol.dm_alpha)
 
 
-def setup_uhf_case(cholesky=False):
+def test_dot_hessian_rhf_fd_direct():
+    mol, _olp, _core, ham = setup_rhf_case(direct=True)
+    check_dot_hessian(ham, mol.dm_alpha)
+
+
+def test_energy_fock_rhf_direct():
+    mol, _olp, _core, ham1 = setup_rhf_case()
+    mol, _olp, _core, ham2 = setup_rhf_case(direct=True)
+    ham1.reset(mol.dm_alpha)
+    ham2.reset(mol.dm_alpha)
+    assert abs(ham1.compute_energy() - ham2.compute_energy()) < 1e-10
+    fock1 = np.zeros(mol.dm_alpha.shape)
+    fock2 = np.zeros(mol.dm_alpha.shape)
+    ham1.compute_fock(fock1)
+    ham2.compute_fock(fock2)
+    assert abs(fock1 - fock2).max() < 1e-10
+
+
+def setup_uhf_case(cholesky=False, direct=False):
     """Prepare datastructures for UHF calculation."""
     fn_fchk = context.get_fn('test/h3_hfs_321g.fchk')
     mol = IOData.from_file(fn_fchk)
@@ -91,7 +113,10 @@ def setup_uhf_case(cholesky=False):
     olp = mol.obasis.compute_overlap()
     core = mol.obasis.compute_kinetic()
     mol.obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers, core)
-    er = mol.obasis.compute_electron_repulsion()
+    if direct:
+        er = DirectFourIndex(mol.obasis)
+    else:
+        er = mol.obasis.compute_electron_repulsion()
     terms = [
         UTwoIndexTerm(core, 'core'),
         UDirectTerm(er, 'hartree'),
@@ -130,3 +155,22 @@ def test_dot_hessian_uhf_fd_cholesky():
 def test_cache_dot_hessian_uhf_cholesky():
     mol, _olp, _core, ham = setup_uhf_case(True)
     check_dot_hessian_cache(ham, mol.dm_alpha, mol.dm_beta)
+
+
+def test_dot_hessian_uhf_fd_direct():
+    mol, _olp, _core, ham = setup_uhf_case(direct=True)
+    check_dot_hessian(ham, mol.dm_alpha, mol.dm_beta)
+
+
+def test_energy_fock_uhf_direct():
+    mol, _olp, _core, ham1 = setup_uhf_case()
+    mol, _olp, _core, ham2 = setup_uhf_case(direct=True)
+    ham1.reset(mol.dm_alpha, mol.dm_beta)
+    ham2.reset(mol.dm_alpha, mol.dm_beta)
+    assert abs(ham1.compute_energy() - ham2.compute_energy()) < 1e-10
+    focks1 = [np.zeros(mol.dm_alpha.shape) for _ in range(2)]
+    focks2 = [np.zeros(mol.dm_alpha.shape) for _ in range(2)]
+    ham1.compute_fock(*focks1)
+    ham2.compute_fock(*focks2)
+    for fock1, fock2 in zip(focks1, focks2):
+        assert abs(fock1 - fock2).max() < 1e-10
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# HORTON: Helpful Open-source Research TOol for N-fermion systems.
+# Copyright (C) 2011-2022 The HORTON Development Team
+#
+# This file is part of HORTON.
+#
+# HORTON is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 3
+# of the License, or (at your option) any later version.
+#
+# HORTON is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>
+#
+# --
+"""Unit tests for horton/meanfield/outofcore.py."""
+
+
+import os
+
+import h5py as h5
+import numpy as np
+from nose.tools import assert_raises
+
+from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from horton.meanfield.observable import contract_direct, contract_exchange
+from horton.test.common import tmpdir
+
+
+def get_h_chain():
+    mol = IOData(coordinates=np.array([[0.0, 0.1*i, 1.4*i] for i in range(4)]),
+                 numbers=np.ones(4, int))
+    mol.obasis = get_gobasis(mol.coordinates, mol.numbers, '3-21g')
+    return mol
+
+
+def get_random_dm(nbasis, seed):
+    np.random.seed(seed)
+    dm = np.random.uniform(-1, 1, (nbasis, nbasis))
+    return dm + dm.T
+
+
+def check_contractions(op, ref):
+    for seed in range(2):
+        dm = get_random_dm(ref.shape[-1], seed)
+        assert abs(contract_direct(op, dm) - contract_direct(ref, dm)).max() < 1e-10
+        assert abs(contract_exchange(op, dm) - contract_exchange(ref, dm)).max() < 1e-10
+
+
+def test_dense_memmap():
+    mol = get_h_chain()
+    nbasis = mol.obasis.nbasis
+    ref = mol.obasis.compute_electron_repulsion()
+    with tmpdir('horton.meanfield.test.test_outofcore.test_dense_memmap') as dn:
+        fn = os.path.join(dn, 'er.dat')
+        er = np.memmap(fn, dtype=float, mode='w+', shape=(nbasis,)*4)
+        assert mol.obasis.compute_electron_repulsion(er) is er
+        er.flush()
+        er = np.memmap(fn, dtype=float, mode='r', shape=(nbasis,)*4)
+        # Blocks of three rows
+        op = OutOfCoreFourIndex(er, memory=3*nbasis**3*8)
+        assert op.blocksize == 3
+        assert op.shape == ref.shape
+        check_contractions(op, ref)
+        del er
+
+
+def test_cholesky_h5():
+    mol = get_h_chain()
+    ref = mol.obasis.compute_electron_repulsion_cholesky()
+    with tmpdir('horton.meanfield.test.test_outofcore.test_cholesky_h5') as dn:
+        with h5.File(os.path.join(dn, 'er.h5'), 'w') as f:
+            vecs = mol.obasis.compute_electron_repulsion_cholesky(output=f)
+            assert isinstance(vecs, h5.Dataset)
+            assert vecs.shape == ref.shape
+            assert abs(vecs[:] - ref).max() < 1e-12
+            op = OutOfCoreFourIndex(vecs, memory=5*ref[0].nbytes)
+            assert op.blocksize == 5
+            check_contractions(op, ref)
+
+            # Four-index transformation, streamed to disk.
+            orb = Orbitals(mol.obasis.nbasis)
+            orb.coeffs[:] = np.random.uniform(-1, 1, orb.coeffs.shape)
+            expected = four_index_transform_cholesky(ref, orb)
+            assert abs(four_index_transform_cholesky(op, orb) - expected).max() < 1e-10
+            output = f.create_dataset('mo', expected.shape, float)
+            assert four_index_transform_cholesky(op, orb, output=output) is output
+            assert abs(output[:] - expected).max() < 1e-10
+            with assert_raises(TypeError):
+                four_index_transform_cholesky(op, orb, output=np.zeros((2, 2, 2)))
+
+
+def test_cholesky_h5_small_memory():
+    mol = get_h_chain()
+    ref = mol.obasis.compute_electron_repulsion_cholesky()
+    ref_reduced, ref_pairs = mol.obasis.compute_electron_repulsion_cholesky(reduced=True)
+    # Room for about four vectors, so they are written and read back in many blocks.
+    memory = 4*ref_reduced[0].nbytes
+    with tmpdir('horton.meanfield.test.test_outofcore.test_cholesky_h5_small_memory') as dn:
+        with h5.File(os.path.join(dn, 'er.h5'), 'w') as f:
+            # Pivots with equal diagonal elements may be picked in a different order,
+            # so only the products of the vectors are compared.
+            vecs = mol.obasis.compute_electron_repulsion_cholesky(
+                output=f.create_group('full'), memory=memory)
+            assert list(f['full']) == ['cholesky']
+            assert vecs.shape[1:] == ref.shape[1:]
+            check_contractions(OutOfCoreFourIndex(vecs, memory=memory), ref)
+            vecs, pairs = mol.obasis.compute_electron_repulsion_cholesky(
+                output=f.create_group('reduced'), reduced=True, memory=memory)
+            assert (pairs[:] == ref_pairs).all()
+            expected = np.dot(ref_reduced.T, ref_reduced)
+            assert abs(np.dot(vecs[:].T, vecs[:]) - expected).max() < 1e-12
+        # The temporary file is removed.
+        assert os.listdir(dn) == ['er.h5']
+
+
+def test_rhf_outofcore():
+    mol = get_h_chain()
+    olp = mol.obasis.compute_overlap()
+    core = mol.obasis.compute_kinetic()
+    mol.obasis.compute_nuclear_attraction(mol.coordinates, mol.pseudo_numbers, core)
+    er = mol.obasis.compute_electron_repulsion()
+    energies = []
+    with tmpdir('horton.meanfield.test.test_outofcore.test_rhf_outofcore') as dn:
+        fn = os.path.join(dn, 'er.npy')
+        np.save(fn, er)
+        for op in er, OutOfCoreFourIndex(np.load(fn, mmap_mode='r'), memory=1):
+            terms = [
+                RTwoIndexTerm(core, 'core'),
+                RDirectTerm(op, 'hartree'),
+                RExchangeTerm(op, 'x_hf'),
+            ]
+            ham = REffHam(terms)
+            orb_alpha = Orbitals(mol.obasis.nbasis)
+            guess_core_hamiltonian(olp, core, orb_alpha)
+            occ_model = AufbauOccModel(2)
+            occ_model.assign(orb_alpha)
+            dm_alpha = orb_alpha.to_dm()
+            CDIISSCFSolver(1e-8)(ham, olp, occ_model, dm_alpha)
+            energies.append(ham.compute_energy())
+    assert abs(energies[0] - energies[1]) < 1e-10
+
+
+def test_outofcore_exceptions():
+    with assert_raises(TypeError):
+        OutOfCoreFourIndex(np.zeros((3, 3)))
+    with assert_raises(TypeError):
+        OutOfCoreFourIndex(np.zeros((2, 3, 4)))
+    with assert_raises(TypeError):
+        OutOfCoreFourIndex(np.zeros((2, 3, 3, 3)))
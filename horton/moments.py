@@ -30,7 +30,7 @@ import numpy as np
 
 __all__ = ['get_cartesian_powers', 'get_ncart', 'get_ncart_cumul',
            'rotate_cartesian_multipole', 'rotate_cartesian_moments_all',
-           'get_npure', 'get_npure_cumul']
+           'get_npure', 'get_npure_cumul', 'get_cartesian_to_pure']
 
 
 def get_cartesian_powers(lmax):
@@ -882,3 +882,65 @@ def get_npure(l):
 def get_npure_cumul(lmax):
     '''The number of pure functions up to a given angular momentum, lmax.'''
     return (lmax + 1) ** 2
+
+
+def get_cartesian_to_pure(lmax):
+    '''Return the transformation from Cartesian to pure multipole moments
+
+       **Arguments:**
+
+       lmax
+            The maximum angular momentum (0=s, 1=p, 2=d, ...)
+
+       **Returns:** an array with shape (npure, ncart), where npure and ncart
+       are the cumulative numbers of pure and Cartesian moments. Row i contains
+       the coefficients of the i-th regular solid harmonic, as computed by
+       ``fill_pure_polynomials``, in terms of the Cartesian polynomials, ordered
+       as in ``get_cartesian_powers``. Pure multipole moments are obtained by
+       multiplying this matrix with a vector of Cartesian multipole moments.
+    '''
+    powers = get_cartesian_powers(lmax)
+    indexes = dict((tuple(power), icart) for icart, power in enumerate(powers))
+    ncart = len(powers)
+
+    def product(poly0, poly1):
+        result = np.zeros(ncart)
+        for icart0 in poly0.nonzero()[0]:
+            for icart1 in poly1.nonzero()[0]:
+                result[indexes[tuple(powers[icart0] + powers[icart1])]] += \
+                    poly0[icart0]*poly1[icart1]
+        return result
+
+    # Polynomials are represented by their Cartesian coefficients. The recursion
+    # below follows the one in fill_pure_polynomials.
+    if lmax == 0:
+        return np.ones((1, 1))
+    one, x, y, z = np.identity(ncart)[:4]
+    result = [one, z, x, y]
+    pi_old = [one] + [None]*lmax
+    pi_new = [z, one] + [None]*(lmax - 1)
+    a = [None, x] + [None]*(lmax - 1)
+    b = [None, y] + [None]*(lmax - 1)
+    if lmax > 1:
+        r2 = product(x, x) + product(y, y) + product(z, z)
+    for l in range(2, lmax + 1):
+        # construct polynomials PI(z,r) for current l
+        factor = 2*l - 1
+        for m in range(l - 1):
+            tmp = pi_old[m]
+            pi_old[m] = pi_new[m]
+            pi_new[m] = (factor*product(z, pi_old[m]) - (l + m - 1)*product(r2, tmp))/(l - m)
+        pi_old[l - 1] = pi_new[l - 1]
+        pi_new[l] = factor*pi_old[l - 1]
+        pi_new[l - 1] = product(z, pi_new[l])
+        # construct new polynomials A(x,y) and B(x,y)
+        a[l] = product(x, a[l - 1]) - product(y, b[l - 1])
+        b[l] = product(x, b[l - 1]) + product(y, a[l - 1])
+        # construct solid harmonics
+        result.append(pi_new[0])
+        factor = np.sqrt(2)
+        for m in range(1, l + 1):
+            factor /= np.sqrt((l + m)*(l - m + 1))
+            result.append(factor*product(a[m], pi_new[m]))
+            result.append(factor*product(b[m], pi_new[m]))
+    return np.array(result)
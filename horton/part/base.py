@@ -368,6 +368,8 @@ class WPart(Part):
         '''
         if local and grid.subgrids is None:
             raise ValueError('Atomic grids are discarded from molecular grid object, but are needed for local integrations.')
+        if local and getattr(grid, 'npruned', 0) > 0:
+            raise ValueError('Local integrations need complete atomic grids, which are not available in a pruned molecular grid.')
         Part.__init__(self, coordinates, numbers, pseudo_numbers, grid, moldens, spindens, local, lmax)
 
     def _init_log_base(self):
@@ -388,6 +390,8 @@ class WPart(Part):
         if index is None or not self.local:
             return data
         else:
+            if hasattr(self._grid, 'to_atomic_grid'):
+                return self._grid.to_atomic_grid(index, data)
             grid = self.get_grid(index)
             return data[grid.begin:grid.end]
 
@@ -21,6 +21,7 @@
 
 
 import numpy as np
+from nose.tools import assert_raises
 from nose.plugins.attrib import attr
 
 from horton import *  # pylint: disable=wildcard-import,unused-wildcard-import
@@ -146,3 +147,63 @@ def test_hirshfeld_i_msa_hf_lan_global():
 def test_is_msa_hf_lan():
     expecting = np.array([1.1721364, -0.5799622, -0.5654549, -0.5599638, -0.5444145, 0.2606699, 0.2721848, 0.2664377, 0.2783666]) # from HiPart
     check_msa_hf_lan('is', expecting, needs_padb=False)
+
+
+def test_hirshfeld_water_hf_sto3g_prune():
+    proatomdb = get_proatomdb_hf_sto3g()
+    fn_fchk = context.get_fn('test/water_sto3g_hf_g03.fchk')
+    mol = IOData.from_file(fn_fchk)
+    rtf = ExpRTransform(5e-4, 2e1, 120)
+    rgrid = RadialGrid(rtf)
+    charges = []
+    for prune in 0.0, 1e-10:
+        grid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, (rgrid, 110),
+                            random_rotate=False, mode='keep', prune=prune, prune_density=True)
+        moldens = mol.obasis.compute_grid_density_dm(mol.get_dm_full(), grid.points)
+        WPartClass = wpart_schemes['h']
+        if prune > 0:
+            assert grid.npruned > 0
+            # Local integrations need complete atomic grids.
+            with assert_raises(ValueError):
+                WPartClass(mol.coordinates, mol.numbers, mol.pseudo_numbers, grid, moldens, proatomdb)
+        wpart = WPartClass(mol.coordinates, mol.numbers, mol.pseudo_numbers, grid, moldens, proatomdb, local=False)
+        wpart.do_charges()
+        charges.append(wpart['charges'])
+    assert abs(charges[0] - charges[1]).max() < 1e-5
+
+
+def test_hirshfeld_water_hf_sto3g_intgrid():
+    proatomdb = get_proatomdb_hf_sto3g()
+    fn_fchk = context.get_fn('test/water_sto3g_hf_g03.fchk')
+    mol = IOData.from_file(fn_fchk)
+    rtf = ExpRTransform(5e-4, 2e1, 120)
+    rgrid = RadialGrid(rtf)
+    molgrid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, (rgrid, 110),
+                           random_rotate=False, mode='keep')
+    # A plain IntGrid with the same atomic grids must work for local integrations too.
+    grid = IntGrid(molgrid.points, molgrid.weights, molgrid.subgrids)
+    moldens = mol.obasis.compute_grid_density_dm(mol.get_dm_full(), grid.points)
+    WPartClass = wpart_schemes['h']
+    charges = []
+    for g in molgrid, grid:
+        wpart = WPartClass(mol.coordinates, mol.numbers, mol.pseudo_numbers, g, moldens, proatomdb)
+        wpart.do_charges()
+        charges.append(wpart['charges'])
+    assert abs(charges[0] - charges[1]).max() < 1e-10
+
+
+def test_hirshfeld_water_hf_sto3g_spatial_order():
+    proatomdb = get_proatomdb_hf_sto3g()
+    fn_fchk = context.get_fn('test/water_sto3g_hf_g03.fchk')
+    mol = IOData.from_file(fn_fchk)
+    rtf = ExpRTransform(5e-4, 2e1, 120)
+    rgrid = RadialGrid(rtf)
+    charges = []
+    for spatial_order in False, True:
+        grid = BeckeMolGrid(mol.coordinates, mol.numbers, mol.pseudo_numbers, (rgrid, 110),
+                            random_rotate=False, mode='only', spatial_order=spatial_order)
+        moldens = mol.obasis.compute_grid_density_dm(mol.get_dm_full(), grid.points)
+        wpart = HirshfeldWPart(mol.coordinates, mol.numbers, mol.pseudo_numbers, grid, moldens, proatomdb)
+        wpart.do_charges()
+        charges.append(wpart['charges'])
+    assert abs(charges[0] - charges[1]).max() < 1e-10
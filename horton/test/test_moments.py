@@ -215,6 +215,27 @@ def test_fill_pure_polynomials():
         fill_cartesian_polynomials(output[:get_ncart_cumul(4)-2], 4)
 
 
+def test_get_cartesian_to_pure():
+    lmax = 4
+    tf = get_cartesian_to_pure(lmax)
+    assert tf.shape == (get_npure_cumul(lmax), get_ncart_cumul(lmax))
+    for _ in range(10):
+        delta = np.random.normal(0, 1, 3)
+        cartesian = np.zeros(get_ncart_cumul(lmax))
+        cartesian[0] = 1.0
+        cartesian[1:4] = delta
+        fill_cartesian_polynomials(cartesian[1:], lmax)
+        pure = np.zeros(get_npure_cumul(lmax))
+        pure[0] = 1.0
+        pure[1:4] = delta[2], delta[0], delta[1]
+        fill_pure_polynomials(pure[1:], lmax)
+        assert abs(np.dot(tf, cartesian) - pure).max() < 1e-10
+    for l in range(lmax):
+        npure = get_npure_cumul(l)
+        ncart = get_ncart_cumul(l)
+        assert (get_cartesian_to_pure(l) == tf[:npure, :ncart]).all()
+
+
 def test_fill_pure_polynomials_array():
     lmax = 4
     npoint = 10